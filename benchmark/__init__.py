@@ -0,0 +1,20 @@
+"""
+Offline benchmarks for smolagentsUI.
+
+Run a benchmark from the repository root, e.g.:
+    python -m benchmark.bench_agent_spawn
+
+End-to-end load test against the stored baseline (benchmark/baselines), exits
+with status 1 on a regression:
+    python -m benchmark.bench_load --check
+
+The package puts the repository's `src` directory first on sys.path, so the
+benchmarks (and the servers they start with `python -m benchmark.serve_fake`)
+run against the working tree without installing it or setting PYTHONPATH.
+"""
+import os
+import sys
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+if os.path.isdir(SRC_DIR) and SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
@@ -0,0 +1,102 @@
+"""
+Time-to-first-token for new sessions.
+
+Compares the legacy spawn (copy.copy + deepcopy of memory and python_executor)
+with clone_agent (shared tools) and with a warm AgentPool, using a prototype
+whose tool holds a large DataFrame, like the demo's DataLoaderTool.
+
+    python -m benchmark.bench_agent_spawn --rows 1000000 --repeat 5
+"""
+import argparse
+import copy
+import statistics
+import time
+
+import numpy as np
+import pandas as pd
+from rich.console import Console
+from smolagents import CodeAgent, Tool
+
+from smolagentsUI.agent_pool import AgentPool, clone_agent
+from smolagentsUI.agent_wrapper import AgentWrapper
+from .fake_model import FakeStreamingModel
+
+
+class DataLoaderTool(Tool):
+    name = "data_loader"
+    description = "Get the dataset as pandas.DataFrame."
+    inputs = {}
+    output_type = "object"
+
+    def __init__(self, df: pd.DataFrame):
+        super().__init__()
+        self.df = df.copy()
+
+    def forward(self) -> pd.DataFrame:
+        return self.df
+
+
+def legacy_clone(prototype: CodeAgent) -> CodeAgent:
+    """ The spawn logic used by get_agent_wrapper before the warm pool. """
+    new_agent = copy.copy(prototype)
+    new_agent.memory = copy.deepcopy(prototype.memory)
+    new_agent.memory.reset()
+    new_agent.python_executor = copy.deepcopy(prototype.python_executor)
+    new_agent.python_executor.state.clear()
+    return new_agent
+
+
+def build_prototype(rows: int) -> CodeAgent:
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(rng.normal(size=(rows, 10)), columns=[f"c{i}" for i in range(10)])
+    agent = CodeAgent(tools=[DataLoaderTool(df)], model=FakeStreamingModel(),
+                      executor_type="local", stream_outputs=True, verbosity_level=-1)
+    agent.logger.console = Console(quiet=True)
+    # A served prototype has already sent its tools to the executor
+    agent.python_executor.send_tools({**agent.tools, **agent.managed_agents})
+    return agent
+
+
+def time_to_first_token(spawn) -> float:
+    start = time.perf_counter()
+    first_token = None
+    wrapper = AgentWrapper(spawn())
+    # Drain the whole run so the agent finishes cleanly; only the first delta is timed
+    for event in wrapper.run("Compute something."):
+        if first_token is None and event["type"] == "stream_delta":
+            first_token = time.perf_counter() - start
+    if first_token is None:
+        raise RuntimeError("The agent produced no stream_delta event.")
+    return first_token
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Rows of the DataFrame held by the tool.")
+    parser.add_argument("--repeat", type=int, default=5, help="New sessions spawned per strategy.")
+    args = parser.parse_args()
+
+    prototype = build_prototype(args.rows)
+    pool = AgentPool(prototype, size=args.repeat)
+    pool.start()
+    # Let the pool fill before measuring, as it would between user requests
+    while pool.stats()["ready"] < args.repeat:
+        time.sleep(0.05)
+
+    strategies = {
+        "legacy deepcopy": lambda: legacy_clone(prototype),
+        "clone_agent": lambda: clone_agent(prototype),
+        "warm pool": pool.acquire,
+    }
+
+    print(f"Time-to-first-token for new sessions (DataFrame {args.rows:,} x 10, {args.repeat} runs)")
+    print(f"{'strategy':<18}{'median ms':>12}{'max ms':>12}")
+    for label, spawn in strategies.items():
+        timings = [time_to_first_token(spawn) * 1000 for _ in range(args.repeat)]
+        print(f"{label:<18}{statistics.median(timings):>12.2f}{max(timings):>12.2f}")
+
+    pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
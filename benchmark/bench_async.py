@@ -0,0 +1,166 @@
+"""
+Socket concurrency of the server modes: opens N dashboard connections against
+`serve(async_mode=...)` while R sessions stream runs from a FakeStreamingModel,
+and measures how many connections are held and the round-trip latency of
+get_history / history_list on every idle dashboard.
+
+Each mode runs in its own server process (benchmark.serve_fake); clients are
+asyncio python-socketio clients (needs aiohttp). Fully offline.
+
+    python -m benchmark.bench_async --clients 500 --runs 8 --modes threading gevent
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import socketio
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def process_stats(pid: int):
+    """ (threads, RSS MiB) of a process, from /proc. """
+    threads = rss = 0
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("Threads:"):
+                    threads = int(line.split()[1])
+                elif line.startswith("VmRSS:"):
+                    rss = int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return threads, rss
+
+
+def start_server(mode: str, port: int, storage_path: str, tokens_per_second: float):
+    cmd = [sys.executable, "-m", "benchmark.serve_fake", "--async-mode", mode, "--port", str(port),
+           "--storage-path", storage_path, "--tokens-per-second", str(tokens_per_second)]
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError(f"{mode} server did not start")
+
+
+class Dashboard:
+    def __init__(self, url: str):
+        self.url = url
+        self.sio = socketio.AsyncClient(reconnection=False)
+        self.pending = None
+        self.sio.on("history_list", self._on_history)
+        self.run_done = None
+        self.sio.on("run_complete", self._on_run_complete)
+
+    async def _on_history(self, data):
+        if self.pending is not None and not self.pending.done():
+            self.pending.set_result(time.perf_counter())
+
+    async def _on_run_complete(self, data):
+        if self.run_done is not None and not self.run_done.done():
+            self.run_done.set_result(True)
+
+    async def connect(self, timeout: float) -> bool:
+        try:
+            await asyncio.wait_for(self.sio.connect(self.url, transports=["websocket"]), timeout)
+            return True
+        except Exception:
+            return False
+
+    async def round_trip(self, timeout: float):
+        """ Latency of get_history -> history_list in ms, None on timeout. """
+        self.pending = asyncio.get_running_loop().create_future()
+        start = time.perf_counter()
+        await self.sio.emit("get_history")
+        try:
+            return (await asyncio.wait_for(self.pending, timeout) - start) * 1000
+        except asyncio.TimeoutError:
+            return None
+
+    async def run(self, message: str, timeout: float) -> bool:
+        self.run_done = asyncio.get_running_loop().create_future()
+        await self.sio.emit("start_run", {"session_id": None, "message": message})
+        try:
+            return await asyncio.wait_for(self.run_done, timeout)
+        except asyncio.TimeoutError:
+            return False
+
+
+async def load(url: str, pid: int, clients: int, runs: int, rounds: int, timeout: float):
+    dashboards = [Dashboard(url) for _ in range(clients)]
+    start = time.perf_counter()
+    connected = await asyncio.gather(*(d.connect(timeout) for d in dashboards))
+    connect_s = time.perf_counter() - start
+    live = [d for d, ok in zip(dashboards, connected) if ok]
+    threads_idle, rss_idle = process_stats(pid)
+
+    runners, watchers = live[:runs], live[runs:]
+    run_tasks = [asyncio.create_task(d.run(f"Task {i}", timeout * 10)) for i, d in enumerate(runners)]
+
+    latencies, timeouts = [], 0
+    for _ in range(rounds):
+        results = await asyncio.gather(*(d.round_trip(timeout) for d in watchers))
+        latencies += [r for r in results if r is not None]
+        timeouts += sum(1 for r in results if r is None)
+    threads_busy, rss_busy = process_stats(pid)
+    completed = sum(await asyncio.gather(*run_tasks))
+
+    await asyncio.gather(*(d.sio.disconnect() for d in live), return_exceptions=True)
+    return {
+        "connected": len(live),
+        "connect_s": connect_s,
+        "p50": statistics.median(latencies) if latencies else float("nan"),
+        "p99": sorted(latencies)[int(len(latencies) * 0.99)] if latencies else float("nan"),
+        "timeouts": timeouts,
+        "runs_completed": completed,
+        "threads": (threads_idle, threads_busy),
+        "rss": (rss_idle, rss_busy),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--runs", type=int, default=8, help="Dashboards that start a streaming run")
+    parser.add_argument("--rounds", type=int, default=5, help="get_history round trips per idle dashboard")
+    parser.add_argument("--tokens-per-second", type=float, default=200)
+    parser.add_argument("--timeout", type=float, default=10.0)
+    parser.add_argument("--modes", nargs="+", default=["threading", "gevent"])
+    args = parser.parse_args()
+
+    print(f"{args.clients} dashboards, {args.runs} streaming runs, {args.rounds} history round trips each")
+    print(f"{'mode':<12}{'held':>7}{'connect s':>11}{'p50 ms':>9}{'p99 ms':>9}{'timeouts':>10}"
+          f"{'runs':>6}{'threads':>12}{'RSS MiB':>14}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in args.modes:
+            port = free_port()
+            proc = start_server(mode, port, os.path.join(tmp, f"{mode}.db"), args.tokens_per_second)
+            try:
+                r = asyncio.run(load(f"http://127.0.0.1:{port}", proc.pid, args.clients, args.runs,
+                                     args.rounds, args.timeout))
+            finally:
+                proc.kill()
+                proc.wait()
+            print(f"{mode:<12}{r['connected']:>7}{r['connect_s']:>11.2f}{r['p50']:>9.1f}{r['p99']:>9.1f}"
+                  f"{r['timeouts']:>10}{r['runs_completed']:>6}{'%d/%d' % r['threads']:>12}"
+                  f"{'%.0f/%.0f' % r['rss']:>14}")
+    print("threads and RSS: after connecting / while runs stream")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Multi-worker mode: runs R CPU-bound sessions (scripted code actions from a
+FakeStreamingModel) against 1 worker and against N workers (serve_cluster),
+with every client connected to worker 0, and reports the wall time.
+
+Also checks the session-affine routing end to end: runs started on worker 0
+stream back from whichever worker owns them, every worker lists every session,
+a session loads from any worker, and stop_run sent through another worker
+stops the run.
+
+    python -m benchmark.bench_cluster --runs 4 --workers 2 --cpu-work 200000
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import socketio
+
+from .bench_async import free_port
+
+
+def start_servers(workers: int, port: int, storage_path: str, cpu_work: int):
+    cmd = [sys.executable, "-m", "benchmark.serve_fake", "--workers", str(workers), "--port", str(port),
+           "--storage-path", storage_path, "--cpu-work", str(cpu_work), "--tokens-per-second", "0"]
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return proc
+
+
+class Client:
+    def __init__(self):
+        self.sio = socketio.AsyncClient(reconnection=False)
+        self.events = {}
+        self.session_id = None
+        self.deltas = 0
+        self.done = None
+        self.sio.on("*", self._on_any)
+
+    async def _on_any(self, event, data=None):
+        if event == "session_created" and self.session_id is None:
+            self.session_id = data["id"]
+        if event == "stream_delta":
+            self.deltas += 1
+        if event == "run_complete" and self.done is not None and not self.done.done():
+            self.done.set_result(time.perf_counter())
+        waiter = self.events.pop(event, None)
+        if waiter is not None and not waiter.done():
+            waiter.set_result(data)
+
+    async def connect(self, port: int, timeout: float = 30):
+        deadline = time.time() + timeout
+        while True:
+            try:
+                await self.sio.connect(f"http://127.0.0.1:{port}", transports=["websocket"])
+                return
+            except Exception:
+                if time.time() > deadline:
+                    raise
+                await asyncio.sleep(0.3)
+
+    async def request(self, event: str, data, reply: str, timeout: float = 30):
+        self.events[reply] = asyncio.get_running_loop().create_future()
+        await self.sio.emit(event, data)
+        return await asyncio.wait_for(self.events[reply], timeout)
+
+    async def run(self, message: str, session_id=None):
+        self.done = asyncio.get_running_loop().create_future()
+        await self.sio.emit("start_run", {"session_id": session_id, "message": message})
+        return await asyncio.wait_for(self.done, 600)
+
+
+async def scenario(port: int, workers: int, runs: int) -> float:
+    """ Wall time of `runs` concurrent runs started on worker 0; then checks the routing. """
+    clients = [Client() for _ in range(runs)]
+    await asyncio.gather(*(c.connect(port) for c in clients))
+    start = time.perf_counter()
+    await asyncio.gather(*(c.run(f"Task {i}") for i, c in enumerate(clients)))
+    elapsed = time.perf_counter() - start
+    if workers > 1:
+        await check_routing(port, workers, clients)
+    for c in clients:
+        await c.sio.disconnect()
+    return elapsed
+
+
+async def check_routing(port: int, workers: int, clients):
+    ids = {c.session_id for c in clients}
+    assert all(c.deltas > 0 for c in clients), "a run did not stream back to its client"
+
+    for w in range(workers):
+        other = Client()
+        await other.connect(port + w)
+        history = await other.request("get_history", None, "history_list")
+        assert ids <= {s["id"] for s in history["sessions"]}, f"worker {w} misses sessions"
+        chat = await other.request("load_session", {"id": clients[0].session_id}, "reload_chat")
+        assert chat["steps"], f"session did not load from worker {w}"
+        await other.sio.disconnect()
+
+    # Stop a run through a connection on the last worker
+    runner, stopper = Client(), Client()
+    await runner.connect(port)
+    await stopper.connect(port + workers - 1)
+    runner.done = asyncio.get_running_loop().create_future()
+    await runner.sio.emit("start_run", {"session_id": None, "message": "Long task"})
+    while runner.deltas == 0:
+        await asyncio.sleep(0.05)
+    await stopper.sio.emit("stop_run", {"session_id": runner.session_id})
+    await asyncio.wait_for(runner.done, 120)
+    await runner.sio.disconnect()
+    await stopper.sio.disconnect()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--cpu-work", type=int, default=200000)
+    args = parser.parse_args()
+
+    print(f"{args.runs} concurrent CPU-bound runs, clients on worker 0")
+    print(f"{'workers':<10}{'wall s':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for workers in sorted({1, args.workers}):
+            port = free_port()
+            proc = start_servers(workers, port, os.path.join(tmp, f"w{workers}.db"), args.cpu_work)
+            try:
+                elapsed = asyncio.run(scenario(port, workers, args.runs))
+                print(f"{workers:<10}{elapsed:>10.2f}")
+            finally:
+                proc.terminate()
+                proc.wait()
+    print("routing check: ok (streaming, shared history, cross-worker load and stop_run)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Compression ratio and encode/decode throughput of the storage codecs on
+realistic payloads: serialized step JSON and dill-pickled executor variables.
+zstd and lz4 are included when the zstandard / lz4 packages are installed.
+
+    python -m benchmark.bench_compression --steps 20 --repeat 5
+"""
+import argparse
+import json
+import time
+
+import dill
+import numpy as np
+import pandas as pd
+
+from smolagentsUI.compression import available_codecs, get_codec
+from smolagentsUI.utils import serialize_step
+
+from .bench_serialize import make_memory
+
+
+def make_payloads(n_steps: int):
+    steps = [json.dumps(serialize_step(step)).encode("utf-8") for step in make_memory(n_steps)]
+
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "month": rng.integers(1, 13, 50_000),
+        "region": rng.choice(["north", "south", "east", "west"], 50_000),
+        "revenue": rng.random(50_000).round(2) * 1000,
+    })
+    variables = [dill.dumps(df), dill.dumps(df.to_dict("records")[:5000]), dill.dumps(rng.random(100_000))]
+    return {"step JSON": steps, "python variables": variables}
+
+
+def measure(codec, payloads, repeat: int):
+    raw = sum(len(p) for p in payloads)
+    best_encode = best_decode = float("inf")
+    compressed = payloads
+    for _ in range(repeat):
+        start = time.perf_counter()
+        compressed = [codec.compress(p) for p in payloads] if codec else payloads
+        best_encode = min(best_encode, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        if codec:
+            for p in compressed:
+                codec.decompress(p)
+        best_decode = min(best_decode, time.perf_counter() - start)
+
+    stored = sum(len(p) for p in compressed)
+    mb = raw / 1e6
+    encode_rate = mb / best_encode if best_encode > 0 else float("inf")
+    decode_rate = mb / best_decode if best_decode > 0 else float("inf")
+    return raw, stored, encode_rate, decode_rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--levels", type=int, nargs="*", default=[1, 6],
+                        help="zlib levels to compare (other codecs use their default level)")
+    args = parser.parse_args()
+
+    payloads = make_payloads(args.steps)
+    codecs = [("none", None)]
+    codecs += [(f"zlib-{level}", get_codec("zlib", level)) for level in args.levels]
+    codecs += [(name, get_codec(name)) for name in available_codecs() if name not in ("none", "zlib")]
+
+    for kind, items in payloads.items():
+        print(f"\n{kind}: {len(items)} payloads, {sum(len(p) for p in items) / 1e6:.2f} MB")
+        print(f"{'codec':<10}{'ratio':>8}{'stored MB':>12}{'encode MB/s':>14}{'decode MB/s':>14}")
+        for label, codec in codecs:
+            raw, stored, encode_rate, decode_rate = measure(codec, items, args.repeat)
+            rates = f"{'-':>14}{'-':>14}" if codec is None else f"{encode_rate:>14.1f}{decode_rate:>14.1f}"
+            print(f"{label:<10}{raw / stored:>8.2f}{stored / 1e6:>12.2f}{rates}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+save_session / get_session throughput of ConversationManager, and the rate of
+database requests served from short-lived threads, the way Flask-SocketIO runs
+every socket event in threading mode.
+
+Compares the bounded connection pool against a new sqlite3 connection per call
+(default journaling) and against one persistent connection per thread, which
+opens (and configures) a connection for every handler thread.
+
+    python -m benchmark.bench_db --sessions 200 --turns 5 --requests 2000
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from smolagentsUI.conversation_manager import ConversationManager
+
+
+class PerCallConnectionManager(ConversationManager):
+    """ A brand-new connection for every call, no PRAGMAs. """
+
+    @contextmanager
+    def _connection(self):
+        conn = sqlite3.connect(self.storage_path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+
+class PerThreadConnectionManager(ConversationManager):
+    """ One persistent, configured connection per thread, closed once its thread has exited. """
+
+    def __init__(self, *args, **kwargs):
+        self._threads = {}  # thread -> connection
+        self._threads_lock = threading.Lock()
+        self.opened = 0
+        super().__init__(*args, **kwargs)
+
+    @contextmanager
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._open_connection()
+            self._local.conn = conn
+            with self._threads_lock:
+                self.opened += 1
+                for thread in [t for t in self._threads if not t.is_alive()]:
+                    self._threads.pop(thread).close()
+                self._threads[threading.current_thread()] = conn
+        yield conn
+
+    def close(self):
+        with self._threads_lock:
+            for conn in self._threads.values():
+                conn.close()
+            self._threads.clear()
+
+
+def make_steps(turn: int):
+    steps = [{"task": f"Task number {turn}: analyse the dataset and plot the results."}]
+    for i in range(3):
+        steps.append({
+            "step_number": i + 1,
+            "model_output": "Thought: let me compute.\n<code>\nresult = df.describe()\nprint(result)\n</code>",
+            "code_action": "result = df.describe()\nprint(result)",
+            "observations": "Execution logs:\n" + "col1  col2  col3\n" * 40,
+            "timing": {"start_time": 0.0, "end_time": 1.0},
+            "token_usage": {"input_tokens": 1000, "output_tokens": 100},
+        })
+    return steps
+
+
+def handler_requests(manager, session_ids, requests: int, concurrency: int) -> float:
+    """ Requests per second when every request runs on its own new thread, `concurrency` at a time. """
+    slots = threading.Semaphore(concurrency)
+    threads = []
+
+    def request(i):
+        try:
+            manager.get_profiles(session_ids[i % len(session_ids)])
+            manager.search_sessions("dataset", limit=5)
+        finally:
+            slots.release()
+
+    start = time.perf_counter()
+    for i in range(requests):
+        slots.acquire()
+        t = threading.Thread(target=request, args=(i,))
+        t.start()
+        threads.append(t)
+    for t in threads:
+        t.join()
+    return requests / (time.perf_counter() - start)
+
+
+def run(manager_cls, path: str, sessions: int, turns: int, requests: int, concurrency: int):
+    manager = manager_cls(path)
+    session_ids = [f"session-{i}" for i in range(sessions)]
+
+    start = time.perf_counter()
+    saves = 0
+    for turn in range(turns):
+        for session_id in session_ids:
+            history = [step for t in range(turn + 1) for step in make_steps(t)]
+            manager.save_session(session_id, history, task_preview="Benchmark",
+                                 python_state={"x": turn, "name": session_id})
+            saves += 1
+    save_elapsed = time.perf_counter() - start
+
+    # Force every load to hit the database
+    for session_id in session_ids:
+        manager.release_session(session_id)
+
+    start = time.perf_counter()
+    for session_id in session_ids:
+        manager.get_session(session_id)
+    load_elapsed = time.perf_counter() - start
+
+    requests_per_s = handler_requests(manager, session_ids, requests, concurrency)
+    manager.close()
+    return saves / save_elapsed, sessions / load_elapsed, requests_per_s
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--requests", type=int, default=2000, help="Requests served from handler threads")
+    parser.add_argument("--concurrency", type=int, default=8, help="Handler threads alive at the same time")
+    args = parser.parse_args()
+
+    print(f"ConversationManager throughput ({args.sessions} sessions x {args.turns} turns, "
+          f"{args.requests} requests from new threads, {args.concurrency} at a time)")
+    print(f"{'connections':<28}{'saves/s':>12}{'loads/s':>12}{'handler req/s':>16}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, cls in [("new connection per call", PerCallConnectionManager),
+                           ("per thread + WAL", PerThreadConnectionManager),
+                           ("bounded pool + WAL", ConversationManager)]:
+            path = os.path.join(tmp, f"{cls.__name__}.db")
+            saves_per_s, loads_per_s, requests_per_s = run(cls, path, args.sessions, args.turns,
+                                                           args.requests, args.concurrency)
+            print(f"{label:<28}{saves_per_s:>12.1f}{loads_per_s:>12.1f}{requests_per_s:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""
+End-to-end load test: N simulated users each drive their own session against
+`serve()` (benchmark.serve_fake with a FakeStreamingModel) for R rounds of
+start_run -> load_session -> inspect_variable -> get_history, all concurrently.
+
+Reports throughput, p50/p99 latency of every operation, the server's memory
+growth and the database size, as the median of --repeat load runs.
+--save-baseline stores the results; --check compares the run with the stored
+baseline and exits with status 1 on a regression beyond --tolerance. Fully offline.
+
+Absolute timings depend on the machine. Both commands time a fixed calibration
+workload (serializing, compressing, storing and reloading a synthetic agent
+memory), and --check scales the baseline's timings by the ratio of the two
+before comparing. Only medians, throughput, memory and database size are
+checked; p99 latencies of a few dozen requests are reported but too noisy to
+gate on. The ratio only corrects for CPU speed: for exact comparisons, save
+the baseline on the machine that runs the checks.
+
+    python -m benchmark.bench_load --sessions 20 --rounds 3 --save-baseline
+    python -m benchmark.bench_load --sessions 20 --rounds 3 --check
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+from smolagentsUI.conversation_manager import ConversationManager
+from smolagentsUI.utils import serialize_step
+
+from .bench_async import free_port, process_stats, start_server
+from .bench_cluster import Client
+from .bench_serialize import make_memory
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "bench_load.json")
+
+# Timed operations: a run (to its first token and to run_complete) and the requests each user sends after it
+OPERATIONS = ["first_token", "run", "load_session", "inspect_variable", "get_history"]
+
+# Differences below these are noise, whatever the relative change
+ABSOLUTE_SLACK = {"p50_ms": 25.0, "rss_growth_mib": 8.0, "db_kib_per_session": 8.0}
+HIGHER_IS_BETTER = {"runs_per_s", "events_per_s"}
+
+# Metrics compared by --check, by suffix. The others are only reported.
+CHECKED = ("p50_ms", "runs_per_s", "events_per_s", "rss_growth_mib", "db_kib_per_session")
+
+# Timings of a run include the fake model's pacing (--tokens-per-second), which a faster
+# machine does not shorten: their baseline is scaled up on slower machines, never down
+PACED = ("first_token.", "run.")
+
+
+class LoadClient(Client):
+    def __init__(self):
+        super().__init__()
+        self.received = 0
+        self.errors = 0
+        self.first_delta = None
+
+    async def _on_any(self, event, data=None):
+        self.received += 1
+        if event == "error":
+            self.errors += 1
+            # Fail the pending requests instead of waiting for their timeout
+            for waiter in self.events.values():
+                if not waiter.done():
+                    waiter.set_exception(RuntimeError(f"server error: {data}"))
+        if event == "stream_delta" and self.first_delta is not None and not self.first_delta.done():
+            self.first_delta.set_result(time.perf_counter())
+        await super()._on_any(event, data)
+
+    async def timed_run(self, message: str, timeout: float):
+        """ (time to first token, run duration) in ms. Returns once the session is saved. """
+        loop = asyncio.get_running_loop()
+        self.first_delta = loop.create_future()
+        self.done = loop.create_future()
+        # The server refreshes the history list after saving the session, which follows run_complete
+        saved = self.events["history_list"] = loop.create_future()
+        start = time.perf_counter()
+        await self.sio.emit("start_run", {"session_id": self.session_id, "message": message})
+        first = await asyncio.wait_for(self.first_delta, timeout)
+        end = await asyncio.wait_for(self.done, timeout)
+        await asyncio.wait_for(saved, timeout)
+        return (first - start) * 1000, (end - start) * 1000
+
+    async def timed_request(self, event: str, data, reply: str, timeout: float) -> float:
+        start = time.perf_counter()
+        await self.request(event, data, reply, timeout)
+        return (time.perf_counter() - start) * 1000
+
+
+async def user(client: LoadClient, index: int, rounds: int, timeout: float, latencies: Dict[str, List[float]]):
+    """ One simulated user: runs tasks in its own session, reopens it, inspects a variable, refreshes history. """
+    for r in range(rounds):
+        first_token, run = await client.timed_run(f"User {index}, task {r}", timeout)
+        latencies["first_token"].append(first_token)
+        latencies["run"].append(run)
+        # variable_state is the last reply to load_session
+        latencies["load_session"].append(
+            await client.timed_request("load_session", {"id": client.session_id}, "variable_state", timeout))
+        # `values` is created by the first action of the fake model's DEFAULT_SCRIPT
+        latencies["inspect_variable"].append(await client.timed_request(
+            "inspect_variable", {"session_id": client.session_id, "name": "values"}, "variable_details", timeout))
+        latencies["get_history"].append(
+            await client.timed_request("get_history", None, "history_list", timeout))
+
+
+async def load(port: int, pid: int, sessions: int, rounds: int, timeout: float) -> Dict:
+    clients = [LoadClient() for _ in range(sessions)]
+    await asyncio.gather(*(c.connect(port) for c in clients))
+    _, rss_start = process_stats(pid)
+
+    latencies = {op: [] for op in OPERATIONS}
+    start = time.perf_counter()
+    await asyncio.gather(*(user(c, i, rounds, timeout, latencies) for i, c in enumerate(clients)))
+    elapsed = time.perf_counter() - start
+    _, rss_end = process_stats(pid)
+
+    received = sum(c.received for c in clients)
+    errors = sum(c.errors for c in clients)
+    await asyncio.gather(*(c.sio.disconnect() for c in clients), return_exceptions=True)
+    await asyncio.sleep(0.25)  # let the transports close before the loop does
+    return {
+        "elapsed_s": elapsed,
+        "latencies": latencies,
+        "runs": sessions * rounds,
+        "events": received,
+        "errors": errors,
+        "rss_start": rss_start,
+        "rss_end": rss_end,
+    }
+
+
+def percentile(values: List[float], q: float) -> float:
+    """ Nearest-rank percentile. """
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))] if ordered else float("nan")
+
+
+def db_bytes(storage_path: str) -> int:
+    """ Size of the database with its WAL file. """
+    return sum(os.path.getsize(p) for p in (storage_path, storage_path + "-wal") if os.path.exists(p))
+
+
+def summarize(result: Dict, sessions: int, storage_path: str) -> Dict[str, float]:
+    """ Flat metric name -> value, the unit of baselines. """
+    metrics = {}
+    for op in OPERATIONS:
+        metrics[f"{op}.p50_ms"] = round(percentile(result["latencies"][op], 0.50), 2)
+        metrics[f"{op}.p99_ms"] = round(percentile(result["latencies"][op], 0.99), 2)
+    metrics["runs_per_s"] = round(result["runs"] / result["elapsed_s"], 3)
+    metrics["events_per_s"] = round(result["events"] / result["elapsed_s"], 1)
+    metrics["rss_growth_mib"] = round(result["rss_end"] - result["rss_start"], 1)
+    metrics["db_kib_per_session"] = round(db_bytes(storage_path) / 1024 / sessions, 1)
+    return metrics
+
+
+def calibrate(repeat: int = 10) -> float:
+    """
+    Milliseconds of a fixed workload on the server's own code paths: serialize, compress and
+    store a 20-step synthetic memory, then reload it. Best of `repeat`, after a warm-up round.
+    """
+    memory = make_memory(20)
+    best = float("inf")
+    with tempfile.TemporaryDirectory() as tmp:
+        for i in range(repeat + 1):
+            manager = ConversationManager(storage_path=os.path.join(tmp, f"calibration{i}.db"))
+            start = time.perf_counter()
+            session_id = manager.save_session(None, [serialize_step(step) for step in memory])
+            manager.release_session(session_id)
+            manager.get_session(session_id)
+            if i:
+                best = min(best, (time.perf_counter() - start) * 1000)
+            manager.close()
+    return best
+
+
+def median_metrics(runs: List[Dict[str, float]]) -> Dict[str, float]:
+    """ Per-metric median of several runs' metrics. """
+    return {name: round(statistics.median(run[name] for run in runs), 2) for name in runs[0]}
+
+
+def scaled_baseline(baseline: Dict[str, float], speed_ratio: float) -> Dict[str, float]:
+    """
+    The baseline's metrics as expected on this machine, `speed_ratio` being this machine's
+    calibration time over the baseline's (above 1 on a slower machine).
+    """
+    expected = {}
+    for name, base in baseline.items():
+        if name in HIGHER_IS_BETTER:
+            expected[name] = base / speed_ratio
+        elif name.endswith("_ms"):
+            expected[name] = base * (max(speed_ratio, 1.0) if name.startswith(PACED) else speed_ratio)
+        else:
+            expected[name] = base
+    return expected
+
+
+def regressions(metrics: Dict[str, float], baseline: Dict[str, float], tolerance: float) -> List[str]:
+    """ Names of the checked metrics that got worse than the baseline by more than `tolerance` (a fraction). """
+    worse = []
+    for name, base in baseline.items():
+        value = metrics.get(name)
+        suffix = name.rsplit(".", 1)[-1]
+        if value is None or suffix not in CHECKED:
+            continue
+        slack = ABSOLUTE_SLACK.get(suffix, 0.0)
+        if name in HIGHER_IS_BETTER:
+            if value < base * (1 - tolerance) - slack:
+                worse.append(name)
+        elif value > base * (1 + tolerance) + slack:
+            worse.append(name)
+    return worse
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=20, help="Concurrent simulated users, one session each")
+    parser.add_argument("--rounds", type=int, default=3, help="Runs per session")
+    parser.add_argument("--tokens-per-second", type=float, default=200)
+    parser.add_argument("--async-mode", default="threading")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the baseline")
+    parser.add_argument("--check", action="store_true", help="Exit with status 1 on a regression against the baseline")
+    parser.add_argument("--repeat", type=int, default=3, help="Load runs per measurement; metrics are their median")
+    parser.add_argument("--tolerance", type=float, default=0.3,
+                        help="Allowed relative change before a metric counts as a regression")
+    args = parser.parse_args()
+
+    params = {"sessions": args.sessions, "rounds": args.rounds,
+              "tokens_per_second": args.tokens_per_second, "async_mode": args.async_mode}
+    print(f"{args.sessions} sessions x {args.rounds} rounds, {args.tokens_per_second} tokens/s, "
+          f"{args.async_mode} mode")
+
+    calibration_ms = calibrate()
+    print(f"calibration: {calibration_ms:.1f} ms")
+
+    runs = []
+    errors = 0
+    for i in range(args.repeat):
+        with tempfile.TemporaryDirectory() as tmp:
+            storage_path = os.path.join(tmp, "load.db")
+            port = free_port()
+            proc = start_server(args.async_mode, port, storage_path, args.tokens_per_second)
+            try:
+                result = asyncio.run(load(port, proc.pid, args.sessions, args.rounds, args.timeout))
+            finally:
+                proc.terminate()
+                proc.wait()
+            runs.append(summarize(result, args.sessions, storage_path))
+        errors += result["errors"]
+        print(f"run {i + 1}/{args.repeat}: {runs[-1]['runs_per_s']:.2f} runs/s over {result['elapsed_s']:.1f} s "
+              f"({result['errors']} errors)")
+    metrics = median_metrics(runs)
+
+    print(f"{'operation':<20}{'count':>8}{'p50 ms':>10}{'p99 ms':>10}")
+    for op in OPERATIONS:
+        print(f"{op:<20}{len(result['latencies'][op]):>8}{metrics[op + '.p50_ms']:>10.1f}{metrics[op + '.p99_ms']:>10.1f}")
+    print(f"throughput: {metrics['runs_per_s']:.2f} runs/s, {metrics['events_per_s']:.0f} events/s "
+          f"({errors} errors)")
+    print(f"server RSS growth: +{metrics['rss_growth_mib']:.1f} MiB")
+    print(f"database: {metrics['db_kib_per_session']:.1f} KiB per session")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump({"params": params, "machine": platform.machine(), "python": platform.python_version(),
+                       "calibration_ms": round(calibration_ms, 2), "metrics": metrics}, f, indent=2)
+            f.write("\n")
+        print(f"baseline saved to {args.baseline}")
+
+    if args.check:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline["params"] != params:
+            print(f"baseline was recorded with {baseline['params']}, not comparable")
+            sys.exit(2)
+        speed_ratio = calibration_ms / baseline["calibration_ms"]
+        expected = scaled_baseline(baseline["metrics"], speed_ratio)
+        worse = regressions(metrics, expected, args.tolerance)
+        print(f"this machine is {speed_ratio:.2f}x the baseline's calibration time")
+        print(f"{'metric':<26}{'expected':>12}{'current':>12}")
+        for name, base in expected.items():
+            flag = "  REGRESSION" if name in worse else "" if name.rsplit(".", 1)[-1] in CHECKED else "  (not checked)"
+            print(f"{name:<26}{round(base, 2):>12}{metrics.get(name, float('nan')):>12}{flag}")
+        if worse or errors:
+            print(f"FAILED: {len(worse)} regressions, {errors} errors (tolerance {args.tolerance:.0%})")
+            sys.exit(1)
+        print(f"OK: no regression beyond {args.tolerance:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Preview cost on large objects: the previous str()/to_markdown() rendering versus
+the bounded preview engine (smolagentsUI.preview).
+
+    python -m benchmark.bench_preview --rows 200000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from smolagentsUI.preview import preview_text, preview_table, VIEWER_LIMITS, CHAT_LIMITS
+
+
+def legacy_viewer_preview(value) -> str:
+    """ Previous Variable Viewer behavior: render everything, then truncate. """
+    preview = str(value)
+    if len(preview) > 100:
+        preview = preview[:100] + "..."
+    return preview
+
+
+def legacy_table(df) -> str:
+    """ Previous serialize_step behavior for DataFrames. """
+    try:
+        return df.to_markdown(index=True)
+    except Exception:
+        return str(df)
+
+
+def timed(fn, value, repeat: int):
+    best = float("inf")
+    out = ""
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn(value)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, len(out)
+
+
+def make_objects(rows: int):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(rng.random((rows, 12)), columns=[f"col{i}" for i in range(12)])
+    df["label"] = "item-" + pd.Series(np.arange(rows)).astype(str)
+    return {
+        "DataFrame": df,
+        "Series": df["col0"],
+        "ndarray": rng.random((rows, 50)),
+        "list[dict]": [{"id": i, "tags": ["a", "b"], "score": i * 0.5} for i in range(rows)],
+        "long str": "lorem ipsum " * rows,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    objects = make_objects(args.rows)
+
+    print(f"Variable Viewer preview ({args.rows:,} rows)")
+    print(f"{'object':<14}{'legacy ms':>12}{'legacy chars':>14}{'bounded ms':>12}{'bounded chars':>15}")
+    for name, value in objects.items():
+        legacy_ms, legacy_len = timed(legacy_viewer_preview, value, args.repeat)
+        new_ms, new_len = timed(lambda v: preview_text(v, VIEWER_LIMITS), value, args.repeat)
+        print(f"{name:<14}{legacy_ms:>12.2f}{legacy_len:>14,}{new_ms:>12.2f}{new_len:>15,}")
+
+    print(f"\nChat table (serialize_step) for a {args.rows:,} x 13 DataFrame")
+    legacy_ms, legacy_len = timed(legacy_table, objects["DataFrame"], 1)
+    new_ms, new_len = timed(lambda v: preview_table(v, CHAT_LIMITS), objects["DataFrame"], args.repeat)
+    print(f"{'legacy':<14}{legacy_ms:>12.2f} ms{legacy_len:>14,} chars")
+    print(f"{'bounded':<14}{new_ms:>12.2f} ms{new_len:>14,} chars")
+
+
+if __name__ == "__main__":
+    main()
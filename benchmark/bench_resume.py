@@ -0,0 +1,105 @@
+"""
+Session resume latency: the previous eager load_memory (every step and every
+ChatMessage rebuilt up front) versus the lazy LazyList-based load_memory.
+
+Also reports the cost paid later when the agent writes its next prompt
+(write_memory_to_messages), which builds the steps but not their input messages.
+
+    python -m benchmark.bench_resume --steps 200
+"""
+import argparse
+import json
+import time
+
+from smolagents import CodeAgent
+from smolagents.memory import ActionStep, PlanningStep, TaskStep, ToolCall
+from smolagents.models import ChatMessage
+from smolagents.monitoring import Timing, TokenUsage
+
+from smolagentsUI.agent_wrapper import AgentWrapper
+from smolagentsUI.utils import serialize_step
+
+from .bench_serialize import make_memory
+from .fake_model import FakeStreamingModel
+
+
+def legacy_load_memory(agent, steps_data):
+    """ The previous load_memory: builds everything before returning. """
+    steps = []
+    for step_data in steps_data:
+        timing = Timing(start_time=step_data["timing"]["start_time"], end_time=step_data["timing"]["end_time"]) if step_data.get("timing") else None
+        token_usage = TokenUsage(input_tokens=step_data["token_usage"]["input_tokens"],
+                                 output_tokens=step_data["token_usage"]["output_tokens"]) if step_data.get("token_usage") else None
+        if "step_number" in step_data:
+            steps.append(ActionStep(
+                step_number=step_data["step_number"],
+                timing=timing,
+                model_input_messages=[ChatMessage.from_dict(m) for m in step_data.get("model_input_messages") or []],
+                tool_calls=[ToolCall(id=tc["id"], name=tc["name"], arguments=tc["arguments"]) for tc in step_data.get("tool_calls") or []],
+                error=step_data.get("error"),
+                model_output_message=ChatMessage.from_dict(step_data["model_output_message"]) if step_data.get("model_output_message") else None,
+                model_output=step_data.get("model_output"),
+                observations=step_data.get("observations"),
+                action_output=step_data.get("action_output"),
+                token_usage=token_usage,
+                code_action=step_data.get("code_action"),
+                is_final_answer=step_data.get("is_final_answer", False),
+            ))
+        elif "plan" in step_data:
+            steps.append(PlanningStep(
+                model_input_messages=[ChatMessage.from_dict(m) for m in step_data.get("model_input_messages") or []],
+                model_output_message=ChatMessage.from_dict(step_data["model_output_message"]),
+                plan=step_data["plan"],
+                timing=timing,
+                token_usage=token_usage,
+            ))
+        elif "task" in step_data:
+            steps.append(TaskStep(task=step_data["task"], task_images=step_data.get("task_images")))
+    agent.memory.reset()
+    agent.memory.steps = steps
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    # Serialized history as stored in the database (round-tripped through JSON)
+    steps_data = [json.loads(json.dumps(serialize_step(step))) for step in make_memory(args.steps)]
+    agent = CodeAgent(tools=[], model=FakeStreamingModel())
+    wrapper = AgentWrapper(agent)
+
+    def best(fn):
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+        return min(timings) * 1000
+
+    eager_load = best(lambda: legacy_load_memory(agent, steps_data))
+    eager_prompt = best(lambda: agent.write_memory_to_messages())
+
+    lazy_load = best(lambda: wrapper.load_memory(steps_data))
+
+    def lazy_prompt():
+        wrapper.load_memory(steps_data)
+        agent.write_memory_to_messages()
+    lazy_prompt_total = best(lazy_prompt)
+
+    print(f"Resume of a {len(steps_data)}-step session, best of {args.repeat}")
+    print(f"{'':<10}{'load_memory ms':>16}{'load + next prompt ms':>24}")
+    print(f"{'eager':<10}{eager_load:>16.2f}{eager_load + eager_prompt:>24.2f}")
+    print(f"{'lazy':<10}{lazy_load:>16.2f}{lazy_prompt_total:>24.2f}")
+
+    # The lazy path must hand the model exactly the same prompt
+    legacy_load_memory(agent, steps_data)
+    expected = [m.dict() for m in agent.write_memory_to_messages()]
+    wrapper.load_memory(steps_data)
+    assert [m.dict() for m in agent.write_memory_to_messages()] == expected, "lazy memory produced a different prompt"
+    print("prompt check: identical")
+
+
+if __name__ == "__main__":
+    main()
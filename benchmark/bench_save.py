@@ -0,0 +1,80 @@
+"""
+Per-turn save cost as a session grows: the previous save (every step in memory
+serialized again, save_session keeping those past MAX(step_index)) versus the
+dirty-tracked save (only steps new or modified since the last save are
+serialized and written).
+
+    python -m benchmark.bench_save --turns 20 --steps-per-turn 3
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from smolagents import CodeAgent
+
+from smolagentsUI.agent_wrapper import AgentWrapper
+from smolagentsUI.conversation_manager import ConversationManager
+from smolagentsUI.utils import serialize_step
+
+from .bench_serialize import make_memory
+from .fake_model import FakeStreamingModel
+
+
+def legacy_save(manager, session_id, wrapper):
+    steps_data = [serialize_step(step) for step in wrapper.agent.memory.steps]
+    return manager.save_session(session_id, steps_data, task_preview="bench")
+
+
+def dirty_save(manager, session_id, wrapper):
+    steps_data, changed_steps = wrapper.get_steps_changes()
+    session_id = manager.save_session(session_id, steps_data, task_preview="bench", changed_steps=changed_steps)
+    wrapper.mark_steps_persisted(steps_data)
+    return session_id
+
+
+def simulate(save, turns: int, steps_per_turn: int, storage_path: str):
+    """ Appends `steps_per_turn` steps per turn and saves after each one. Returns the save time of every turn. """
+    steps = make_memory(turns * steps_per_turn)
+    manager = ConversationManager(storage_path)
+    wrapper = AgentWrapper(CodeAgent(tools=[], model=FakeStreamingModel()))
+    memory = wrapper.agent.memory.steps
+
+    session_id = None
+    timings = []
+    memory.extend(steps[:2])  # task and plan
+    for turn in range(turns):
+        memory.extend(steps[2 + turn * steps_per_turn: 2 + (turn + 1) * steps_per_turn])
+        start = time.perf_counter()
+        session_id = save(manager, session_id, wrapper)
+        timings.append(time.perf_counter() - start)
+
+    stored = manager.get_session(session_id)["steps"]
+    manager.close()
+    return timings, stored
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--steps-per-turn", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy, legacy_steps = simulate(legacy_save, args.turns, args.steps_per_turn, os.path.join(tmp, "legacy.db"))
+        dirty, dirty_steps = simulate(dirty_save, args.turns, args.steps_per_turn, os.path.join(tmp, "dirty.db"))
+
+    print(f"Save after each of {args.turns} turns, {args.steps_per_turn} new steps per turn")
+    print(f"{'turn':>6}{'steps':>8}{'full ms':>12}{'dirty ms':>12}")
+    for turn in sorted({0, args.turns // 4, args.turns // 2, args.turns - 1}):
+        n_steps = 2 + (turn + 1) * args.steps_per_turn
+        print(f"{turn + 1:>6}{n_steps:>8}{legacy[turn] * 1000:>12.2f}{dirty[turn] * 1000:>12.2f}")
+    print(f"{'total':>14}{sum(legacy) * 1000:>12.2f}{sum(dirty) * 1000:>12.2f}")
+
+    # Both paths must leave the same history in storage
+    assert legacy_steps == dirty_steps, "dirty-tracked save stored a different history"
+    print("stored history check: identical")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Full-text search latency over a large history: ConversationManager.search_sessions
+(FTS5 index) versus decoding every stored step and matching its text.
+
+Also checks that the index follows save_session, rename_session and delete_session.
+
+    python -m benchmark.bench_search --sessions 2000 --steps 100
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from smolagentsUI.conversation_manager import ConversationManager
+from smolagentsUI.compression import decode_text
+
+WORDS = ("dataset", "regression", "histogram", "dataframe", "pandas", "tumor", "benign", "malignant",
+         "correlation", "cluster", "median", "outlier", "feature", "accuracy", "matrix", "plot")
+
+
+def make_session(rng: random.Random, n_steps: int, session_no: int):
+    steps = [{"task": f"Analyse {rng.choice(WORDS)} number {session_no} and report the {rng.choice(WORDS)}."}]
+    for i in range(1, n_steps):
+        a, b = rng.choice(WORDS), rng.choice(WORDS)
+        steps.append({
+            "step_number": i,
+            "model_output": f"Thought: compute the {a} of the {b}.\n<code>\nresult = df['{a}'].describe()\n</code>",
+            "code_action": f"result = df['{a}'].describe()\nprint(result)",
+            "observations": f"Execution logs:\n{b} " + "count mean std min max\n" * 20,
+            "timing": {"start_time": 0.0, "end_time": 1.0},
+        })
+    return steps
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def naive_search(manager, word: str, limit: int):
+    """ What finding a chat costs without an index: read and decode every step. """
+    hits = []
+    with manager._connection() as conn:
+        for row in conn.execute("SELECT session_id, step_index, step_data, codec FROM steps"):
+            step = json.loads(decode_text(row["step_data"], row["codec"]))
+            text = " ".join(str(step.get(k) or "") for k in ("task", "model_output", "code_action", "observations"))
+            if word in text.lower():
+                hits.append((row["session_id"], row["step_index"]))
+    return hits[:limit]
+
+
+def check_maintenance(manager):
+    session_id = manager.save_session(None, [{"task": "zebrafish growth curves"}], task_preview="zebra chat")
+    assert any(r["session_id"] == session_id for r in manager.search_sessions("zebrafish")["results"])
+
+    manager.rename_session(session_id, "okapi notes")
+    assert any(r["step_index"] is None and "<mark>okapi</mark>" in r["snippet"]
+               for r in manager.search_sessions("okap")["results"])
+    assert not any(r["step_index"] is None for r in manager.search_sessions("zebra chat")["results"])
+
+    manager.save_session(session_id, [{"task": "zebrafish growth curves"}, {"step_number": 1, "observations": "quokka"}],
+                         task_preview="okapi notes", changed_steps=[1])
+    assert manager.search_sessions("quokka")["results"][0]["step_index"] == 1
+
+    manager.delete_session(session_id)
+    for word in ("zebrafish", "okapi", "quokka"):
+        assert not manager.search_sessions(word)["results"], word
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--steps", type=int, default=100, help="Steps per session")
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = ConversationManager(os.path.join(tmp, "search.db"))
+
+        start = time.perf_counter()
+        for i in range(args.sessions):
+            manager.save_session(f"session-{i}", make_session(rng, args.steps, i), task_preview=f"Chat {i}")
+        build = time.perf_counter() - start
+        n_steps = args.sessions * args.steps
+        print(f"Indexed {args.sessions} sessions / {n_steps:,} steps while saving in {build:.1f} s")
+
+        queries = [rng.choice(WORDS) for _ in range(args.queries)]
+        queries += [rng.choice(WORDS)[:4] for _ in range(args.queries)]          # prefix, as typed
+        queries += [f"number {rng.randrange(args.sessions)}" for _ in range(args.queries)]  # selective
+        latencies = {"word": [], "prefix": [], "two words": []}
+        for n, query in enumerate(queries):
+            kind = list(latencies)[n // args.queries]
+            start = time.perf_counter()
+            page = manager.search_sessions(query, limit=20)
+            latencies[kind].append((time.perf_counter() - start) * 1000)
+            assert page["results"], query
+
+        print(f"{'query':<12}{'p50 ms':>10}{'p99 ms':>10}")
+        for kind, values in latencies.items():
+            print(f"{kind:<12}{statistics.median(values):>10.2f}{percentile(values, 0.99):>10.2f}")
+
+        start = time.perf_counter()
+        page = manager.search_sessions("histogram", limit=20, offset=1000)
+        print(f"{'page 51':<12}{(time.perf_counter() - start) * 1000:>10.2f}")
+
+        start = time.perf_counter()
+        naive_search(manager, "histogram", 20)
+        print(f"{'full scan':<12}{(time.perf_counter() - start) * 1000:>10.2f}")
+
+        check_maintenance(manager)
+        print("index maintenance check: ok")
+        manager.close()
+
+
+if __name__ == "__main__":
+    main()
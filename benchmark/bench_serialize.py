@@ -0,0 +1,111 @@
+"""
+serialize_step throughput on realistic agent memories: the previous isinstance
+chain (JSON sniffing of every bracketed string, no handler cache) versus the
+type-dispatched serializer in smolagentsUI.utils.
+
+    python -m benchmark.bench_serialize --steps 20 --repeat 5
+"""
+import argparse
+import json
+import time
+
+from smolagents.memory import ActionStep, PlanningStep, TaskStep, ToolCall
+from smolagents.models import ChatMessage, MessageRole
+from smolagents.monitoring import Timing, TokenUsage
+
+from smolagentsUI.utils import serialize_step
+
+
+def legacy_serialize_step(step):
+    """ The previous implementation, without image handling (no images in this benchmark). """
+    if step is None:
+        return None
+    elif isinstance(step, (str, int, float, bool)):
+        if isinstance(step, str):
+            try:
+                if (step.startswith("{") and step.endswith("}")) or (step.startswith("[") and step.endswith("]")):
+                    parsed = json.loads(step)
+                    return legacy_serialize_step(parsed)
+            except json.JSONDecodeError:
+                pass
+        return step
+    elif isinstance(step, (list, tuple)):
+        return [legacy_serialize_step(item) for item in step]
+    elif isinstance(step, dict):
+        return {str(k): legacy_serialize_step(v) for k, v in step.items()}
+    elif hasattr(step, "__dict__"):
+        return {"_type": step.__class__.__name__, **{k: legacy_serialize_step(v) for k, v in step.__dict__.items()}}
+    else:
+        return str(step)
+
+
+SYSTEM_PROMPT = "You are an expert assistant who can solve any task using code blobs. " * 200
+
+
+def make_memory(n_steps: int):
+    """ A task, a plan and n action steps whose model inputs grow with the conversation, as in a real run. """
+    history = [ChatMessage(role=MessageRole.SYSTEM, content=[{"type": "text", "text": SYSTEM_PROMPT}])]
+    steps = [TaskStep(task="Load the sales data, clean it and plot the monthly revenue per region.")]
+
+    plan = "1. Load the data\n2. Clean missing values\n3. Aggregate per month and region\n4. Plot\n" * 5
+    steps.append(PlanningStep(
+        model_input_messages=list(history),
+        model_output_message=ChatMessage(role=MessageRole.ASSISTANT, content=plan),
+        plan=plan,
+        timing=Timing(start_time=0.0, end_time=1.0),
+        token_usage=TokenUsage(input_tokens=3000, output_tokens=200),
+    ))
+
+    for i in range(n_steps):
+        code = f"df_{i} = df.groupby(['month', 'region'])['revenue'].sum().reset_index()\nprint(df_{i}.to_dict('records'))"
+        # Logs that look like JSON: a printed list of records, several hundred KB
+        records = [{"month": m % 12 + 1, "region": f"region-{m % 7}", "revenue": m * 13.5} for m in range(3000)]
+        observations = json.dumps(records)
+        output = f"Thought: aggregate step {i}.\n<code>\n{code}\n</code>"
+
+        steps.append(ActionStep(
+            step_number=i + 1,
+            timing=Timing(start_time=float(i), end_time=float(i) + 0.5),
+            model_input_messages=list(history),
+            tool_calls=[ToolCall(name="python_interpreter", arguments=code, id=f"call_{i}")],
+            model_output_message=ChatMessage(role=MessageRole.ASSISTANT, content=output),
+            model_output=output,
+            code_action=code,
+            observations=observations,
+            action_output=None,
+            token_usage=TokenUsage(input_tokens=3000 + 500 * i, output_tokens=150),
+        ))
+        history.append(ChatMessage(role=MessageRole.ASSISTANT, content=[{"type": "text", "text": output}]))
+        history.append(ChatMessage(role=MessageRole.USER, content=[{"type": "text", "text": "Observation:\n" + observations[:2000]}]))
+    return steps
+
+
+def timed(fn, steps, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for step in steps:
+            fn(step)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    steps = make_memory(args.steps)
+    legacy = timed(legacy_serialize_step, steps, args.repeat)
+    current = timed(serialize_step, steps, args.repeat)
+
+    print(f"serialize_step over {len(steps)} steps (1 task, 1 plan, {args.steps} actions), best of {args.repeat}")
+    print(f"{'serializer':<18}{'total ms':>12}{'ms/step':>12}")
+    print(f"{'legacy':<18}{legacy * 1000:>12.2f}{legacy * 1000 / len(steps):>12.3f}")
+    print(f"{'type-dispatched':<18}{current * 1000:>12.2f}{current * 1000 / len(steps):>12.3f}")
+    print(f"speedup: {legacy / current:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
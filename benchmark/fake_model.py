@@ -0,0 +1,62 @@
+import time
+from typing import List, Optional
+from smolagents.models import Model, ChatMessage, ChatMessageStreamDelta, TokenUsage, MessageRole
+
+
+DEFAULT_SCRIPT = [
+    "Thought: I will create some data.\n<code>\nimport math\nvalues = [math.sqrt(i) for i in range(100)]\nprint(len(values))\n</code>",
+    "Thought: Now I return the answer.\n<code>\nfinal_answer(['Done', sum(values)])\n</code>",
+]
+
+
+class FakeStreamingModel(Model):
+    def __init__(self, script: Optional[List[str]] = None, tokens_per_second: Optional[float] = None,
+                 chars_per_token: int = 4, **kwargs):
+        """
+        Deterministic model that replays scripted outputs, streaming them as
+        ChatMessageStreamDelta at a fixed token rate. Runs fully offline.
+
+        The output is picked from the number of assistant messages in the prompt, so
+        session agents sharing this model each replay the script from the start,
+        however their calls interleave.
+
+        Parameters:
+        -----------
+        script : List[str]
+            Model outputs returned in order, one per step of a conversation. Cycles when exhausted.
+        tokens_per_second : float, Optional
+            Streaming rate. None streams as fast as possible.
+        chars_per_token : int
+            Number of characters emitted per delta.
+        """
+        super().__init__(model_id="fake-streaming-model", **kwargs)
+        self.script = script or DEFAULT_SCRIPT
+        self.tokens_per_second = tokens_per_second
+        self.chars_per_token = chars_per_token
+        self.calls = 0
+
+    def _next_output(self, messages) -> str:
+        turn = sum(1 for m in messages if _role(m) == MessageRole.ASSISTANT)
+        self.calls += 1
+        return self.script[turn % len(self.script)]
+
+    def generate(self, messages, stop_sequences=None, response_format=None, tools_to_call_from=None, **kwargs) -> ChatMessage:
+        content = self._next_output(messages)
+        n_tokens = max(1, len(content) // self.chars_per_token)
+        return ChatMessage(role=MessageRole.ASSISTANT, content=content,
+                           token_usage=TokenUsage(input_tokens=len(messages), output_tokens=n_tokens))
+
+    def generate_stream(self, messages, stop_sequences=None, response_format=None, tools_to_call_from=None, **kwargs):
+        content = self._next_output(messages)
+        delay = 1.0 / self.tokens_per_second if self.tokens_per_second else 0
+        n_tokens = 0
+        for i in range(0, len(content), self.chars_per_token):
+            if delay:
+                time.sleep(delay)
+            n_tokens += 1
+            yield ChatMessageStreamDelta(content=content[i:i + self.chars_per_token])
+        yield ChatMessageStreamDelta(content="", token_usage=TokenUsage(input_tokens=len(messages), output_tokens=n_tokens))
+
+
+def _role(message):
+    return message.get("role") if isinstance(message, dict) else getattr(message, "role", None)
@@ -0,0 +1,49 @@
+"""
+Runs smolagentsUI.serve with a FakeStreamingModel agent, for load tests.
+
+    python -m benchmark.serve_fake --async-mode gevent --port 5055 --tokens-per-second 200
+    python -m benchmark.serve_fake --workers 2 --storage-path /tmp/cluster.db --cpu-work 200000
+"""
+import argparse
+
+from smolagents import CodeAgent
+
+import smolagentsUI
+from .fake_model import FakeStreamingModel, DEFAULT_SCRIPT
+
+
+def cpu_script(iterations: int):
+    """ Scripted actions whose code execution keeps a core busy for `iterations` loop turns. """
+    return [
+        f"Thought: Crunch numbers.\n<code>\ntotal = 0\nfor i in range({iterations}):\n    total += i % 7\nprint(total)\n</code>",
+        "Thought: Done.\n<code>\nfinal_answer(total)\n</code>",
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--async-mode", default="threading")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--storage-path", default=None)
+    parser.add_argument("--tokens-per-second", type=float, default=200)
+    parser.add_argument("--max-concurrent-runs", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=1, help="Above 1, runs serve_cluster on consecutive ports")
+    parser.add_argument("--cpu-work", type=int, default=0, help="Loop turns of CPU-bound code per run")
+    args = parser.parse_args()
+
+    script = cpu_script(args.cpu_work) if args.cpu_work else DEFAULT_SCRIPT
+    agent = CodeAgent(tools=[], model=FakeStreamingModel(script=script, tokens_per_second=args.tokens_per_second),
+                      stream_outputs=True, max_steps=4, verbosity_level=0)
+    options = dict(host=args.host, port=args.port, debug=False,
+                   storage_path=args.storage_path, async_mode=args.async_mode,
+                   max_concurrent_runs=args.max_concurrent_runs, max_queued_runs=1024,
+                   server_options={"allow_unsafe_werkzeug": True, "log_output": False})
+    if args.workers > 1:
+        smolagentsUI.serve_cluster(agent, workers=args.workers, **options)
+    else:
+        smolagentsUI.serve(agent, **options)
+
+
+if __name__ == "__main__":
+    main()
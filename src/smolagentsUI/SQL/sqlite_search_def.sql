@@ -0,0 +1,19 @@
+-- Full-text index over the chat history. Needs SQLite built with FTS5; applied separately
+-- from sqlite_table_def.sql so the rest of the schema works without it.
+-- Step rows use rowid = steps.id; the preview row of a session uses a negative rowid
+-- derived from its session_id (see search.preview_rowid).
+CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+    session_id UNINDEXED,
+    step_index UNINDEXED,
+    preview,
+    task,
+    model_output,
+    code_action,
+    observations,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+
+-- Deleted steps (including ON DELETE CASCADE from sessions) leave the index
+CREATE TRIGGER IF NOT EXISTS steps_search_delete AFTER DELETE ON steps BEGIN
+    DELETE FROM search_index WHERE rowid = old.id;
+END;
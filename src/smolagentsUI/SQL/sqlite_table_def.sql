@@ -10,6 +10,7 @@ CREATE TABLE IF NOT EXISTS steps (
     session_id TEXT NOT NULL,
     step_index INTEGER NOT NULL,  
     step_data TEXT NOT NULL,     
+    codec TEXT,
     FOREIGN KEY(session_id) REFERENCES sessions(session_id) ON DELETE CASCADE
 );
 
@@ -20,5 +21,89 @@ CREATE TABLE IF NOT EXISTS python_state (
     FOREIGN KEY(session_id) REFERENCES sessions(session_id) ON DELETE CASCADE
 );
 
-CREATE INDEX IF NOT EXISTS idx_steps_session_id ON steps(session_id);
-CREATE INDEX IF NOT EXISTS idx_python_state_session_id ON python_state(session_id);
\ No newline at end of file
+-- One row per step: serves the per-session scans, paging and single-step reads. Databases older
+-- than schema version 3 lose their duplicate step rows first (ConversationManager._remove_duplicate_steps).
+CREATE UNIQUE INDEX IF NOT EXISTS idx_steps_session_step ON steps(session_id, step_index);
+CREATE INDEX IF NOT EXISTS idx_python_state_session_id ON python_state(session_id);
+
+CREATE TABLE IF NOT EXISTS python_variables (
+    session_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (session_id, name),
+    FOREIGN KEY(session_id) REFERENCES sessions(session_id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS python_blobs (
+    content_hash TEXT PRIMARY KEY,
+    data BLOB NOT NULL,
+    codec TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_python_variables_content_hash ON python_variables(content_hash);
+CREATE INDEX IF NOT EXISTS idx_sessions_last_updated ON sessions(last_updated);
+
+CREATE TABLE IF NOT EXISTS artifacts (
+    content_hash TEXT PRIMARY KEY,
+    mime_type TEXT NOT NULL,
+    data BLOB NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS session_artifacts (
+    session_id TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    PRIMARY KEY (session_id, content_hash),
+    FOREIGN KEY(session_id) REFERENCES sessions(session_id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_session_artifacts_content_hash ON session_artifacts(content_hash);
+
+CREATE TABLE IF NOT EXISTS messages (
+    content_hash TEXT PRIMARY KEY,
+    message_data TEXT NOT NULL,
+    codec TEXT
+);
+
+CREATE TABLE IF NOT EXISTS session_messages (
+    session_id TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    PRIMARY KEY (session_id, content_hash),
+    FOREIGN KEY(session_id) REFERENCES sessions(session_id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_session_messages_content_hash ON session_messages(content_hash);
+
+CREATE TABLE IF NOT EXISTS run_profiles (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    profile_data BLOB,
+    codec TEXT,
+    FOREIGN KEY(session_id) REFERENCES sessions(session_id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_run_profiles_session_id ON run_profiles(session_id);
+
+-- One row per action/planning step, kept in sync with `steps` by save_session, for aggregate
+-- queries that do not decode step_data. run_id is the step_index of the run's task step.
+CREATE TABLE IF NOT EXISTS step_telemetry (
+    session_id TEXT NOT NULL,
+    step_index INTEGER NOT NULL,
+    run_id INTEGER,
+    step_type TEXT NOT NULL,
+    step_number INTEGER,
+    started_at REAL,
+    duration_s REAL,
+    input_tokens INTEGER,
+    output_tokens INTEGER,
+    is_error INTEGER NOT NULL DEFAULT 0,
+    model_id TEXT,
+    PRIMARY KEY (session_id, step_index),
+    FOREIGN KEY(session_id) REFERENCES sessions(session_id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_step_telemetry_started_at ON step_telemetry(started_at);
+CREATE INDEX IF NOT EXISTS idx_step_telemetry_model_started_at ON step_telemetry(model_id, started_at);
@@ -1,3 +1,4 @@
 from .server import serve
+from .cluster import serve_cluster
 
-__all__ = ["serve"]
\ No newline at end of file
+__all__ = ["serve", "serve_cluster"]
\ No newline at end of file
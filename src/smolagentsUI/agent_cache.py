@@ -0,0 +1,215 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional, Dict, Any
+
+
+class AgentCache:
+    def __init__(self, max_agents: int = 64, idle_ttl: Optional[float] = 1800,
+                 memory_budget: Optional[int] = None,
+                 on_evict: Optional[Callable[[str, Any], None]] = None,
+                 size_fn: Optional[Callable[[Any], int]] = None):
+        """
+        Bounded LRU cache of live AgentWrapper instances keyed by session_id.
+
+        Agents are evicted when the cache holds more than `max_agents`, when they
+        have been idle longer than `idle_ttl` seconds, or when the estimated memory
+        of all cached agents exceeds `memory_budget` bytes. Pinned agents (e.g. with
+        a run in progress) are never evicted.
+
+        Evicted agents are flushed (on_evict) after the cache lock is released, by the
+        thread whose call evicted them, so a slow save never blocks other lookups.
+        A lookup of a session whose flush is still running waits for it and then
+        misses, so the session is reloaded from the saved state; pop() waits for it too.
+
+        Parameters:
+        -----------
+        max_agents : int
+            Maximum number of agents kept alive.
+        idle_ttl : float, Optional
+            Seconds since last access after which an agent is evicted. None disables TTL eviction.
+        memory_budget : int, Optional
+            Upper bound in bytes for the summed size estimates. None disables memory-based eviction.
+        on_evict : Callable, Optional
+            Called with (session_id, wrapper) before an agent is dropped, e.g. to flush it to storage.
+        size_fn : Callable, Optional
+            Returns the estimated size in bytes of a wrapper. Required for memory_budget to take effect.
+        """
+        if max_agents < 1:
+            raise ValueError("max_agents must be at least 1.")
+
+        self.max_agents = max_agents
+        self.idle_ttl = idle_ttl
+        self.memory_budget = memory_budget
+        self.on_evict = on_evict
+        self.size_fn = size_fn
+
+        self.lock = threading.RLock()
+        self._entries = OrderedDict()  # session_id -> [wrapper, last_access, size_bytes], least recent first
+        self._pins = {}                # session_id -> pin count
+        self._evicting = {}            # session_id -> Event set once its on_evict call is done
+        self._to_flush = []            # (session_id, wrapper, Event) evicted but not flushed yet
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __contains__(self, session_id: str) -> bool:
+        with self.lock:
+            return session_id in self._entries
+
+    def __len__(self) -> int:
+        with self.lock:
+            return len(self._entries)
+
+    def get(self, session_id: str):
+        """ Returns the cached wrapper (marking it most recently used), or None on a miss. """
+        with self.lock:
+            self._sweep()
+            entry = self._entries.get(session_id)
+            if entry is not None:
+                self.hits += 1
+                entry[1] = time.monotonic()
+                self._entries.move_to_end(session_id)
+            else:
+                self.misses += 1
+                flushing = self._evicting.get(session_id)
+        self._flush_evicted()
+        if entry is not None:
+            return entry[0]
+        if flushing is not None:
+            flushing.wait()
+        return None
+
+    def put(self, session_id: str, wrapper):
+        """ Inserts or replaces a wrapper, then evicts agents until the cache is within its limits. """
+        with self.lock:
+            self._entries[session_id] = [wrapper, time.monotonic(), self._estimate(wrapper)]
+            self._entries.move_to_end(session_id)
+            self._enforce_limits()
+        self._flush_evicted()
+
+    def pop(self, session_id: str):
+        """
+        Removes a wrapper without flushing it. Returns the wrapper or None.
+        If the session's agent was evicted and its flush is still running, waits for the
+        flush, so a session deleted after pop() is not saved again by it.
+        """
+        with self.lock:
+            self._pins.pop(session_id, None)
+            entry = self._entries.pop(session_id, None)
+            flushing = self._evicting.get(session_id)
+        if flushing is not None:
+            flushing.wait()
+        return entry[0] if entry else None
+
+    def refresh(self, session_id: str):
+        """ Re-estimates the size of an agent (e.g. after a run changed its state) and re-applies limits. """
+        with self.lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return
+            entry[1] = time.monotonic()
+            entry[2] = self._estimate(entry[0])
+            # Just used: the agent whose run finished is the last one to evict
+            self._entries.move_to_end(session_id)
+            self._enforce_limits()
+        self._flush_evicted()
+
+    def pin(self, session_id: str):
+        """ Protects a session's agent from eviction until a matching unpin(). """
+        with self.lock:
+            self._pins[session_id] = self._pins.get(session_id, 0) + 1
+
+    def unpin(self, session_id: str):
+        with self.lock:
+            count = self._pins.get(session_id, 0) - 1
+            if count > 0:
+                self._pins[session_id] = count
+            else:
+                self._pins.pop(session_id, None)
+
+    def sweep(self):
+        """ Evicts agents idle for longer than idle_ttl. """
+        with self.lock:
+            self._sweep()
+        self._flush_evicted()
+
+    def stats(self) -> Dict[str, Any]:
+        """ Returns hit/miss/eviction counters and current occupancy. """
+        with self.lock:
+            return {
+                "size": len(self._entries),
+                "max_agents": self.max_agents,
+                "memory_bytes": sum(e[2] for e in self._entries.values()),
+                "memory_budget": self.memory_budget,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    # --- Internals ---
+
+    def _sweep(self):
+        """ Caller must hold the lock and call _flush_evicted() after releasing it. """
+        if self.idle_ttl is None:
+            return
+        deadline = time.monotonic() - self.idle_ttl
+        # Entries are ordered by last access, so expired ones are at the front
+        for session_id, entry in list(self._entries.items()):
+            if entry[1] > deadline:
+                break
+            if session_id not in self._pins:
+                self._evict(session_id)
+
+    def _estimate(self, wrapper) -> int:
+        if self.size_fn is None:
+            return 0
+        try:
+            return int(self.size_fn(wrapper))
+        except Exception as e:
+            print(f"Warning: Could not estimate agent size: {e}")
+            return 0
+
+    def _enforce_limits(self):
+        """
+        Evicts least recently used, unpinned agents until all limits hold.
+        Caller must hold the lock and call _flush_evicted() after releasing it.
+        """
+        self._sweep()
+        # Never evict the most recently used agent: the caller is about to use it
+        for session_id in list(self._entries.keys())[:-1]:
+            over_count = len(self._entries) > self.max_agents
+            over_memory = (self.memory_budget is not None and
+                           sum(e[2] for e in self._entries.values()) > self.memory_budget)
+            if not (over_count or over_memory):
+                break
+            if session_id in self._pins:
+                continue
+            self._evict(session_id)
+
+    def _evict(self, session_id: str):
+        entry = self._entries.pop(session_id, None)
+        if entry is None:
+            return
+        self.evictions += 1
+        print(f"♻️ Evicting agent for session: {session_id}")
+        done = threading.Event()
+        self._evicting[session_id] = done
+        self._to_flush.append((session_id, entry[0], done))
+
+    def _flush_evicted(self):
+        """ Runs on_evict for the agents evicted so far. Must be called without holding the lock. """
+        with self.lock:
+            victims, self._to_flush = self._to_flush, []
+        for session_id, wrapper, done in victims:
+            try:
+                if self.on_evict:
+                    self.on_evict(session_id, wrapper)
+            except Exception as e:
+                print(f"Warning: Could not flush evicted agent {session_id}: {e}")
+            finally:
+                with self.lock:
+                    if self._evicting.get(session_id) is done:
+                        del self._evicting[session_id]
+                done.set()
@@ -0,0 +1,140 @@
+import copy
+import threading
+from collections import deque
+from typing import Callable, Dict, Any, Optional
+from smolagents import CodeAgent
+
+
+def _shared_objects(prototype: CodeAgent) -> Dict[int, Any]:
+    """
+    Builds a deepcopy memo that maps the prototype's immutable parts to themselves,
+    so cloning shares them instead of copying them. Tools (which may hold large
+    objects such as DataFrames), managed agents, the model and the executor's
+    helper functions never change per session.
+    """
+    memo = {}
+    shared = [prototype.model]
+    shared.extend((getattr(prototype, "tools", None) or {}).values())
+    shared.extend((getattr(prototype, "managed_agents", None) or {}).values())
+
+    executor = getattr(prototype, "python_executor", None)
+    if executor is not None:
+        shared.extend((getattr(executor, "static_tools", None) or {}).values())
+        shared.extend((getattr(executor, "additional_functions", None) or {}).values())
+
+    for obj in shared:
+        memo[id(obj)] = obj
+    return memo
+
+
+def clone_agent(prototype: CodeAgent) -> CodeAgent:
+    """
+    Creates a 'child' agent from the prototype with its own empty memory and
+    executor state. Per-session containers are copied; tools, model and other
+    immutable parts are shared with the prototype.
+    """
+    new_agent = copy.copy(prototype)
+
+    # Fresh memory that keeps the prototype's system prompt
+    new_agent.memory = copy.copy(prototype.memory)
+    new_agent.memory.reset()
+
+    executor = getattr(prototype, "python_executor", None)
+    if executor is not None:
+        memo = _shared_objects(prototype)
+        # Never copy the prototype's variables: the child starts with an empty state
+        if hasattr(executor, "state"):
+            memo[id(executor.state)] = {}
+        new_agent.python_executor = copy.deepcopy(executor, memo)
+
+    return new_agent
+
+
+class AgentPool:
+    def __init__(self, prototype: CodeAgent, size: int = 2,
+                 factory: Callable[[CodeAgent], CodeAgent] = clone_agent):
+        """
+        Keeps a number of ready-to-use child agents cloned from the prototype,
+        refilled by a background thread, so a new session does not pay the
+        cloning cost on its first message.
+
+        Parameters:
+        -----------
+        prototype : CodeAgent
+            The user-provided agent used as template.
+        size : int
+            Number of pre-cloned agents to keep ready. 0 disables the background fill.
+        factory : Callable
+            Function that creates a child agent from the prototype.
+        """
+        if size < 0:
+            raise ValueError("size must be non-negative.")
+
+        self.prototype = prototype
+        self.size = size
+        self.factory = factory
+
+        self._cond = threading.Condition()
+        self._ready = deque()
+        self._thread: Optional[threading.Thread] = None
+        self._shutdown = False
+
+        self.hits = 0
+        self.misses = 0
+
+    def start(self):
+        """ Starts the background filler thread. """
+        with self._cond:
+            if self.size == 0 or self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._fill_loop, name="smolagentsUI-agent-pool", daemon=True)
+            self._thread.start()
+
+    def acquire(self) -> CodeAgent:
+        """ Returns a ready child agent, or clones one synchronously if the pool is empty. """
+        with self._cond:
+            if self._ready:
+                self.hits += 1
+                agent = self._ready.popleft()
+                self._cond.notify()
+                return agent
+            self.misses += 1
+            self._cond.notify()
+        return self.factory(self.prototype)
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            return {
+                "size": self.size,
+                "ready": len(self._ready),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def shutdown(self):
+        with self._cond:
+            self._shutdown = True
+            self._ready.clear()
+            self._cond.notify_all()
+
+    def _fill_loop(self):
+        while True:
+            with self._cond:
+                while not self._shutdown and len(self._ready) >= self.size:
+                    self._cond.wait()
+                if self._shutdown:
+                    return
+
+            # Clone outside the lock so acquire() is never blocked by a fill
+            try:
+                agent = self.factory(self.prototype)
+            except Exception as e:
+                print(f"Warning: Could not pre-clone agent: {e}")
+                with self._cond:
+                    self._cond.wait(timeout=5)
+                continue
+
+            with self._cond:
+                if self._shutdown:
+                    return
+                self._ready.append(agent)
@@ -1,10 +1,15 @@
 import io
-import base64
 import pprint
 import inspect
 import json
+import time
 from typing import Generator, List, Dict, Any, Optional
-from .utils import serialize_step
+from .utils import serialize_step, display_value, estimate_size, fingerprint_value, image_artifact
+from .preview import preview_text, VIEWER_LIMITS
+from .dataframe_view import DataFrameWindowCache, is_dataframe
+from .artifact_store import load_artifact
+from .lazy_memory import LazyList
+from .metrics import SERIALIZE_SECONDS, STEP_SECONDS, MODEL_TOKENS_PER_SECOND
 
 # smolagents imports
 from smolagents.memory import (
@@ -20,6 +25,10 @@ from smolagents.monitoring import Timing
 from smolagents.models import ChatMessageStreamDelta, ChatMessage, TokenUsage
 
 
+# Recursion depth of estimate_size over the memory steps
+STEP_SIZE_DEPTH = 7
+
+
 class AgentWrapper:
     def __init__(self, agent:CodeAgent):
         """
@@ -28,94 +37,96 @@ class AgentWrapper:
         if not isinstance(agent, CodeAgent):
             raise ValueError("AgentWrapper currently only supports CodeAgent instances.")   
         self.agent = agent
+        # Variable viewer change tracking: name -> (token, entry) of the last computed preview,
+        # and name -> entry as last sent to the client
+        self._variable_cache: Dict[str, Any] = {}
+        self._sent_variables: Dict[str, Dict[str, Any]] = {}
+        # Sorted/filtered views and rendered windows of DataFrames opened in the inspector
+        self._frame_windows = DataFrameWindowCache()
+        self.last_load_seconds = 0.0  # duration of the last load_memory call
+        # Step dirty tracking: id(step) -> (step, field snapshot, serialized dict),
+        # and the serialized dicts as last written by save_session
+        self._step_cache: Dict[int, tuple] = {}
+        self._persisted_steps: List[Dict] = []
+        # Content hashes of executor variables: name -> (value, state version, fingerprint).
+        # The version is bumped whenever code may have run, so a large DataFrame is hashed
+        # once per executed step and shared by the variable viewer and the save.
+        self._state_version = 0
+        self._fingerprints: Dict[str, tuple] = {}
 
     def get_steps_data(self) -> List[Dict]:
         """
         Serializes the current agent memory into a list of dictionaries.
+        Steps restored by load_memory that were never built are returned as loaded, and
+        steps whose fields did not change since they were last serialized are not serialized again.
+        """
+        steps = self.agent.memory.steps
+        lazy = isinstance(steps, LazyList)
+        step_cache = {}
+        steps_data = []
+        for i in range(len(steps)):
+            pending = steps.pending_data(i) if lazy else None
+            if pending is not None:
+                steps_data.append(pending)
+                continue
+            step = steps[i]
+            snapshot = _step_snapshot(step)
+            cached = self._step_cache.get(id(step))
+            if cached is not None and cached[0] is step and _same_snapshot(cached[1], snapshot):
+                step_data = cached[2]
+            else:
+                with SERIALIZE_SECONDS.time("step"):
+                    step_data = serialize_step(step)
+            step_cache[id(step)] = (step, snapshot, step_data)
+            steps_data.append(step_data)
+        # Only keep entries of steps still in memory
+        self._step_cache = step_cache
+        return steps_data
+
+    def get_steps_changes(self) -> tuple:
+        """
+        Serializes the memory like get_steps_data and lists the steps that are new or
+        were modified since the last mark_steps_persisted call.
+
+        Returns:
+        --------
+        (steps_data, changed_indices) : the full list of step dicts (unchanged steps reuse
+        their previous dict) and the sorted indices that need to be written.
         """
-        return [serialize_step(step) for step in self.agent.memory.steps]
+        steps_data = self.get_steps_data()
+        persisted = self._persisted_steps
+        changed = [i for i, step_data in enumerate(steps_data)
+                   if i >= len(persisted) or persisted[i] is not step_data]
+        return steps_data, changed
+
+    def mark_steps_persisted(self, steps_data: List[Dict]):
+        """ Records the step dicts returned by get_steps_changes as written to storage. """
+        self._persisted_steps = list(steps_data)
 
     def load_memory(self, steps_data: List[Dict]):
         """
-        Reconstructs agent memory steps from a list of dictionaries 
+        Restores agent memory steps from a list of dictionaries 
         and updates the agent's internal memory state.
+
+        Steps are built lazily: each ActionStep, PlanningStep or TaskStep (and each
+        of its model_input_messages) is reconstructed the first time it is accessed,
+        e.g. when the agent writes its next prompt. Viewing a session builds nothing.
         """
-        reconstructed_steps = []
-
-        for step_data in steps_data:
-            # 1. Identify and reconstruct ActionStep
-            if "step_number" in step_data:
-                # Reconstruct nested objects
-                timing = Timing(start_time=step_data["timing"]["start_time"], end_time=step_data["timing"]["end_time"]) if step_data.get("timing") else None
-                token_usage = TokenUsage(input_tokens=step_data["token_usage"]["input_tokens"],
-                                         output_tokens=step_data["token_usage"]["output_tokens"]) if step_data.get("token_usage") else None
-                
-                # Reconstruct ToolCalls
-                tool_calls = []
-                if step_data.get("tool_calls"):
-                    for tc in step_data["tool_calls"]:
-                        tool_calls.append(ToolCall(
-                            id=tc["id"],
-                            name=tc["name"],
-                            arguments=tc["arguments"]
-                        ))
-
-                # Reconstruct ChatMessages
-                model_input_messages = [
-                    ChatMessage.from_dict(msg) for msg in step_data.get("model_input_messages", [])
-                ] if step_data.get("model_input_messages") else None
-                
-                model_output_message = ChatMessage.from_dict(step_data["model_output_message"]) if step_data.get("model_output_message") else None
-
-                model_output = step_data.get("model_output")
-                if isinstance(model_output, (dict, list)):
-                    model_output = json.dumps(model_output)
-
-                step = ActionStep(
-                    step_number=step_data["step_number"],
-                    timing=timing,
-                    model_input_messages=model_input_messages,
-                    tool_calls=tool_calls,
-                    error=step_data.get("error"),
-                    model_output_message=model_output_message,
-                    model_output=model_output,
-                    observations=step_data.get("observations"),
-                    action_output=step_data.get("action_output"),
-                    token_usage=token_usage,
-                    code_action=step_data.get("code_action"),
-                    is_final_answer=step_data.get("is_final_answer", False)
-                )
-                reconstructed_steps.append(step)
-
-            # 2. Identify and reconstruct PlanningStep
-            elif "plan" in step_data:
-                timing = Timing(**step_data["timing"]) if step_data.get("timing") else None
-                token_usage = TokenUsage(**step_data["token_usage"]) if step_data.get("token_usage") else None
-                
-                model_input_messages = [
-                    ChatMessage.from_dict(msg) for msg in step_data.get("model_input_messages", [])
-                ]
-                model_output_message = ChatMessage.from_dict(step_data["model_output_message"])
-
-                step = PlanningStep(
-                    model_input_messages=model_input_messages,
-                    model_output_message=model_output_message,
-                    plan=step_data["plan"],
-                    timing=timing,
-                    token_usage=token_usage
-                )
-                reconstructed_steps.append(step)
-
-            # 3. Identify and reconstruct TaskStep
-            elif "task" in step_data:
-                step = TaskStep(
-                    task=step_data["task"],
-                    task_images=step_data.get("task_images") 
-                )
-                reconstructed_steps.append(step)
+        start = time.perf_counter()
+        # Unrecognized step dicts were always dropped on load
+        steps = [step_data for step_data in steps_data if _step_kind(step_data) is not None]
 
         self.agent.memory.reset()
-        self.agent.memory.steps = reconstructed_steps
+        self.agent.memory.steps = LazyList(steps, self._build_loaded_step)
+        # The loaded dicts are what storage holds: steps built from them stay clean until modified
+        self._step_cache = {}
+        self._persisted_steps = list(steps)
+        self.last_load_seconds = time.perf_counter() - start
+
+    def _build_loaded_step(self, step_data: Dict) -> Any:
+        step = _build_step(step_data)
+        self._step_cache[id(step)] = (step, _step_snapshot(step), step_data)
+        return step
 
     def clear_memory(self):
         self.agent.memory.reset()
@@ -135,62 +146,126 @@ class AgentWrapper:
         if state and hasattr(self.agent.python_executor, "send_variables"):
             print(f"🔄 Restoring {len(state)} variables to Python executor.")
             self.agent.python_executor.send_variables(state)
+        self._state_version += 1
+
+    def get_state_fingerprints(self) -> Dict[str, Optional[str]]:
+        """
+        Content hashes (see utils.fingerprint_value) of all executor variables, None for types
+        without one. Reuses the hashes computed since code last ran, e.g. by the variable viewer.
+        """
+        state = self.get_executor_state()
+        self._prune_fingerprints(state)
+        return {name: self._fingerprint(name, value) for name, value in state.items()}
+
+    def _fingerprint(self, name: str, value: Any) -> Optional[str]:
+        cached = self._fingerprints.get(name)
+        if cached is not None and cached[0] is value and cached[1] == self._state_version:
+            return cached[2]
+        fingerprint = fingerprint_value(value)
+        self._fingerprints[name] = (value, self._state_version, fingerprint)
+        return fingerprint
+
+    def _prune_fingerprints(self, state: Dict[str, Any]):
+        """ Drops the hashes (and references) of deleted variables. """
+        for name in [n for n in self._fingerprints if n not in state]:
+            del self._fingerprints[name]
+
+    def estimate_memory(self) -> int:
+        """
+        Returns an approximate size in bytes of the session-specific data held by this agent
+        (executor variables and memory steps). Used for memory-budget eviction.
+        """
+        size = 0
+        for name, value in self.get_executor_state().items():
+            if name.startswith('__'):
+                continue
+            size += estimate_size(value)
+        steps = self.agent.memory.steps
+        if isinstance(steps, LazyList):
+            # Measure pending steps by their raw data instead of building them
+            steps = [steps.peek(i) for i in range(len(steps))]
+        # Deep enough to reach the text of model_input_messages:
+        # list -> step -> model_input_messages -> message -> content -> part -> text
+        size += estimate_size(steps, max_depth=STEP_SIZE_DEPTH)
+        return size
 
     def get_active_variables(self) -> List[Dict[str, Any]]:
         """
         Returns a filtered list of variables from the executor state
-        suitable for the Variable Viewer UI.
+        suitable for the Variable Viewer UI. The returned list becomes the
+        baseline for the next get_variable_delta() call.
+        """
+        current = self._collect_variables()
+        self._sent_variables = current
+        # Sort alphabetically
+        return sorted(current.values(), key=lambda x: x['name'])
+
+    def get_variable_delta(self) -> Dict[str, List]:
+        """
+        Compares the executor state with what was last sent to the client.
+        Previews are only recomputed for new or changed variables.
+
+        Returns:
+        --------
+        {'added': [entry, ...], 'changed': [entry, ...], 'removed': [name, ...]}
+        """
+        current = self._collect_variables()
+        previous = self._sent_variables
+
+        added = [entry for name, entry in current.items() if name not in previous]
+        changed = [entry for name, entry in current.items() if name in previous and previous[name] != entry]
+        removed = [name for name in previous if name not in current]
+
+        self._sent_variables = current
+        return {
+            'added': sorted(added, key=lambda x: x['name']),
+            'changed': sorted(changed, key=lambda x: x['name']),
+            'removed': sorted(removed)
+        }
+
+    def _collect_variables(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Builds the viewer entries for all visible variables, reusing cached
+        entries for variables whose change token did not change.
         """
         if not hasattr(self.agent.python_executor, "state"):
-            return []
+            self._variable_cache = {}
+            return {}
 
-        variables = []
+        cache = {}
+        variables = {}
         state = self.agent.python_executor.state
-        
+        self._prune_fingerprints(state)
         for name, value in state.items():
-            # 1. Filter System Variables and Private attributes
-            if name.startswith('_'):
-                continue
-            
-            # 2. Filter Constants (All Uppercase)
-            if name.isupper():
+            if not _is_viewer_variable(name, value):
                 continue
 
-            # 3. Filter Modules, Functions, and Classes (we only want data)
-            if inspect.ismodule(value) or inspect.isclass(value) or inspect.isfunction(value) or inspect.isbuiltin(value):
-                continue
-            
-            # 4. Filter Specific Framework objects (optional, e.g. the agent itself if injected)
-            type_name = type(value).__name__
-            if type_name in ['CodeAgent', 'Tool']:
-                continue
+            token = self._variable_token(name, value)
+            cached = self._variable_cache.get(name)
+            if token is not None and cached is not None and cached[0] == token:
+                entry = cached[1]
+            else:
+                entry = _variable_entry(name, value)
 
-            # 5. Extract Metadata
-            preview = str(value)
-            if len(preview) > 100:
-                preview = preview[:100] + "..."
-            
-            shape = ""
-            # Handle pandas DataFrame/Series shape
-            if hasattr(value, "shape") and isinstance(value.shape, tuple):
-                shape = str(value.shape)
-            # Handle list/dict length
-            elif hasattr(value, "__len__"):
-                try:
-                    shape = str(len(value)) + " items"
-                except:
-                    pass
-
-            variables.append({
-                "name": name,
-                "type": type_name,
-                "preview": preview,
-                "shape": shape
-            })
-            
-        # Sort alphabetically
-        return sorted(variables, key=lambda x: x['name'])
+            cache[name] = (token, entry)
+            variables[name] = entry
+
+        # Dropping the entries of deleted variables also releases their tokens
+        self._variable_cache = cache
+        return variables
     
+    def _variable_token(self, name: str, value: Any) -> Optional[tuple]:
+        """
+        Change token for a variable. Equal tokens mean the cached preview can be reused.
+
+        Only values with a content hash (scalars, strings, bytes, numpy arrays, pandas
+        objects) get a token. Lists, dicts, sets and other objects can be changed in place,
+        anywhere and at any depth, without any cheap sign of it, so they return None and
+        their preview is always recomputed (it is bounded by VIEWER_LIMITS).
+        """
+        fingerprint = self._fingerprint(name, value)
+        return ("h", fingerprint) if fingerprint is not None else None
+
     def get_variable_details(self, name: str) -> Dict[str, Any]:
         """
         Retrieves the full details of a variable for inspection.
@@ -204,45 +279,24 @@ class AgentWrapper:
 
         type_name = type(value).__name__
         
-        # 1. Pandas DataFrame -> HTML Table
-        if hasattr(value, "to_html") and type_name == "DataFrame":
-            try:
-                # We render a scrollable HTML table. 
-                # max_rows can be adjusted or removed to show all.
-                html = value.to_html(max_rows=1000, classes="df-table", border=0)
-                return {
-                    "name": name, 
-                    "type": "dataframe", 
-                    "content": html
-                }
-            except Exception as e:
-                return {"name": name, "type": "text", "content": f"Error converting DataFrame: {e}"}
+        # 1. Pandas DataFrame -> first window of the data grid; further windows are fetched on scroll
+        if is_dataframe(value):
+            window = self.get_dataframe_window(name)
+            if "error" in window:
+                return {"name": name, "type": "text", "content": f"Error converting DataFrame: {window['error']}"}
+            return {
+                "name": name,
+                "type": "dataframe",
+                "window": window
+            }
 
-        # 2. Images (PIL or Matplotlib Figure) -> Base64
-        # Check for PIL Image
-        if hasattr(value, "save") and type_name.endswith("Image"):
-            try:
-                buffered = io.BytesIO()
-                value.save(buffered, format="PNG")
-                img_str = base64.b64encode(buffered.getvalue()).decode("utf-8")
-                return {
-                    "name": name, 
-                    "type": "image", 
-                    "content": f"data:image/png;base64,{img_str}"
-                }
-            except:
-                pass
-        
-        # Check for Matplotlib Figure
-        if hasattr(value, "savefig"):
+        # 2. Images (PIL or Matplotlib Figure) -> artifact URL
+        if (hasattr(value, "save") and type_name.endswith("Image")) or hasattr(value, "savefig"):
             try:
-                buffered = io.BytesIO()
-                value.savefig(buffered, format='png')
-                img_str = base64.b64encode(buffered.getvalue()).decode("utf-8")
                 return {
                     "name": name, 
                     "type": "image", 
-                    "content": f"data:image/png;base64,{img_str}"
+                    "content": image_artifact(value)
                 }
             except:
                 pass
@@ -260,21 +314,70 @@ class AgentWrapper:
             "content": formatted_text
         }
 
+    def get_dataframe_window(self, name: str, row_start: int = 0, row_count: int = 100,
+                             col_start: int = 0, col_count: int = 20, sort_by: Optional[int] = None,
+                             ascending: bool = True, filter: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Returns a row/column window of a DataFrame variable, optionally sorted and filtered.
+        See DataFrameWindowCache.get_window for the parameters.
+        """
+        state = self.get_executor_state()
+        value = state.get(name)
+        if not is_dataframe(value):
+            return {"name": name, "error": f"Variable '{name}' is not a DataFrame"}
+
+        # The change token is refreshed after every action step; the object id guards reassignment
+        cached = self._variable_cache.get(name)
+        token = cached[0] if cached is not None else self._variable_token(name, value)
+        version = (id(value), token)
+
+        try:
+            return self._frame_windows.get_window(name, version, value, row_start=row_start, row_count=row_count,
+                                                  col_start=col_start, col_count=col_count, sort_by=sort_by,
+                                                  ascending=ascending, filter=filter)
+        except Exception as e:
+            return {"name": name, "error": str(e)}
+
     def run(self, task: str) -> Generator[Dict, None, Optional[ActionStep]]:
         """
         Runs the agent and yields UI-friendly event dictionaries.
         """
         stream = self.agent.run(task, stream=True, reset=False)
+        try:
+            return (yield from self._run_events(stream))
+        finally:
+            # Code may have changed variables in place, even if the run failed
+            self._state_version += 1
+
+    def _run_events(self, stream) -> Generator[Dict, None, Optional[ActionStep]]:
         final_step_obj = None
+        # Per-step model stream accounting, for the step metrics
+        step_deltas = 0
+        model_end = None
+        observed_step = None  # smolagents yields the last step again when max_steps is reached
 
         for step in stream:
             # Streaming Text
             if isinstance(step, ChatMessageStreamDelta):
                 if step.content:
+                    step_deltas += 1
                     yield {'type': 'stream_delta', 'content': step.content}
             
+            # Tool call parsed from the model output: code is about to execute.
+            # Also marks the end of the model stream, so buffered deltas are flushed.
+            elif isinstance(step, ToolCall):
+                model_end = time.time()
+                yield {'type': 'tool_start', 'tool_name': step.name}
+
             # Action Steps (Code & Logs)
             elif isinstance(step, ActionStep):
+                if step is not observed_step:
+                    _observe_step(step, model_end, step_deltas)
+                    observed_step = step
+                step_deltas = 0
+                model_end = None
+                # The step's code has run: variables may have changed in place
+                self._state_version += 1
                 yield {
                         'type': 'action_step',
                         'step_number': step.step_number,
@@ -287,11 +390,196 @@ class AgentWrapper:
                 if step.is_final_answer:
                     final_step_obj = step
                     yield {'type': 'final_answer', 
-                        'content': serialize_step(step.action_output)
+                        'content': display_value(serialize_step(step.action_output))
                         }
                     
             # Planning
             elif isinstance(step, PlanningStep):
                 yield {'type': 'planning_step', 'plan': step.plan}
 
-        return final_step_obj
\ No newline at end of file
+        return final_step_obj
+
+def _observe_step(step: ActionStep, model_end: Optional[float], deltas: int):
+    """
+    Records the duration of an action step from its timing, split at the tool call into
+    model and execution time, and the model's output token rate. Without token usage
+    from the model, each streamed delta counts as one token.
+    """
+    timing = step.timing
+    if timing is None or timing.end_time is None:
+        return
+    STEP_SECONDS.observe(timing.end_time - timing.start_time, "total")
+    if model_end is None:
+        return  # no code was parsed: the model and execution phases cannot be told apart
+    model_seconds = model_end - timing.start_time
+    STEP_SECONDS.observe(model_seconds, "model")
+    STEP_SECONDS.observe(timing.end_time - model_end, "execution")
+    tokens = step.token_usage.output_tokens if step.token_usage else deltas
+    if tokens and model_seconds > 0:
+        MODEL_TOKENS_PER_SECOND.observe(tokens / model_seconds)
+
+def _step_kind(step_data: Dict) -> Optional[str]:
+    if "step_number" in step_data:
+        return "action"
+    if "plan" in step_data:
+        return "planning"
+    if "task" in step_data:
+        return "task"
+    return None
+
+
+def _step_snapshot(step: Any) -> tuple:
+    """
+    Cheap change marker of a memory step: the objects its fields point to, plus the length of
+    list fields and the attributes of object fields (e.g. Timing.end_time, set in place).
+    smolagents fills steps by assigning fields, so a step with the same snapshot serializes
+    to the same dict. Holding the values keeps their ids from being reused.
+    """
+    fields = getattr(step, "__dict__", None)
+    if fields is None:
+        return ((step, None),)
+    return tuple((value, _field_marker(value)) for value in fields.values())
+
+
+def _field_marker(value: Any) -> Any:
+    if isinstance(value, list):
+        return len(value)
+    attributes = getattr(value, "__dict__", None)
+    if attributes is not None and not isinstance(value, type):
+        return tuple(attributes.values())
+    return None
+
+
+def _same_snapshot(a: tuple, b: tuple) -> bool:
+    return len(a) == len(b) and all(x[0] is y[0] and _same_marker(x[1], y[1]) for x, y in zip(a, b))
+
+
+def _same_marker(a: Any, b: Any) -> bool:
+    if isinstance(a, tuple) and isinstance(b, tuple):
+        return len(a) == len(b) and all(x is y for x, y in zip(a, b))
+    return a == b
+
+
+def _build_step(step_data: Dict) -> Any:
+    """ Reconstructs an ActionStep, PlanningStep or TaskStep from its serialized dictionary. """
+    kind = _step_kind(step_data)
+    timing = Timing(start_time=step_data["timing"]["start_time"], end_time=step_data["timing"]["end_time"]) if step_data.get("timing") else None
+    token_usage = TokenUsage(input_tokens=step_data["token_usage"]["input_tokens"],
+                             output_tokens=step_data["token_usage"]["output_tokens"]) if step_data.get("token_usage") else None
+
+    # 1. Reconstruct ActionStep
+    if kind == "action":
+        # Reconstruct ToolCalls
+        tool_calls = []
+        if step_data.get("tool_calls"):
+            for tc in step_data["tool_calls"]:
+                tool_calls.append(ToolCall(
+                    id=tc["id"],
+                    name=tc["name"],
+                    arguments=tc["arguments"]
+                ))
+
+        # ChatMessages of the prompt are only built if something reads them
+        model_input_messages = LazyList(step_data["model_input_messages"], ChatMessage.from_dict) \
+            if step_data.get("model_input_messages") else None
+
+        model_output_message = ChatMessage.from_dict(step_data["model_output_message"]) if step_data.get("model_output_message") else None
+
+        model_output = step_data.get("model_output")
+        if isinstance(model_output, (dict, list)):
+            model_output = json.dumps(model_output)
+
+        return ActionStep(
+            step_number=step_data["step_number"],
+            timing=timing,
+            model_input_messages=model_input_messages,
+            tool_calls=tool_calls,
+            error=step_data.get("error"),
+            model_output_message=model_output_message,
+            model_output=model_output,
+            observations=step_data.get("observations"),
+            action_output=step_data.get("action_output"),
+            token_usage=token_usage,
+            code_action=step_data.get("code_action"),
+            is_final_answer=step_data.get("is_final_answer", False)
+        )
+
+    # 2. Reconstruct PlanningStep
+    if kind == "planning":
+        return PlanningStep(
+            model_input_messages=LazyList(step_data.get("model_input_messages") or [], ChatMessage.from_dict),
+            model_output_message=ChatMessage.from_dict(step_data["model_output_message"]),
+            plan=step_data["plan"],
+            timing=timing,
+            token_usage=token_usage
+        )
+
+    # 3. Reconstruct TaskStep
+    return TaskStep(
+        task=step_data["task"],
+        task_images=_restore_images(step_data.get("task_images"))
+    )
+
+
+def _restore_images(images: Optional[List[Any]]) -> Optional[List[Any]]:
+    """ Turns artifact URLs back into PIL images for the agent memory. Other values are kept as-is. """
+    if not images:
+        return images
+    try:
+        from PIL import Image
+    except ImportError:
+        return images
+
+    restored = []
+    for img in images:
+        artifact = load_artifact(img) if isinstance(img, str) else None
+        if artifact is not None:
+            try:
+                img = Image.open(io.BytesIO(artifact[1]))
+            except Exception:
+                pass
+        restored.append(img)
+    return restored
+
+
+def _is_viewer_variable(name: str, value: Any) -> bool:
+    """ Filters out the executor variables that are not shown in the Variable Viewer. """
+    # 1. Filter System Variables and Private attributes
+    if name.startswith('_'):
+        return False
+
+    # 2. Filter Constants (All Uppercase)
+    if name.isupper():
+        return False
+
+    # 3. Filter Modules, Functions, and Classes (we only want data)
+    if inspect.ismodule(value) or inspect.isclass(value) or inspect.isfunction(value) or inspect.isbuiltin(value):
+        return False
+
+    # 4. Filter Specific Framework objects (optional, e.g. the agent itself if injected)
+    if type(value).__name__ in ['CodeAgent', 'Tool']:
+        return False
+    return True
+
+
+def _variable_entry(name: str, value: Any) -> Dict[str, Any]:
+    """ Extracts the metadata shown on a Variable Viewer card. """
+    preview = preview_text(value, VIEWER_LIMITS)
+
+    shape = ""
+    # Handle pandas DataFrame/Series shape
+    if hasattr(value, "shape") and isinstance(value.shape, tuple):
+        shape = str(value.shape)
+    # Handle list/dict length
+    elif hasattr(value, "__len__"):
+        try:
+            shape = str(len(value)) + " items"
+        except:
+            pass
+
+    return {
+        "name": name,
+        "type": type(value).__name__,
+        "preview": preview,
+        "shape": shape
+    }
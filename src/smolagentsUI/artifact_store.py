@@ -0,0 +1,116 @@
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Iterable, Optional, Set, Tuple
+
+# Steps reference artifacts by URL; the server serves them from this route
+ARTIFACT_ROUTE = "/artifacts/"
+
+_ARTIFACT_HASH = re.compile(r"^[0-9a-f]{40}$")
+_ARTIFACT_REF = re.compile(r"/artifacts/([0-9a-f]{40})")
+
+
+def artifact_hash(data: bytes) -> str:
+    """ Content address of an artifact. """
+    return hashlib.blake2b(data, digest_size=20).hexdigest()
+
+
+def is_artifact_hash(value: str) -> bool:
+    return bool(_ARTIFACT_HASH.match(value or ""))
+
+
+def artifact_url(content_hash: str) -> str:
+    return ARTIFACT_ROUTE + content_hash
+
+
+def find_artifact_refs(text: str) -> Set[str]:
+    """ Returns the hashes of all artifact URLs in a (JSON) string. """
+    return set(_ARTIFACT_REF.findall(text or ""))
+
+
+class MemoryArtifactStore:
+    def __init__(self, max_items: int = 256):
+        """
+        In-memory artifact store, used when no database is configured.
+        Artifacts referenced by a session (see add_refs) are kept until the session releases
+        them; of the others, the most recently stored `max_items` are kept.
+        """
+        self.max_items = max_items
+        self.lock = threading.Lock()
+        self._items = OrderedDict()  # unreferenced: content_hash -> (mime_type, data), least recent first
+        self._pinned = {}  # referenced by a session: content_hash -> (mime_type, data)
+        self._refcounts = {}  # content_hash -> number of sessions referencing it
+        self._session_refs = {}  # session_id -> set of content hashes
+
+    def put_artifact(self, data: bytes, mime_type: str) -> str:
+        content_hash = artifact_hash(data)
+        with self.lock:
+            if content_hash in self._pinned:
+                pass
+            elif self._refcounts.get(content_hash):
+                # Referenced before it was stored (or after it was evicted)
+                self._items.pop(content_hash, None)
+                self._pinned[content_hash] = (mime_type, data)
+            elif content_hash in self._items:
+                self._items.move_to_end(content_hash)
+            else:
+                self._items[content_hash] = (mime_type, data)
+                self._evict()
+        return content_hash
+
+    def get_artifact(self, content_hash: str) -> Optional[Tuple[str, bytes]]:
+        with self.lock:
+            return self._pinned.get(content_hash) or self._items.get(content_hash)
+
+    def add_refs(self, session_id: str, hashes: Iterable[str]):
+        """ Records that a session references these artifacts: they are not evicted until it is released. """
+        with self.lock:
+            refs = self._session_refs.setdefault(session_id, set())
+            for content_hash in set(hashes) - refs:
+                refs.add(content_hash)
+                self._refcounts[content_hash] = self._refcounts.get(content_hash, 0) + 1
+                if content_hash in self._items:
+                    self._pinned[content_hash] = self._items.pop(content_hash)
+
+    def release_session(self, session_id: str):
+        """ Drops the references of a deleted session. Artifacts no other session uses become evictable. """
+        with self.lock:
+            for content_hash in self._session_refs.pop(session_id, ()):
+                self._refcounts[content_hash] -= 1
+                if self._refcounts[content_hash] == 0:
+                    del self._refcounts[content_hash]
+                    if content_hash in self._pinned:
+                        self._items[content_hash] = self._pinned.pop(content_hash)
+            self._evict()
+
+    def _evict(self):
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+
+# The store serialize_step writes to. serve() replaces it with the ConversationManager.
+_store: Any = MemoryArtifactStore()
+
+
+def set_artifact_store(store: Any):
+    """ Sets the store used for new artifacts. It must implement put_artifact and get_artifact. """
+    global _store
+    _store = store
+
+
+def get_artifact_store() -> Any:
+    return _store
+
+
+def store_artifact(data: bytes, mime_type: str) -> str:
+    """ Stores bytes once (by content hash) and returns the URL that references them. """
+    return artifact_url(_store.put_artifact(data, mime_type))
+
+
+def load_artifact(ref: str) -> Optional[Tuple[str, bytes]]:
+    """ Returns (mime_type, data) for an artifact URL or hash, or None if it is unknown. """
+    content_hash = ref[len(ARTIFACT_ROUTE):] if ref.startswith(ARTIFACT_ROUTE) else ref
+    if not is_artifact_hash(content_hash):
+        return None
+    return _store.get_artifact(content_hash)
@@ -0,0 +1,216 @@
+"""
+A minimal single-host pub/sub broker that lets several server workers share
+Socket.IO events and forward session calls to each other, standing in for an
+external message queue such as Redis.
+
+    SMOLAGENTSUI_BROKER_KEY=<secret> python -m smolagentsUI.broker --port 5600
+
+Frames are pickled, so the shared secret is what keeps other processes from
+running code in the workers: the broker refuses to start without one, and only
+listens on a loopback address, so the workers must run on the same host.
+"""
+import argparse
+import ipaddress
+import os
+import socket
+import sys
+import threading
+from multiprocessing.connection import Listener, Client
+from typing import Any, Callable, Dict, Iterator, Optional, Set
+from urllib.parse import urlparse
+
+import socketio
+
+# Environment variable holding the shared secret of a standalone broker and its workers
+AUTHKEY_ENV = "SMOLAGENTSUI_BROKER_KEY"
+
+
+def new_authkey() -> bytes:
+    """ A random secret for one cluster launch. """
+    return os.urandom(32)
+
+
+def authkey_from_env() -> Optional[bytes]:
+    value = os.environ.get(AUTHKEY_ENV)
+    return value.encode("utf-8") if value else None
+
+
+def _check_authkey(authkey: bytes) -> bytes:
+    if not isinstance(authkey, bytes) or not authkey:
+        raise ValueError(f"The broker needs a non-empty bytes authkey (e.g. new_authkey() or ${AUTHKEY_ENV}).")
+    return authkey
+
+
+def _check_loopback(host: str) -> str:
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, None)}
+    except socket.gaierror as e:
+        raise ValueError(f"Cannot resolve broker host '{host}': {e}")
+    if not all(ipaddress.ip_address(address.split("%")[0]).is_loopback for address in addresses):
+        raise ValueError(f"The broker only listens on loopback (e.g. 127.0.0.1), not on '{host}': "
+                         "its pickled frames must not be reachable from other hosts.")
+    return host
+
+
+class LocalBroker:
+    def __init__(self, authkey: bytes, host: str = "127.0.0.1", port: int = 0):
+        """
+        Pub/sub over authenticated local TCP connections. A connection either publishes
+        (("pub", channel, message) frames) or subscribes to one channel (("sub", channel)),
+        after which it receives every message published on that channel, in order.
+
+        Parameters:
+        -----------
+        authkey : bytes
+            Shared secret clients must present. Anyone holding it can run code in the workers
+            (frames are pickled): use a random one per launch (new_authkey()) and never a constant.
+        host : str
+            Interface to bind. It must be a loopback address: ValueError otherwise.
+        port : int
+            Port to bind. 0 picks a free port (see `url`).
+        """
+        self.authkey = _check_authkey(authkey)
+        self.listener = Listener((_check_loopback(host), port), authkey=authkey)
+        self.host, self.port = self.listener.address
+        self._subscribers: Dict[str, Set] = {}  # channel -> subscribed connections
+        self._lock = threading.Lock()
+        self._send_locks = {}  # connection -> lock serializing sends to it
+        self.published = 0
+
+    @property
+    def url(self) -> str:
+        return f"local://{self.host}:{self.port}"
+
+    def start(self) -> "LocalBroker":
+        threading.Thread(target=self._accept_loop, name="smolagentsUI-broker", daemon=True).start()
+        return self
+
+    def serve_forever(self):
+        self._accept_loop()
+
+    def _accept_loop(self):
+        while True:
+            try:
+                conn = self.listener.accept()
+            except OSError:
+                return
+            except Exception as e:
+                # Failed handshake (wrong authkey): keep serving the others
+                print(f"Warning: broker rejected a connection: {e}")
+                continue
+            threading.Thread(target=self._serve_connection, args=(conn,), daemon=True).start()
+
+    def _serve_connection(self, conn):
+        channel = None
+        try:
+            while True:
+                frame = conn.recv()
+                if frame[0] == "pub":
+                    self._fan_out(frame[1], frame[2])
+                elif frame[0] == "sub":
+                    channel = frame[1]
+                    with self._lock:
+                        self._send_locks[conn] = threading.Lock()
+                        self._subscribers.setdefault(channel, set()).add(conn)
+        except (EOFError, OSError):
+            pass
+        finally:
+            with self._lock:
+                if channel is not None:
+                    self._subscribers.get(channel, set()).discard(conn)
+                self._send_locks.pop(conn, None)
+            conn.close()
+
+    def _fan_out(self, channel: str, message: Any):
+        with self._lock:
+            targets = [(c, self._send_locks[c]) for c in self._subscribers.get(channel, ())]
+            self.published += 1
+        for conn, lock in targets:
+            try:
+                with lock:
+                    conn.send(message)
+            except (OSError, ValueError):
+                pass  # the subscriber's own thread drops it when its connection closes
+
+    def close(self):
+        self.listener.close()
+
+
+class BrokerClient:
+    def __init__(self, url: str, authkey: bytes):
+        """
+        Connection to a LocalBroker at a "local://host:port" URL, authenticated with the
+        broker's authkey. Publishing is thread-safe; each subscribe() opens its own connection.
+        """
+        parsed = urlparse(url)
+        if parsed.scheme != "local" or not parsed.hostname or not parsed.port:
+            raise ValueError(f"Unsupported broker URL '{url}', expected local://host:port")
+        self.address = (parsed.hostname, parsed.port)
+        self.authkey = _check_authkey(authkey)
+        self._pub = None
+        self._pub_lock = threading.Lock()
+
+    def publish(self, channel: str, message: Any):
+        with self._pub_lock:
+            if self._pub is None:
+                self._pub = Client(self.address, authkey=self.authkey)
+            self._pub.send(("pub", channel, message))
+
+    def subscribe(self, channel: str, wait_readable: Optional[Callable[[int], None]] = None) -> Iterator[Any]:
+        """
+        Yields the messages published on `channel`. `wait_readable(fileno)` is called before
+        each read, so an event loop can wait for data cooperatively instead of blocking.
+        """
+        conn = Client(self.address, authkey=self.authkey)
+        conn.send(("sub", channel))
+        try:
+            while True:
+                if wait_readable is not None:
+                    wait_readable(conn.fileno())
+                yield conn.recv()
+        finally:
+            conn.close()
+
+
+class LocalBrokerManager(socketio.PubSubManager):
+    """
+    Socket.IO client manager that shares events between server workers through a LocalBroker,
+    like socketio.RedisManager does through Redis. Pass it as SocketIO(client_manager=...).
+    """
+    name = "smolagentsUI-local"
+
+    def __init__(self, url: str, authkey: bytes, channel: str = "socketio", write_only: bool = False,
+                 logger=None, cooperative: bool = False):
+        # The listener runs as a greenlet in gevent mode: wait for data without blocking the loop
+        self.client = BrokerClient(url, authkey)
+        self.wait_readable = _gevent_wait_read if cooperative else None
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+
+    def _publish(self, data):
+        self.client.publish(self.channel, data)
+
+    def _listen(self):
+        yield from self.client.subscribe(self.channel, wait_readable=self.wait_readable)
+
+
+def _gevent_wait_read(fileno: int):
+    import gevent.socket
+    gevent.socket.wait_read(fileno)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1", help="loopback address to bind")
+    parser.add_argument("--port", type=int, default=5600)
+    args = parser.parse_args()
+
+    authkey = authkey_from_env()
+    if authkey is None:
+        sys.exit(f"Refusing to start without a shared secret: set ${AUTHKEY_ENV} for the broker and its workers.")
+    broker = LocalBroker(authkey, args.host, args.port)
+    print(f"📮 Broker listening on {broker.url}")
+    broker.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+import hashlib
+import multiprocessing
+import signal
+import sys
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from .broker import BrokerClient, LocalBroker, new_authkey, authkey_from_env
+
+
+class WorkerCluster:
+    def __init__(self, worker_id: int, num_workers: int, broker_url: str, broker_authkey: bytes,
+                 handlers: Dict[str, Callable[[Dict, str], None]], max_threads: int = 8):
+        """
+        Session-affine routing between server workers.
+
+        Every session is owned by one worker, picked by hashing its id, which keeps its
+        agent, executor state and cached history and is the only one writing its rows.
+        Session events received by another worker are forwarded to the owner over the
+        broker; the owner replies to the client's sid through the shared Socket.IO
+        message queue, whichever worker holds the connection.
+
+        Parameters:
+        -----------
+        worker_id : int
+            This worker, in [0, num_workers).
+        num_workers : int
+            Number of workers sharing the database and the broker.
+        broker_url : str
+            URL of the LocalBroker (local://host:port).
+        broker_authkey : bytes
+            Shared secret of the broker.
+        handlers : Dict
+            event name -> handler(data, sid). Looked up when a forwarded event arrives.
+        max_threads : int
+            Threads executing forwarded events.
+        """
+        if not 0 <= worker_id < num_workers:
+            raise ValueError(f"worker_id must be in [0, {num_workers}).")
+        self.worker_id = worker_id
+        self.num_workers = num_workers
+        self.handlers = handlers
+        self.client = BrokerClient(broker_url, broker_authkey)
+        self._executor = ThreadPoolExecutor(max_workers=max_threads, thread_name_prefix="smolagentsUI-forwarded")
+        self._counts = {"forwarded": 0, "received": 0}
+        self._lock = threading.Lock()
+
+    def owner_of(self, session_id: Optional[str]) -> int:
+        """ The worker that owns a session. Stable across restarts for the same num_workers. """
+        if not session_id:
+            return self.worker_id
+        digest = hashlib.blake2b(str(session_id).encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "big") % self.num_workers
+
+    def owns(self, session_id: Optional[str]) -> bool:
+        return self.owner_of(session_id) == self.worker_id
+
+    def forward(self, session_id: str, event: str, data: Dict, sid: str):
+        """ Sends a session event to its owner, to be handled as if its client had sent it there. """
+        self.client.publish(_channel(self.owner_of(session_id)), (event, data, sid))
+        with self._lock:
+            self._counts["forwarded"] += 1
+
+    def start(self):
+        threading.Thread(target=self._listen, name=f"smolagentsUI-worker-{self.worker_id}", daemon=True).start()
+
+    def _listen(self):
+        try:
+            for event, data, sid in self.client.subscribe(_channel(self.worker_id)):
+                with self._lock:
+                    self._counts["received"] += 1
+                self._executor.submit(self._handle, event, data, sid)
+        except (EOFError, OSError):
+            print(f"Warning: worker {self.worker_id} lost the broker, forwarded session events will be dropped")
+
+    def _handle(self, event: str, data: Dict, sid: str):
+        handler = self.handlers.get(event)
+        if handler is None:
+            print(f"Warning: worker {self.worker_id} has no handler for forwarded event '{event}'")
+            return
+        try:
+            handler(data, sid)
+        except Exception:
+            print(f"Error handling forwarded '{event}' on worker {self.worker_id}:")
+            traceback.print_exc()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"worker_id": self.worker_id, "num_workers": self.num_workers, **self._counts}
+
+
+def _channel(worker_id: int) -> str:
+    return f"smolagentsUI-worker-{worker_id}"
+
+
+def _run_worker(agent, worker_id: int, num_workers: int, port: int, broker: Optional[LocalBroker],
+                broker_url: str, broker_authkey: bytes, serve_kwargs: Dict):
+    # The forked worker inherits the launcher's broker socket: only the launcher accepts on it
+    if broker is not None:
+        broker.close()
+    from .server import serve
+    serve(agent, port=port, worker_id=worker_id, num_workers=num_workers, broker_url=broker_url,
+          broker_authkey=broker_authkey, **serve_kwargs)
+
+
+def serve_cluster(agent, workers: int = 2, host: str = "127.0.0.1", port: int = 5000,
+                  storage_path: str = None, broker_url: Optional[str] = None,
+                  broker_authkey: Optional[bytes] = None, **serve_kwargs):
+    """
+    Starts `workers` server processes on ports port, port+1, ..., sharing one SQLite
+    database and one message broker. Put a load balancer in front of them, or point
+    each browser at any worker: session events are routed to the worker owning the session.
+
+    Parameters:
+    -----------
+    agent : CodeAgent
+        The prototype agent. Each worker process gets a copy (processes are forked).
+    workers : int
+        Number of worker processes.
+    host : str
+        Host address every worker binds.
+    port : int
+        Port of worker 0. Worker i listens on port + i.
+    storage_path : str
+        Path to the shared SQLite database file. Required: workers share history through it.
+    broker_url : str, Optional
+        URL of a running broker (python -m smolagentsUI.broker) on this host's loopback
+        interface. If None, one is started in this process on 127.0.0.1 with a random
+        authkey generated for this launch.
+    broker_authkey : bytes, Optional
+        Shared secret of the broker at broker_url. Defaults to $SMOLAGENTSUI_BROKER_KEY.
+    **serve_kwargs
+        Passed to serve() in every worker (async_mode, max_concurrent_runs, ...). debug
+        defaults to False, since the reloader cannot run in a worker process.
+    """
+    if workers < 1:
+        raise ValueError("workers must be at least 1.")
+    if not storage_path:
+        raise ValueError("serve_cluster needs a storage_path: workers share the chat history through it.")
+
+    # Create and migrate the database once, before workers open it concurrently
+    from .conversation_manager import ConversationManager
+    ConversationManager(storage_path).close()
+
+    broker = None
+    if broker_url is None:
+        broker_authkey = new_authkey()
+        broker = LocalBroker(broker_authkey, host="127.0.0.1")
+        broker_url = broker.url
+    elif broker_authkey is None:
+        broker_authkey = authkey_from_env()
+        if broker_authkey is None:
+            raise ValueError("broker_url needs the broker's broker_authkey (or $SMOLAGENTSUI_BROKER_KEY).")
+
+    serve_kwargs = {"debug": False, "host": host, "storage_path": storage_path, **serve_kwargs}
+    # fork: the agent (tools, model, executor) does not need to be picklable
+    context = multiprocessing.get_context("fork")
+    processes: List[multiprocessing.Process] = []
+    for worker_id in range(workers):
+        p = context.Process(target=_run_worker, name=f"smolagentsUI-worker-{worker_id}",
+                            args=(agent, worker_id, workers, port + worker_id, broker, broker_url,
+                                  broker_authkey, serve_kwargs))
+        p.start()
+        processes.append(p)
+    # Accept connections only once every worker is forked, so none inherits the accept thread
+    if broker is not None:
+        broker.start()
+        print(f"📮 Broker listening on {broker_url}")
+
+    # Stop the workers with the launcher, also when a process manager sends SIGTERM
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        for p in processes:
+            p.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for p in processes:
+            if p.is_alive():
+                p.terminate()
+        for p in processes:
+            p.join()
+        if broker is not None:
+            broker.close()
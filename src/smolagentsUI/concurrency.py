@@ -0,0 +1,113 @@
+import queue
+import threading
+from typing import Any, Callable, Dict, Optional
+
+# Values accepted by serve(async_mode=...)
+ASYNC_MODES = ("threading", "gevent")
+
+
+class ThreadingBackend:
+    def __init__(self, socketio):
+        """
+        Default server mode: Werkzeug serves every client on its own OS thread, so socket
+        handlers may block and any thread may emit directly.
+        """
+        self.socketio = socketio
+        self.name = "threading"
+
+    def run_blocking(self, fn: Callable, *args, **kwargs) -> Any:
+        """ Runs a blocking call (SQLite, agent state, dill). The calling thread can block. """
+        return fn(*args, **kwargs)
+
+    def emit(self, event: str, data: Any, to: Optional[str] = None):
+        """ Emits an event from any thread. """
+        self.socketio.emit(event, data, to=to)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"mode": self.name}
+
+
+class GeventBackend:
+    def __init__(self, socketio, threadpool_size: int = 16):
+        """
+        High-concurrency mode: all sockets are served by gevent greenlets on one OS thread,
+        so an idle dashboard costs a greenlet instead of a thread.
+
+        The standard library is NOT monkey-patched. Agent runs stay on the RunScheduler's OS
+        threads, and socket handlers hand their blocking work (SQLite, agent state, dill) to
+        gevent's native thread pool through run_blocking(), so the event loop never waits on it.
+        Events emitted from OS threads are queued and sent by a greenlet on the loop.
+
+        Parameters:
+        -----------
+        socketio : SocketIO
+            Server created with async_mode='gevent'. Must be built on the thread that runs it.
+        threadpool_size : int
+            Maximum number of OS threads executing blocking handler work at the same time.
+        """
+        import gevent
+        import gevent.event
+
+        self.socketio = socketio
+        self.name = "gevent"
+        self.hub = gevent.get_hub()
+        self.hub.threadpool.maxsize = threadpool_size
+        self._loop_thread = threading.get_ident()
+
+        # queue.SimpleQueue is safe to fill from OS threads; the async watcher is the
+        # thread-safe way to wake the loop, whose callback must not block, so it only
+        # sets an event the pump greenlet waits on.
+        self._outbox = queue.SimpleQueue()
+        self._wakeup = gevent.event.Event()
+        self._watcher = self.hub.loop.async_()
+        self._watcher.start(self._wakeup.set)
+        self.emitted_from_threads = 0
+        gevent.spawn(self._pump)
+
+    def run_blocking(self, fn: Callable, *args, **kwargs) -> Any:
+        """ Runs fn on a pool thread. Only the calling greenlet waits; exceptions propagate. """
+        if threading.get_ident() != self._loop_thread:
+            return fn(*args, **kwargs)
+        return self.hub.threadpool.apply(fn, args, kwargs)
+
+    def emit(self, event: str, data: Any, to: Optional[str] = None):
+        """ Emits an event from any thread, in order. """
+        if threading.get_ident() == self._loop_thread:
+            self.socketio.emit(event, data, to=to)
+            return
+        self._outbox.put((event, data, to))
+        self._watcher.send()
+
+    def _pump(self):
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            while True:
+                try:
+                    event, data, to = self._outbox.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    self.socketio.emit(event, data, to=to)
+                    self.emitted_from_threads += 1
+                except Exception as e:
+                    print(f"Warning: could not emit '{event}': {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        pool = self.hub.threadpool
+        return {
+            "mode": self.name,
+            "threadpool_size": pool.maxsize,
+            "threadpool_busy": pool.size,
+            "queued_emits": self._outbox.qsize(),
+            "emitted_from_threads": self.emitted_from_threads,
+        }
+
+
+def make_backend(async_mode: str, socketio, threadpool_size: int = 16):
+    """ Returns the concurrency backend for serve(async_mode=...). """
+    if async_mode == "threading":
+        return ThreadingBackend(socketio)
+    if async_mode == "gevent":
+        return GeventBackend(socketio, threadpool_size=threadpool_size)
+    raise ValueError(f"Unknown async_mode '{async_mode}'. Choose one of {ASYNC_MODES}.")
@@ -4,12 +4,60 @@ import json
 import uuid
 import datetime
 import threading
+import queue
 import sqlite3
-from typing import List, Dict, Optional
-from .utils import serialize_python_state, deserialize_python_state
+from contextlib import contextmanager
+import re
+from typing import Iterable, Iterator, List, Dict, Optional, Any
+from .session_registry import SessionRegistry
+from .utils import (deserialize_python_state, fingerprint_value, serialize_variable,
+                    deserialize_variable, content_hash)
+from .artifact_store import MemoryArtifactStore, artifact_hash, find_artifact_refs
+from .compression import get_codec, encode, decode, encode_text, decode_text
+from .metrics import DB_SECONDS
+from .search import (RANK_FUNCTION, SNIPPET_TOKENS, MARK_OPEN, MARK_CLOSE, preview_rowid, fts_query,
+                     query_terms, step_search_fields, render_snippet, memory_snippet)
+from .telemetry import TELEMETRY_COLUMNS, TIME_BUCKETS, GROUPS, step_telemetry_rows, parse_time, rollup
+
+# PRAGMAs applied to every connection. journal_mode=WAL lets readers proceed while a
+# session is being saved; foreign_keys must be enabled per connection for ON DELETE CASCADE.
+DEFAULT_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -65536,       # negative = KiB, i.e. 64 MiB page cache per connection
+    "mmap_size": 268435456,     # 256 MiB
+    "busy_timeout": 5000,       # ms to wait on a locked database
+    "foreign_keys": "ON",
+}
+
+_PRAGMA_TOKEN = re.compile(r"^-?\w+$")
+
+# Stored in PRAGMA user_version.
+# 1: model_input_messages are stored once in the messages table.
+# 2: step_data, message_data and python_blobs.data may be compressed, as named by their `codec` column.
+# 3: steps are unique per (session_id, step_index), replacing the index on session_id alone.
+SCHEMA_VERSION = 3
+
+# Columns added after the first release: (table, column, declaration)
+_ADDED_COLUMNS = [
+    ("steps", "codec", "TEXT"),
+    ("messages", "codec", "TEXT"),
+    ("python_blobs", "codec", "TEXT"),
+]
+
+# In stored step_data, model_input_messages is replaced by the list of their content hashes
+MESSAGE_REFS_KEY = "model_input_message_refs"
+
+# Max number of bound parameters per query (SQLite's default limit is 999)
+_SQL_BATCH = 500
+
+# Run profiles kept per session; older ones are deleted when a new one is saved
+PROFILES_PER_SESSION = 20
 
 class ConversationManager:
-    def __init__(self, storage_path: str = None):
+    def __init__(self, storage_path: str = None, pragmas: Optional[Dict[str, Any]] = None,
+                 codec: Optional[str] = "zlib", codec_level: Optional[int] = None, shared: bool = False,
+                 pool_size: int = 8):
         """
         Manages conversation sessions.
         
@@ -17,6 +65,22 @@ class ConversationManager:
         -----------
         storage_path : str 
             Path to the SQLite database file. If None, runs in in-memory mode.
+        pragmas : Dict, Optional
+            SQLite PRAGMAs overriding DEFAULT_PRAGMAS (e.g. {"synchronous": "FULL", "mmap_size": 0}).
+            A value of None removes a default PRAGMA.
+        codec : str, Optional
+            Compression for step JSON, stored messages and python variable BLOBs:
+            "zlib" (default), "zstd" or "lz4" if their package is installed, or "none".
+            Each row records its codec, so changing it never breaks existing data.
+        codec_level : int, Optional
+            Compression level passed to the codec. None uses the codec's default.
+        shared : bool
+            The database is also written by other processes (see serve_cluster). Session
+            summaries are re-read from the DB instead of trusted from the cache, writes take
+            the write lock when their transaction begins, and artifacts of unsaved runs are
+            not purged on startup, since another worker may be running them.
+        pool_size : int
+            Maximum number of open database connections. Threads beyond it wait for a free one.
         """
         # check file extension
         _, file_extension = os.path.splitext(storage_path) if storage_path else (None, None)
@@ -24,26 +88,123 @@ class ConversationManager:
             raise ValueError(f"Database file must have a SQLite database file (.db): {storage_path}")
         
         self.storage_path = storage_path
+        self.shared = shared
+        self.codec = get_codec(codec, codec_level)
         self.lock = threading.RLock()
-        self.sessions_cache = [] 
+        self.sessions_cache = SessionRegistry()  # session_id -> session dict, most recent first
+        self._variable_hashes = {}  # session_id -> {variable name: content_hash} as last persisted
+        self._memory_artifacts = MemoryArtifactStore() if not storage_path else None
+        self._pending_artifacts = {}  # session_id -> artifact hashes referenced before its first save
+        self._memory_profiles = {}  # in-memory mode: profile id -> record with its data
+        self._memory_telemetry = {}  # in-memory mode: (session_id, step_index) -> step_telemetry row
+        self.migration_stats = {}
+        self.search_enabled = False  # True once the FTS5 search_index exists
+
+        self.pragmas = {**DEFAULT_PRAGMAS, **(pragmas or {})}
+        self.pragmas = {k: v for k, v in self.pragmas.items() if v is not None}
+        for name, value in self.pragmas.items():
+            if not _PRAGMA_TOKEN.match(str(name)) or not _PRAGMA_TOKEN.match(str(value)):
+                raise ValueError(f"Invalid SQLite PRAGMA: {name}={value}")
+
+        # Bounded pool of connections shared by all threads (handler threads are short-lived)
+        self.pool_size = max(1, pool_size)
+        self._idle = queue.LifoQueue()  # most recently used first: its pages are warm
+        self._open_connections = 0
+        self._pool_lock = threading.Lock()
+        self._closed = False
+        self._local = threading.local()  # the connection this thread has checked out, for nested use
 
         # Initialize Database if storage_path is provided
         if self.storage_path:
             self._init_db()
             self._load_session_summaries()
 
-    def _get_db_conn(self) -> sqlite3.Connection:
-        """ Returns a new database connection. """
+    @contextmanager
+    def _connection(self) -> Iterator[sqlite3.Connection]:
+        """
+        Checks a connection out of the pool for the duration of the block, opening one if
+        fewer than `pool_size` exist and waiting for one otherwise. Nested use on the same
+        thread reuses the connection it already holds.
+        Use `with self._connection() as conn, conn:` to run a transaction.
+        """
         if not self.storage_path:
             raise RuntimeError("No storage path defined for database connection.")
-        
+
+        held = getattr(self._local, "conn", None)
+        if held is not None:
+            yield held
+            return
+
+        conn = self._checkout()
+        self._local.conn = conn
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            self._checkin(conn)
+
+    def _checkout(self) -> sqlite3.Connection:
+        with self._pool_lock:
+            if self._closed:
+                raise RuntimeError("ConversationManager is closed.")
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+            if self._open_connections < self.pool_size:
+                self._open_connections += 1
+                opening = True
+            else:
+                opening = False
+        if not opening:
+            return self._idle.get()
+        try:
+            return self._open_connection()
+        except Exception:
+            with self._pool_lock:
+                self._open_connections -= 1
+            raise
+
+    def _checkin(self, conn: sqlite3.Connection):
+        if conn.in_transaction:
+            conn.rollback()
+        with self._pool_lock:
+            if not self._closed:
+                self._idle.put(conn)
+                return
+            self._open_connections -= 1
+        conn.close()
+
+    def _open_connection(self) -> sqlite3.Connection:
         try:
-            conn = sqlite3.connect(self.storage_path)
+            # A pooled connection is used by one thread at a time, but not always the same one
+            conn = sqlite3.connect(self.storage_path, check_same_thread=False)
             conn.row_factory = sqlite3.Row
+            if self.shared:
+                # BEGIN IMMEDIATE: wait for the write lock (busy_timeout) up front, instead of
+                # failing when a read transaction is upgraded after another process wrote
+                conn.isolation_level = "IMMEDIATE"
+            for name, value in self.pragmas.items():
+                conn.execute(f"PRAGMA {name} = {value}")
             return conn
         except Exception as e:
             raise IOError(f"Could not connect to database at {self.storage_path}: {e}")
 
+    def close(self):
+        """ Closes the idle pooled connections; connections in use are closed when they are returned. """
+        with self._pool_lock:
+            self._closed = True
+            while True:
+                try:
+                    conn = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                self._open_connections -= 1
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+
     def _init_db(self):
         """ Creates DB directory/file and initializes tables from SQL definition. """
         # Ensure directory exists. If not, create it.
@@ -66,24 +227,335 @@ class ConversationManager:
             with open(sql_path, 'r', encoding='utf-8') as f:
                 schema = f.read()
             
-            with self._get_db_conn() as conn:
+            with self._connection() as conn, conn:
+                telemetry_existed = conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'step_telemetry'"
+                ).fetchone() is not None
+                # The schema creates a unique index that duplicate rows of older databases would violate
+                duplicate_steps = self._remove_duplicate_steps(conn)
                 conn.executescript(schema)
+                self._add_missing_columns(conn)
+                self.migration_stats = self._migrate(conn)
+                self.migration_stats["duplicate_steps_removed"] = duplicate_steps
+                self._init_search_index(conn, base_dir)
+                if not telemetry_existed:
+                    self.migration_stats["telemetry_rows_written"] = self._rebuild_telemetry(conn)
+                self._purge_orphans(conn)
         except Exception as e:
             raise IOError(f"Could not initialize database: {e}")
 
+    def _add_missing_columns(self, conn: sqlite3.Connection):
+        """ CREATE TABLE IF NOT EXISTS does not touch existing tables: add newer columns to old databases. """
+        for table, column, declaration in _ADDED_COLUMNS:
+            columns = {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+            if column not in columns:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+
+    def _migrate(self, conn: sqlite3.Connection) -> Dict[str, int]:
+        """ Upgrades databases created by older versions, based on PRAGMA user_version. """
+        stats = {"from_version": conn.execute("PRAGMA user_version").fetchone()[0], "steps_rewritten": 0}
+        if stats["from_version"] < 1:
+            stats["steps_rewritten"] = self._migrate_message_refs(conn)
+        if stats["from_version"] < 3:
+            conn.execute("DROP INDEX IF EXISTS idx_steps_session_id")
+        if stats["from_version"] < SCHEMA_VERSION:
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        return stats
+
+    def _remove_duplicate_steps(self, conn: sqlite3.Connection) -> int:
+        """
+        Before schema version 3, nothing stopped two saves from inserting the same step twice.
+        Keeps the most recently written row of each (session_id, step_index) and returns the
+        number of rows removed. Runs before the schema script, which creates the unique index.
+        """
+        if conn.execute("PRAGMA user_version").fetchone()[0] >= 3:
+            return 0
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'steps'").fetchone() is None:
+            return 0
+        return conn.execute("""
+            DELETE FROM steps WHERE id NOT IN (SELECT MAX(id) FROM steps GROUP BY session_id, step_index)
+        """).rowcount
+
+    def _migrate_message_refs(self, conn: sqlite3.Connection) -> int:
+        """ Moves the inline model_input_messages of existing steps to the messages table. """
+        rewritten = 0
+        last_id = 0
+        while True:
+            rows = conn.execute(
+                "SELECT id, session_id, step_data, codec FROM steps WHERE id > ? ORDER BY id LIMIT ?",
+                (last_id, _SQL_BATCH)
+            ).fetchall()
+            if not rows:
+                return rewritten
+            last_id = rows[-1]["id"]
+
+            updates = []
+            for row in rows:
+                step = json.loads(decode_text(row["step_data"], row["codec"]))
+                if not isinstance(step.get("model_input_messages"), list):
+                    continue
+                step_data, codec = encode_text(json.dumps(self._pack_messages(conn, row["session_id"], step)), self.codec)
+                updates.append((step_data, codec, row["id"]))
+            conn.executemany("UPDATE steps SET step_data = ?, codec = ? WHERE id = ?", updates)
+            rewritten += len(updates)
+
+    def _init_search_index(self, conn: sqlite3.Connection, base_dir: str):
+        """
+        Creates the FTS5 search_index and fills it from the stored history the first time.
+        Search is disabled (with a warning) if this SQLite build has no FTS5.
+        """
+        existed = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'search_index'"
+        ).fetchone() is not None
+        try:
+            with open(os.path.join(base_dir, 'SQL', 'sqlite_search_def.sql'), 'r', encoding='utf-8') as f:
+                conn.executescript(f.read())
+            # Stored in the table's config, so `ORDER BY rank` uses the column weights
+            conn.execute("INSERT INTO search_index (search_index, rank) VALUES ('rank', ?)", (RANK_FUNCTION,))
+        except sqlite3.OperationalError as e:
+            warnings.warn(f"Full-text search disabled, SQLite FTS5 is not available: {e}", RuntimeWarning)
+            return
+
+        self.search_enabled = True
+        if not existed:
+            self.migration_stats["search_rows_indexed"] = self._rebuild_search_index(conn)
+
+    def rebuild_search_index(self) -> int:
+        """ Re-indexes every stored session and step. Returns the number of indexed rows. """
+        if not self.storage_path or not self.search_enabled:
+            return 0
+        with self.lock:
+            with self._connection() as conn, conn:
+                return self._rebuild_search_index(conn)
+
+    def _rebuild_search_index(self, conn: sqlite3.Connection) -> int:
+        conn.execute("DELETE FROM search_index")
+        indexed = 0
+        for row in conn.execute("SELECT session_id, preview FROM sessions").fetchall():
+            self._index_preview(conn, row["session_id"], row["preview"])
+            indexed += 1
+
+        last_id = 0
+        while True:
+            rows = conn.execute(
+                "SELECT id, session_id, step_index, step_data, codec FROM steps WHERE id > ? ORDER BY id LIMIT ?",
+                (last_id, _SQL_BATCH)
+            ).fetchall()
+            if not rows:
+                return indexed
+            last_id = rows[-1]["id"]
+            conn.executemany(
+                "INSERT OR REPLACE INTO search_index "
+                "(rowid, session_id, step_index, task, model_output, code_action, observations) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(row["id"], row["session_id"], row["step_index"],
+                  *step_search_fields(json.loads(decode_text(row["step_data"], row["codec"]))))
+                 for row in rows]
+            )
+            indexed += len(rows)
+
+    def _index_preview(self, conn: sqlite3.Connection, session_id: str, preview: Optional[str]):
+        conn.execute(
+            "INSERT OR REPLACE INTO search_index (rowid, session_id, step_index, preview) VALUES (?, ?, NULL, ?)",
+            (preview_rowid(session_id), session_id, preview or "")
+        )
+
+    def _index_steps(self, conn: sqlite3.Connection, session_id: str, steps: List[Dict], indices):
+        """ (Re-)indexes the steps at `indices`, which must already be written to the steps table. """
+        indices = list(indices)
+        ids = {}
+        for i in range(0, len(indices), _SQL_BATCH):
+            batch = indices[i:i + _SQL_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            ids.update((row["step_index"], row["id"]) for row in conn.execute(
+                f"SELECT id, step_index FROM steps WHERE session_id = ? AND step_index IN ({placeholders})",
+                (session_id, *batch)
+            ))
+        conn.executemany(
+            "INSERT OR REPLACE INTO search_index "
+            "(rowid, session_id, step_index, task, model_output, code_action, observations) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(ids[idx], session_id, idx, *step_search_fields(steps[idx])) for idx in indices if idx in ids]
+        )
+
+    def rebuild_telemetry(self) -> int:
+        """ Re-derives step_telemetry from every stored step. Returns the number of rows written. """
+        if not self.storage_path:
+            return 0
+        with self.lock:
+            with self._connection() as conn, conn:
+                return self._rebuild_telemetry(conn)
+
+    def _rebuild_telemetry(self, conn: sqlite3.Connection) -> int:
+        """
+        Fills step_telemetry from the steps table, one session at a time (run ids depend on the
+        preceding task steps). The model of old steps is unknown, so model_id is left NULL.
+        """
+        conn.execute("DELETE FROM step_telemetry")
+        written = 0
+        for row in conn.execute("SELECT session_id FROM sessions").fetchall():
+            steps = [json.loads(decode_text(step["step_data"], step["codec"])) for step in conn.execute(
+                "SELECT step_data, codec FROM steps WHERE session_id = ? ORDER BY step_index", (row["session_id"],)
+            )]
+            rows = step_telemetry_rows(row["session_id"], steps, range(len(steps)), None)
+            self._write_telemetry(conn, rows)
+            written += len(rows)
+        return written
+
+    def _write_telemetry(self, conn: sqlite3.Connection, rows: List[tuple]):
+        columns = ("session_id", "step_index") + TELEMETRY_COLUMNS
+        conn.executemany(
+            f"INSERT OR REPLACE INTO step_telemetry ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            rows
+        )
+
+    def compress_existing_rows(self) -> Dict[str, int]:
+        """
+        Compresses rows stored uncompressed (codec NULL) with the configured codec,
+        e.g. rows written before compression was enabled. Returns the rows rewritten per table.
+        """
+        if not self.storage_path or self.codec is None:
+            return {}
+
+        tables = [("steps", "id", "step_data", True),
+                  ("messages", "rowid", "message_data", True),
+                  ("python_blobs", "rowid", "data", False)]
+        rewritten = {}
+        with self.lock, self._connection() as conn:
+            for table, key, column, is_text in tables:
+                rewritten[table] = 0
+                last_key = None
+                while True:
+                    with conn:
+                        rows = conn.execute(
+                            f"SELECT {key} AS k, {column} AS payload FROM {table} "
+                            f"WHERE codec IS NULL AND (? IS NULL OR {key} > ?) ORDER BY {key} LIMIT ?",
+                            (last_key, last_key, _SQL_BATCH)
+                        ).fetchall()
+                        if not rows:
+                            break
+                        last_key = rows[-1]["k"]
+
+                        updates = []
+                        for row in rows:
+                            if is_text:
+                                payload, codec = encode_text(decode_text(row["payload"], None), self.codec)
+                            else:
+                                payload, codec = encode(bytes(row["payload"]), self.codec)
+                            if codec is not None:
+                                updates.append((payload, codec, row["k"]))
+                        conn.executemany(f"UPDATE {table} SET {column} = ?, codec = ? WHERE {key} = ?", updates)
+                        rewritten[table] += len(updates)
+        return rewritten
+
+    def _pack_messages(self, conn: sqlite3.Connection, session_id: str, step: Dict) -> Dict:
+        """
+        Stores the step's model_input_messages in the messages table (once per distinct message)
+        and returns a copy of the step that references them by content hash.
+        """
+        messages = step.get("model_input_messages")
+        if not isinstance(messages, list):
+            return step
+
+        hashes = []
+        rows = {}
+        for message in messages:
+            data = json.dumps(message, sort_keys=True)
+            message_hash = content_hash(data.encode("utf-8"))
+            hashes.append(message_hash)
+            rows[message_hash] = data
+
+        known = self._existing_keys(conn, "messages", list(rows))
+        conn.executemany(
+            "INSERT OR IGNORE INTO messages (content_hash, message_data, codec) VALUES (?, ?, ?)",
+            [(h, *encode_text(data, self.codec)) for h, data in rows.items() if h not in known]
+        )
+        conn.executemany(
+            "INSERT OR IGNORE INTO session_messages (session_id, content_hash) VALUES (?, ?)",
+            [(session_id, h) for h in rows]
+        )
+
+        packed = {k: v for k, v in step.items() if k != "model_input_messages"}
+        packed[MESSAGE_REFS_KEY] = hashes
+        return packed
+
+    def _existing_keys(self, conn: sqlite3.Connection, table: str, hashes: List[str]) -> set:
+        """ Returns the hashes among `hashes` already stored in `table`, so they are not compressed again. """
+        found = set()
+        for i in range(0, len(hashes), _SQL_BATCH):
+            batch = hashes[i:i + _SQL_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            found.update(row[0] for row in conn.execute(
+                f"SELECT content_hash FROM {table} WHERE content_hash IN ({placeholders})", batch
+            ))
+        return found
+
+    def _unpack_messages(self, conn: sqlite3.Connection, steps: List[Dict]):
+        """
+        Restores model_input_messages in steps loaded from the DB, in place.
+        Identical messages are shared between steps instead of being copied.
+        """
+        needed = {h for step in steps for h in step.get(MESSAGE_REFS_KEY, ())}
+        if not needed:
+            return
+
+        messages = {}
+        needed = list(needed)
+        for i in range(0, len(needed), _SQL_BATCH):
+            batch = needed[i:i + _SQL_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            for row in conn.execute(
+                f"SELECT content_hash, message_data, codec FROM messages WHERE content_hash IN ({placeholders})", batch
+            ):
+                messages[row["content_hash"]] = json.loads(decode_text(row["message_data"], row["codec"]))
+
+        for step in steps:
+            refs = step.pop(MESSAGE_REFS_KEY, None)
+            if refs is None:
+                continue
+            missing = [h for h in refs if h not in messages]
+            if missing:
+                warnings.warn(f"{len(missing)} model input message(s) missing from the database", RuntimeWarning)
+            step["model_input_messages"] = [messages[h] for h in refs if h in messages]
+
+    def _purge_orphans(self, conn: sqlite3.Connection):
+        """
+        Removes rows left behind by deletes made while foreign keys were not enforced,
+        so ON DELETE CASCADE never fired.
+        """
+        for table in ("steps", "python_state", "python_variables", "session_artifacts", "session_messages"):
+            conn.execute(f"DELETE FROM {table} WHERE session_id NOT IN (SELECT session_id FROM sessions)")
+        conn.execute(
+            "DELETE FROM python_blobs WHERE content_hash NOT IN (SELECT content_hash FROM python_variables)"
+        )
+        conn.execute(
+            "DELETE FROM messages WHERE content_hash NOT IN (SELECT content_hash FROM session_messages)"
+        )
+        # Artifacts of runs that were never saved. Inspected variable images are kept through
+        # session_artifacts (add_session_artifacts).
+        if not self.shared:
+            conn.execute(
+                "DELETE FROM artifacts WHERE content_hash NOT IN (SELECT content_hash FROM session_artifacts)"
+            )
+        if self.search_enabled:
+            # Step rows leave with their step (trigger); preview rows are keyed by session
+            conn.execute(
+                "DELETE FROM search_index WHERE rowid < 0 AND session_id NOT IN (SELECT session_id FROM sessions)"
+            )
+
     def _load_session_summaries(self):
         """
         Populates sessions_cache with metadata from the DB.
         'steps' are set to None and lazy-loaded later.
         """
         try:
-            with self._get_db_conn() as conn:
+            with self._connection() as conn, conn:
                 cursor = conn.execute(
                     "SELECT session_id, timestamp, preview FROM sessions ORDER BY last_updated DESC"
                 )
                 rows = cursor.fetchall()
                 
-                self.sessions_cache = []
+                self.sessions_cache.clear()
                 for row in rows:
                     self.sessions_cache.append({
                         "id": row["session_id"],
@@ -95,38 +567,68 @@ class ConversationManager:
         except Exception as e:
             print(f"Warning: Could not load initial metadata from DB: {e}")
 
+    def _refresh_summaries(self):
+        """
+        Shared mode: syncs sessions_cache with the sessions table, which other processes
+        also write. Cached session dicts (and their loaded steps) are kept.
+        """
+        try:
+            with self._connection() as conn:
+                rows = conn.execute(
+                    "SELECT session_id, timestamp, preview FROM sessions ORDER BY last_updated DESC"
+                ).fetchall()
+        except Exception as e:
+            print(f"Warning: Could not refresh sessions from DB: {e}")
+            return
+
+        previous = {s["id"]: s for s in self.sessions_cache}
+        self.sessions_cache.clear()
+        for row in rows:
+            session = previous.get(row["session_id"]) or {"id": row["session_id"], "steps": None, "python_state": None}
+            session["timestamp"] = row["timestamp"]
+            session["preview"] = row["preview"]
+            self.sessions_cache.append(session)
+        for session_id in previous:
+            if session_id not in self.sessions_cache:
+                self._variable_hashes.pop(session_id, None)
+
     def get_session_summaries(self) -> List[Dict]:
         """
         Returns lightweight summaries. 
-        Pulls directly from cache (which is populated on init).
+        Pulls directly from cache (which is populated on init), refreshed from the DB in shared mode.
         """
         with self.lock:
+            if self.shared and self.storage_path:
+                self._refresh_summaries()
             return [{
                 "id": s["id"], 
                 "timestamp": s["timestamp"], 
                 "preview": s.get("preview", "No preview")
             } for s in self.sessions_cache]
 
+    @DB_SECONDS.time("get_session")
     def get_session(self, session_id: str) -> Optional[Dict]:
         """
         Returns the full data for a specific session, including python_state.
         """
         with self.lock:
             # check in cache first
-            session = next((s for s in self.sessions_cache if s["id"] == session_id), None)
+            session = self.sessions_cache.get(session_id)
             
             if session is not None:
                 # Load Steps if missing
                 if session.get("steps") is None:
                     if self.storage_path:
                         try:
-                            with self._get_db_conn() as conn:
+                            with self._connection() as conn, conn:
                                 cursor = conn.execute(
-                                    "SELECT step_data FROM steps WHERE session_id = ? ORDER BY step_index ASC", 
+                                    "SELECT step_data, codec FROM steps WHERE session_id = ? ORDER BY step_index ASC", 
                                     (session_id,)
                                 )
                                 step_rows = cursor.fetchall()
-                                session["steps"] = [json.loads(row["step_data"]) for row in step_rows]
+                                steps = [json.loads(decode_text(row["step_data"], row["codec"])) for row in step_rows]
+                                self._unpack_messages(conn, steps)
+                                session["steps"] = steps
                         except Exception as e:
                             warnings.warn(f"Could not load session steps: {e}", RuntimeWarning)
                             session["steps"] = []
@@ -138,23 +640,199 @@ class ConversationManager:
                     session["python_state"] = {}
                     if self.storage_path:
                         try:
-                            with self._get_db_conn() as conn:
-                                cursor = conn.execute(
-                                    "SELECT state_data FROM python_state WHERE session_id = ?", 
-                                    (session_id,)
-                                )
-                                row = cursor.fetchone()
-                                if row and row["state_data"]:
-                                    session["python_state"] = deserialize_python_state(row["state_data"])
+                            with self._connection() as conn, conn:
+                                session["python_state"] = self._load_python_variables(conn, session_id)
                         except Exception as e:
                             print(f"Warning: Could not load python state: {e}")
 
             return session
 
-    def save_session(self, session_id: Optional[str], serialized_steps: List[Dict], task_preview: str = "New Chat", python_state: Dict = None) -> str:
+    def get_steps_page(self, session_id: str, before: Optional[int] = None, limit: int = 20) -> Optional[Dict]:
+        """
+        Returns a page of a session's steps: up to `limit` steps ending before index `before`
+        (the most recent steps if None), extended back to the task step that opens the turn,
+        so a turn is never split across pages. The session's timestamp and preview are included.
+
+        Steps of a session that is not loaded are read from the database by step_index range,
+        without loading the rest of the session or its model_input_messages.
+        """
+        with self.lock:
+            session = self.sessions_cache.get(session_id)
+            if session is None:
+                return None
+            header = {"timestamp": session.get("timestamp"), "preview": session.get("preview")}
+
+            steps = session.get("steps")
+            if steps is None and self.storage_path:
+                try:
+                    with self._connection() as conn:
+                        return {**header, **self._read_steps_page(conn, session_id, before, limit)}
+                except Exception as e:
+                    warnings.warn(f"Could not load session steps: {e}", RuntimeWarning)
+                    return {**header, "start_index": 0, "total_steps": 0, "steps": []}
+
+            steps = steps or []
+            end = len(steps) if before is None else max(0, min(int(before), len(steps)))
+            start = max(0, end - max(1, int(limit)))
+            while start > 0 and "task" not in steps[start]:
+                start -= 1
+
+            return {
+                **header,
+                "start_index": start,
+                "total_steps": len(steps),
+                "steps": steps[start:end],
+            }
+
+    def _read_steps_page(self, conn: sqlite3.Connection, session_id: str, before: Optional[int], limit: int) -> Dict:
+        """ get_steps_page for a session whose steps are not loaded. """
+        row = conn.execute("SELECT COUNT(*) FROM steps WHERE session_id = ?", (session_id,)).fetchone()
+        total = row[0]
+        end = total if before is None else max(0, min(int(before), total))
+        limit = max(1, int(limit))
+        start = max(0, end - limit)
+
+        steps = self._read_steps(conn, session_id, start, end - start)
+        # Extend back to the task step of the turn, one page at a time
+        while start > 0 and not (steps and "task" in steps[0]):
+            offset = max(0, start - limit)
+            earlier = self._read_steps(conn, session_id, offset, start - offset)
+            tasks = [i for i, step in enumerate(earlier) if "task" in step]
+            cut = tasks[-1] if tasks else 0
+            steps = earlier[cut:] + steps
+            start = offset + cut
+        return {"start_index": start, "total_steps": total, "steps": steps}
+
+    def _read_steps(self, conn: sqlite3.Connection, session_id: str, offset: int, limit: int) -> List[Dict]:
+        """
+        Decodes `limit` steps of a session starting at step_index `offset`. model_input_messages
+        are left out: they are only needed to resume the agent (see get_session).
+        """
+        if limit <= 0:
+            return []
+        rows = conn.execute(
+            "SELECT step_data, codec FROM steps WHERE session_id = ? AND step_index >= ? "
+            "ORDER BY step_index ASC LIMIT ?",
+            (session_id, offset, limit)
+        ).fetchall()
+        steps = [json.loads(decode_text(row["step_data"], row["codec"])) for row in rows]
+        for step in steps:
+            step.pop(MESSAGE_REFS_KEY, None)
+        return steps
+
+    def get_step(self, session_id: str, step_index: int) -> Optional[Dict]:
+        """
+        Returns one step of a session, or None if there is no such step. Reads a single row
+        when the session is not loaded; model_input_messages are not included then.
+        """
+        if not isinstance(step_index, int) or step_index < 0:
+            return None
+        with self.lock:
+            session = self.sessions_cache.get(session_id)
+            if session is None:
+                return None
+            steps = session.get("steps")
+            if steps is not None:
+                return steps[step_index] if step_index < len(steps) else None
+            if not self.storage_path:
+                return None
+            with self._connection() as conn:
+                row = conn.execute(
+                    "SELECT step_data, codec FROM steps WHERE session_id = ? AND step_index = ?",
+                    (session_id, step_index)
+                ).fetchone()
+            if row is None:
+                return None
+            step = json.loads(decode_text(row["step_data"], row["codec"]))
+            step.pop(MESSAGE_REFS_KEY, None)
+            return step
+
+    def search_sessions(self, query: str, limit: int = 20, offset: int = 0) -> Dict:
+        """
+        Full-text search over session previews, tasks, model outputs, code actions and observations.
+        Every word of `query` must match (the last one as a prefix). Results are ranked best first,
+        one per matching step or session title, with an HTML snippet whose matches are in <mark>.
+
+        Returns {"query", "results", "offset", "has_more"}. Each result has session_id,
+        step_index (None for a title match), preview, timestamp and snippet.
+        """
+        limit = max(1, min(int(limit), 100))
+        offset = max(0, int(offset))
+        page = {"query": query, "results": [], "offset": offset, "has_more": False}
+
+        if self.storage_path:
+            match = fts_query(query)
+            if match is None or not self.search_enabled:
+                return page
+            try:
+                with self._connection() as conn:
+                    rows = conn.execute(
+                        "SELECT session_id, step_index, snippet(search_index, -1, ?, ?, '…', ?) AS snippet "
+                        "FROM search_index WHERE search_index MATCH ? ORDER BY rank LIMIT ? OFFSET ?",
+                        (MARK_OPEN, MARK_CLOSE, SNIPPET_TOKENS, match, limit + 1, offset)
+                    ).fetchall()
+            except sqlite3.OperationalError as e:
+                warnings.warn(f"Search failed for {query!r}: {e}", RuntimeWarning)
+                return page
+            hits = [(row["session_id"], row["step_index"], render_snippet(row["snippet"])) for row in rows]
+        else:
+            hits = self._search_memory(query_terms(query), limit + 1 + offset)[offset:]
+
+        page["has_more"] = len(hits) > limit
+        with self.lock:
+            if self.shared and any(hit[0] not in self.sessions_cache for hit in hits):
+                self._refresh_summaries()
+            for session_id, step_index, snippet in hits[:limit]:
+                session = self.sessions_cache.get(session_id) or {}
+                page["results"].append({
+                    "session_id": session_id,
+                    "step_index": step_index,
+                    "preview": session.get("preview"),
+                    "timestamp": session.get("timestamp"),
+                    "snippet": snippet
+                })
+        return page
+
+    def _search_memory(self, terms: List[str], max_hits: int) -> List[tuple]:
+        """ Unindexed search of the in-memory sessions, most recent first (no database configured). """
+        hits = []
+        if not terms:
+            return hits
+        with self.lock:
+            for session in self.sessions_cache:
+                snippet = memory_snippet([session.get("preview") or ""], terms)
+                if snippet is not None:
+                    hits.append((session["id"], None, snippet))
+                for i, step in enumerate(session.get("steps") or []):
+                    snippet = memory_snippet(list(step_search_fields(step)), terms)
+                    if snippet is not None:
+                        hits.append((session["id"], i, snippet))
+                if len(hits) >= max_hits:
+                    break
+        return hits[:max_hits]
+
+    @DB_SECONDS.time("save_session")
+    def save_session(self, session_id: Optional[str], serialized_steps: List[Dict], task_preview: str = "New Chat",
+                     python_state: Dict = None, changed_steps: Optional[List[int]] = None,
+                     model_id: Optional[str] = None,
+                     python_fingerprints: Optional[Dict[str, Optional[str]]] = None) -> str:
         """
         Saves or updates a session in both cache and database.
         Accepts optional python_state dict.
+
+        Parameters:
+        -----------
+        changed_steps : List[int], optional
+            Indices of the steps that are new or modified since the last save (see
+            AgentWrapper.get_steps_changes). Only those rows are written, in place, and rows
+            past the end of `serialized_steps` are removed. When omitted, steps beyond the
+            highest stored index are appended.
+        model_id : str, optional
+            Model that produced the written steps, recorded in their step_telemetry rows.
+        python_fingerprints : Dict[str, str], optional
+            Content hashes of the `python_state` values already computed by the caller (see
+            AgentWrapper.get_state_fingerprints), so large DataFrames are not hashed again.
+            Missing names are hashed here.
         """
         with self.lock:
             if not session_id:
@@ -171,17 +849,24 @@ class ConversationManager:
             }
 
             # Update cache list logic
-            existing_idx = next((i for i, s in enumerate(self.sessions_cache) if s["id"] == session_id), None)
-            if existing_idx is not None:
-                self.sessions_cache[existing_idx].update(session_data)
-                self.sessions_cache.insert(0, self.sessions_cache.pop(existing_idx))
+            existing = self.sessions_cache.get(session_id)
+            if existing is not None:
+                existing.update(session_data)
+                self.sessions_cache.move_to_front(session_id)
             else:
-                self.sessions_cache.insert(0, session_data)
+                self.sessions_cache.push_front(session_data)
+
+            if not self.storage_path:
+                self._save_memory_telemetry(session_id, serialized_steps, changed_steps, model_id)
+                indices = range(len(serialized_steps)) if changed_steps is None else changed_steps
+                self._memory_artifacts.add_refs(session_id, {
+                    h for idx in indices for h in find_artifact_refs(json.dumps(serialized_steps[idx]))
+                })
 
             # Update SQLite
             if self.storage_path:
                 try:
-                    with self._get_db_conn() as conn:
+                    with self._connection() as conn, conn:
                         # Upsert Metadata
                         conn.execute("""
                             INSERT INTO sessions (session_id, preview, timestamp, last_updated)
@@ -192,45 +877,420 @@ class ConversationManager:
                         """, (session_id, task_preview, timestamp))
 
                         # Upsert Steps
-                        cursor = conn.execute(
-                            "SELECT MAX(step_index) as max_idx FROM steps WHERE session_id = ?", 
-                            (session_id,)
-                        )
-                        result = cursor.fetchone()
-                        current_db_max_idx = result["max_idx"] if result and result["max_idx"] is not None else -1
+                        if changed_steps is None:
+                            cursor = conn.execute(
+                                "SELECT MAX(step_index) as max_idx FROM steps WHERE session_id = ?", 
+                                (session_id,)
+                            )
+                            result = cursor.fetchone()
+                            current_db_max_idx = result["max_idx"] if result and result["max_idx"] is not None else -1
+                            indices = range(current_db_max_idx + 1, len(serialized_steps))
+                        else:
+                            indices = changed_steps
+                            conn.execute("DELETE FROM steps WHERE session_id = ? AND step_index >= ?",
+                                         (session_id, len(serialized_steps)))
+                            conn.execute("DELETE FROM step_telemetry WHERE session_id = ? AND step_index >= ?",
+                                         (session_id, len(serialized_steps)))
 
                         steps_to_insert = []
-                        for idx, step in enumerate(serialized_steps):
-                            if idx > current_db_max_idx:
-                                steps_to_insert.append((session_id, idx, json.dumps(step)))
+                        artifact_refs = set(self._pending_artifacts.get(session_id, ()))
+                        for idx in indices:
+                            step_json = json.dumps(self._pack_messages(conn, session_id, serialized_steps[idx]))
+                            artifact_refs |= find_artifact_refs(step_json)
+                            row = (*encode_text(step_json, self.codec), session_id, idx)
+                            # Modified steps are rewritten where they are; new ones are inserted
+                            updated = changed_steps is not None and conn.execute(
+                                "UPDATE steps SET step_data = ?, codec = ? WHERE session_id = ? AND step_index = ?", row
+                            ).rowcount
+                            if not updated:
+                                steps_to_insert.append((session_id, idx, *row[:2]))
                         
                         if steps_to_insert:
                             conn.executemany(
-                                "INSERT INTO steps (session_id, step_index, step_data) VALUES (?, ?, ?)",
+                                "INSERT INTO steps (session_id, step_index, step_data, codec) VALUES (?, ?, ?, ?)",
                                 steps_to_insert
                             )
+
+                        if self.search_enabled:
+                            self._index_preview(conn, session_id, task_preview)
+                            self._index_steps(conn, session_id, serialized_steps, indices)
+                        self._write_telemetry(conn, step_telemetry_rows(session_id, serialized_steps,
+                                                                        indices, model_id))
+
+                        # Images in the steps are stored once in `artifacts`; keep track of who uses them
+                        if artifact_refs:
+                            conn.executemany(
+                                "INSERT OR IGNORE INTO session_artifacts (session_id, content_hash) VALUES (?, ?)",
+                                [(session_id, h) for h in artifact_refs]
+                            )
                         
-                        # Upsert Python State
-                        if python_state:
-                            state_blob = serialize_python_state(python_state)
-                            if state_blob:
-                                conn.execute("""
-                                    INSERT INTO python_state (session_id, state_data, last_updated)
-                                    VALUES (?, ?, CURRENT_TIMESTAMP)
-                                    ON CONFLICT(session_id) DO UPDATE SET
-                                        state_data=excluded.state_data,
-                                        last_updated=CURRENT_TIMESTAMP
-                                """, (session_id, state_blob))
+                        # Upsert Python State (only variables that changed)
+                        saved_hashes = None
+                        if python_state is not None:
+                            saved_hashes = self._save_python_variables(conn, session_id, python_state,
+                                                                      python_fingerprints)
+
+                    if saved_hashes is not None:
+                        self._variable_hashes[session_id] = saved_hashes
+                    self._pending_artifacts.pop(session_id, None)
 
                 except Exception as e:
                     raise IOError(f"Could not save session: {e}")
 
             return session_id
+
+    def _save_memory_telemetry(self, session_id: str, steps: List[Dict], changed_steps: Optional[List[int]],
+                               model_id: Optional[str]):
+        if changed_steps is None:
+            stored = max((i for s, i in self._memory_telemetry if s == session_id), default=-1)
+            indices = range(stored + 1, len(steps))
+        else:
+            indices = changed_steps
+            for key in [k for k in self._memory_telemetry if k[0] == session_id and k[1] >= len(steps)]:
+                del self._memory_telemetry[key]
+        columns = ("session_id", "step_index") + TELEMETRY_COLUMNS
+        for row in step_telemetry_rows(session_id, steps, indices, model_id):
+            self._memory_telemetry[row[:2]] = dict(zip(columns, row))
+
+    def telemetry_rollup(self, group_by: str = "day", since: Any = None, until: Any = None,
+                         session_id: Optional[str] = None, model_id: Optional[str] = None,
+                         limit: int = 100) -> Dict:
+        """
+        Aggregates the step telemetry of agent runs.
+
+        Parameters:
+        -----------
+        group_by : str
+            "hour", "day", "week" or "month" (buckets in local time, newest first), "session" or
+            "model" (largest total step time first), or "step" for the slowest individual steps.
+        since, until : float or str, optional
+            Only steps started in [since, until): unix seconds or local "YYYY-MM-DD[ HH:MM[:SS]]".
+        session_id, model_id : str, optional
+            Only steps of this session / model.
+        limit : int
+            Maximum number of rows returned.
+
+        Returns:
+        --------
+        {"group_by", "since", "until", "rows"}. Each row has key, runs, steps, errors,
+        input_tokens, output_tokens, duration_s, avg_step_s and max_step_s; session rows
+        also have the session preview.
+        """
+        if group_by not in GROUPS:
+            raise ValueError(f"group_by must be one of {', '.join(GROUPS)}: {group_by}")
+        start, end = parse_time(since), parse_time(until)
+        limit = max(1, min(int(limit), 1000))
+
+        filters, params = [], []
+        for clause, value in (("started_at >= ?", start), ("started_at < ?", end),
+                              ("session_id = ?", session_id), ("model_id = ?", model_id)):
+            if value is not None:
+                filters.append(clause)
+                params.append(value)
+
+        if not self.storage_path:
+            with self.lock:
+                rows = [r for r in self._memory_telemetry.values()
+                        if (start is None or (r["started_at"] is not None and r["started_at"] >= start))
+                        and (end is None or (r["started_at"] is not None and r["started_at"] < end))
+                        and (session_id is None or r["session_id"] == session_id)
+                        and (model_id is None or r["model_id"] == model_id)]
+            result = rollup(rows, group_by, limit)
+        else:
+            where = f"WHERE {' AND '.join(filters)}" if filters else ""
+            with self._connection() as conn:
+                if group_by == "step":
+                    columns = ", ".join(("session_id", "step_index") + TELEMETRY_COLUMNS)
+                    result = [dict(row) for row in conn.execute(
+                        f"SELECT {columns} FROM step_telemetry {where} "
+                        f"{'AND' if where else 'WHERE'} duration_s IS NOT NULL ORDER BY duration_s DESC LIMIT ?",
+                        (*params, limit)
+                    )]
+                else:
+                    if group_by in TIME_BUCKETS:
+                        key = "strftime(?, started_at, 'unixepoch', 'localtime')"
+                        params.insert(0, TIME_BUCKETS[group_by])
+                        order = "key DESC"
+                    else:
+                        key = "session_id" if group_by == "session" else "model_id"
+                        order = "duration_s DESC"
+                    result = [dict(row) for row in conn.execute(f"""
+                        SELECT {key} AS key,
+                               COUNT(DISTINCT session_id || ':' || IFNULL(run_id, '')) AS runs,
+                               COUNT(*) AS steps,
+                               SUM(is_error) AS errors,
+                               IFNULL(SUM(input_tokens), 0) AS input_tokens,
+                               IFNULL(SUM(output_tokens), 0) AS output_tokens,
+                               IFNULL(SUM(duration_s), 0) AS duration_s,
+                               AVG(duration_s) AS avg_step_s,
+                               MAX(duration_s) AS max_step_s
+                        FROM step_telemetry {where}
+                        GROUP BY key ORDER BY {order} LIMIT ?
+                    """, (*params, limit))]
+
+        if group_by in ("session", "step"):
+            for row in result:
+                session = self.sessions_cache.get(row.get("key", row.get("session_id")))
+                row["preview"] = session["preview"] if session else None
+        return {"group_by": group_by, "since": start, "until": end, "rows": result}
+
+    def _load_python_variables(self, conn: sqlite3.Connection, session_id: str) -> Dict:
+        """
+        Restores the executor state of a session, one variable at a time.
+        Falls back to the legacy single-BLOB python_state table for old sessions.
+        """
+        rows = conn.execute("""
+            SELECT v.name, v.content_hash, b.data, b.codec
+            FROM python_variables v JOIN python_blobs b ON b.content_hash = v.content_hash
+            WHERE v.session_id = ?
+        """, (session_id,)).fetchall()
+
+        if rows:
+            state = {}
+            hashes = {}
+            for row in rows:
+                try:
+                    data = decode(row["data"], row["codec"])
+                except Exception as e:
+                    print(f"Warning: Could not decompress variable '{row['name']}': {e}")
+                    continue
+                ok, value = deserialize_variable(row["name"], data)
+                if ok:
+                    state[row["name"]] = value
+                    hashes[row["name"]] = row["content_hash"]
+            self._variable_hashes[session_id] = hashes
+            return state
+
+        row = conn.execute(
+            "SELECT state_data FROM python_state WHERE session_id = ?", 
+            (session_id,)
+        ).fetchone()
+        if row and row["state_data"]:
+            return deserialize_python_state(row["state_data"])
+        return {}
+
+    def _save_python_variables(self, conn: sqlite3.Connection, session_id: str, python_state: Dict,
+                               fingerprints: Optional[Dict[str, Optional[str]]] = None) -> Dict[str, str]:
+        """
+        Persists the executor state per variable, keyed by content hash.
+        Variables whose hash did not change since the last save are neither re-serialized
+        (for hashable data types such as DataFrames and arrays) nor rewritten.
+        Unpicklable variables are skipped individually. `fingerprints` are precomputed
+        fingerprint_value results by name.
+        Returns the {name: content_hash} map now stored for the session.
+        """
+        known = self._variable_hashes.get(session_id)
+        if known is None:
+            rows = conn.execute(
+                "SELECT name, content_hash FROM python_variables WHERE session_id = ?", 
+                (session_id,)
+            ).fetchall()
+            known = {row["name"]: row["content_hash"] for row in rows}
+
+        current = {}
+        new_blobs = []
+        changed = []
+        for name, value in list(python_state.items()):
+            key = fingerprints[name] if fingerprints and name in fingerprints else fingerprint_value(value)
+            data = None
+            if key is None:
+                # No cheap content hash for this type: hash its serialized bytes
+                data = serialize_variable(name, value)
+                if data is None:
+                    continue
+                key = content_hash(data)
+
+            current[name] = key
+            if known.get(name) == key:
+                continue
+            changed.append((session_id, name, key))
+
+            # Content-addressed: identical values (also across sessions) are stored once
+            if conn.execute("SELECT 1 FROM python_blobs WHERE content_hash = ?", (key,)).fetchone():
+                continue
+            if data is None:
+                data = serialize_variable(name, value)
+                if data is None:
+                    current.pop(name)
+                    changed.pop()
+                    continue
+            new_blobs.append((key, *encode(data, self.codec)))
+
+        if new_blobs:
+            conn.executemany(
+                "INSERT OR IGNORE INTO python_blobs (content_hash, data, codec) VALUES (?, ?, ?)",
+                new_blobs
+            )
+        if changed:
+            conn.executemany("""
+                INSERT INTO python_variables (session_id, name, content_hash, last_updated)
+                VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(session_id, name) DO UPDATE SET
+                    content_hash=excluded.content_hash,
+                    last_updated=CURRENT_TIMESTAMP
+            """, changed)
+
+        removed = [name for name in known if name not in current]
+        if removed:
+            conn.executemany(
+                "DELETE FROM python_variables WHERE session_id = ? AND name = ?",
+                [(session_id, name) for name in removed]
+            )
+
+        stale = {h for name, h in known.items() if current.get(name) != h}
+        self._delete_unreferenced_blobs(conn, stale)
+
+        # The per-variable rows supersede the legacy single-BLOB state
+        conn.execute("DELETE FROM python_state WHERE session_id = ?", (session_id,))
+        return current
+
+    def _delete_unreferenced_blobs(self, conn: sqlite3.Connection, hashes):
+        """ Removes blobs among `hashes` that no variable references anymore. """
+        if not hashes:
+            return
+        conn.executemany("""
+            DELETE FROM python_blobs WHERE content_hash = ?
+            AND NOT EXISTS (SELECT 1 FROM python_variables WHERE content_hash = ?)
+        """, [(h, h) for h in hashes])
+
+    def put_artifact(self, data: bytes, mime_type: str) -> str:
+        """
+        Stores an artifact (e.g. a PNG image) once, keyed by its content hash, and returns the hash.
+        Storing the same bytes again is a no-op.
+        """
+        if not self.storage_path:
+            return self._memory_artifacts.put_artifact(data, mime_type)
+
+        content_hash = artifact_hash(data)
+        with self._connection() as conn, conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO artifacts (content_hash, mime_type, data) VALUES (?, ?, ?)",
+                (content_hash, mime_type, sqlite3.Binary(data))
+            )
+        return content_hash
+
+    def get_artifact(self, content_hash: str) -> Optional[tuple]:
+        """ Returns (mime_type, data) of an artifact, or None if it is unknown. """
+        if not self.storage_path:
+            return self._memory_artifacts.get_artifact(content_hash)
+
+        with self._connection() as conn:
+            row = conn.execute(
+                "SELECT mime_type, data FROM artifacts WHERE content_hash = ?", (content_hash,)
+            ).fetchone()
+        return (row["mime_type"], bytes(row["data"])) if row else None
+
+    def add_session_artifacts(self, session_id: str, hashes: Iterable[str]):
+        """
+        Records that a session references artifacts outside its steps (e.g. the image of an
+        inspected variable), so they are kept as long as the session: neither evicted in
+        in-memory mode nor purged on startup. References made before the session's first
+        save are recorded by that save.
+        """
+        hashes = set(hashes)
+        if not hashes:
+            return
+        if not self.storage_path:
+            self._memory_artifacts.add_refs(session_id, hashes)
+            return
+        with self.lock:
+            with self._connection() as conn, conn:
+                if conn.execute("SELECT 1 FROM sessions WHERE session_id = ?", (session_id,)).fetchone():
+                    conn.executemany(
+                        "INSERT OR IGNORE INTO session_artifacts (session_id, content_hash) VALUES (?, ?)",
+                        [(session_id, h) for h in hashes]
+                    )
+                    return
+            self._pending_artifacts.setdefault(session_id, set()).update(hashes)
+
+    def _delete_unreferenced_artifacts(self, conn: sqlite3.Connection, hashes):
+        """ Removes artifacts among `hashes` that no session references anymore. """
+        if not hashes:
+            return
+        conn.executemany("""
+            DELETE FROM artifacts WHERE content_hash = ?
+            AND NOT EXISTS (SELECT 1 FROM session_artifacts WHERE content_hash = ?)
+        """, [(h, h) for h in hashes])
+
+    def release_session(self, session_id: str):
+        """
+        Drops the cached steps and python_state of a session so they can be garbage collected.
+        They are lazy-loaded again from the DB by get_session. No-op in in-memory mode.
+        """
+        if not self.storage_path:
+            return
+        with self.lock:
+            session = self.sessions_cache.get(session_id)
+            if session is not None:
+                session["steps"] = None
+                session["python_state"] = None
+
+    def save_profile(self, session_id: str, summary: Dict, profile_data: bytes) -> Dict:
+        """
+        Stores a run profile (see profiling.RunProfiler) next to its session and
+        returns its record: {id, session_id, created_at, summary}.
+        """
+        created_at = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self.lock:
+            if not self.storage_path:
+                profile_id = max(self._memory_profiles, default=0) + 1
+                self._memory_profiles[profile_id] = {"id": profile_id, "session_id": session_id,
+                                                     "created_at": created_at, "summary": summary,
+                                                     "data": profile_data}
+                kept = sorted((p["id"] for p in self._memory_profiles.values() if p["session_id"] == session_id),
+                              reverse=True)
+                for old_id in kept[PROFILES_PER_SESSION:]:
+                    del self._memory_profiles[old_id]
+            else:
+                data, codec = encode(profile_data, self.codec)
+                with self._connection() as conn, conn:
+                    profile_id = conn.execute(
+                        "INSERT INTO run_profiles (session_id, created_at, summary, profile_data, codec) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (session_id, created_at, json.dumps(summary), data, codec)
+                    ).lastrowid
+                    conn.execute("""
+                        DELETE FROM run_profiles WHERE session_id = ? AND id NOT IN (
+                            SELECT id FROM run_profiles WHERE session_id = ? ORDER BY id DESC LIMIT ?)
+                    """, (session_id, session_id, PROFILES_PER_SESSION))
+        return {"id": profile_id, "session_id": session_id, "created_at": created_at, "summary": summary}
+
+    def get_profiles(self, session_id: str, limit: int = 10) -> List[Dict]:
+        """ The latest run profiles of a session, newest first, without their profile data. """
+        if not self.storage_path:
+            with self.lock:
+                records = [p for p in self._memory_profiles.values() if p["session_id"] == session_id]
+            records.sort(key=lambda p: p["id"], reverse=True)
+            return [{k: v for k, v in p.items() if k != "data"} for p in records[:limit]]
+
+        with self._connection() as conn:
+            rows = conn.execute(
+                "SELECT id, session_id, created_at, summary FROM run_profiles "
+                "WHERE session_id = ? ORDER BY id DESC LIMIT ?", (session_id, limit)
+            ).fetchall()
+        return [{"id": row["id"], "session_id": row["session_id"], "created_at": row["created_at"],
+                 "summary": json.loads(row["summary"])} for row in rows]
+
+    def get_profile_data(self, profile_id: int) -> Optional[tuple]:
+        """ Returns (session_id, pstats data) of a stored profile, or None if it is unknown. """
+        if not self.storage_path:
+            with self.lock:
+                record = self._memory_profiles.get(profile_id)
+            return (record["session_id"], record["data"]) if record else None
+
+        with self._connection() as conn:
+            row = conn.execute(
+                "SELECT session_id, profile_data, codec FROM run_profiles WHERE id = ?", (profile_id,)
+            ).fetchone()
+        if row is None or row["profile_data"] is None:
+            return None
+        return row["session_id"], decode(row["profile_data"], row["codec"])
+
     def rename_session(self, session_id: str, new_name: str) -> bool:
         """ Renames a session in cache and DB. """
         with self.lock:
             # update cache
-            session = next((s for s in self.sessions_cache if s["id"] == session_id), None)
+            session = self.sessions_cache.get(session_id)
             if session:
                 session["preview"] = new_name
             else:
@@ -239,11 +1299,13 @@ class ConversationManager:
             # update DB
             if self.storage_path:
                 try:
-                    with self._get_db_conn() as conn:
+                    with self._connection() as conn, conn:
                         conn.execute(
                             "UPDATE sessions SET preview = ? WHERE session_id = ?",
                             (new_name, session_id)
                         )
+                        if self.search_enabled:
+                            self._index_preview(conn, session_id, new_name)
                 except Exception as e:
                     print(f"Error renaming session in DB: {e}")
                     return False
@@ -254,18 +1316,47 @@ class ConversationManager:
         """ Deletes a session from cache and DB. """
         with self.lock:
             # update cache
-            initial_len = len(self.sessions_cache)
-            self.sessions_cache = [s for s in self.sessions_cache if s["id"] != session_id]
-            
-            if len(self.sessions_cache) == initial_len:
+            if self.sessions_cache.remove(session_id) is None:
                 return False
+            self._variable_hashes.pop(session_id, None)
+            self._pending_artifacts.pop(session_id, None)
+            if not self.storage_path:
+                self._memory_artifacts.release_session(session_id)
+            # In the DB, run_profiles and step_telemetry rows go with the session (ON DELETE CASCADE)
+            for profile_id in [k for k, p in self._memory_profiles.items() if p["session_id"] == session_id]:
+                del self._memory_profiles[profile_id]
+            for key in [k for k in self._memory_telemetry if k[0] == session_id]:
+                del self._memory_telemetry[key]
 
             # update DB
             if self.storage_path:
                 try:
-                    with self._get_db_conn() as conn:
+                    with self._connection() as conn, conn:
+                        hashes = {row["content_hash"] for row in conn.execute(
+                            "SELECT content_hash FROM python_variables WHERE session_id = ?", (session_id,)
+                        ).fetchall()}
+                        conn.execute("DELETE FROM python_variables WHERE session_id = ?", (session_id,))
+                        self._delete_unreferenced_blobs(conn, hashes)
+
+                        artifacts = {row["content_hash"] for row in conn.execute(
+                            "SELECT content_hash FROM session_artifacts WHERE session_id = ?", (session_id,)
+                        ).fetchall()}
+                        conn.execute("DELETE FROM session_artifacts WHERE session_id = ?", (session_id,))
+                        self._delete_unreferenced_artifacts(conn, artifacts)
+
+                        messages = [row["content_hash"] for row in conn.execute(
+                            "SELECT content_hash FROM session_messages WHERE session_id = ?", (session_id,)
+                        ).fetchall()]
+                        conn.execute("DELETE FROM session_messages WHERE session_id = ?", (session_id,))
+                        conn.executemany("""
+                            DELETE FROM messages WHERE content_hash = ?
+                            AND NOT EXISTS (SELECT 1 FROM session_messages WHERE content_hash = ?)
+                        """, [(h, h) for h in messages])
+
                         conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
-                        
+                        if self.search_enabled:
+                            conn.execute("DELETE FROM search_index WHERE rowid = ?", (preview_rowid(session_id),))
+
                 except Exception as e:
                     print(f"Error deleting session from DB: {e}")
                     return False
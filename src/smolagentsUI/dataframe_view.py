@@ -0,0 +1,267 @@
+import math
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+MAX_WINDOW_ROWS = 500
+MAX_WINDOW_COLS = 50
+MAX_CELL_CHARS = 200
+FILTER_OPS = ("contains", "==", "!=", ">", ">=", "<", "<=")
+
+
+class DataFrameWindowCache:
+    def __init__(self, max_views: int = 8, max_pages: int = 64):
+        """
+        Serves row/column windows of DataFrames for the inspector grid.
+
+        Sorting and filtering are computed once per variable version and kept as an
+        array of row positions (a "view"); rendered windows are cached per view.
+        When a variable gets a new version, all of its views and pages are dropped.
+
+        Parameters:
+        -----------
+        max_views : int
+            Number of sorted/filtered row orders kept (LRU).
+        max_pages : int
+            Number of rendered windows kept (LRU).
+        """
+        self.max_views = max_views
+        self.max_pages = max_pages
+        self._views = OrderedDict()    # (name, version, sort, filter) -> row positions (None = natural order)
+        self._pages = OrderedDict()    # view key + window -> payload
+        self._versions = {}            # name -> latest version seen
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.RLock()
+
+    def get_window(self, name: str, version: Hashable, df: Any,
+                   row_start: int = 0, row_count: int = 100,
+                   col_start: int = 0, col_count: int = 20,
+                   sort_by: Optional[int] = None, ascending: bool = True,
+                   filter: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Returns a window of `df` as JSON-friendly cells.
+
+        Parameters:
+        -----------
+        name : str
+            Variable name, used to invalidate older versions.
+        version : Hashable
+            Changes whenever the DataFrame object or its content changes.
+        row_start, row_count : int
+            Row window, in positions of the sorted/filtered view.
+        col_start, col_count : int
+            Column window, in column positions.
+        sort_by : int, Optional
+            Position of the column to sort by.
+        ascending : bool
+            Sort direction.
+        filter : Dict, Optional
+            {"column": position or None (all columns), "op": one of FILTER_OPS, "value": str}
+        """
+        with self.lock:
+            return self._get_window(name, version, df, row_start, row_count, col_start, col_count,
+                                    sort_by, ascending, filter)
+
+    def _get_window(self, name, version, df, row_start, row_count, col_start, col_count, sort_by, ascending, filter):
+        if self._versions.get(name) != version:
+            self._invalidate(name)
+            self._versions[name] = version
+
+        n_rows, n_cols = df.shape
+        row_count = max(1, min(int(row_count), MAX_WINDOW_ROWS))
+        col_count = max(1, min(int(col_count), MAX_WINDOW_COLS))
+        col_start = max(0, min(int(col_start), max(n_cols - 1, 0)))
+        row_start = max(0, int(row_start))
+        sort_by = _column_position(sort_by, n_cols)
+        filter = _normalize_filter(filter, n_cols)
+
+        view_key = (name, version, sort_by, bool(ascending), _filter_key(filter))
+        page_key = view_key + (row_start, row_count, col_start, col_count)
+        page = self._pages.get(page_key)
+        if page is not None:
+            self.hits += 1
+            self._pages.move_to_end(page_key)
+            return page
+        self.misses += 1
+
+        positions = self._get_view(view_key, df, sort_by, ascending, filter)
+        total_rows = n_rows if positions is None else len(positions)
+        row_start = min(row_start, max(total_rows - 1, 0))
+
+        row_slice = slice(row_start, row_start + row_count)
+        col_slice = slice(col_start, col_start + col_count)
+        if positions is None:
+            window = df.iloc[row_slice, col_slice]
+        else:
+            window = df.iloc[positions[row_slice], col_slice]
+
+        page = {
+            "name": name,
+            "version": _version_tag(version),
+            "total_rows": total_rows,
+            "total_rows_unfiltered": n_rows,
+            "total_cols": n_cols,
+            "row_start": row_start,
+            "col_start": col_start,
+            "columns": [str(c) for c in window.columns],
+            "dtypes": [str(d) for d in window.dtypes],
+            "index": [_format_cell(i) for i in window.index],
+            "rows": [[_format_cell(v) for v in row] for row in window.itertuples(index=False, name=None)],
+            "sort_by": sort_by,
+            "ascending": bool(ascending),
+            "filter": filter,
+        }
+
+        self._pages[page_key] = page
+        if len(self._pages) > self.max_pages:
+            self._pages.popitem(last=False)
+        return page
+
+    def invalidate(self, name: Optional[str] = None):
+        """ Drops the cached views and pages of one variable (or of all variables). """
+        with self.lock:
+            self._invalidate(name)
+
+    def _invalidate(self, name: Optional[str]):
+        if name is None:
+            self._views.clear()
+            self._pages.clear()
+            self._versions.clear()
+            return
+        for cache in (self._views, self._pages):
+            for key in [k for k in cache if k[0] == name]:
+                del cache[key]
+        self._versions.pop(name, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "views": len(self._views),
+            "pages": len(self._pages),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def _get_view(self, view_key: tuple, df: Any, sort_by: Optional[int], ascending: bool,
+                  filter: Optional[Dict[str, Any]]):
+        if view_key in self._views:
+            self._views.move_to_end(view_key)
+            return self._views[view_key]
+
+        positions = None
+        if filter is not None:
+            mask = _filter_mask(df, filter)
+            positions = np.flatnonzero(mask)
+
+        if sort_by is not None:
+            column = df.iloc[:, sort_by]
+            if positions is not None:
+                column = column.iloc[positions]
+            # Stable sort on positions so duplicate index labels are never an issue
+            order = column.reset_index(drop=True).sort_values(ascending=ascending, kind="stable",
+                                                              na_position="last").index.to_numpy()
+            positions = order if positions is None else positions[order]
+
+        self._views[view_key] = positions
+        if len(self._views) > self.max_views:
+            self._views.popitem(last=False)
+        return positions
+
+
+def is_dataframe(value: Any) -> bool:
+    return pd is not None and isinstance(value, pd.DataFrame)
+
+
+def _column_position(column: Any, n_cols: int) -> Optional[int]:
+    if column is None or column == "":
+        return None
+    try:
+        position = int(column)
+    except (TypeError, ValueError):
+        return None
+    return position if 0 <= position < n_cols else None
+
+
+def _normalize_filter(filter: Optional[Dict[str, Any]], n_cols: int) -> Optional[Dict[str, Any]]:
+    if not filter:
+        return None
+    value = str(filter.get("value", "")).strip()
+    if not value:
+        return None
+    op = filter.get("op") or "contains"
+    if op not in FILTER_OPS:
+        raise ValueError(f"Unsupported filter operator: {op}")
+    return {"column": _column_position(filter.get("column"), n_cols), "op": op, "value": value}
+
+
+def _filter_key(filter: Optional[Dict[str, Any]]) -> Optional[tuple]:
+    if filter is None:
+        return None
+    return (filter["column"], filter["op"], filter["value"])
+
+
+def _filter_mask(df: Any, filter: Dict[str, Any]):
+    """ Boolean mask of the rows matching the filter, as a numpy array. """
+    columns = range(df.shape[1]) if filter["column"] is None else [filter["column"]]
+    mask = np.zeros(len(df), dtype=bool)
+    for position in columns:
+        mask |= _column_mask(df.iloc[:, position], filter["op"], filter["value"])
+    return mask
+
+
+def _column_mask(column: Any, op: str, value: str):
+    if op == "contains":
+        return column.astype(str).str.contains(value, case=False, regex=False, na=False).to_numpy()
+
+    target: Any = value
+    if pd.api.types.is_numeric_dtype(column) and not pd.api.types.is_bool_dtype(column):
+        try:
+            target = float(value)
+        except ValueError:
+            return np.zeros(len(column), dtype=bool)
+    else:
+        column = column.astype(str)
+
+    try:
+        if op == "==":
+            result = column == target
+        elif op == "!=":
+            result = column != target
+        elif op == ">":
+            result = column > target
+        elif op == ">=":
+            result = column >= target
+        elif op == "<":
+            result = column < target
+        else:
+            result = column <= target
+    except TypeError:
+        return np.zeros(len(column), dtype=bool)
+    return result.fillna(False).to_numpy(dtype=bool)
+
+
+def _format_cell(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float) and math.isnan(value):
+        return "NaN"
+    text = str(value)
+    if len(text) > MAX_CELL_CHARS:
+        text = text[:MAX_CELL_CHARS] + "..."
+    return text
+
+
+def _version_tag(version: Hashable) -> str:
+    return hashlib.blake2b(repr(version).encode("utf-8"), digest_size=6).hexdigest()
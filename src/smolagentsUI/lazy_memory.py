@@ -0,0 +1,94 @@
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+
+class _Pending:
+    """ Slot of a LazyList whose item has not been built yet. """
+    __slots__ = ("data",)
+
+    def __init__(self, data: Any):
+        self.data = data
+
+
+class LazyList(list):
+    def __init__(self, items: Iterable[Any], factory: Callable[[Any], Any]):
+        """
+        A list whose items are stored as raw data and built with `factory` on first access.
+        Used for agent memory steps (and their model_input_messages) restored from the
+        database, so resuming a session does not rebuild objects nobody looks at.
+
+        Indexing, slicing, iteration, len() and appending behave like a normal list.
+        Operations that need every item (comparison, copy, sort, pop...) build all items first.
+
+        Parameters:
+        -----------
+        items : Iterable
+            Raw data of the items (e.g. serialized step dicts).
+        factory : Callable
+            Builds an item from its raw data.
+        """
+        super().__init__(_Pending(data) for data in items)
+        self._factory = factory
+
+    def _build(self, i: int) -> Any:
+        item = list.__getitem__(self, i)
+        if type(item) is _Pending:
+            item = self._factory(item.data)
+            list.__setitem__(self, i, item)
+        return item
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._build(i) for i in range(*index.indices(len(self)))]
+        n = len(self)
+        i = index + n if index < 0 else index
+        if not 0 <= i < n:
+            raise IndexError("list index out of range")
+        return self._build(i)
+
+    def __iter__(self) -> Iterator[Any]:
+        i = 0
+        while i < len(self):
+            yield self._build(i)
+            i += 1
+
+    def __reversed__(self) -> Iterator[Any]:
+        for i in range(len(self) - 1, -1, -1):
+            yield self._build(i)
+
+    def __contains__(self, value: Any) -> bool:
+        return any(item is value or item == value for item in self)
+
+    def pending_data(self, index: int) -> Optional[Any]:
+        """ Returns the raw data of an item that has not been built yet, or None if it was built. """
+        item = list.__getitem__(self, index)
+        return item.data if type(item) is _Pending else None
+
+    def peek(self, index: int) -> Any:
+        """ Returns the built item, or the raw data of an item not built yet, without building it. """
+        item = list.__getitem__(self, index)
+        return item.data if type(item) is _Pending else item
+
+    def built_count(self) -> int:
+        return sum(1 for item in list.__iter__(self) if type(item) is not _Pending)
+
+    def materialize(self):
+        """ Builds every pending item. """
+        for i in range(len(self)):
+            self._build(i)
+
+
+def _materializing(name: str):
+    method = getattr(list, name)
+
+    def wrapper(self, *args, **kwargs):
+        self.materialize()
+        return method(self, *args, **kwargs)
+
+    wrapper.__name__ = name
+    return wrapper
+
+
+# list methods implemented in C read the slots directly: build the items first
+for _name in ("__add__", "__mul__", "__rmul__", "__eq__", "__ne__", "__lt__", "__le__", "__gt__", "__ge__",
+              "__repr__", "copy", "index", "count", "pop", "remove", "sort", "__reduce_ex__"):
+    setattr(LazyList, _name, _materializing(_name))
@@ -0,0 +1,200 @@
+"""
+In-process counters, histograms and gauges, exposed in the Prometheus text format
+by the /metrics route.
+
+Recording costs a lock and a few additions: histogram buckets are fixed, nothing is
+formatted until the endpoint is scraped, and gauges are callbacks evaluated only then.
+"""
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Upper bounds (seconds) for latencies spanning a DB read to a full model call
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_RATE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        """ Monotonic total, one per combination of label values. """
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.enabled = True
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        lines = _header(self, "counter")
+        for label_values, value in values:
+            lines.append(f"{self.name}{_labels(self.labels, label_values)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        """ Distribution over fixed buckets, one per combination of label values. """
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self.enabled = True
+        # label values -> [per-bucket counts (last one is +Inf), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str):
+        if not self.enabled:
+            return
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, *label_values: str):
+        """ Observes the duration of the with-block, also when it raises. """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *label_values)
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            series = sorted((k, (list(v[0]), v[1], v[2])) for k, v in self._series.items())
+        lines = _header(self, "histogram")
+        names = self.labels + ("le",)
+        for label_values, (counts, total, count) in series:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (math.inf,), counts):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{_labels(names, label_values + (_number(bound),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, label_values)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labels, label_values)} {count}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name: str, help: str, fn: Callable[[], float]):
+        """ Current value, read from `fn` at scrape time. """
+        self.name = name
+        self.help = help
+        self.fn = fn
+
+    def collect(self) -> List[str]:
+        try:
+            value = self.fn()
+        except Exception:
+            return []  # the component is not running (yet): leave the gauge out
+        return _header(self, "gauge") + [f"{self.name} {_number(value)}"]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        """ The metrics rendered by /metrics, in registration order. """
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def gauge(self, name: str, help: str, fn: Callable[[], float]) -> Gauge:
+        """ Registers a callback gauge, replacing an earlier one of the same name. """
+        gauge = Gauge(name, help, fn)
+        with self._lock:
+            self._metrics[name] = gauge
+        return gauge
+
+    def _register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric '{metric.name}' is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def set_enabled(self, enabled: bool):
+        """ Turns recording of counters and histograms on or off. Gauges cost nothing until scraped. """
+        with self._lock:
+            for metric in self._metrics.values():
+                if hasattr(metric, "enabled"):
+                    metric.enabled = enabled
+
+    def render(self) -> str:
+        """ All metrics in the Prometheus text exposition format. """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines += metric.collect()
+        return "\n".join(lines) + "\n"
+
+
+def _header(metric, kind: str) -> List[str]:
+    return [f"# HELP {metric.name} {metric.help}", f"# TYPE {metric.name} {kind}"]
+
+
+def _labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, int) or (isinstance(value, float) and value.is_integer()):
+        return str(int(value))
+    return repr(float(value))
+
+
+REGISTRY = MetricsRegistry()
+
+RUN_TTFT = REGISTRY.histogram(
+    "smolagentsui_run_time_to_first_token_seconds",
+    "Time from the start of an agent run to its first streamed token.")
+RUNS = REGISTRY.counter(
+    "smolagentsui_runs_total",
+    "Agent runs executed, by outcome (completed, stopped, error).", labels=("outcome",))
+MODEL_TOKENS_PER_SECOND = REGISTRY.histogram(
+    "smolagentsui_model_tokens_per_second",
+    "Output tokens per second of the model call of each action step.", buckets=TOKEN_RATE_BUCKETS)
+STEP_SECONDS = REGISTRY.histogram(
+    "smolagentsui_step_seconds",
+    "Duration of action steps from ActionStep.timing, split into the model call and code execution.",
+    labels=("phase",))
+DB_SECONDS = REGISTRY.histogram(
+    "smolagentsui_db_seconds",
+    "Latency of ConversationManager calls.", labels=("operation",))
+SERIALIZE_SECONDS = REGISTRY.histogram(
+    "smolagentsui_serialize_seconds",
+    "Time spent serializing memory steps and dill-pickling executor variables.", labels=("kind",))
+SOCKET_EMITS = REGISTRY.counter(
+    "smolagentsui_socket_emits_total",
+    "Socket.IO events emitted, by event name.", labels=("event",))
@@ -0,0 +1,98 @@
+"""
+Upgrades a smolagentsUI session database to the current schema.
+
+Databases are also upgraded automatically when the server opens them; this
+command does it ahead of time and can reclaim the freed space with VACUUM.
+
+    python -m smolagentsUI.migrate chat_history/sessions.db --vacuum
+    python -m smolagentsUI.migrate chat_history/sessions.db --compress --codec zlib --vacuum
+    python -m smolagentsUI.migrate chat_history/sessions.db --reindex
+    python -m smolagentsUI.migrate chat_history/sessions.db --telemetry
+"""
+import argparse
+import os
+import sqlite3
+
+from .conversation_manager import ConversationManager, SCHEMA_VERSION
+from .compression import available_codecs
+
+
+def migrate(storage_path: str, vacuum: bool = False, compress: bool = False, codec: str = "zlib",
+            reindex: bool = False, telemetry: bool = False) -> dict:
+    """
+    Opens (and thereby migrates) the database at `storage_path`.
+
+    Parameters:
+    -----------
+    storage_path : str
+        Path to an existing .db file.
+    vacuum : bool
+        Rebuild the file afterwards to return the freed pages to the filesystem.
+    compress : bool
+        Also compress rows that were stored uncompressed.
+    codec : str
+        Codec used for rows rewritten by the migration and by `compress`.
+    reindex : bool
+        Rebuild the full-text search index from the stored history.
+    telemetry : bool
+        Rebuild the step_telemetry table from the stored steps (model ids are lost).
+    """
+    if not os.path.exists(storage_path):
+        raise FileNotFoundError(f"Database file not found: {storage_path}")
+
+    size_before = os.path.getsize(storage_path)
+    manager = ConversationManager(storage_path, codec=codec)
+    stats = dict(manager.migration_stats)
+    if compress:
+        stats["rows_compressed"] = manager.compress_existing_rows()
+    if reindex:
+        stats["search_rows_indexed"] = manager.rebuild_search_index()
+    if telemetry:
+        stats["telemetry_rows_written"] = manager.rebuild_telemetry()
+    manager.close()
+
+    if vacuum:
+        conn = sqlite3.connect(storage_path)
+        try:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            conn.execute("VACUUM")
+        finally:
+            conn.close()
+
+    stats["to_version"] = SCHEMA_VERSION
+    stats["size_before"] = size_before
+    stats["size_after"] = os.path.getsize(storage_path)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("storage_path", help="Path to the SQLite session database (.db)")
+    parser.add_argument("--vacuum", action="store_true", help="Reclaim the freed space after migrating")
+    parser.add_argument("--compress", action="store_true", help="Compress rows stored uncompressed")
+    parser.add_argument("--reindex", action="store_true", help="Rebuild the full-text search index")
+    parser.add_argument("--telemetry", action="store_true", help="Rebuild the step telemetry table")
+    parser.add_argument("--codec", default="zlib", help=f"Compression codec, one of {available_codecs()}")
+    args = parser.parse_args()
+
+    stats = migrate(args.storage_path, vacuum=args.vacuum, compress=args.compress, codec=args.codec,
+                    reindex=args.reindex, telemetry=args.telemetry)
+    if stats["from_version"] >= stats["to_version"]:
+        print(f"✅ Database is already at schema version {stats['to_version']}.")
+    else:
+        print(f"✅ Migrated schema version {stats['from_version']} -> {stats['to_version']}, "
+              f"{stats['steps_rewritten']} steps rewritten.")
+    if stats.get("duplicate_steps_removed"):
+        print(f"🧹 Removed {stats['duplicate_steps_removed']} duplicate step rows")
+    if "rows_compressed" in stats:
+        counts = ", ".join(f"{n} {table}" for table, n in stats["rows_compressed"].items())
+        print(f"🗜️ Compressed rows: {counts}")
+    if "search_rows_indexed" in stats:
+        print(f"🔎 Indexed {stats['search_rows_indexed']} sessions and steps for search")
+    if "telemetry_rows_written" in stats:
+        print(f"📈 Wrote telemetry for {stats['telemetry_rows_written']} steps")
+    print(f"💾 Size: {stats['size_before']:,} -> {stats['size_after']:,} bytes")
+
+
+if __name__ == "__main__":
+    main()
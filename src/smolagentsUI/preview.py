@@ -0,0 +1,179 @@
+import time
+import reprlib
+from collections.abc import Collection, Mapping
+from itertools import islice
+from typing import Any, Optional
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class PreviewLimits:
+    def __init__(self, max_chars: int = 100, max_rows: int = 10, max_cols: int = 10,
+                 max_items: int = 20, max_depth: int = 3, time_budget: float = 0.05):
+        """
+        Hard limits for a preview. Every limit bounds the work done, not only the output:
+        values are sliced before they are rendered.
+
+        Parameters:
+        -----------
+        max_chars : int
+            Maximum length of the preview text. Longer text is cut and ends with "...".
+        max_rows : int
+            Maximum number of DataFrame/Series rows (or array rows) rendered.
+        max_cols : int
+            Maximum number of DataFrame columns rendered.
+        max_items : int
+            Maximum number of items rendered per list, tuple, set, dict or 1-D array.
+        max_depth : int
+            Maximum nesting depth of containers. Deeper levels are shown as "...".
+        time_budget : float
+            Seconds after which nested containers stop being expanded.
+        """
+        self.max_chars = max_chars
+        self.max_rows = max_rows
+        self.max_cols = max_cols
+        self.max_items = max_items
+        self.max_depth = max_depth
+        self.time_budget = time_budget
+
+
+# One-line previews on Variable Viewer cards
+VIEWER_LIMITS = PreviewLimits(max_chars=100, max_rows=5, max_cols=8, max_items=10, max_depth=2, time_budget=0.02)
+
+# Tables and values rendered in the chat (final answers, action outputs)
+CHAT_LIMITS = PreviewLimits(max_chars=20000, max_rows=50, max_cols=20, max_items=100, max_depth=4, time_budget=0.2)
+
+
+def preview_text(value: Any, limits: Optional[PreviewLimits] = None) -> str:
+    """
+    Returns a bounded text preview of any value.
+    Strings are shown as-is (without quotes); containers, DataFrames, Series and
+    arrays are rendered from a slice of their content only.
+    """
+    limits = limits or VIEWER_LIMITS
+    if isinstance(value, str):
+        return _cut(value, limits.max_chars)
+
+    if pd is not None and isinstance(value, pd.DataFrame):
+        text = _frame_text(value, limits)
+    elif pd is not None and isinstance(value, pd.Series):
+        text = _series_text(value, limits)
+    elif np is not None and isinstance(value, np.ndarray):
+        text = _array_text(value, limits)
+    elif isinstance(value, (list, tuple, set, frozenset, dict, bytes, bytearray, Mapping, Collection)):
+        text = _PreviewRepr(limits).repr(value)
+    else:
+        try:
+            text = str(value)
+        except Exception as e:
+            text = f"<{type(value).__name__}: preview failed ({e})>"
+    return _cut(text, limits.max_chars)
+
+
+def preview_table(df: Any, limits: Optional[PreviewLimits] = None) -> str:
+    """
+    Renders the top-left corner of a DataFrame as a Markdown table, with a note
+    of the full shape when rows or columns were left out.
+    """
+    limits = limits or CHAT_LIMITS
+    n_rows, n_cols = df.shape
+    head = df.iloc[:limits.max_rows, :limits.max_cols]
+    try:
+        text = head.to_markdown(index=True)
+    except Exception:
+        # to_markdown needs the optional 'tabulate' package
+        text = head.to_string()
+
+    if n_rows > limits.max_rows or n_cols > limits.max_cols:
+        text += f"\n\n... showing {len(head)} of {n_rows:,} rows and {head.shape[1]} of {n_cols:,} columns"
+    return _cut(text, limits.max_chars)
+
+
+def _cut(text: str, max_chars: int) -> str:
+    if max_chars and len(text) > max_chars:
+        return text[:max_chars] + "..."
+    return text
+
+
+def _frame_text(df: Any, limits: PreviewLimits) -> str:
+    head = df.iloc[:limits.max_rows, :limits.max_cols]
+    return head.to_string(max_colwidth=limits.max_chars)
+
+
+def _series_text(series: Any, limits: PreviewLimits) -> str:
+    head = series.iloc[:limits.max_rows]
+    text = head.to_string(max_rows=limits.max_rows)
+    if len(series) > limits.max_rows:
+        text += "\n..."
+    return text
+
+
+def _array_text(array: Any, limits: PreviewLimits) -> str:
+    # array2string summarizes from the edges, so only 2 * edgeitems values per axis are formatted
+    edge = max(1, limits.max_items // 2)
+    return np.array2string(array, threshold=limits.max_items, edgeitems=edge,
+                           max_line_width=max(limits.max_chars, 40))
+
+
+class _PreviewRepr(reprlib.Repr):
+    """ reprlib with a time budget and bounded handlers for pandas/numpy values nested in containers. """
+
+    def __init__(self, limits: PreviewLimits):
+        super().__init__()
+        self.limits = limits
+        self.maxlevel = limits.max_depth
+        self.maxlist = self.maxtuple = self.maxset = self.maxfrozenset = self.maxdict = limits.max_items
+        self.maxdeque = self.maxarray = limits.max_items
+        self.maxstring = self.maxother = max(limits.max_chars, 20)
+        self.maxlong = 40
+        self._deadline = time.monotonic() + limits.time_budget
+
+    def repr1(self, x: Any, level: int) -> str:
+        if time.monotonic() > self._deadline:
+            return "..."
+        return super().repr1(x, level)
+
+    def repr_DataFrame(self, x: Any, level: int) -> str:
+        return f"DataFrame{x.shape}"
+
+    def repr_Series(self, x: Any, level: int) -> str:
+        return f"Series({len(x)})"
+
+    def repr_ndarray(self, x: Any, level: int) -> str:
+        return _array_text(x, self.limits).replace("\n", "")
+
+    def repr_range(self, x: Any, level: int) -> str:
+        return repr(x)
+
+    def repr_bytes(self, x: Any, level: int) -> str:
+        return self._cut_repr(x)
+
+    def repr_bytearray(self, x: Any, level: int) -> str:
+        return self._cut_repr(x)
+
+    def repr_instance(self, x: Any, level: int) -> str:
+        # Other containers (deque subclasses, UserDict, custom sequences...) are rendered
+        # from their first items instead of repr() of all of them
+        try:
+            if isinstance(x, Mapping):
+                items = dict(islice(x.items(), self.maxdict + 1))
+                return f"{type(x).__name__}({self.repr_dict(items, level)})"
+            if isinstance(x, Collection) and not isinstance(x, str):
+                items = list(islice(iter(x), self.maxlist + 1))
+                return f"{type(x).__name__}({self.repr_list(items, level)})"
+        except Exception:
+            pass
+        return super().repr_instance(x, level)
+
+    def _cut_repr(self, x: Any) -> str:
+        limit = self.maxstring
+        text = repr(x[:limit + 1])
+        return text[:limit] + "..." if len(x) > limit else text
@@ -0,0 +1,134 @@
+import cProfile
+import marshal
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional
+
+# Where a run's time goes: (label, file name suffix or None for any file, function names).
+# A phase is the largest cumulative time among its matching functions.
+PHASES = [
+    ("Model", None, ("generate_stream", "generate")),
+    ("Code execution", "local_python_executor.py", ("__call__",)),
+    ("Code execution", "remote_executors.py", ("run_code_raise_errors",)),
+    ("Variable viewer", "agent_wrapper.py", ("get_variable_delta", "get_active_variables")),
+    ("Step serialization", "agent_wrapper.py", ("get_steps_changes",)),
+    ("Save (SQLite, dill)", "conversation_manager.py", ("save_session",)),
+    ("Session resume", "server.py", ("get_agent_wrapper",)),
+]
+
+# cProfile is process-wide on Python 3.12+ and tracemalloc always is: one capture at a time
+_capture_lock = threading.Lock()
+
+
+class RunProfiler:
+    def __init__(self, top_n: int = 25, memory: bool = True):
+        """
+        Captures a cProfile profile of the calling thread and, optionally, the memory allocated
+        meanwhile (tracemalloc, one frame per allocation), around an agent run and its save.
+
+        Only one run is profiled at a time: start() returns False while another capture is active.
+
+        Parameters:
+        -----------
+        top_n : int
+            Number of hotspot functions and allocation sites kept in the summary.
+        memory : bool
+            Also trace allocations. Memory tracing covers all threads and slows the run down more than cProfile.
+        """
+        self.top_n = top_n
+        self.memory = memory
+        self._profile = None
+        self._started_tracing = False
+        self._start = None
+        self.duration = 0.0
+
+    def start(self) -> bool:
+        if not _capture_lock.acquire(blocking=False):
+            return False
+        try:
+            if self.memory and not tracemalloc.is_tracing():
+                tracemalloc.start(1)
+                self._started_tracing = True
+            elif self.memory:
+                tracemalloc.reset_peak()
+            self._profile = cProfile.Profile()
+            self._start = time.perf_counter()
+            self._profile.enable()
+        except Exception:
+            self._stop_tracing()
+            _capture_lock.release()
+            raise
+        return True
+
+    def stop(self) -> Dict[str, Any]:
+        """ Ends the capture and returns its summary. Must be called on the thread that called start(). """
+        self._profile.disable()
+        self.duration = time.perf_counter() - self._start
+        try:
+            memory = self._memory_summary() if self.memory else None
+        finally:
+            self._stop_tracing()
+            _capture_lock.release()
+        return self._summary(memory)
+
+    def dump(self) -> bytes:
+        """ The profile in the format of pstats.Stats.dump_stats (a .prof file for pstats, snakeviz...). """
+        return marshal.dumps(pstats.Stats(self._profile).stats)
+
+    def _stop_tracing(self):
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def _memory_summary(self) -> Dict[str, Any]:
+        _, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        return {
+            "peak_kib": round(peak / 1024, 1),
+            "top": [{"location": f"{_short_path(stat.traceback[0].filename)}:{stat.traceback[0].lineno}",
+                     "size_kib": round(stat.size / 1024, 1),
+                     "count": stat.count}
+                    for stat in snapshot.statistics("lineno")[:self.top_n]],
+        }
+
+    def _summary(self, memory: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        stats = pstats.Stats(self._profile).stats  # (file, line, name) -> (cc, nc, tottime, cumtime, callers)
+        hotspots = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)[:self.top_n]
+        return {
+            "duration_s": round(self.duration, 4),
+            "phases": _phases(stats),
+            "hotspots": [{"function": _label(func),
+                          "calls": nc,
+                          "tottime": round(tottime, 5),
+                          "cumtime": round(cumtime, 5)}
+                         for func, (cc, nc, tottime, cumtime, _) in hotspots],
+            "memory": memory,
+        }
+
+
+def _phases(stats: Dict) -> List[Dict[str, Any]]:
+    seconds = {}
+    for label, suffix, names in PHASES:
+        for (filename, _, name), (_, _, _, cumtime, _) in stats.items():
+            if name in names and (suffix is None or filename.endswith(suffix)):
+                seconds[label] = max(seconds.get(label, 0.0), cumtime)
+    return [{"name": label, "seconds": round(value, 4)} for label, value in seconds.items()]
+
+
+def _label(func: tuple) -> str:
+    filename, line, name = func
+    if filename == "~":
+        return name  # built-in, e.g. <method 'execute' of 'sqlite3.Connection' objects>
+    return f"{_short_path(filename)}:{line}({name})"
+
+
+def _short_path(filename: str) -> str:
+    """ The file and its parent directory, enough to tell smolagents from smolagentsUI or the stdlib. """
+    parent, base = os.path.split(filename)
+    return os.path.join(os.path.basename(parent), base) if parent else base
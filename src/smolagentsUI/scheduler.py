@@ -0,0 +1,232 @@
+import threading
+import itertools
+from collections import deque
+from typing import Callable, Optional, Dict, List
+
+
+class QueueFullError(RuntimeError):
+    """ Raised when a run cannot be admitted because the wait queue is full. """
+    pass
+
+
+class RunJob:
+    def __init__(self, job_id: int, session_id: str, fn: Callable[[], None],
+                 on_queued: Optional[Callable[["RunJob", int], None]] = None,
+                 on_cancel: Optional[Callable[["RunJob"], None]] = None):
+        """
+        A unit of work submitted to the RunScheduler.
+
+        Parameters:
+        -----------
+        job_id : int
+            Monotonic id assigned by the scheduler.
+        session_id : str
+            Session the run belongs to. Runs of the same session execute in FIFO order, one at a time.
+        fn : Callable
+            The function that performs the run. Called without arguments on a worker thread.
+        on_queued : Callable, Optional
+            Called with (job, position) whenever the job's 1-based wait position changes.
+        on_cancel : Callable, Optional
+            Called with (job) if the job is cancelled before it starts.
+        """
+        self.job_id = job_id
+        self.session_id = session_id
+        self.fn = fn
+        self.on_queued = on_queued
+        self.on_cancel = on_cancel
+        self.position = 0
+
+
+class RunScheduler:
+    def __init__(self, max_workers: int = 4, max_queued: int = 32):
+        """
+        Runs agent tasks on a bounded pool of worker threads.
+
+        Runs of the same session are executed one at a time in submission order.
+        Runs that cannot start immediately wait in a global FIFO queue; once
+        that queue holds `max_queued` runs, new submissions are rejected.
+        A run that waits for an earlier run of its own session is queued too: with
+        max_queued=0 a run is only accepted if it can start right away, so a second
+        message to a session whose run is still executing is rejected.
+
+        Parameters:
+        -----------
+        max_workers : int
+            Maximum number of runs executing concurrently.
+        max_queued : int
+            Maximum number of waiting runs (for a worker or for their session's previous run).
+            Submissions beyond this raise QueueFullError. 0 disables waiting.
+        """
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1.")
+        if max_queued < 0:
+            raise ValueError("max_queued must be non-negative.")
+
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+
+        self._cond = threading.Condition()
+        self._pending = deque()          # RunJob waiting for a worker, in submission order
+        self._running_sessions = set()   # session_ids that currently occupy a worker
+        self._workers = []
+        self._ids = itertools.count(1)
+        self._shutdown = False
+
+    # --- Public API ---
+
+    def submit(self, session_id: str, fn: Callable[[], None],
+               on_queued: Optional[Callable[[RunJob, int], None]] = None,
+               on_cancel: Optional[Callable[[RunJob], None]] = None) -> RunJob:
+        """
+        Submits a run. Returns the RunJob; job.position is 0 if it was dispatched
+        immediately, otherwise its 1-based position in the wait queue.
+        Raises QueueFullError if the wait queue is full.
+        """
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("RunScheduler has been shut down.")
+
+            starting = sum(1 for j in self._pending if j.position == 0)
+            waiting = len(self._pending) - starting
+            can_start_now = (len(self._running_sessions) + starting < self.max_workers
+                             and session_id not in self._running_sessions
+                             and not any(j.session_id == session_id for j in self._pending))
+            if not can_start_now and waiting >= self.max_queued:
+                if self.max_queued == 0:
+                    reason = ("this chat is still running" if self.is_busy(session_id)
+                              else "all workers are busy")
+                    raise QueueFullError(f"Cannot start the run now: {reason}. Please try again later.")
+                raise QueueFullError(
+                    f"Server is busy: {waiting} runs are already waiting. Please try again later."
+                )
+
+            job = RunJob(next(self._ids), session_id, fn, on_queued=on_queued, on_cancel=on_cancel)
+            job.position = -1 if not can_start_now else 0
+            self._pending.append(job)
+            self._ensure_workers()
+            self._cond.notify()
+
+            # If the job cannot be picked up right away, report its position
+            if not can_start_now:
+                job.position = waiting + 1
+            notify = [(job, job.position)] if job.position and on_queued else []
+
+        self._notify_positions(notify)
+        return job
+
+    def cancel(self, session_id: str) -> int:
+        """ Removes all waiting (not yet started) runs of a session. Returns the number removed. """
+        with self._cond:
+            cancelled = [j for j in self._pending if j.session_id == session_id]
+            if not cancelled:
+                return 0
+            self._pending = deque(j for j in self._pending if j.session_id != session_id)
+            notify = self._refresh_positions()
+
+        for job in cancelled:
+            if job.on_cancel:
+                try:
+                    job.on_cancel(job)
+                except Exception as e:
+                    print(f"Warning: on_cancel callback failed for session {job.session_id}: {e}")
+        self._notify_positions(notify)
+        return len(cancelled)
+
+    def is_busy(self, session_id: str) -> bool:
+        """ Returns True if the session has a run executing or waiting. """
+        with self._cond:
+            return session_id in self._running_sessions or any(j.session_id == session_id for j in self._pending)
+
+    def stats(self) -> Dict[str, int]:
+        """ Returns a snapshot of the scheduler's load. """
+        with self._cond:
+            return {
+                "max_workers": self.max_workers,
+                "max_queued": self.max_queued,
+                "running": len(self._running_sessions),
+                "queued": sum(1 for j in self._pending if j.position != 0),
+            }
+
+    def shutdown(self, wait: bool = True):
+        """ Stops accepting runs, drops waiting runs and stops the workers. """
+        with self._cond:
+            self._shutdown = True
+            dropped = list(self._pending)
+            self._pending.clear()
+            self._cond.notify_all()
+            workers = list(self._workers)
+
+        for job in dropped:
+            if job.on_cancel:
+                try:
+                    job.on_cancel(job)
+                except Exception:
+                    pass
+        if wait:
+            for t in workers:
+                t.join()
+
+    # --- Internals ---
+
+    def _ensure_workers(self):
+        """ Lazily starts worker threads up to max_workers. Caller must hold the lock. """
+        while len(self._workers) < self.max_workers:
+            t = threading.Thread(target=self._worker_loop, name=f"smolagentsUI-run-{len(self._workers)}", daemon=True)
+            self._workers.append(t)
+            t.start()
+
+    def _next_runnable(self) -> Optional[RunJob]:
+        """ Pops the oldest job whose session is not already running. Caller must hold the lock. """
+        for idx, job in enumerate(self._pending):
+            if job.session_id not in self._running_sessions:
+                del self._pending[idx]
+                return job
+        return None
+
+    def _refresh_positions(self) -> List:
+        """ Recomputes wait positions. Returns (job, position) pairs that changed. Caller must hold the lock. """
+        changed = []
+        idx = 0
+        for job in self._pending:
+            # Jobs admitted for immediate start are not waiting in line
+            if job.position == 0:
+                continue
+            idx += 1
+            if job.position != idx:
+                job.position = idx
+                if job.on_queued:
+                    changed.append((job, idx))
+        return changed
+
+    def _notify_positions(self, changed: List):
+        for job, position in changed:
+            try:
+                job.on_queued(job, position)
+            except Exception as e:
+                print(f"Warning: on_queued callback failed for session {job.session_id}: {e}")
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                job = None
+                while not self._shutdown:
+                    job = self._next_runnable()
+                    if job is not None:
+                        break
+                    self._cond.wait()
+                if job is None:
+                    return
+                job.position = 0
+                self._running_sessions.add(job.session_id)
+                notify = self._refresh_positions()
+
+            self._notify_positions(notify)
+            try:
+                job.fn()
+            except Exception as e:
+                print(f"Error in scheduled run for session {job.session_id}: {e}")
+            finally:
+                with self._cond:
+                    self._running_sessions.discard(job.session_id)
+                    # A waiting run of the same session may now be runnable
+                    self._cond.notify_all()
@@ -0,0 +1,89 @@
+import re
+import html
+import json
+import hashlib
+from typing import Any, Dict, List, Optional, Tuple
+
+# Indexed text columns of search_index, in table order (after session_id and step_index)
+SEARCH_COLUMNS = ("preview", "task", "model_output", "code_action", "observations")
+
+# bm25 weight of each column: a hit in the title or the task outranks one in a long log
+COLUMN_WEIGHTS = {"preview": 10.0, "task": 5.0, "model_output": 1.0, "code_action": 2.0, "observations": 0.5}
+RANK_FUNCTION = "bm25(0.0, 0.0, " + ", ".join(str(COLUMN_WEIGHTS[c]) for c in SEARCH_COLUMNS) + ")"
+
+# Text indexed per field; observation logs can be megabytes
+FIELD_MAX_CHARS = 20000
+
+# Number of tokens around the match in a snippet
+SNIPPET_TOKENS = 16
+
+# Match markers used inside SQLite, replaced by <mark> after the text is HTML-escaped
+MARK_OPEN, MARK_CLOSE = "\x02", "\x03"
+
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+
+def preview_rowid(session_id: str) -> int:
+    """ Negative, stable rowid of a session's preview row (step rows use the positive steps.id). """
+    digest = hashlib.blake2b(session_id.encode("utf-8"), digest_size=8).digest()
+    return -(int.from_bytes(digest, "big") >> 1) - 1
+
+
+def query_terms(text: str) -> List[str]:
+    return _TERM.findall(text or "")
+
+
+def fts_query(text: str) -> Optional[str]:
+    """
+    Turns user input into an FTS5 query: every word must match, the last one as a prefix
+    (search-as-you-type). Operators and quotes in the input are treated as plain text.
+    Returns None if the input has no searchable word.
+    """
+    terms = query_terms(text)
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def _field_text(value: Any) -> str:
+    if value is None:
+        return ""
+    if not isinstance(value, str):
+        value = json.dumps(value, ensure_ascii=False, default=str)
+    return value[:FIELD_MAX_CHARS]
+
+
+def step_search_fields(step: Dict) -> Tuple[str, str, str, str]:
+    """ (task, model_output, code_action, observations) text of a serialized step. """
+    return (
+        _field_text(step.get("task")),
+        _field_text(step.get("model_output") or step.get("plan")),
+        _field_text(step.get("code_action")),
+        _field_text(step.get("observations")),
+    )
+
+
+def render_snippet(raw: str) -> str:
+    """ HTML-escapes a snippet produced with MARK_OPEN/MARK_CLOSE and wraps the matches in <mark>. """
+    return html.escape(raw or "").replace(MARK_OPEN, "<mark>").replace(MARK_CLOSE, "</mark>")
+
+
+def memory_snippet(texts: List[str], terms: List[str]) -> Optional[str]:
+    """
+    Substring search used when there is no database: returns a highlighted snippet if every
+    term occurs in `texts` (case-insensitive, last term as a prefix), otherwise None.
+    """
+    lowered = [t.lower() for t in texts]
+    words = [term.lower() for term in terms]
+    if not all(any(word in text for text in lowered) for word in words):
+        return None
+
+    text = next(t for t, low in zip(texts, lowered) if words[0] in low)
+    pattern = re.compile("|".join(re.escape(w) for w in words), re.IGNORECASE)
+    first = pattern.search(text)
+    start = max(0, first.start() - 60)
+    window = text[start:first.start() + 140]
+    marked = pattern.sub(lambda m: MARK_OPEN + m.group(0) + MARK_CLOSE, window)
+    return render_snippet(("…" if start else "") + marked + ("…" if start + len(window) < len(text) else ""))
@@ -1,18 +1,81 @@
 import os
 import traceback
-import copy
 import uuid
-from flask import Flask, render_template, request
+import threading
+import time
+from contextlib import contextmanager
+from flask import Flask, render_template, request, abort, Response
 from flask_socketio import SocketIO, emit
 from .conversation_manager import ConversationManager
 from .agent_wrapper import AgentWrapper
+from .scheduler import RunScheduler, QueueFullError
+from .agent_cache import AgentCache
+from .agent_pool import AgentPool
+from .utils import make_display_step, get_display_field
+from .streaming import StreamCoalescer, StreamMetrics
+from .artifact_store import set_artifact_store, load_artifact, is_artifact_hash, find_artifact_refs
+from .concurrency import make_backend, ASYNC_MODES
+from .broker import LocalBrokerManager
+from .cluster import WorkerCluster
+from .metrics import REGISTRY, CONTENT_TYPE, RUN_TTFT, RUNS, SOCKET_EMITS
+from .profiling import RunProfiler
 from smolagents.memory import TaskStep
 
 # Global State
 prototype_agent = None  # The user-provided agent (template)
-active_agents = {}    # Maps session_id -> AgentWrapper instance
+active_agents = None    # AgentCache: session_id -> AgentWrapper instance (bounded LRU)
 stop_signals = {}       # Maps session_id -> bool (True if stop requested)
+profiled_sessions = set()  # Sessions whose runs are profiled (set_profiling)
 conversation_manager = None
+run_scheduler = None    # Bounded worker pool that executes agent runs
+agent_pool = None       # Pre-cloned child agents ready for new sessions
+stream_metrics = StreamMetrics()  # Totals of stream_delta traffic, for tuning coalescing
+agents_lock = threading.RLock()  # Guards spawn_locks and resume_stats
+spawn_locks = {}        # session_id -> [Lock, number of threads using it]: one agent spawn per session at a time
+resume_stats = {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "last": None}  # Session resume latency, guarded by agents_lock
+
+class MeteredSocketIO(SocketIO):
+    """ SocketIO that counts emitted events by name, for /metrics. Every emit goes through here. """
+    def emit(self, event, *args, **kwargs):
+        SOCKET_EMITS.inc(event)
+        return super().emit(event, *args, **kwargs)
+
+def save_agent_session(session_id, wrapper):
+    """
+    Persists the memory steps and executor state of an agent through the ConversationManager.
+    """
+    # Only steps added or modified since the last save are serialized and written
+    steps_data, changed_steps = wrapper.get_steps_changes()
+    current_state = wrapper.get_executor_state()
+
+    # Determine preview
+    preview = "New Chat"
+    if len(steps_data) > 0 and steps_data[0].get('task'):
+         preview = steps_data[0]['task'][:50] + "..."
+    elif conversation_manager.get_session(session_id):
+         preview = conversation_manager.get_session(session_id).get('preview', 'New Chat')
+
+    # Thread-safe save
+    session_id = conversation_manager.save_session(
+        session_id, 
+        steps_data, 
+        task_preview=preview,
+        python_state=current_state,
+        changed_steps=changed_steps,
+        model_id=getattr(wrapper.agent.model, 'model_id', None),
+        python_fingerprints=wrapper.get_state_fingerprints() if conversation_manager.storage_path else None
+    )
+    wrapper.mark_steps_persisted(steps_data)
+    return session_id
+
+def flush_evicted_agent(session_id, wrapper):
+    """
+    AgentCache eviction hook: saves the agent, then lets the ConversationManager drop
+    its cached copy of the session so the memory is actually released.
+    """
+    if wrapper.agent.memory.steps:
+        save_agent_session(session_id, wrapper)
+    conversation_manager.release_session(session_id)
 
 def get_agent_wrapper(session_id):
     """
@@ -20,41 +83,194 @@ def get_agent_wrapper(session_id):
     or creates a new 'child' agent from the prototype.
     """
     global active_agents, prototype_agent
-    
-    if session_id in active_agents:
-        print(f"🔄 Reusing existing agent for session: {session_id}")
-        return active_agents[session_id]
 
-    print(f"✨ Spawning new agent for session: {session_id}")
-    
-    # Copy the prototype agent
-    new_agent = copy.copy(prototype_agent)
-    new_agent.memory = copy.deepcopy(prototype_agent.memory)
-    new_agent.memory.reset()
-    if hasattr(prototype_agent, 'python_executor'):
-        new_agent.python_executor = copy.deepcopy(prototype_agent.python_executor)
-    
-    new_agent.python_executor.state.clear()
-    
-    # Wrap new agent
-    wrapper = AgentWrapper(new_agent)
-    
-    # Load history if this is an old session being resumed
-    session_data = conversation_manager.get_session(session_id)
-    if session_data:
-        wrapper.load_memory(session_data.get("steps", []))
-        if session_data.get("python_state") is not None:
-            wrapper.set_executor_state(session_data["python_state"])
+    # Only this session waits while its agent is spawned; evicted agents are saved outside any shared lock
+    with session_spawn_lock(session_id):
+        wrapper = active_agents.get(session_id)
+        if wrapper is not None:
+            print(f"🔄 Reusing existing agent for session: {session_id}")
+            return wrapper
+
+        print(f"✨ Spawning new agent for session: {session_id}")
+        start = time.perf_counter()
+        
+        # Take a pre-cloned copy of the prototype agent
+        new_agent = agent_pool.acquire()
+
+        # Wrap new agent
+        wrapper = AgentWrapper(new_agent)
+        spawned = time.perf_counter()
         
-    active_agents[session_id] = wrapper
-    return wrapper
+        # Load history if this is an old session being resumed
+        session_data = conversation_manager.get_session(session_id)
+        loaded = time.perf_counter()
+        if session_data:
+            wrapper.load_memory(session_data.get("steps", []))
+            memory_done = time.perf_counter()
+            if session_data.get("python_state") is not None:
+                wrapper.set_executor_state(session_data["python_state"])
+            done = time.perf_counter()
+            record_resume(session_id, len(session_data.get("steps") or []), {
+                "agent_ms": (spawned - start) * 1000,
+                "db_ms": (loaded - spawned) * 1000,
+                "memory_ms": (memory_done - loaded) * 1000,
+                "variables_ms": (done - memory_done) * 1000,
+                "total_ms": (done - start) * 1000,
+            })
+            
+        active_agents.put(session_id, wrapper)
+        return wrapper
 
-def serve(agent, host="127.0.0.1", port=5000, debug=True, storage_path=None):
-    global prototype_agent, conversation_manager
+@contextmanager
+def session_spawn_lock(session_id):
+    """ Serializes the spawning of one session's agent without blocking other sessions. """
+    with agents_lock:
+        entry = spawn_locks.setdefault(session_id, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with agents_lock:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del spawn_locks[session_id]
+
+def record_resume(session_id, n_steps, timings):
+    """ Aggregates the latency of resuming a session agent, reported by the server_stats event. """
+    with agents_lock:
+        resume_stats["count"] += 1
+        resume_stats["total_ms"] += timings["total_ms"]
+        resume_stats["max_ms"] = max(resume_stats["max_ms"], timings["total_ms"])
+        resume_stats["last"] = {"session_id": session_id, "steps": n_steps,
+                                **{k: round(v, 2) for k, v in timings.items()}}
+
+def get_resume_stats():
+    with agents_lock:
+        count = resume_stats["count"]
+        return {
+            "count": count,
+            "avg_ms": round(resume_stats["total_ms"] / count, 2) if count else 0.0,
+            "max_ms": round(resume_stats["max_ms"], 2),
+            "last": resume_stats["last"],
+        }
+
+def register_gauges():
+    """ Exposes the size of the agent cache, warm pool and run queue on /metrics. """
+    REGISTRY.gauge("smolagentsui_active_agents", "Session agents held in memory.",
+                   lambda: len(active_agents))
+    REGISTRY.gauge("smolagentsui_agent_pool_ready", "Pre-cloned agents ready for new sessions.",
+                   lambda: agent_pool.stats()["ready"])
+    REGISTRY.gauge("smolagentsui_runs_running", "Agent runs executing.",
+                   lambda: run_scheduler.stats()["running"])
+    REGISTRY.gauge("smolagentsui_runs_queued", "Agent runs waiting for a free worker.",
+                   lambda: run_scheduler.stats()["queued"])
+
+def serve(agent, host="127.0.0.1", port=5000, debug=True, storage_path=None,
+          max_concurrent_runs=4, max_queued_runs=32,
+          agent_cache_size=64, agent_idle_ttl=1800, agent_memory_budget=None,
+          warm_pool_size=2, db_pragmas=None, db_codec="zlib", db_codec_level=None, db_pool_size=8,
+          history_page_size=20, stream_coalesce_ms=50, stream_coalesce_bytes=4096,
+          async_mode="threading", blocking_threads=16, server_options=None,
+          worker_id=0, num_workers=1, broker_url=None, broker_authkey=None, metrics=True,
+          profile_runs=False, profile_top_n=25):
+    """
+    Starts the web UI server.
+
+    Parameters:
+    -----------
+    agent : CodeAgent
+        The prototype agent. Each session gets its own copy.
+    host : str
+        Host address to bind.
+    port : int
+        Port to bind.
+    debug : bool
+        Runs Flask in debug mode.
+    storage_path : str, Optional
+        Path to the SQLite database file. If None, chat history is kept in memory only.
+    max_concurrent_runs : int
+        Maximum number of agent runs executing at the same time.
+    max_queued_runs : int
+        Maximum number of runs waiting for a free worker or for the previous run of their session.
+        Further runs are rejected until the queue drains. With 0 nothing waits: a run is rejected
+        unless it can start at once, including a second message to a chat that is still running.
+    agent_cache_size : int
+        Maximum number of session agents kept in memory. Least recently used agents are saved and evicted.
+    agent_idle_ttl : float, Optional
+        Seconds of inactivity after which a session agent is saved and evicted. None disables it.
+    agent_memory_budget : int, Optional
+        Approximate memory budget in bytes for all session agents (executor variables and memory).
+        None disables memory-based eviction.
+    warm_pool_size : int
+        Number of child agents pre-cloned in the background for new sessions. 0 clones on demand.
+    db_pragmas : Dict, Optional
+        SQLite PRAGMAs overriding ConversationManager.DEFAULT_PRAGMAS (WAL, synchronous, cache_size, mmap_size...).
+    db_codec : str, Optional
+        Compression for stored steps, messages and python variables: "zlib", "zstd", "lz4" or "none".
+        zstd and lz4 need the zstandard / lz4 packages.
+    db_codec_level : int, Optional
+        Compression level of db_codec. None uses the codec's default.
+    db_pool_size : int
+        Maximum number of SQLite connections, shared by socket handlers and run workers.
+    history_page_size : int
+        Number of steps sent per page when a session is opened; older pages load on scroll-up.
+    stream_coalesce_ms : float
+        Minimum interval between two stream_delta frames sent to a client; deltas arriving in between
+        are merged and sent at the latest when the interval is over. 0 (together with
+        stream_coalesce_bytes=0) sends every delta as its own frame.
+    stream_coalesce_bytes : int
+        Merged deltas are flushed as soon as they reach this size.
+    async_mode : str
+        "threading" (default) serves each client on its own thread with the Werkzeug server.
+        "gevent" serves all clients from one event loop (needs the gevent package) and runs
+        blocking work on threads, for hundreds of concurrent dashboards. The reloader is off in this mode.
+    blocking_threads : int
+        In gevent mode, the number of threads running SQLite and agent-state work for socket handlers.
+    server_options : Dict, Optional
+        Extra keyword arguments for SocketIO.run, e.g. {"allow_unsafe_werkzeug": True}.
+    worker_id : int
+        Index of this process when several workers share storage_path (see serve_cluster).
+    num_workers : int
+        Number of workers. Above 1, session events are routed to the worker owning the session
+        and Socket.IO events are shared through the broker; storage_path and broker_url are required.
+    broker_url : str, Optional
+        URL of the message broker shared by the workers (local://host:port, see smolagentsUI.broker).
+    broker_authkey : bytes, Optional
+        Shared secret of the broker, required with broker_url. serve_cluster generates one per launch.
+    metrics : bool
+        Serves counters and latency histograms in the Prometheus text format at /metrics.
+        False removes the route and stops recording.
+    profile_runs : bool
+        Profiles every run (cProfile and tracemalloc) and stores the profile with its session.
+        Otherwise runs are profiled only in sessions where a client turned profiling on.
+        Profiling slows runs down, and only one run is profiled at a time.
+    profile_top_n : int
+        Number of hotspot functions and allocation sites kept in a profile's summary.
+    """
+    global prototype_agent, conversation_manager, run_scheduler, active_agents, agent_pool
+    if async_mode not in ASYNC_MODES:
+        raise ValueError(f"Unknown async_mode '{async_mode}'. Choose one of {ASYNC_MODES}.")
+    if num_workers > 1 and not (storage_path and broker_url and broker_authkey):
+        raise ValueError("Running several workers needs a shared storage_path, a broker_url and its broker_authkey.")
     
+    REGISTRY.set_enabled(metrics)
+
     # 1. Store the prototype
     prototype_agent = agent
-    conversation_manager = ConversationManager(storage_path)
+    conversation_manager = ConversationManager(storage_path, pragmas=db_pragmas,
+                                               codec=db_codec, codec_level=db_codec_level,
+                                               shared=num_workers > 1, pool_size=db_pool_size)
+    # Images in steps and variables are stored once in the session database
+    set_artifact_store(conversation_manager)
+    run_scheduler = RunScheduler(max_workers=max_concurrent_runs, max_queued=max_queued_runs)
+    active_agents = AgentCache(max_agents=agent_cache_size,
+                               idle_ttl=agent_idle_ttl,
+                               memory_budget=agent_memory_budget,
+                               on_evict=flush_evicted_agent,
+                               size_fn=lambda wrapper: wrapper.estimate_memory())
+    agent_pool = AgentPool(prototype_agent, size=warm_pool_size)
+    agent_pool.start()
     
     # Initialize Flask
     base_dir = os.path.dirname(os.path.abspath(__file__))
@@ -62,7 +278,19 @@ def serve(agent, host="127.0.0.1", port=5000, debug=True, storage_path=None):
                 template_folder=os.path.join(base_dir, 'templates'),
                 static_folder=os.path.join(base_dir, 'static'))
     
-    socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
+    socket_options = {}
+    if num_workers > 1:
+        # Any worker can emit to any client: events go through the broker
+        socket_options["client_manager"] = LocalBrokerManager(broker_url, broker_authkey, cooperative=async_mode == "gevent")
+    socketio = MeteredSocketIO(app, cors_allowed_origins="*", async_mode=async_mode, **socket_options)
+    # Where blocking calls run and how worker threads emit, for the selected async_mode
+    backend = make_backend(async_mode, socketio, threadpool_size=blocking_threads)
+    blocking = backend.run_blocking
+
+    # Session-scoped event handlers, by event name: handler(data, sid)
+    session_handlers = {}
+    cluster = WorkerCluster(worker_id, num_workers, broker_url, broker_authkey, session_handlers,
+                            max_threads=blocking_threads) if num_workers > 1 else None
 
     # --- Routes ---
 
@@ -70,13 +298,106 @@ def serve(agent, host="127.0.0.1", port=5000, debug=True, storage_path=None):
     def index():
         return render_template('index.html')
 
+    @app.route('/artifacts/<content_hash>')
+    def get_artifact(content_hash):
+        """ Serves a stored image. The URL is its content hash, so it can be cached forever. """
+        if not is_artifact_hash(content_hash):
+            abort(404)
+        artifact = blocking(load_artifact, content_hash)
+        if artifact is None:
+            abort(404)
+
+        headers = {
+            'ETag': f'"{content_hash}"',
+            'Cache-Control': 'public, max-age=31536000, immutable'
+        }
+        if content_hash in request.if_none_match:
+            return Response(status=304, headers=headers)
+
+        mime_type, data = artifact
+        return Response(data, mimetype=mime_type, headers=headers)
+
+    @app.route('/profiles/<int:profile_id>.prof')
+    def download_profile(profile_id):
+        """ A stored run profile, in the pstats format (python -m pstats, snakeviz...). """
+        profile = blocking(conversation_manager.get_profile_data, profile_id)
+        if profile is None:
+            abort(404)
+        session_id, data = profile
+        return Response(data, mimetype='application/octet-stream', headers={
+            'Content-Disposition': f'attachment; filename="run-{session_id[:8]}-{profile_id}.prof"'
+        })
+
+    def telemetry_query(args):
+        """ Keyword arguments of ConversationManager.telemetry_rollup from a request's parameters. """
+        query = {k: args.get(k) for k in ('group_by', 'since', 'until', 'session_id', 'model_id', 'limit')
+                 if args.get(k) not in (None, '')}
+        if 'limit' in query:
+            query['limit'] = int(query['limit'])
+        return query
+
+    @app.route('/telemetry')
+    def get_telemetry():
+        """ Step telemetry rollup as JSON, e.g. /telemetry?group_by=model&since=2025-12-01 """
+        try:
+            return blocking(conversation_manager.telemetry_rollup, **telemetry_query(request.args))
+        except (TypeError, ValueError) as e:
+            return {'error': str(e)}, 400
+
+    if metrics:
+        register_gauges()
+
+        @app.route('/metrics')
+        def get_metrics():
+            """ Prometheus scrape target. Gauges are read and text is formatted only here. """
+            return Response(blocking(REGISTRY.render), mimetype=CONTENT_TYPE)
+
     # --- Socket Events ---
 
     @socketio.on('get_history')
     def handle_get_history():
-        summary_list = conversation_manager.get_session_summaries()
+        summary_list = blocking(conversation_manager.get_session_summaries)
         emit('history_list', {'sessions': summary_list})
 
+    @socketio.on('search_sessions')
+    def handle_search_sessions(data=None):
+        """ Full-text search over the chat history, one page of ranked, highlighted hits. """
+        data = data or {}
+        query = data.get('query') or ''
+        try:
+            page = blocking(conversation_manager.search_sessions, query,
+                            limit=data.get('page_size') or 20,
+                            offset=data.get('offset') or 0)
+        except (TypeError, ValueError):
+            emit('error', {'message': "Invalid search request"})
+            return
+        page['request_id'] = data.get('request_id')
+        emit('search_results', page)
+
+    @socketio.on('get_telemetry')
+    def handle_get_telemetry(data=None):
+        """ Step telemetry rollup by time bucket, session, model or step (see /telemetry). """
+        data = data or {}
+        try:
+            result = blocking(conversation_manager.telemetry_rollup, **telemetry_query(data))
+        except (TypeError, ValueError) as e:
+            emit('error', {'message': f"Invalid telemetry request: {e}"})
+            return
+        result['request_id'] = data.get('request_id')
+        emit('telemetry', result)
+
+    @socketio.on('get_server_stats')
+    def handle_get_server_stats():
+        emit('server_stats', blocking(lambda: {
+            'agents': active_agents.stats(),
+            'agent_pool': agent_pool.stats(),
+            'runs': run_scheduler.stats(),
+            'stream': stream_metrics.snapshot(),
+            'resume': get_resume_stats(),
+            'server': backend.stats(),
+            'cluster': cluster.stats() if cluster else None
+        }))
+
     @socketio.on('get_agent_specs')
     def handle_get_agent_specs():
         """Extracts and sends the prototype agent's specs to the UI."""
@@ -130,147 +451,392 @@ def serve(agent, host="127.0.0.1", port=5000, debug=True, storage_path=None):
         # Just tell UI to clear; backend will lazy-create the agent when run starts
         emit('reload_chat', {'steps': []})
 
-    @socketio.on('load_session')
-    def handle_load_session(data):
-        target_id = data.get('id')
-        session = conversation_manager.get_session(target_id)
-        
-        if not session:
-            emit('error', {'message': "Session not found"})
+    def reply(sid, event, payload):
+        """ Emits to one client. Works on any worker and thread, unlike flask_socketio.emit. """
+        backend.emit(event, payload, to=sid)
+
+    def session_event(name, id_key):
+        """
+        Registers handler(data, sid) for a session-scoped event. With several workers it
+        runs on the worker that owns the session (data[id_key]), wherever the client is connected.
+        """
+        def register(handler):
+            session_handlers[name] = handler
+
+            @socketio.on(name)
+            def on_event(data=None):
+                route_session_event(name, (data or {}).get(id_key), data or {}, request.sid)
+            return handler
+        return register
+
+    def route_session_event(name, session_id, data, sid):
+        if cluster is not None and not cluster.owns(session_id):
+            cluster.forward(session_id, name, data, sid)
             return
-        
-        # Prepare session data for UI (exclude raw python state)
-        session_display = {k: v for k, v in session.items() if k != 'python_state'}
+        session_handlers[name](data, sid)
+
+    def open_session(target_id, page_size):
+        """ Returns the reload_chat payload of a session and its agent wrapper, or (None, None). """
+        page = conversation_manager.get_steps_page(target_id, limit=page_size)
+        if page is None:
+            return None, None
             
         print(f"📂 Loading session UI: {target_id}")
         
         # Get the wrapper (this restores the python_state internally)
         wrapper = get_agent_wrapper(target_id) 
         
-        # Send Chat History
-        emit('reload_chat', session_display)
+        # The most recent page of the chat history; older pages are requested on scroll-up
+        return {
+            'id': target_id,
+            'timestamp': page['timestamp'],
+            'preview': page['preview'],
+            'steps': [make_display_step(step, page['start_index'] + i) for i, step in enumerate(page['steps'])],
+            'start_index': page['start_index'],
+            'total_steps': page['total_steps'],
+            'has_more': page['start_index'] > 0
+        }, wrapper
+
+    @session_event('load_session', 'id')
+    def handle_load_session(data, sid):
+        target_id = data.get('id')
+        page_size = data.get('page_size') or history_page_size
+        chat, wrapper = blocking(open_session, target_id, page_size)
+        
+        if chat is None:
+            reply(sid, 'error', {'message': "Session not found"})
+            return
+
+        reply(sid, 'reload_chat', chat)
 
         # Send Restored Variables
-        vars_data = wrapper.get_active_variables()
-        emit('variable_state', {
+        vars_data = blocking(wrapper.get_active_variables)
+        reply(sid, 'variable_state', {
             'variables': vars_data, 
             'session_id': target_id
         })
 
-    @socketio.on('rename_session')
-    def handle_rename_session(data):
+    @session_event('load_session_page', 'id')
+    def handle_load_session_page(data, sid):
+        """ Sends an older page of a session's history (steps before index `before`). """
+        session_id = data.get('id')
+        before = data.get('before')
+        if not session_id or before is None:
+            return
+
+        page = blocking(conversation_manager.get_steps_page, session_id, before=before,
+                        limit=data.get('page_size') or history_page_size)
+        if page is None:
+            reply(sid, 'error', {'message': "Session not found"})
+            return
+
+        steps = blocking(lambda: [make_display_step(step, page['start_index'] + i)
+                                  for i, step in enumerate(page['steps'])])
+        reply(sid, 'session_page', {
+            'id': session_id,
+            'steps': steps,
+            'start_index': page['start_index'],
+            'total_steps': page['total_steps'],
+            'has_more': page['start_index'] > 0
+        })
+
+    @session_event('get_step_field', 'session_id')
+    def handle_get_step_field(data, sid):
+        """ Sends a heavy step field (images, large final answer) deferred by make_display_step. """
+        session_id = data.get('session_id')
+        step_index = data.get('step_index')
+        field = data.get('field')
+
+        def load_field():
+            step = conversation_manager.get_step(session_id, step_index) if session_id else None
+            if step is None:
+                raise KeyError("Step not found")
+            return get_display_field(step, field)
+
+        try:
+            value = blocking(load_field)
+        except KeyError as e:
+            reply(sid, 'error', {'message': e.args[0] if e.args else str(e)})
+            return
+
+        reply(sid, 'step_field', {
+            'session_id': session_id,
+            'step_index': step_index,
+            'field': field,
+            'value': value
+        })
+
+    @session_event('rename_session', 'id')
+    def handle_rename_session(data, sid):
         session_id = data.get('id')
         new_name = data.get('new_name')
-        if conversation_manager.rename_session(session_id, new_name):
-            emit('history_list', {'sessions': conversation_manager.get_session_summaries()})
+        if blocking(conversation_manager.rename_session, session_id, new_name):
+            reply(sid, 'history_list', {'sessions': blocking(conversation_manager.get_session_summaries)})
 
-    @socketio.on('delete_session')
-    def handle_delete_session(data):
+    @session_event('delete_session', 'id')
+    def handle_delete_session(data, sid):
         session_id = data.get('id')
         
         # Cleanup active session if it exists
-        if session_id in active_agents:
-            del active_agents[session_id]
+        blocking(active_agents.pop, session_id)
+        profiled_sessions.discard(session_id)
             
-        if conversation_manager.delete_session(session_id):
-            emit('history_list', {'sessions': conversation_manager.get_session_summaries()})
+        if blocking(conversation_manager.delete_session, session_id):
+            reply(sid, 'history_list', {'sessions': blocking(conversation_manager.get_session_summaries)})
 
-    @socketio.on('inspect_variable')
-    def handle_inspect_variable(data):
+    @session_event('inspect_variable', 'session_id')
+    def handle_inspect_variable(data, sid):
         session_id = data.get('session_id')
         var_name = data.get('name')
         
         if not session_id or not var_name:
             return
             
-        wrapper = get_agent_wrapper(session_id)
+        wrapper = blocking(get_agent_wrapper, session_id)
+        if wrapper:
+            details = blocking(wrapper.get_variable_details, var_name)
+            if details.get('type') == 'image':
+                # The image is not in any step: tie it to the session so it outlives restarts
+                blocking(conversation_manager.add_session_artifacts, session_id,
+                         find_artifact_refs(details['content']))
+            reply(sid, 'variable_details', details)
+
+    @session_event('inspect_dataframe', 'session_id')
+    def handle_inspect_dataframe(data, sid):
+        """ Sends a row/column window of a DataFrame variable for the inspector grid. """
+        session_id = data.get('session_id')
+        var_name = data.get('name')
+
+        if not session_id or not var_name:
+            return
+
+        wrapper = blocking(get_agent_wrapper, session_id)
         if wrapper:
-            details = wrapper.get_variable_details(var_name)
-            emit('variable_details', details)
+            window = blocking(wrapper.get_dataframe_window,
+                var_name,
+                row_start=data.get('row_start', 0),
+                row_count=data.get('row_count', 100),
+                col_start=data.get('col_start', 0),
+                col_count=data.get('col_count', 20),
+                sort_by=data.get('sort_by'),
+                ascending=data.get('ascending', True),
+                filter=data.get('filter')
+            )
+            # Windows are cached, so the request id goes on a copy
+            reply(sid, 'dataframe_window', {**window, 'request_id': data.get('request_id')})
 
-    @socketio.on('stop_run')
-    def handle_stop_run(data):
+    @session_event('stop_run', 'session_id')
+    def handle_stop_run(data, sid):
         session_id = data.get('session_id')
         if session_id:
             print(f"🛑 Stop signal received for {session_id}")
             stop_signals[session_id] = True
+            # Drop runs of this session that are still waiting for a worker
+            run_scheduler.cancel(session_id)
 
-    @socketio.on('start_run')
-    def handle_run(data):
+    @session_event('get_profiles', 'session_id')
+    def handle_get_profiles(data, sid):
+        """ Whether runs of a session are profiled, and its latest stored profiles. """
         session_id = data.get('session_id')
-        task = data.get('message')
-        
-        # Determine Session ID (if new chat, generate one)
         if not session_id:
-            session_id = str(uuid.uuid4())
-            emit('session_created', {'id': session_id})
+            return
+        reply(sid, 'profile_list', {
+            'session_id': session_id,
+            'enabled': profile_runs or session_id in profiled_sessions,
+            'profiles': blocking(conversation_manager.get_profiles, session_id)
+        })
 
-        # Get the specific agent for this session
-        wrapper = get_agent_wrapper(session_id)
-        
+    @session_event('set_profiling', 'session_id')
+    def handle_set_profiling(data, sid):
+        """ Turns profiling of a session's next runs on or off. """
+        session_id = data.get('session_id')
+        if not session_id:
+            return
+        set_profiling(session_id, data.get('enabled'))
+        reply(sid, 'profiling_state', {'session_id': session_id,
+                                       'enabled': profile_runs or session_id in profiled_sessions})
+
+    def set_profiling(session_id, enabled):
+        if enabled:
+            profiled_sessions.add(session_id)
+        else:
+            profiled_sessions.discard(session_id)
+
+    def start_profiler(session_id, sid):
+        """ Starts capturing a profile of this run if the session is profiled. Returns the profiler or None. """
+        if not (profile_runs or session_id in profiled_sessions):
+            return None
+        profiler = RunProfiler(top_n=profile_top_n)
+        if profiler.start():
+            return profiler
+        print(f"Warning: run for {session_id} is not profiled, another run is being profiled")
+        backend.emit('profile_ready', {'session_id': session_id,
+                                       'error': "Not profiled: another run was being profiled"}, to=sid)
+        return None
+
+    def store_profile(session_id, profiler, sid):
+        """ Stops the capture, saves it next to the session and sends its summary to the client. """
+        try:
+            summary = profiler.stop()
+            record = conversation_manager.save_profile(session_id, summary, profiler.dump())
+        except Exception as e:
+            print(f"Warning: could not store the profile of {session_id}: {e}")
+            return
+        print(f"🔬 Profiled run of {session_id} in {summary['duration_s']:.2f} s (profile {record['id']})")
+        backend.emit('profile_ready', {'session_id': session_id, 'profile': record}, to=sid)
+
+    def report_run_error(session_id, sid, e):
+        print(f"Error in session {session_id}: {e}")
+        traceback.print_exc()
+        backend.emit('error', {'message': str(e), 'session_id': session_id}, to=sid)
+
+    def execute_run(session_id, task, sid):
+        """
+        Drives one agent run to completion. Executed on a RunScheduler worker thread.
+        Whatever fails (resuming the agent, the run or the save), the client gets an 'error'
+        and the run always ends with 'run_complete'.
+        """
+        run_start = time.perf_counter()
+        outcome = "error"
+        profiler = wrapper = None
+        pinned = False
+        try:
+            try:
+                # Covers resuming the agent, the run and the save
+                profiler = start_profiler(session_id, sid)
+                # Get the specific agent for this session; keep it from being evicted mid-run
+                active_agents.pin(session_id)
+                pinned = True
+                wrapper = get_agent_wrapper(session_id)
+                outcome = stream_run(session_id, task, sid, wrapper, run_start)
+            except Exception as e:
+                report_run_error(session_id, sid, e)
+            finally:
+                RUNS.inc(outcome)
+                backend.emit('run_complete', {'session_id': session_id}, to=sid)
+
+            # --- Saving Logic ---
+            if wrapper is not None:
+                save_agent_session(session_id, wrapper)
+        except Exception as e:
+            report_run_error(session_id, sid, e)
+        finally:
+            if pinned:
+                active_agents.unpin(session_id)
+                active_agents.refresh(session_id)
+            if profiler is not None:
+                store_profile(session_id, profiler, sid)
+
+        # Refresh history list
+        backend.emit('history_list', {'sessions': conversation_manager.get_session_summaries()}, to=sid)
+
+    def stream_run(session_id, task, sid, wrapper, run_start):
+        """ Sends the events of a run to the client. Returns "completed" or "stopped"; errors propagate. """
+        first_token = True
         # Reset Stop Signal
         stop_signals[session_id] = False
 
         print(f"🚀 Starting run for {session_id}: {task}")
-        
+
+        # Batches stream_delta events; flushed on every step boundary and at the latest after the window
+        coalescer = StreamCoalescer(lambda out: backend.emit(out['type'], out, to=sid),
+                                    window_ms=stream_coalesce_ms,
+                                    max_bytes=stream_coalesce_bytes,
+                                    metrics=stream_metrics)
+
         try:
-            emit('agent_start', {'session_id': session_id})
-            
+            backend.emit('agent_start', {'session_id': session_id}, to=sid)
+
             generator = wrapper.run(task)
-            
+
             while True:
                 # Check Stop Signal
                 if stop_signals.get(session_id, False):
-                    emit('stream_delta', {'content': "\n\n[Stopped by user]", 'session_id': session_id})
-                    break
+                    coalescer.flush()
+                    backend.emit('stream_delta', {'content': "\n\n[Stopped by user]", 'session_id': session_id}, to=sid)
+                    return "stopped"
 
                 try:
                     event = next(generator)
-                    socketio.sleep(0)
-                    
+                    time.sleep(0)
+
+                    if first_token and event['type'] == 'stream_delta':
+                        RUN_TTFT.observe(time.perf_counter() - run_start)
+                        first_token = False
+
                     # Inject Session ID into event so UI knows where to route it
                     event['session_id'] = session_id
-                    emit(event['type'], event)
+                    coalescer.push(event)
 
                     # Update variable viewer after every Action Step (code execution)
+                    # Only new, changed and removed variables are sent
                     if event['type'] == 'action_step':
-                        vars_data = wrapper.get_active_variables()
-                        emit('variable_state', {
-                            'variables': vars_data, 
-                            'session_id': session_id
-                        })
-                    
-                except StopIteration:
-                    break
+                        delta = wrapper.get_variable_delta()
+                        if delta['added'] or delta['changed'] or delta['removed']:
+                            delta['session_id'] = session_id
+                            backend.emit('variable_delta', delta, to=sid)
 
-        except Exception as e:
-            print(f"Error in session {session_id}: {e}")
-            traceback.print_exc()
-            emit('error', {'message': str(e), 'session_id': session_id})
+                except StopIteration:
+                    return "completed"
         finally:
-            emit('run_complete', {'session_id': session_id})
-            
-            # --- Saving Logic ---
-            steps_data = wrapper.get_steps_data()
-            current_state = wrapper.get_executor_state()
-            
-            # Determine preview
-            preview = "New Chat"
-            if len(steps_data) > 0 and steps_data[0].get('task'):
-                 preview = steps_data[0]['task'][:50] + "..."
-            elif conversation_manager.get_session(session_id):
-                 preview = conversation_manager.get_session(session_id).get('preview', 'New Chat')
-
-            # Thread-safe save
-            final_id = conversation_manager.save_session(
-                session_id, 
-                steps_data, 
-                task_preview=preview,
-                python_state=current_state
-            )
-            
-            # Refresh history list
-            emit('history_list', {'sessions': conversation_manager.get_session_summaries()})
+            # Buffered deltas go out before the error or run_complete (totals are in server_stats)
+            coalescer.close()
+
+    @socketio.on('start_run')
+    def handle_run(data):
+        data = dict(data or {})
+
+        # Determine Session ID (if new chat, generate one); it decides which worker runs it
+        if not data.get('session_id'):
+            data['session_id'] = str(uuid.uuid4())
+            emit('session_created', {'id': data['session_id']})
+
+        route_session_event('start_run', data['session_id'], data, request.sid)
+
+    def submit_run(data, sid):
+        session_id = data['session_id']
+        task = data.get('message')
+        # A new chat has no session to toggle profiling on before its first run
+        if 'profile' in data:
+            set_profiling(session_id, data['profile'])
+
+        def on_queued(job, position):
+            print(f"⏳ Run for {session_id} queued at position {position}")
+            backend.emit('run_queued', {'session_id': session_id, 'position': position}, to=sid)
+
+        def on_cancel(job):
+            backend.emit('run_complete', {'session_id': session_id}, to=sid)
+
+        # Admission control: hand the run to the worker pool or reject it when the queue is full
+        try:
+            run_scheduler.submit(session_id,
+                                 lambda: execute_run(session_id, task, sid),
+                                 on_queued=on_queued,
+                                 on_cancel=on_cancel)
+        except QueueFullError as e:
+            print(f"🚫 Rejected run for {session_id}: {e}")
+            reply(sid, 'error', {'message': str(e), 'session_id': session_id})
+            reply(sid, 'run_complete', {'session_id': session_id})
+
+    session_handlers['start_run'] = submit_run
+    if cluster is not None:
+        cluster.start()
+
+    def sweep_idle_agents():
+        """ Background task: evicts idle agents even when no socket traffic triggers a sweep. """
+        interval = max(1, min(60, agent_idle_ttl / 4)) if agent_idle_ttl else None
+        while interval:
+            socketio.sleep(interval)
+            blocking(active_agents.sweep)
+
+    if agent_idle_ttl:
+        socketio.start_background_task(sweep_idle_agents)
+
+    run_options = {"debug": debug, **(server_options or {})}
+    if async_mode == "gevent":
+        # The reloader monkey-patches threading, which would turn the run workers into greenlets
+        run_options["use_reloader"] = False
 
-    print(f"✨ SmolagentsUI running on http://{host}:{port}")
-    socketio.run(app, host=host, port=port, debug=debug)
\ No newline at end of file
+    worker = f", worker {worker_id + 1}/{num_workers}" if num_workers > 1 else ""
+    print(f"✨ SmolagentsUI running on http://{host}:{port} ({async_mode} mode{worker})")
+    socketio.run(app, host=host, port=port, **run_options)
\ No newline at end of file
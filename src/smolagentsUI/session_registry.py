@@ -0,0 +1,50 @@
+from collections import OrderedDict
+from typing import Dict, Iterator, Optional
+
+
+class SessionRegistry:
+    def __init__(self):
+        """
+        In-memory index of session dicts, keyed by session id and ordered by
+        recency (most recently updated first).
+
+        Lookup, insertion at the front, move-to-front and removal are O(1).
+        Iteration yields the session dicts in recency order.
+        """
+        self._sessions = OrderedDict()  # session_id -> session dict; front = most recent
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def __iter__(self) -> Iterator[Dict]:
+        return iter(self._sessions.values())
+
+    def get(self, session_id: str) -> Optional[Dict]:
+        """ Returns the session dict, or None if the id is unknown. """
+        return self._sessions.get(session_id)
+
+    def append(self, session: Dict):
+        """ Adds a session at the back (least recent). Used when loading from the DB in recency order. """
+        self._sessions[session["id"]] = session
+
+    def push_front(self, session: Dict):
+        """ Adds or replaces a session and marks it as the most recent. """
+        self._sessions[session["id"]] = session
+        self._sessions.move_to_end(session["id"], last=False)
+
+    def move_to_front(self, session_id: str) -> bool:
+        """ Marks an existing session as the most recent. Returns False if the id is unknown. """
+        if session_id not in self._sessions:
+            return False
+        self._sessions.move_to_end(session_id, last=False)
+        return True
+
+    def remove(self, session_id: str) -> Optional[Dict]:
+        """ Removes a session. Returns the removed dict, or None if the id is unknown. """
+        return self._sessions.pop(session_id, None)
+
+    def clear(self):
+        self._sessions.clear()
@@ -4,6 +4,7 @@ const chatContainer = document.getElementById('chat-container');
 const userInput = document.getElementById('user-input');
 const sendBtn = document.getElementById('send-btn');
 const historyList = document.getElementById('history-list');
+const historySearch = document.getElementById('history-search');
 const variableList = document.getElementById('variable-list'); // NEW: Variable Viewer Element
 
 // Global State
@@ -14,15 +15,32 @@ let currentSessionId = null;
 let agentSpecs = null; 
 let streamRenderTimeout = null;
 
+// History paging: older steps are fetched on scroll-up
+let historyPaging = null; // { id, startIndex, hasMore, loading }
+let renderRoot = chatContainer; // Where chat bubbles are appended; swapped while prepending older pages
+
+// History search: while a query is active the sidebar lists search hits instead of sessions
+let searchState = null; // { query, offset, requestId }
+let searchRequestCounter = 0;
+let searchDebounce = null;
+const SEARCH_PAGE_SIZE = 20;
+
 // --- Smart Scroll Logic ---
 let isUserAtBottom = true; // Default to true so it scrolls initially
 
 chatContainer.addEventListener('scroll', () => {
     const threshold = 30; // pixels from bottom to be considered "at bottom"
     isUserAtBottom = chatContainer.scrollHeight - chatContainer.scrollTop - chatContainer.clientHeight <= threshold;
+
+    // Near the top: fetch the previous page of history
+    if (chatContainer.scrollTop < 200) {
+        requestOlderHistory();
+    }
 });
 
 function scrollToBottom(force = false) {
+    // Never scroll while rendering an older page off-screen
+    if (renderRoot !== chatContainer) return;
     if (force || isUserAtBottom) {
         chatContainer.scrollTop = chatContainer.scrollHeight;
     }
@@ -60,7 +78,7 @@ function createMessageBubble(role, htmlContent = null) {
     }
     
     msgDiv.appendChild(contentDiv);
-    chatContainer.appendChild(msgDiv);
+    renderRoot.appendChild(msgDiv);
     
     // Force scroll if it's a user message, otherwise use smart scroll
     scrollToBottom(role === 'user');
@@ -69,7 +87,7 @@ function createMessageBubble(role, htmlContent = null) {
 }
 
 function ensureAgentContainer() {
-    let lastMsg = chatContainer.lastElementChild;
+    let lastMsg = renderRoot.lastElementChild;
     if (!lastMsg || !lastMsg.classList.contains('agent')) {
         return createMessageBubble('agent');
     }
@@ -118,7 +136,6 @@ function getOrCreateStepContainer() {
         
         stepsContainer.appendChild(thinkingDiv);
         currentStepContainer = thinkingDiv;
-        currentStreamText = "";
         
         scrollToBottom();
     }
@@ -174,15 +191,29 @@ function renderWelcomeScreen() {
     chatContainer.innerHTML = html;
 }
 
+/**
+ * Images are stored once on the server and referenced by /artifacts/<hash> URLs.
+ * Sessions saved before that still carry base64 data.
+ */
+function isArtifactUrl(value) {
+    return typeof value === 'string' && /^\/artifacts\/[0-9a-f]{40}$/.test(value.trim());
+}
+
+function imageSource(img) {
+    if (img.startsWith('data:') || isArtifactUrl(img)) return img;
+    return `data:image/png;base64,${img}`;
+}
+
 function renderStep(stepNumber, modelOutput, code, logs, images, error) {
     let stepsContainer;
     
     // If we were streaming, the placeholder is inside the correct container
-    if (currentStepContainer) {
+    // (never while rendering an older history page off-screen)
+    if (currentStepContainer && renderRoot === chatContainer) {
         stepsContainer = currentStepContainer.parentElement;
         currentStepContainer.remove();
         currentStepContainer = null;
-        currentStreamText = "";
+        resetStreamState();
     } else {
         // Otherwise (loading history), ensure we find/create the wrapper
         const agentContent = ensureAgentContainer();
@@ -286,9 +317,9 @@ function renderStep(stepNumber, modelOutput, code, logs, images, error) {
     
     if (logs) htmlContent += `<div class="logs"><strong>Observation:</strong>\n${logs}</div>`;
     
-    if (images && images.length > 0) {
+    if (images && !isDeferred(images) && images.length > 0) {
         images.forEach(img => {
-            const src = img.startsWith('data:') ? img : `data:image/png;base64,${img}`;
+            const src = imageSource(img);
             htmlContent += `<br><img src="${src}" class="agent-image"><br>`;
         });
     }
@@ -307,6 +338,17 @@ function renderStep(stepNumber, modelOutput, code, logs, images, error) {
     if (error) htmlContent += `<div class="error-msg"><strong>Error:</strong> ${errorText}</div>`;
 
     body.innerHTML = htmlContent;
+    if (isDeferred(images)) {
+        // Images are only fetched once the step is expanded
+        body.appendChild(createDeferredPlaceholder(images, (container, value) => {
+            (value || []).forEach(img => {
+                const el = document.createElement('img');
+                el.src = imageSource(img);
+                el.className = 'agent-image';
+                container.appendChild(el);
+            });
+        }));
+    }
     details.appendChild(summary);
     details.appendChild(body);
     
@@ -365,7 +407,7 @@ function renderContentRecursive(container, content) {
         });
     } else {
         const str = String(content);
-        if (str.trim().startsWith('data:image')) {
+        if (str.trim().startsWith('data:image') || isArtifactUrl(str)) {
             const img = document.createElement('img');
             img.src = str;
             img.className = 'agent-image';
@@ -389,6 +431,18 @@ function renderFinalAnswer(container, content) {
     const div = document.createElement('div');
     div.className = 'final-answer';
     
+    if (isDeferred(content)) {
+        div.appendChild(createDeferredPlaceholder(content, (target, value) => {
+            renderContentRecursive(target, value);
+            target.querySelectorAll('pre code').forEach((block) => {
+                hljs.highlightElement(block);
+            });
+        }));
+        container.appendChild(div);
+        scrollToBottom();
+        return;
+    }
+
     renderContentRecursive(div, content);
     
     div.querySelectorAll('pre code').forEach((block) => {
@@ -399,6 +453,52 @@ function renderFinalAnswer(container, content) {
     scrollToBottom();
 }
 
+// --- Deferred Fields (heavy step data fetched when displayed) ---
+
+const pendingDeferredFields = new Map(); // "stepIndex:field" -> { placeholder, render }
+
+function isDeferred(value) {
+    return value !== null && typeof value === 'object' && !Array.isArray(value) && '_deferred' in value;
+}
+
+const deferredFieldObserver = new IntersectionObserver((entries) => {
+    entries.forEach(entry => {
+        if (!entry.isIntersecting) return;
+        const placeholder = entry.target;
+        deferredFieldObserver.unobserve(placeholder);
+        socket.emit('get_step_field', {
+            session_id: placeholder.dataset.sessionId,
+            step_index: Number(placeholder.dataset.stepIndex),
+            field: placeholder.dataset.field
+        });
+    });
+}, { root: chatContainer, rootMargin: '200px' });
+
+function createDeferredPlaceholder(marker, render) {
+    const placeholder = document.createElement('div');
+    placeholder.className = 'deferred-field';
+    placeholder.textContent = 'Loading...';
+    placeholder.dataset.sessionId = currentSessionId;
+    placeholder.dataset.stepIndex = marker.step_index;
+    placeholder.dataset.field = marker._deferred;
+
+    pendingDeferredFields.set(`${marker.step_index}:${marker._deferred}`, { placeholder, render });
+    deferredFieldObserver.observe(placeholder);
+    return placeholder;
+}
+
+socket.on('step_field', (data) => {
+    if (data.session_id !== currentSessionId) return;
+    const key = `${data.step_index}:${data.field}`;
+    const pending = pendingDeferredFields.get(key);
+    if (!pending) return;
+    pendingDeferredFields.delete(key);
+
+    const container = document.createElement('div');
+    pending.render(container, data.value);
+    pending.placeholder.replaceWith(...container.childNodes);
+});
+
 function renderVariables(variables) {
     if (!variables || variables.length === 0) {
         variableList.innerHTML = '<div class="empty-state">No variables active</div>';
@@ -406,47 +506,91 @@ function renderVariables(variables) {
     }
 
     variableList.innerHTML = '';
+    variables.forEach(v => variableList.appendChild(createVariableCard(v)));
+}
+
+/**
+ * Patches the Variable Viewer with the server's diff instead of rebuilding it.
+ * Cards are matched by data-name; new cards are inserted in alphabetical order.
+ */
+function applyVariableDelta(delta) {
+    (delta.removed || []).forEach(name => {
+        const card = findVariableCard(name);
+        if (card) card.remove();
+    });
+
+    (delta.changed || []).forEach(v => {
+        const card = findVariableCard(v.name);
+        if (card) {
+            card.replaceWith(createVariableCard(v));
+        } else {
+            insertVariableCard(v);
+        }
+    });
+
+    (delta.added || []).forEach(v => {
+        const card = findVariableCard(v.name);
+        if (card) card.remove();
+        insertVariableCard(v);
+    });
+
+    if (!variableList.querySelector('.var-card')) {
+        variableList.innerHTML = '<div class="empty-state">No variables active</div>';
+    }
+}
+
+function findVariableCard(name) {
+    return Array.from(variableList.querySelectorAll('.var-card')).find(card => card.dataset.name === name) || null;
+}
+
+function insertVariableCard(v) {
+    const emptyState = variableList.querySelector('.empty-state');
+    if (emptyState) emptyState.remove();
+
+    const card = createVariableCard(v);
+    const next = Array.from(variableList.querySelectorAll('.var-card')).find(c => c.dataset.name > v.name);
+    variableList.insertBefore(card, next || null);
+}
+
+function createVariableCard(v) {
+    const card = document.createElement('div');
+    card.className = 'var-card';
+    card.dataset.name = v.name; // Store name for reference
     
-    variables.forEach(v => {
-        const card = document.createElement('div');
-        card.className = 'var-card';
-        card.dataset.name = v.name; // Store name for reference
-        
-        const shapeBadge = v.shape ? `<span style="background:#333; padding:1px 4px; border-radius:3px; margin-left:6px;">${v.shape}</span>` : '';
+    const shapeBadge = v.shape ? `<span style="background:#333; padding:1px 4px; border-radius:3px; margin-left:6px;">${v.shape}</span>` : '';
 
-        card.innerHTML = `
-            <div class="var-header">
-                <span class="var-name">${v.name}</span>
-                <span class="var-type">${v.type}${shapeBadge}</span>
-            </div>
-            <div class="var-preview" title="${v.preview.replace(/"/g, '&quot;')}">${v.preview}</div>
-        `;
-        
-        // --- UPDATED CLICK LOGIC ---
-        card.onclick = (e) => {
-            // If user clicks inside the expanded content (e.g. to copy text), don't collapse
-            if (e.target.closest('.var-expanded-content')) return;
-
-            // Toggle Collapse if already expanded
-            if (card.classList.contains('expanded')) {
-                card.classList.remove('expanded');
-                const existingContent = card.querySelector('.var-expanded-content');
-                if (existingContent) existingContent.remove();
-                return;
-            }
+    card.innerHTML = `
+        <div class="var-header">
+            <span class="var-name">${v.name}</span>
+            <span class="var-type">${v.type}${shapeBadge}</span>
+        </div>
+        <div class="var-preview" title="${v.preview.replace(/"/g, '&quot;')}">${v.preview}</div>
+    `;
+    
+    // --- UPDATED CLICK LOGIC ---
+    card.onclick = (e) => {
+        // If user clicks inside the expanded content (e.g. to copy text), don't collapse
+        if (e.target.closest('.var-expanded-content')) return;
+
+        // Toggle Collapse if already expanded
+        if (card.classList.contains('expanded')) {
+            card.classList.remove('expanded');
+            const existingContent = card.querySelector('.var-expanded-content');
+            if (existingContent) existingContent.remove();
+            return;
+        }
 
-            // Visual feedback that we are fetching
-            card.style.opacity = '0.6';
-            card.style.cursor = 'wait';
-            
-            socket.emit('inspect_variable', { 
-                session_id: currentSessionId, 
-                name: v.name 
-            });
-        };
+        // Visual feedback that we are fetching
+        card.style.opacity = '0.6';
+        card.style.cursor = 'wait';
         
-        variableList.appendChild(card);
-    });
+        socket.emit('inspect_variable', { 
+            session_id: currentSessionId, 
+            name: v.name 
+        });
+    };
+
+    return card;
 }
 
 socket.on('variable_details', (data) => {
@@ -530,8 +674,9 @@ function openInspectionModal(data) {
         body.style.alignItems = 'center';
         body.appendChild(img);
     } else if (data.type === 'dataframe') {
-        // Inject the HTML Table
-        body.innerHTML = data.content;
+        // Windowed grid: rows and columns are fetched from the server as the user scrolls
+        body.classList.add('df-grid-body');
+        activeDataFrameGrid = new DataFrameGrid(body, currentSessionId, data.name, data.window);
     }
 
     contentBox.appendChild(header);
@@ -539,6 +684,255 @@ function openInspectionModal(data) {
     overlay.appendChild(contentBox);
 }
 
+/**
+ * Virtual-scrolling grid for DataFrame variables.
+ * Only the visible rows are in the DOM; missing row blocks are requested with
+ * 'inspect_dataframe' and kept in a client cache until the view (version, sort,
+ * filter or column window) changes.
+ */
+let activeDataFrameGrid = null;
+const DF_ROW_HEIGHT = 26;
+const DF_BLOCK_ROWS = 200;
+const DF_COL_COUNT = 20;
+
+class DataFrameGrid {
+    constructor(root, sessionId, name, firstWindow) {
+        this.root = root;
+        this.sessionId = sessionId;
+        this.name = name;
+        this.colStart = 0;
+        this.sortBy = null;
+        this.ascending = true;
+        this.filter = null;
+        this.requestSeq = 0;
+        this.renderQueued = false;
+        this.buildDom();
+        this.resetView(firstWindow);
+        this.receive(firstWindow);
+    }
+
+    buildDom() {
+        this.root.innerHTML = `
+            <div class="df-toolbar">
+                <select class="df-filter-col"><option value="">All columns</option></select>
+                <select class="df-filter-op">
+                    <option value="contains">contains</option>
+                    <option value="==">=</option><option value="!=">≠</option>
+                    <option value=">">&gt;</option><option value=">=">≥</option>
+                    <option value="<">&lt;</option><option value="<=">≤</option>
+                </select>
+                <input class="df-filter-value" type="text" placeholder="Filter...">
+                <button class="df-filter-apply">Apply</button>
+                <span class="df-status"></span>
+                <span class="df-col-nav">
+                    <button class="df-col-prev">◀</button>
+                    <span class="df-col-label"></span>
+                    <button class="df-col-next">▶</button>
+                </span>
+            </div>
+            <div class="df-viewport">
+                <div class="df-header"></div>
+                <div class="df-canvas"><div class="df-rows"></div></div>
+            </div>
+        `;
+        this.viewport = this.root.querySelector('.df-viewport');
+        this.header = this.root.querySelector('.df-header');
+        this.canvas = this.root.querySelector('.df-canvas');
+        this.rowsEl = this.root.querySelector('.df-rows');
+        this.statusEl = this.root.querySelector('.df-status');
+        this.colLabel = this.root.querySelector('.df-col-label');
+        this.filterCol = this.root.querySelector('.df-filter-col');
+
+        this.viewport.addEventListener('scroll', () => this.scheduleRender());
+        this.root.querySelector('.df-col-prev').onclick = () => this.moveColumns(-DF_COL_COUNT);
+        this.root.querySelector('.df-col-next').onclick = () => this.moveColumns(DF_COL_COUNT);
+
+        const applyFilter = () => {
+            const value = this.root.querySelector('.df-filter-value').value.trim();
+            this.filter = value ? {
+                column: this.filterCol.value === '' ? null : parseInt(this.filterCol.value, 10),
+                op: this.root.querySelector('.df-filter-op').value,
+                value: value
+            } : null;
+            this.reload();
+        };
+        this.root.querySelector('.df-filter-apply').onclick = applyFilter;
+        this.root.querySelector('.df-filter-value').addEventListener('keydown', (e) => {
+            if (e.key === 'Enter') applyFilter();
+        });
+    }
+
+    /** Forgets all cached rows; called when the server reports a different view. */
+    resetView(window) {
+        this.version = window.version;
+        this.totalRows = window.total_rows;
+        this.totalCols = window.total_cols;
+        this.columns = window.columns;
+        this.dtypes = window.dtypes;
+        this.rowCache = new Map();   // view row position -> {index, cells}
+        this.pending = new Set();    // block starts requested and not yet received
+        this.canvas.style.height = `${this.totalRows * DF_ROW_HEIGHT}px`;
+        this.renderHeader();
+    }
+
+    isCurrent(window) {
+        return window.col_start === this.colStart &&
+            window.sort_by === this.sortBy &&
+            window.ascending === this.ascending &&
+            JSON.stringify(window.filter) === JSON.stringify(this.filter);
+    }
+
+    receive(window) {
+        if (window.error) {
+            this.statusEl.textContent = window.error;
+            return;
+        }
+        if (!this.isCurrent(window)) return;  // answer to an older view
+        // A new variable version, filter or column window changes the rows and the header
+        if (window.version !== this.version || window.total_rows !== this.totalRows ||
+            window.columns.join('\u0000') !== this.columns.join('\u0000')) {
+            this.resetView(window);
+        }
+        this.pending.delete(window.row_start);
+        window.rows.forEach((cells, i) => {
+            this.rowCache.set(window.row_start + i, { index: window.index[i], cells: cells });
+        });
+
+        const filtered = window.total_rows !== window.total_rows_unfiltered
+            ? ` (filtered from ${window.total_rows_unfiltered.toLocaleString()})` : '';
+        this.statusEl.textContent = `${window.total_rows.toLocaleString()} rows${filtered}`;
+        this.scheduleRender();
+    }
+
+    renderHeader() {
+        const colEnd = Math.min(this.colStart + this.columns.length, this.totalCols);
+        this.colLabel.textContent = `Columns ${this.colStart + 1}-${colEnd} of ${this.totalCols}`;
+
+        // Keep the filter column choice for the columns currently shown
+        const selected = this.filterCol.value;
+        this.filterCol.innerHTML = '<option value="">All columns</option>';
+        this.columns.forEach((c, i) => {
+            const option = document.createElement('option');
+            option.value = String(this.colStart + i);
+            option.textContent = c;
+            this.filterCol.appendChild(option);
+        });
+        this.filterCol.value = Array.from(this.filterCol.options).some(o => o.value === selected) ? selected : '';
+
+        this.header.innerHTML = '';
+        this.header.appendChild(this.makeCell('', 'df-cell df-index'));
+        this.columns.forEach((c, i) => {
+            const position = this.colStart + i;
+            let arrow = '';
+            if (this.sortBy === position) arrow = this.ascending ? ' ▲' : ' ▼';
+            const cell = this.makeCell(`${c}${arrow}`, 'df-cell df-head');
+            cell.title = `${c} (${this.dtypes[i]})`;
+            cell.onclick = () => this.toggleSort(position);
+            this.header.appendChild(cell);
+        });
+    }
+
+    makeCell(text, className) {
+        const cell = document.createElement('div');
+        cell.className = className;
+        cell.textContent = text;
+        return cell;
+    }
+
+    scheduleRender() {
+        if (this.renderQueued) return;
+        this.renderQueued = true;
+        requestAnimationFrame(() => {
+            this.renderQueued = false;
+            this.render();
+        });
+    }
+
+    render() {
+        const first = Math.floor(this.viewport.scrollTop / DF_ROW_HEIGHT);
+        const visible = Math.ceil(this.viewport.clientHeight / DF_ROW_HEIGHT) + 1;
+        const start = Math.max(0, first - 10);
+        const end = Math.min(this.totalRows, first + visible + 10);
+
+        const fragment = document.createDocumentFragment();
+        for (let r = start; r < end; r++) {
+            const row = document.createElement('div');
+            row.className = 'df-row';
+            const data = this.rowCache.get(r);
+            row.appendChild(this.makeCell(data ? data.index : '', 'df-cell df-index'));
+            if (data) {
+                data.cells.forEach(v => row.appendChild(this.makeCell(v, 'df-cell')));
+            } else {
+                row.classList.add('loading');
+            }
+            fragment.appendChild(row);
+        }
+        this.rowsEl.style.transform = `translateY(${start * DF_ROW_HEIGHT}px)`;
+        this.rowsEl.replaceChildren(fragment);
+
+        this.requestMissing(start, end);
+    }
+
+    requestMissing(start, end) {
+        for (let block = Math.floor(start / DF_BLOCK_ROWS) * DF_BLOCK_ROWS; block < end; block += DF_BLOCK_ROWS) {
+            if (this.rowCache.has(block) || this.pending.has(block)) continue;
+            this.requestBlock(block);
+        }
+    }
+
+    requestBlock(block) {
+        this.pending.add(block);
+        socket.emit('inspect_dataframe', {
+            session_id: this.sessionId,
+            name: this.name,
+            request_id: ++this.requestSeq,
+            row_start: block,
+            row_count: DF_BLOCK_ROWS,
+            col_start: this.colStart,
+            col_count: DF_COL_COUNT,
+            sort_by: this.sortBy,
+            ascending: this.ascending,
+            filter: this.filter
+        });
+    }
+
+    toggleSort(position) {
+        if (this.sortBy !== position) {
+            this.sortBy = position;
+            this.ascending = true;
+        } else if (this.ascending) {
+            this.ascending = false;
+        } else {
+            this.sortBy = null;
+            this.ascending = true;
+        }
+        this.reload();
+    }
+
+    moveColumns(offset) {
+        const next = Math.max(0, Math.min(this.colStart + offset, Math.max(0, this.totalCols - 1)));
+        if (next === this.colStart) return;
+        this.colStart = next;
+        this.reload();
+    }
+
+    /** Drops the client cache and fetches the visible rows of the new view. */
+    reload() {
+        this.rowCache = new Map();
+        this.pending = new Set();
+        this.statusEl.textContent = 'Loading...';
+        this.viewport.scrollTop = 0;
+        this.requestBlock(0);
+        this.renderHeader();
+    }
+}
+
+socket.on('dataframe_window', (data) => {
+    const grid = activeDataFrameGrid;
+    if (!grid || !grid.root.isConnected || data.name !== grid.name) return;
+    grid.receive(data);
+});
+
 // New Sidebar Toggle Logic
 function toggleRightSidebar() {
     const sidebar = document.getElementById('right-sidebar');
@@ -586,10 +980,13 @@ sendBtn.addEventListener('click', () => {
     
     toggleSendButtonState(true);
     
-    socket.emit('start_run', { 
+    const runRequest = {
         message: text,
-        session_id: currentSessionId 
-    });
+        session_id: currentSessionId
+    };
+    // A new chat has no session to turn profiling on for yet
+    if (!currentSessionId && profileToggle.checked) runRequest.profile = true;
+    socket.emit('start_run', runRequest);
     getOrCreateStepContainer();
 });
 
@@ -625,6 +1022,11 @@ socket.on('session_created', (data) => {
 });
 
 socket.on('history_list', (data) => {
+    // Keep showing search hits; refresh them since the history changed
+    if (searchState) {
+        requestSearch(searchState.query);
+        return;
+    }
     historyList.innerHTML = ''; 
     
     const newChatBtn = document.createElement('div');
@@ -698,6 +1100,81 @@ document.addEventListener('click', () => {
     });
 });
 
+// --- History Search ---
+
+historySearch.addEventListener('input', () => {
+    clearTimeout(searchDebounce);
+    searchDebounce = setTimeout(() => {
+        const query = historySearch.value.trim();
+        if (!query) {
+            searchState = null;
+            socket.emit('get_history');
+            return;
+        }
+        requestSearch(query);
+    }, 250);
+});
+
+function requestSearch(query, offset = 0) {
+    searchState = { query: query, offset: offset, requestId: ++searchRequestCounter };
+    socket.emit('search_sessions', {
+        query: query,
+        offset: offset,
+        page_size: SEARCH_PAGE_SIZE,
+        request_id: searchState.requestId
+    });
+}
+
+socket.on('search_results', (data) => {
+    // Drop responses to queries the user has typed past
+    if (!searchState || data.request_id !== searchState.requestId) return;
+
+    if (data.offset === 0) historyList.innerHTML = '';
+    const more = historyList.querySelector('.search-more');
+    if (more) more.remove();
+
+    if (data.offset === 0 && data.results.length === 0) {
+        const empty = document.createElement('div');
+        empty.className = 'search-empty';
+        empty.textContent = 'No matching chats';
+        historyList.appendChild(empty);
+        return;
+    }
+
+    data.results.forEach(hit => {
+        const item = document.createElement('div');
+        item.className = 'history-item search-result';
+        item.dataset.id = hit.session_id;
+        if (hit.session_id === currentSessionId) item.classList.add('active');
+
+        const title = document.createElement('div');
+        title.className = 'search-result-title';
+        title.textContent = hit.preview || 'Untitled chat';
+
+        const snippet = document.createElement('div');
+        snippet.className = 'search-result-snippet';
+        snippet.innerHTML = hit.snippet; // HTML-escaped by the server, matches wrapped in <mark>
+
+        const meta = document.createElement('div');
+        meta.style.cssText = 'font-size:0.8em; opacity:0.7';
+        meta.textContent = hit.step_index === null ? hit.timestamp || '' : `Step ${hit.step_index} · ${hit.timestamp || ''}`;
+
+        item.appendChild(title);
+        item.appendChild(snippet);
+        item.appendChild(meta);
+        item.onclick = () => loadSession(hit.session_id);
+        historyList.appendChild(item);
+    });
+
+    if (data.has_more) {
+        const moreBtn = document.createElement('div');
+        moreBtn.className = 'search-more';
+        moreBtn.textContent = 'Show more results';
+        moreBtn.onclick = () => requestSearch(data.query, data.offset + data.results.length);
+        historyList.appendChild(moreBtn);
+    }
+});
+
 function loadSession(id) {
     if (isGenerating && id !== currentSessionId) {
     }
@@ -716,27 +1193,11 @@ function loadSession(id) {
     socket.emit('load_session', { id: id });
 }
 
-socket.on('reload_chat', (data) => {
-    chatContainer.classList.remove('loading');
-    chatContainer.innerHTML = '';
-    
-    if (variableList) {
-        variableList.innerHTML = '<div class="empty-state">No variables active</div>';
-    }
-    
-    if (data.id) currentSessionId = data.id;
-    else currentSessionId = null; 
-
-    toggleSendButtonState(false);
-
-    // Case 1: New/Empty Chat
-    if (!data.steps || data.steps.length === 0) {
-        renderWelcomeScreen();
-        return;
-    }
-    
-    // Case 2: Restore History
-    data.steps.forEach(step => {
+/**
+ * Renders a list of history steps (as sent by the server) into renderRoot.
+ */
+function renderHistorySteps(steps) {
+    steps.forEach(step => {
         if ("task" in step) {
             createMessageBubble('user').textContent = step.task;
         } 
@@ -756,10 +1217,95 @@ socket.on('reload_chat', (data) => {
             }
         }
     });
+}
+
+function updateHistoryLoader() {
+    let loader = chatContainer.querySelector('.history-loader');
+    if (historyPaging && historyPaging.hasMore) {
+        if (!loader) {
+            loader = document.createElement('div');
+            loader.className = 'history-loader';
+            loader.textContent = 'Scroll up to load earlier messages';
+            chatContainer.prepend(loader);
+        }
+        loader.textContent = historyPaging.loading ? 'Loading earlier messages...' : 'Scroll up to load earlier messages';
+    } else if (loader) {
+        loader.remove();
+    }
+}
+
+function requestOlderHistory() {
+    if (!historyPaging || !historyPaging.hasMore || historyPaging.loading) return;
+    if (historyPaging.id !== currentSessionId) return;
+
+    historyPaging.loading = true;
+    updateHistoryLoader();
+    socket.emit('load_session_page', { id: historyPaging.id, before: historyPaging.startIndex });
+}
+
+socket.on('reload_chat', (data) => {
+    chatContainer.classList.remove('loading');
+    chatContainer.innerHTML = '';
+    currentStepContainer = null;
+    resetStreamState();
+    pendingDeferredFields.clear();
+    
+    if (variableList) {
+        variableList.innerHTML = '<div class="empty-state">No variables active</div>';
+    }
+    
+    if (data.id) currentSessionId = data.id;
+    else currentSessionId = null; 
+    resetProfilePanel();
+
+    toggleSendButtonState(false);
+
+    historyPaging = data.id ? {
+        id: data.id,
+        startIndex: data.start_index || 0,
+        hasMore: !!data.has_more,
+        loading: false
+    } : null;
+
+    // Case 1: New/Empty Chat
+    if (!data.steps || data.steps.length === 0) {
+        renderWelcomeScreen();
+        return;
+    }
+    
+    // Case 2: Restore the most recent page of history
+    renderHistorySteps(data.steps);
+    updateHistoryLoader();
     
     scrollToBottom(true);
 });
 
+socket.on('session_page', (data) => {
+    if (!historyPaging || data.id !== historyPaging.id) return;
+
+    // Render the older page off-screen, then prepend it while keeping the viewport in place
+    const fragmentRoot = document.createElement('div');
+    renderRoot = fragmentRoot;
+    try {
+        renderHistorySteps(data.steps);
+    } finally {
+        renderRoot = chatContainer;
+    }
+
+    const loader = chatContainer.querySelector('.history-loader');
+    const anchor = loader ? loader.nextSibling : chatContainer.firstChild;
+    const previousHeight = chatContainer.scrollHeight;
+
+    const nodes = Array.from(fragmentRoot.childNodes);
+    nodes.forEach(node => chatContainer.insertBefore(node, anchor));
+    chatContainer.scrollTop += chatContainer.scrollHeight - previousHeight;
+
+    historyPaging.startIndex = data.start_index;
+    historyPaging.hasMore = !!data.has_more;
+    historyPaging.loading = false;
+    updateHistoryLoader();
+});
+
 
 // --- Socket Events (Streaming & Logic) ---
 
@@ -767,90 +1313,266 @@ function isForCurrentSession(data) {
     return data.session_id === currentSessionId;
 }
 
-/* Helper to unescape JSON string content manually */
-function unescapeJson(str) {
-    return str.replace(/\\n/g, '\n')
-              .replace(/\\"/g, '"')
-              .replace(/\\\\/g, '\\')
-              .replace(/\\t/g, '\t');
+/**
+ * Incremental parser for the model's streamed output.
+ * Keeps cursor state across deltas so each chunk is scanned once, and returns
+ * only the thought/code text added by that chunk. Handles both output formats:
+ *  - JSON mode (use_structured_outputs_internally=True): {"thought": "...", "code": "..."}
+ *  - Tag mode (standard smolagents): thought text... <code>code...</code>
+ */
+class StreamParser {
+    constructor() {
+        this.mode = null;        // null until the first non-whitespace char, then 'json' | 'text'
+        this.thought = "";
+        this.code = "";
+        this.hasCode = false;
+
+        // Tag mode state
+        this.section = 'thought'; // 'thought' | 'code' | 'done'
+        this.pending = "";        // tail that may be the start of a <code> / </code> tag
+
+        // JSON mode state
+        this.inString = false;
+        this.expectValue = false;
+        this.key = "";
+        this.lastKey = "";
+        this.target = null;       // 'thought' | 'code' while inside their string values
+        this.escape = null;       // null | '' (after backslash) | 'uXXX' (reading \u escape)
+    }
+
+    push(chunk) {
+        const out = { thought: "", code: "" };
+        if (!chunk) return out;
+
+        if (this.mode === null) {
+            const trimmed = chunk.replace(/^\s+/, '');
+            if (!trimmed) return out;
+            this.mode = trimmed.startsWith('{') ? 'json' : 'text';
+            // Leading whitespace is irrelevant in both modes
+            chunk = trimmed;
+        }
+
+        if (this.mode === 'json') this._pushJson(chunk, out);
+        else this._pushText(chunk, out);
+
+        this.thought += out.thought;
+        this.code += out.code;
+        return out;
+    }
+
+    _pushText(chunk, out) {
+        let buf = this.pending + chunk;
+        this.pending = "";
+
+        while (buf) {
+            if (this.section === 'done') return;
+
+            const tag = this.section === 'thought' ? '<code>' : '</code>';
+            const idx = buf.indexOf(tag);
+            if (idx !== -1) {
+                out[this.section] += buf.substring(0, idx);
+                buf = buf.substring(idx + tag.length);
+                if (this.section === 'thought') {
+                    this.section = 'code';
+                    this.hasCode = true;
+                } else {
+                    this.section = 'done';
+                }
+                continue;
+            }
+
+            // Hold back a suffix that could be the beginning of the tag
+            let keep = Math.min(tag.length - 1, buf.length);
+            while (keep > 0 && !tag.startsWith(buf.substring(buf.length - keep))) keep--;
+            out[this.section] += buf.substring(0, buf.length - keep);
+            this.pending = buf.substring(buf.length - keep);
+            return;
+        }
+    }
+
+    _pushJson(chunk, out) {
+        const ESCAPES = { n: '\n', t: '\t', r: '\r', b: '\b', f: '\f', '"': '"', '\\': '\\', '/': '/' };
+
+        for (let i = 0; i < chunk.length; i++) {
+            const ch = chunk[i];
+
+            if (!this.inString) {
+                if (ch === '"') {
+                    this.inString = true;
+                    if (this.expectValue && (this.lastKey === 'thought' || this.lastKey === 'code')) {
+                        this.target = this.lastKey;
+                        if (this.target === 'code') this.hasCode = true;
+                    } else {
+                        this.target = null;
+                        this.key = "";
+                    }
+                } else if (ch === ':') {
+                    this.expectValue = true;
+                } else if (ch === ',' || ch === '{') {
+                    this.expectValue = false;
+                }
+                continue;
+            }
+
+            // Inside a string
+            let decoded = null;
+            if (this.escape !== null) {
+                if (this.escape === '' && ch !== 'u') {
+                    decoded = ESCAPES[ch] !== undefined ? ESCAPES[ch] : ch;
+                    this.escape = null;
+                } else {
+                    this.escape += ch;
+                    if (this.escape.length === 5) { // 'u' + 4 hex digits
+                        decoded = String.fromCharCode(parseInt(this.escape.substring(1), 16));
+                        this.escape = null;
+                    }
+                }
+            } else if (ch === '\\') {
+                this.escape = '';
+            } else if (ch === '"') {
+                this.inString = false;
+                if (this.target === null && !this.expectValue) this.lastKey = this.key;
+                this.target = null;
+                this.expectValue = false;
+            } else {
+                decoded = ch;
+            }
+
+            if (decoded === null) continue;
+            if (this.target) out[this.target] += decoded;
+            else if (!this.expectValue) this.key += decoded;
+        }
+    }
 }
 
-/* Helper to parse partial stream */
-function parseStream(text) {
-    // 1. JSON Mode (use_structured_outputs_internally=True)
-    if (text.trim().startsWith('{')) {
-        const thoughtMatch = text.match(/"thought"\s*:\s*"((?:\\.|[^"\\])*)(?:"|$)/);
-        const codeMatch = text.match(/"code"\s*:\s*"((?:\\.|[^"\\])*)(?:"|$)/);
-        
-        return {
-            mode: 'json',
-            thought: thoughtMatch ? unescapeJson(thoughtMatch[1]) : "",
-            code: codeMatch ? unescapeJson(codeMatch[1]) : ""
-        };
+/**
+ * Appends streamed thought/code to the "thinking" element without re-rendering what is already shown.
+ * Completed markdown blocks are parsed once; only the trailing block is re-parsed each tick.
+ * Completed code lines are highlighted once; only the current line is re-rendered.
+ */
+class StreamRenderer {
+    constructor(root) {
+        this.root = root;
+        this.thoughtEl = null;
+        this.thoughtDone = null;
+        this.thoughtTail = null;
+        this.codeDone = null;
+        this.codeTail = null;
+        this.thoughtPending = "";
+        this.codePending = "";
     }
-    
-    // 2. Text/Tag Mode (Standard smolagents)
-    // Pattern: text... <code>code...
-    const codeStart = text.indexOf('<code>');
-    if (codeStart !== -1) {
-        let thought = text.substring(0, codeStart);
-        let code = text.substring(codeStart + 6); // 6 is len of <code>
-        
-        // Remove closing tag if present
-        const codeEnd = code.lastIndexOf('</code>');
-        if (codeEnd !== -1) {
-            code = code.substring(0, codeEnd);
+
+    append(thought, code) {
+        if (!thought && !code) return;
+
+        if (!this.thoughtEl) {
+            // First content replaces the "Thinking..." placeholder
+            this.root.innerHTML = "";
+            this.thoughtEl = document.createElement('div');
+            this.thoughtEl.className = 'model-thought';
+            this.thoughtEl.style.marginBottom = '10px';
+            this.thoughtDone = document.createElement('div');
+            this.thoughtTail = document.createElement('div');
+            this.thoughtEl.appendChild(this.thoughtDone);
+            this.thoughtEl.appendChild(this.thoughtTail);
+            this.root.appendChild(this.thoughtEl);
+        }
+
+        if (thought) this._appendThought(thought);
+        if (code) this._appendCode(code);
+    }
+
+    _appendThought(text) {
+        this.thoughtPending += text;
+
+        // Commit everything up to the last blank line that is not inside a ``` fence
+        let cut = this.thoughtPending.lastIndexOf('\n\n');
+        while (cut !== -1 && (this.thoughtPending.substring(0, cut).split('```').length - 1) % 2 !== 0) {
+            cut = this.thoughtPending.lastIndexOf('\n\n', cut - 1);
+        }
+        if (cut > 0) {
+            const block = this.thoughtPending.substring(0, cut);
+            this.thoughtDone.insertAdjacentHTML('beforeend', marked.parse(block));
+            this.thoughtPending = this.thoughtPending.substring(cut + 2);
+        }
+        this.thoughtTail.innerHTML = this.thoughtPending ? marked.parse(this.thoughtPending) : "";
+    }
+
+    _appendCode(text) {
+        if (!this.codeDone) {
+            const wrap = document.createElement('div');
+            wrap.className = 'code-block';
+            const pre = document.createElement('pre');
+            const codeEl = document.createElement('code');
+            codeEl.className = 'hljs language-python';
+            this.codeDone = document.createElement('span');
+            this.codeTail = document.createTextNode("");
+            codeEl.appendChild(this.codeDone);
+            codeEl.appendChild(this.codeTail);
+            pre.appendChild(codeEl);
+            wrap.appendChild(pre);
+            this.root.appendChild(wrap);
         }
-        return { mode: 'text', thought: thought, code: code };
+
+        this.codePending += text;
+        const cut = this.codePending.lastIndexOf('\n');
+        if (cut !== -1) {
+            const lines = this.codePending.substring(0, cut + 1);
+            this.codeDone.insertAdjacentHTML('beforeend',
+                hljs.highlight(lines, { language: 'python', ignoreIllegals: true }).value);
+            this.codePending = this.codePending.substring(cut + 1);
+        }
+        this.codeTail.textContent = this.codePending;
     }
+}
 
-    // 3. Plain Text
-    return { mode: 'text', thought: text, code: null };
+let streamParser = new StreamParser();
+let streamRenderer = null;
+let pendingStreamText = "";   // Received deltas not yet handed to the parser
+let streamStatusLine = null;  // First non-empty thought line once complete
+
+function resetStreamState() {
+    currentStreamText = "";
+    streamParser = new StreamParser();
+    streamRenderer = null;
+    pendingStreamText = "";
+    streamStatusLine = null;
 }
 
 /**
- * Renders the current buffered stream text to the UI.
+ * Renders the deltas received since the last tick to the UI.
  */
 function renderCurrentStream() {
+    streamRenderTimeout = null; // Clear the timeout flag
+
     // This creates/finds the 'thinking' element AND makes sure the developer view wrapper exists
     const div = getOrCreateStepContainer();
-    
-    const parsed = parseStream(currentStreamText);
-    
-    let html = "";
-    if (parsed.thought) {
-        // Render thought (Markdown supported)
-        html += `<div class="model-thought" style="margin-bottom: 10px;">${marked.parse(parsed.thought)}</div>`;
-    }
-    if (parsed.code) {
-        // Render code block
-        html += `<div class="code-block"><pre><code class="language-python">${parsed.code}</code></pre></div>`;
-    }
-    
-    if (html) {
-        div.innerHTML = html;
-        // Highlight code blocks
-        div.querySelectorAll('pre code').forEach((block) => {
-            hljs.highlightElement(block);
-        });
-    } else {
-        // Fallback if empty
-        div.textContent = currentStreamText;
+
+    const chunk = pendingStreamText;
+    pendingStreamText = "";
+    const added = streamParser.push(chunk);
+
+    if (!streamRenderer || streamRenderer.root !== div) {
+        streamRenderer = new StreamRenderer(div);
     }
+    streamRenderer.append(added.thought, added.code);
     
     // Update the Status Panel Text with the first line of thought
     const group = div.closest('.agent-process-group');
-    if (group) {
+    if (group && streamStatusLine === null) {
         const statusText = group.querySelector('.status-text');
         if (statusText) {
             // Use parsed thought for cleaner status (avoids JSON syntax)
-            const sourceText = parsed.thought || currentStreamText;
+            const sourceText = streamParser.thought || (streamParser.mode === 'json' ? "" : currentStreamText);
             
-            // Find first non-empty line
+            // Find first non-empty line; freeze it once the line is complete
             const match = sourceText.match(/\S.*$/m); 
             if (match) {
                  const line = match[0];
                  statusText.textContent = line.length > 80 ? line.substring(0, 80) + "..." : line;
+                 if (sourceText.indexOf('\n', match.index) !== -1 || streamParser.hasCode) {
+                     streamStatusLine = line;
+                 }
             } else if (sourceText.length > 0) {
                  statusText.textContent = "Thinking..."; 
             }
@@ -858,13 +1580,13 @@ function renderCurrentStream() {
     }
 
     scrollToBottom();
-    streamRenderTimeout = null; // Clear the timeout flag
 }
 
 socket.on('stream_delta', (data) => {
     if (!isForCurrentSession(data)) return;
     
     currentStreamText += data.content;
+    pendingStreamText += data.content;
 
     if (!streamRenderTimeout) {
         streamRenderTimeout = setTimeout(renderCurrentStream, 50); // 50ms = 20fps
@@ -888,6 +1610,33 @@ socket.on('tool_start', (data) => {
     }
 });
 
+socket.on('run_queued', (data) => {
+    if (!isForCurrentSession(data)) return;
+
+    // The server has no free worker yet; show our place in line until the run starts
+    const div = getOrCreateStepContainer();
+    const text = `Queued (position ${data.position})...`;
+    div.innerHTML = `<span class="spinner">⏳</span> ${text}`;
+
+    const group = div.closest('.agent-process-group');
+    if (group) {
+        const statusText = group.querySelector('.status-text');
+        if (statusText) statusText.textContent = text;
+    }
+});
+
+socket.on('agent_start', (data) => {
+    if (!isForCurrentSession(data)) return;
+
+    // Run picked up by a worker: restore the thinking placeholder if we were queued
+    if (currentStepContainer && !currentStreamText) {
+        currentStepContainer.innerHTML = '<span class="spinner">⚡</span> Thinking...';
+        const group = currentStepContainer.closest('.agent-process-group');
+        const statusText = group ? group.querySelector('.status-text') : null;
+        if (statusText) statusText.textContent = "Agent steps...";
+    }
+});
+
 socket.on('action_step', (data) => {
     if (!isForCurrentSession(data)) return;
 
@@ -907,6 +1656,11 @@ socket.on('variable_state', (data) => {
     renderVariables(data.variables);
 });
 
+socket.on('variable_delta', (data) => {
+    if (data.session_id !== currentSessionId) return;
+    applyVariableDelta(data);
+});
+
 socket.on('final_answer', (data) => {
     if (!isForCurrentSession(data)) return;
 
@@ -954,7 +1708,7 @@ socket.on('run_complete', (data) => {
             currentStepContainer.remove(); 
         }
         currentStepContainer = null;
-        currentStreamText = "";
+        resetStreamState();
     }
 });
 
@@ -966,6 +1720,114 @@ socket.on('error', (data) => {
 });
 
 
+// --- Profiling Panel ---
+
+const profileToggle = document.getElementById('profile-toggle');
+const profileList = document.getElementById('profile-list');
+
+function resetProfilePanel() {
+    profileToggle.checked = false;
+    profileList.innerHTML = '<div class="empty-state">No profiles</div>';
+    if (currentSessionId) socket.emit('get_profiles', { session_id: currentSessionId });
+}
+
+profileToggle.addEventListener('change', () => {
+    // Without a session, the state is sent with the first start_run
+    if (currentSessionId) {
+        socket.emit('set_profiling', { session_id: currentSessionId, enabled: profileToggle.checked });
+    }
+});
+
+socket.on('profiling_state', (data) => {
+    if (isForCurrentSession(data)) profileToggle.checked = data.enabled;
+});
+
+socket.on('profile_list', (data) => {
+    if (!isForCurrentSession(data)) return;
+    profileToggle.checked = data.enabled;
+    profileList.innerHTML = '';
+    if (!data.profiles.length) {
+        profileList.innerHTML = '<div class="empty-state">No profiles</div>';
+        return;
+    }
+    data.profiles.forEach((profile, i) => profileList.appendChild(createProfileCard(profile, i === 0)));
+});
+
+socket.on('profile_ready', (data) => {
+    if (!isForCurrentSession(data)) return;
+    const empty = profileList.querySelector('.empty-state');
+    if (empty) empty.remove();
+    if (data.error) {
+        const note = document.createElement('div');
+        note.className = 'run-profile-note';
+        note.textContent = data.error;
+        profileList.prepend(note);
+        return;
+    }
+    profileList.querySelectorAll('.run-profile.expanded').forEach(card => card.classList.remove('expanded'));
+    profileList.prepend(createProfileCard(data.profile, true));
+});
+
+/**
+ * A stored run profile: where the time went by phase, the top functions by own time
+ * and the largest allocation sites. The header toggles the details.
+ */
+function createProfileCard(profile, expanded) {
+    const summary = profile.summary;
+    const card = document.createElement('div');
+    card.className = 'run-profile' + (expanded ? ' expanded' : '');
+
+    const header = document.createElement('div');
+    header.className = 'run-profile-header';
+    const title = document.createElement('span');
+    title.textContent = `${profile.created_at} · ${summary.duration_s.toFixed(2)} s`;
+    const download = document.createElement('a');
+    download.href = `/profiles/${profile.id}.prof`;
+    download.textContent = '.prof';
+    download.title = 'Download (python -m pstats, snakeviz)';
+    download.addEventListener('click', (e) => e.stopPropagation());
+    header.append(title, download);
+    header.addEventListener('click', () => card.classList.toggle('expanded'));
+    card.appendChild(header);
+
+    const details = document.createElement('div');
+    details.className = 'run-profile-details';
+    details.appendChild(profileTable(['Phase', 's', '%'], summary.phases.map(p => [
+        p.name, p.seconds.toFixed(3), (100 * p.seconds / (summary.duration_s || 1)).toFixed(0)
+    ])));
+    details.appendChild(profileTable(['Function', 'Calls', 'Own s', 'Cum s'], summary.hotspots.map(h => [
+        h.function, h.calls, h.tottime.toFixed(4), h.cumtime.toFixed(4)
+    ])));
+    if (summary.memory) {
+        details.appendChild(profileTable([`Allocated (peak ${summary.memory.peak_kib} KiB)`, 'KiB', 'Blocks'],
+            summary.memory.top.map(m => [m.location, m.size_kib, m.count])));
+    }
+    card.appendChild(details);
+    return card;
+}
+
+function profileTable(columns, rows) {
+    const table = document.createElement('table');
+    table.className = 'run-profile-table';
+    const head = table.createTHead().insertRow();
+    columns.forEach(name => {
+        const th = document.createElement('th');
+        th.textContent = name;
+        head.appendChild(th);
+    });
+    const body = table.createTBody();
+    rows.forEach(values => {
+        const row = body.insertRow();
+        values.forEach(value => {
+            const cell = row.insertCell();
+            cell.textContent = value;
+            cell.title = value;
+        });
+    });
+    return table;
+}
+
+
 // --- Modal Logic (Renaming/Deleting) ---
 
 const modalOverlay = document.getElementById('modal-overlay');
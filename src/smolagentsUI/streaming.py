@@ -0,0 +1,196 @@
+import heapq
+import itertools
+import time
+import threading
+from typing import Any, Callable, Dict
+
+
+class StreamMetrics:
+    def __init__(self):
+        """
+        Thread-safe totals of stream_delta traffic across all runs, used to tune coalescing.
+        """
+        self.lock = threading.Lock()
+        self.frames_in = 0      # deltas produced by the agent
+        self.frames_out = 0     # stream_delta frames emitted to clients
+        self.bytes_out = 0      # UTF-8 bytes of emitted delta content
+        self.active_seconds = 0.0
+
+    def record(self, frames_in: int, frames_out: int, bytes_out: int, seconds: float):
+        with self.lock:
+            self.frames_in += frames_in
+            self.frames_out += frames_out
+            self.bytes_out += bytes_out
+            self.active_seconds += seconds
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            return _rates(self.frames_in, self.frames_out, self.bytes_out, self.active_seconds)
+
+
+class StreamCoalescer:
+    def __init__(self, send: Callable[[Dict], None], window_ms: float = 50, max_bytes: int = 4096,
+                 metrics: StreamMetrics = None):
+        """
+        Batches consecutive 'stream_delta' events into fewer, larger frames.
+
+        A buffered delta is sent once `window_ms` has passed since the last sent frame or
+        once the buffer reaches `max_bytes`, whichever comes first. The window is enforced
+        by a deadline, so a delta buffered just before the model pauses (tool call, slow
+        token) still goes out within `window_ms`. Any other event (action_step, tool_start,
+        final_answer...) flushes the buffer first, so step boundaries are never delayed.
+        Slow streams pass through unbatched.
+
+        Parameters:
+        -----------
+        send : Callable
+            Called with every outgoing event, in order. Deadline flushes call it from the
+            deadline thread; calls never overlap.
+        window_ms : float
+            Minimum time between two sent stream_delta frames. 0 disables time batching.
+        max_bytes : int
+            Buffer size that forces a flush. 0 disables size batching.
+        metrics : StreamMetrics, Optional
+            Receives this stream's totals when close() is called.
+        """
+        self.send = send
+        self.window = max(0.0, window_ms) / 1000.0
+        self.max_bytes = max(0, max_bytes)
+        self.metrics = metrics
+
+        # Serializes sends between the run thread and the deadline thread, keeping them in order
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._buffered_bytes = 0
+        self._template = None          # the first buffered event, reused for the merged frame
+        self._deadline_armed = False
+        self._closed = False
+        self._started = time.monotonic()
+        self._last_emit = 0.0
+
+        self.frames_in = 0
+        self.frames_out = 0
+        self.bytes_out = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0 or self.max_bytes > 0
+
+    def push(self, event: Dict):
+        """ Adds an event. Sends it, or the buffered deltas merged with it, if they are due. """
+        with self._lock:
+            if event.get('type') != 'stream_delta':
+                self._flush()
+                self.send(event)
+                return
+
+            content = event.get('content') or ""
+            n_bytes = len(content.encode('utf-8'))
+            self.frames_in += 1
+
+            if not self.enabled:
+                self._count_out(n_bytes)
+                self.send(event)
+                return
+
+            if self._template is None:
+                self._template = event
+            self._buffer.append(content)
+            self._buffered_bytes += n_bytes
+
+            now = time.monotonic()
+            if (self.max_bytes and self._buffered_bytes >= self.max_bytes) or (now - self._last_emit >= self.window):
+                self._flush()
+            elif not self._deadline_armed:
+                self._deadline_armed = True
+                _deadlines.call_at(self._last_emit + self.window, self._on_deadline)
+
+    def flush(self):
+        """ Sends the buffered deltas merged into a single stream_delta event, if any. """
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        """ Flushes the buffer and reports this stream's totals to the shared metrics. """
+        with self._lock:
+            self._flush()
+            self._closed = True
+        if self.metrics is not None:
+            self.metrics.record(self.frames_in, self.frames_out, self.bytes_out, time.monotonic() - self._started)
+
+    def stats(self) -> Dict[str, Any]:
+        return _rates(self.frames_in, self.frames_out, self.bytes_out, time.monotonic() - self._started)
+
+    def _on_deadline(self):
+        with self._lock:
+            self._deadline_armed = False
+            if not self._closed:
+                self._flush()
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        merged = dict(self._template)
+        merged['content'] = "".join(self._buffer)
+        self._count_out(self._buffered_bytes)
+
+        self._buffer = []
+        self._buffered_bytes = 0
+        self._template = None
+        self.send(merged)
+
+    def _count_out(self, n_bytes: int):
+        self.frames_out += 1
+        self.bytes_out += n_bytes
+        self._last_emit = time.monotonic()
+
+
+class _DeadlineThread:
+    def __init__(self):
+        """
+        One daemon thread calling functions at given time.monotonic() deadlines, shared by
+        all coalescers so a buffered stream does not cost a timer thread.
+        """
+        self._heap = []
+        self._order = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def call_at(self, when: float, fn: Callable[[], None]):
+        with self._cond:
+            heapq.heappush(self._heap, (when, next(self._order), fn))
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="smolagentsUI-stream-deadlines", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                when, _, fn = self._heap[0]
+                delay = when - time.monotonic()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                heapq.heappop(self._heap)
+            try:
+                fn()
+            except Exception as e:
+                print(f"Warning: stream deadline flush failed: {e}")
+
+
+_deadlines = _DeadlineThread()
+
+
+def _rates(frames_in: int, frames_out: int, bytes_out: int, seconds: float) -> Dict[str, Any]:
+    return {
+        "frames_in": frames_in,
+        "frames_out": frames_out,
+        "bytes_out": bytes_out,
+        "seconds": round(seconds, 3),
+        "frames_per_second": round(frames_out / seconds, 2) if seconds > 0 else 0.0,
+        "bytes_per_second": round(bytes_out / seconds, 2) if seconds > 0 else 0.0,
+        "coalescing_ratio": round(frames_in / frames_out, 2) if frames_out else 0.0,
+    }
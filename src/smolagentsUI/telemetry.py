@@ -0,0 +1,103 @@
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Columns of step_telemetry after session_id and step_index, in table order
+TELEMETRY_COLUMNS = ("run_id", "step_type", "step_number", "started_at", "duration_s",
+                     "input_tokens", "output_tokens", "is_error", "model_id")
+
+# Time buckets: strftime formats understood by both SQLite and Python, applied in local time
+TIME_BUCKETS = {"hour": "%Y-%m-%d %H:00", "day": "%Y-%m-%d", "week": "%Y-W%W", "month": "%Y-%m"}
+
+# group_by values of a rollup. "step" lists individual steps, slowest first.
+GROUPS = tuple(TIME_BUCKETS) + ("session", "model", "step")
+
+
+def step_telemetry_rows(session_id: str, steps: List[Dict], indices: Iterable[int],
+                        model_id: Optional[str]) -> List[Tuple]:
+    """
+    Telemetry rows (session_id, step_index, *TELEMETRY_COLUMNS) of the action and planning steps
+    at `indices` of a session's serialized steps. A run is identified by the step_index of the
+    task step that started it.
+    """
+    wanted = set(indices)
+    rows = []
+    run_id = None
+    for index, step in enumerate(steps):
+        if "task" in step and "step_number" not in step:
+            run_id = index
+        if index not in wanted:
+            continue
+        step_type = "action" if "step_number" in step else "planning" if "plan" in step else None
+        if step_type is None:
+            continue
+        timing = step.get("timing") or {}
+        start, end = timing.get("start_time"), timing.get("end_time")
+        usage = step.get("token_usage") or {}
+        rows.append((session_id, index, run_id, step_type, step.get("step_number"), start,
+                     end - start if start is not None and end is not None else None,
+                     usage.get("input_tokens"), usage.get("output_tokens"),
+                     1 if step.get("error") else 0, model_id))
+    return rows
+
+
+def parse_time(value: Any) -> Optional[float]:
+    """ Unix seconds from a number or a local "YYYY-MM-DD[ HH:MM[:SS]]" string. None stays None. """
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).strip().replace("T", " ")
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            return time.mktime(time.strptime(text, fmt))
+        except ValueError:
+            continue
+    raise ValueError(f"Invalid time '{value}', expected unix seconds or YYYY-MM-DD[ HH:MM[:SS]]")
+
+
+def group_key(group_by: str, row: Dict) -> Any:
+    """ The rollup key of a telemetry row, as the SQL rollup computes it. """
+    if group_by in TIME_BUCKETS:
+        started = row["started_at"]
+        return time.strftime(TIME_BUCKETS[group_by], time.localtime(started)) if started is not None else None
+    if group_by == "session":
+        return row["session_id"]
+    return row["model_id"]
+
+
+def rollup(rows: List[Dict], group_by: str, limit: int) -> List[Dict]:
+    """
+    Aggregates telemetry rows in Python, for in-memory mode. Same output as
+    ConversationManager.telemetry_rollup on a database.
+    """
+    if group_by == "step":
+        ranked = sorted((r for r in rows if r["duration_s"] is not None), key=lambda r: r["duration_s"], reverse=True)
+        return [dict(r) for r in ranked[:limit]]
+
+    groups = {}
+    for row in rows:
+        groups.setdefault(group_key(group_by, row), []).append(row)
+    result = []
+    for key, members in groups.items():
+        durations = [r["duration_s"] for r in members if r["duration_s"] is not None]
+        result.append({
+            "key": key,
+            "runs": len({(r["session_id"], r["run_id"]) for r in members}),
+            "steps": len(members),
+            "errors": sum(r["is_error"] for r in members),
+            "input_tokens": sum(r["input_tokens"] or 0 for r in members),
+            "output_tokens": sum(r["output_tokens"] or 0 for r in members),
+            "duration_s": sum(durations),
+            "avg_step_s": sum(durations) / len(durations) if durations else None,
+            "max_step_s": max(durations) if durations else None,
+        })
+    # As in SQL: time buckets newest first, sessions and models by total step time
+    if group_by in TIME_BUCKETS:
+        result.sort(key=lambda r: r["key"] or "", reverse=True)
+    else:
+        result.sort(key=lambda r: r["duration_s"], reverse=True)
+    return result[:limit]
@@ -1,8 +1,14 @@
-from typing import Any, Tuple, Dict
+from typing import Any, Callable, Tuple, Dict, Optional
+import sys
+import inspect
+import hashlib
 import json
 import io
 import base64
 import dill
+from .preview import preview_text, preview_table, PreviewLimits, CHAT_LIMITS
+from .artifact_store import store_artifact, ARTIFACT_ROUTE
+from .metrics import SERIALIZE_SECONDS
 
 try:
     from PIL import Image
@@ -21,57 +27,206 @@ try:
 except ImportError:
     pd = None
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# Strings longer than this are never parsed as JSON (observation logs can be megabytes)
+JSON_SNIFF_MAX_CHARS = 65536
 
 def serialize_step(step: Any) -> Any:
-    """ Recursive function to make step a JSON-serializable object. """
-    if step is None:
-        return None
-    elif isinstance(step, (str, int, float, bool)):
-        # Try to parse string as JSON if it looks like a JSON object/array
-        if isinstance(step, str):
-            try:
-                if (step.startswith("{") and step.endswith("}")) or (step.startswith("[") and step.endswith("]")):
-                    parsed = json.loads(step)
-                    return serialize_step(parsed)
-            except json.JSONDecodeError:
-                pass
-        return step
-    elif isinstance(step, (list, tuple)):
-        return [serialize_step(item) for item in step]
-    elif isinstance(step, dict):
-        return {str(k): serialize_step(v) for k, v in step.items()}
-    # PIL Image -> Base64
-    elif Image and isinstance(step, Image.Image): 
-        try:
-            buffered = io.BytesIO()
-            step.save(buffered, format="PNG")
-            img_str = base64.b64encode(buffered.getvalue()).decode("utf-8")
-            return f"data:image/png;base64,{img_str}"
-        except Exception:
-            return "[Error serializing Image]"
-    # Matplotlib Figure -> Base64
-    elif plt and hasattr(step, 'savefig'):
+    """
+    Recursive function to make step a JSON-serializable object.
+
+    The conversion for each type is looked up once and cached (see _get_handler).
+    Objects that contain themselves are serialized once; repeated visits on the
+    same path become "[Circular reference: <type>]".
+    """
+    return _serialize(step, set())
+
+def _serialize(value: Any, active: set) -> Any:
+    handler = _HANDLERS.get(type(value))
+    if handler is None:
+        handler = _get_handler(type(value))
+    return handler(value, active)
+
+def _get_handler(cls: type) -> Callable[[Any, set], Any]:
+    """ Picks the conversion for a type, in the same order of precedence as the isinstance checks it replaces. """
+    if cls is type(None):
+        handler = _serialize_none
+    elif issubclass(cls, str):
+        handler = _serialize_str
+    elif issubclass(cls, (int, float, bool)):
+        handler = _serialize_scalar
+    elif issubclass(cls, (list, tuple)):
+        handler = _serialize_list
+    elif issubclass(cls, dict):
+        handler = _serialize_dict
+    elif (Image and issubclass(cls, Image.Image)) or (plt and hasattr(cls, 'savefig')):
+        handler = _serialize_image
+    elif pd and issubclass(cls, pd.DataFrame):
+        handler = _serialize_dataframe
+    elif (pd and issubclass(cls, pd.Series)) or (np and issubclass(cls, np.ndarray)):
+        handler = _serialize_preview
+    else:
+        handler = _serialize_object
+    _HANDLERS[cls] = handler
+    return handler
+
+def _serialize_none(value: Any, active: set) -> Any:
+    return None
+
+def _serialize_scalar(value: Any, active: set) -> Any:
+    return value
+
+def _serialize_str(value: str, active: set) -> Any:
+    # Try to parse string as JSON if it looks like a JSON object/array
+    if len(value) <= JSON_SNIFF_MAX_CHARS and value and value[0] in "{[" and value[-1] == ("}" if value[0] == "{" else "]"):
         try:
-            buffered = io.BytesIO()
-            step.savefig(buffered, format='png')
-            img_str = base64.b64encode(buffered.getvalue()).decode("utf-8")
-            return f"data:image/png;base64,{img_str}"
-        except Exception:
-            return "[Error serializing Plot]"
-
-    # Pandas DataFrame -> Markdown Table
-    elif pd and isinstance(step, pd.DataFrame):
+            return _serialize(json.loads(value), active)
+        except json.JSONDecodeError:
+            pass
+    return value
+
+def _serialize_list(value: Any, active: set) -> Any:
+    if id(value) in active:
+        return _circular(value)
+    active.add(id(value))
+    try:
+        return [_serialize(item, active) for item in value]
+    finally:
+        active.discard(id(value))
+
+def _serialize_dict(value: Dict, active: set) -> Any:
+    if id(value) in active:
+        return _circular(value)
+    active.add(id(value))
+    try:
+        return {str(k): _serialize(v, active) for k, v in value.items()}
+    finally:
+        active.discard(id(value))
+
+def _serialize_image(value: Any, active: set) -> Any:
+    # PIL Image / Matplotlib Figure -> artifact URL
+    try:
+        return image_artifact(value)
+    except Exception:
+        return "[Error serializing Plot]" if hasattr(value, 'savefig') else "[Error serializing Image]"
+
+def _serialize_dataframe(value: Any, active: set) -> Any:
+    # Pandas DataFrame -> Markdown Table (first rows and columns only)
+    try:
+        return preview_table(value, CHAT_LIMITS)
+    except Exception:
+        return preview_text(value, CHAT_LIMITS)
+
+def _serialize_preview(value: Any, active: set) -> Any:
+    # Series and arrays -> bounded text (they would otherwise be walked through __dict__ or str())
+    return preview_text(value, CHAT_LIMITS)
+
+def _serialize_object(value: Any, active: set) -> Any:
+    attributes = getattr(value, "__dict__", None)
+    if attributes is None:
+        # For any other type, convert to string. Stored in full: the chat bounds it (see display_value)
         try:
-            return step.to_markdown(index=True)
-        except Exception:
-            return str(step)
-    elif hasattr(step, "__dict__"):
-        # For custom object, convert their __dict__ to a serializable format
-        return {"_type": step.__class__.__name__, **{k: serialize_step(v) for k, v in step.__dict__.items()}}
+            return str(value)
+        except Exception as e:
+            return f"<{type(value).__name__}: str() failed ({e})>"
+
+    # For custom object, convert their __dict__ to a serializable format
+    if id(value) in active:
+        return _circular(value)
+    active.add(id(value))
+    try:
+        return {"_type": value.__class__.__name__, **{k: _serialize(v, active) for k, v in attributes.items()}}
+    finally:
+        active.discard(id(value))
+
+def _circular(value: Any) -> str:
+    return f"[Circular reference: {type(value).__name__}]"
+
+# type -> conversion function, filled on first use of each type
+_HANDLERS: Dict[type, Callable[[Any, set], Any]] = {}
+
+def image_artifact(image: Any) -> str:
+    """
+    Stores a PIL Image or matplotlib Figure as PNG in the artifact store and returns its URL.
+    Identical images are stored once. Falls back to a base64 data URL if the store fails.
+    """
+    buffered = io.BytesIO()
+    if hasattr(image, "savefig"):
+        image.savefig(buffered, format="png")
     else:
-        # For any other type, convert to string
-        return str(step)
-    
+        image.save(buffered, format="PNG")
+    data = buffered.getvalue()
+    try:
+        return store_artifact(data, "image/png")
+    except Exception as e:
+        print(f"Warning: Could not store image artifact: {e}")
+        return "data:image/png;base64," + base64.b64encode(data).decode("utf-8")
+
+def is_artifact_url(value: Any) -> bool:
+    return isinstance(value, str) and value.startswith(ARTIFACT_ROUTE)
+
+# Step fields the chat view renders. model_input_messages and other bookkeeping fields are never sent.
+DISPLAY_STEP_FIELDS = ("task", "step_number", "model_output", "code_action", "observations",
+                       "error", "is_final_answer", "plan")
+
+# action_output values larger than this (as JSON) are sent as a placeholder and fetched when rendered
+DEFERRED_FIELD_MIN_BYTES = 2048
+
+def make_display_step(step: Dict[str, Any], step_index: int) -> Dict[str, Any]:
+    """
+    Shapes a serialized step for the chat view. Heavy fields (images, large final answers)
+    are replaced by {"_deferred": field, "step_index": i} placeholders that the client
+    resolves with the 'get_step_field' event once the element is displayed.
+    """
+    display = {k: step[k] for k in DISPLAY_STEP_FIELDS if k in step}
+    display["step_index"] = step_index
+
+    images = step.get("observations_images")
+    if images:
+        # Artifact URLs are tiny; only legacy inline base64 images are deferred
+        if all(is_artifact_url(img) for img in images):
+            display["images"] = images
+        else:
+            display["images"] = {"_deferred": "images", "step_index": step_index}
+
+    if step.get("action_output") is not None:
+        value = step["action_output"]
+        try:
+            heavy = len(json.dumps(value)) > DEFERRED_FIELD_MIN_BYTES
+        except (TypeError, ValueError):
+            heavy = True
+        display["action_output"] = {"_deferred": "action_output", "step_index": step_index} if heavy else display_value(value)
+
+    return display
+
+def display_value(value: Any, limits: PreviewLimits = CHAT_LIMITS) -> Any:
+    """
+    Bounds a serialized value (see serialize_step) for the chat view: strings longer than
+    limits.max_chars are cut, except image URLs. Stored steps keep the full value.
+    """
+    if isinstance(value, str):
+        if value.startswith("data:image/") or is_artifact_url(value):
+            return value
+        return preview_text(value, limits)
+    if isinstance(value, list):
+        return [display_value(item, limits) for item in value]
+    if isinstance(value, dict):
+        return {k: display_value(v, limits) for k, v in value.items()}
+    return value
+
+def get_display_field(step: Dict[str, Any], field: str) -> Any:
+    """ Returns the value of a field deferred by make_display_step. """
+    if field == "images":
+        return step.get("observations_images") or []
+    if field == "action_output":
+        return display_value(step.get("action_output"))
+    raise KeyError(f"Field '{field}' cannot be fetched")
+
 def serialize_python_state(state: Dict[str, Any]) -> bytes:
     """
     Serializes the Python state dictionary using dill.
@@ -80,11 +235,76 @@ def serialize_python_state(state: Dict[str, Any]) -> bytes:
     if not state:
         return b""
     try:
-        return dill.dumps(state)
+        with SERIALIZE_SECONDS.time("dill_dump"):
+            return dill.dumps(state)
     except Exception as e:
         print(f"Warning: Could not serialize python state: {e}")
         return b""
 
+def fingerprint_value(value: Any) -> Optional[str]:
+    """
+    Computes a content hash for common data types without pickling them.
+    Returns None for types that can only be hashed through their serialized bytes.
+    """
+    try:
+        if value is None or isinstance(value, (bool, int, float, complex)):
+            return "v:" + _digest(f"{type(value).__name__}:{value!r}".encode("utf-8"))
+        if isinstance(value, str):
+            return "s:" + _digest(value.encode("utf-8", "surrogatepass"))
+        if isinstance(value, (bytes, bytearray)):
+            return "b:" + _digest(type(value).__name__.encode() + bytes(value))
+        if np is not None and isinstance(value, np.ndarray) and value.dtype != object:
+            header = f"{value.dtype.str}:{value.shape}".encode("utf-8")
+            return "np:" + _digest(header + np.ascontiguousarray(value).tobytes())
+        if pd is not None and isinstance(value, (pd.DataFrame, pd.Series)):
+            # Everything dill would restore besides the values, so that two objects only share
+            # a blob if they unpickle alike. repr() of a dtype includes categorical categories.
+            is_frame = isinstance(value, pd.DataFrame)
+            header = repr((type(value).__name__, getattr(value, "name", None),
+                           list(value.columns) if is_frame else None,
+                           list(value.columns.names) if is_frame else None,
+                           type(value.columns).__name__ if is_frame else None,
+                           [repr(d) for d in (value.dtypes if is_frame else [value.dtype])],
+                           type(value.index).__name__, list(value.index.names), repr(value.index.dtype),
+                           value.flags.allows_duplicate_labels, repr(value.attrs),
+                           value.shape)).encode("utf-8")
+            row_hashes = pd.util.hash_pandas_object(value, index=True).values
+            return "pd:" + _digest(header + row_hashes.tobytes())
+    except Exception:
+        return None
+    return None
+
+def serialize_variable(name: str, value: Any) -> Optional[bytes]:
+    """
+    Serializes a single executor variable using dill.
+    Returns None (and warns) if the value cannot be pickled, so one bad variable
+    does not prevent the rest of the state from being saved.
+    """
+    try:
+        with SERIALIZE_SECONDS.time("dill_dump"):
+            return dill.dumps(value)
+    except Exception as e:
+        print(f"Warning: Skipping unpicklable variable '{name}' ({type(value).__name__}): {e}")
+        return None
+
+def deserialize_variable(name: str, data: bytes) -> Tuple[bool, Any]:
+    """
+    Deserializes a single executor variable. Returns (ok, value).
+    """
+    try:
+        with SERIALIZE_SECONDS.time("dill_load"):
+            return True, dill.loads(data)
+    except Exception as e:
+        print(f"Warning: Could not restore variable '{name}': {e}")
+        return False, None
+
+def content_hash(data: bytes) -> str:
+    """ Content hash of serialized bytes, used as key in the python_blobs table. """
+    return "d:" + _digest(data)
+
+def _digest(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=20).hexdigest()
+
 def deserialize_python_state(data: bytes) -> Dict[str, Any]:
     """
     Deserializes the Python state from bytes.
@@ -92,7 +312,49 @@ def deserialize_python_state(data: bytes) -> Dict[str, Any]:
     if not data:
         return {}
     try:
-        return dill.loads(data)
+        with SERIALIZE_SECONDS.time("dill_load"):
+            return dill.loads(data)
     except Exception as e:
         print(f"Warning: Could not restore python state: {e}")
-        return {}
\ No newline at end of file
+        return {}
+
+def estimate_size(obj: Any, max_depth: int = 3) -> int:
+    """
+    Cheap, approximate size in bytes of a Python object.
+    Uses nbytes/memory_usage for arrays and DataFrames, and a bounded recursion for containers
+    and for the attributes of plain objects (e.g. memory steps). Shared objects are counted once.
+    """
+    seen = set()
+
+    def _size(o: Any, depth: int) -> int:
+        if id(o) in seen:
+            return 0
+        seen.add(id(o))
+
+        if pd is not None and isinstance(o, (pd.DataFrame, pd.Series)):
+            try:
+                usage = o.memory_usage(index=True, deep=False)
+                return int(usage.sum()) if hasattr(usage, "sum") else int(usage)
+            except Exception:
+                return sys.getsizeof(o)
+        if hasattr(o, "nbytes") and isinstance(getattr(o, "nbytes"), int):
+            return o.nbytes
+        if isinstance(o, (str, bytes, bytearray)):
+            return sys.getsizeof(o)
+
+        size = sys.getsizeof(o)
+        if depth <= 0:
+            return size
+        if isinstance(o, dict):
+            size += sum(_size(k, depth - 1) + _size(v, depth - 1) for k, v in o.items())
+        elif isinstance(o, (list, tuple, set, frozenset)):
+            size += sum(_size(item, depth - 1) for item in o)
+        elif hasattr(o, "__dict__") and not (inspect.isclass(o) or inspect.ismodule(o) or inspect.isroutine(o)):
+            attributes = vars(o)
+            size += sys.getsizeof(attributes) + sum(_size(v, depth - 1) for v in attributes.values())
+        return size
+
+    try:
+        return _size(obj, max_depth)
+    except Exception:
+        return 0
@@ -0,0 +1,41 @@
+import pytest
+from flask_socketio import SocketIO
+from smolagents import CodeAgent
+from smolagents.models import Model, ChatMessage, MessageRole
+
+from smolagentsUI import artifact_store, server
+from smolagentsUI.agent_wrapper import AgentWrapper
+
+
+class StaticModel(Model):
+    """ Model that always answers with the same code action. Never called by tests that do not run the agent. """
+    def __init__(self, output: str = "<code>\nfinal_answer('ok')\n</code>", **kwargs):
+        super().__init__(model_id="static-model", **kwargs)
+        self.output = output
+
+    def generate(self, messages, stop_sequences=None, response_format=None, tools_to_call_from=None, **kwargs):
+        return ChatMessage(role=MessageRole.ASSISTANT, content=self.output)
+
+
+@pytest.fixture
+def agent():
+    return CodeAgent(tools=[], model=StaticModel())
+
+
+@pytest.fixture
+def wrapper(agent):
+    return AgentWrapper(agent)
+
+
+@pytest.fixture
+def served(tmp_path, agent, monkeypatch):
+    """ Runs serve() on a temporary database without starting the server. Returns (app, socketio). """
+    started = []
+    monkeypatch.setattr(SocketIO, "run", lambda self, app, **kwargs: started.append((app, self)))
+    # serve() installs its ConversationManager as the artifact store: put the current one back afterwards
+    monkeypatch.setattr(artifact_store, "_store", artifact_store.get_artifact_store())
+    server.serve(agent, debug=False, storage_path=str(tmp_path / "chat.db"),
+                 warm_pool_size=0, agent_idle_ttl=None)
+    yield started[0]
+    server.run_scheduler.shutdown()
+    server.conversation_manager.close()
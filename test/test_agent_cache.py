@@ -0,0 +1,137 @@
+import threading
+import time
+
+from smolagents.memory import ActionStep
+from smolagents.monitoring import Timing
+
+from smolagentsUI.agent_cache import AgentCache
+
+
+class Agent:
+    def __init__(self, size=0):
+        self.size = size
+
+
+def test_least_recently_used_agent_is_evicted_and_flushed():
+    flushed = []
+    cache = AgentCache(max_agents=2, idle_ttl=None, on_evict=lambda sid, w: flushed.append(sid))
+    cache.put("a", Agent())
+    cache.put("b", Agent())
+    cache.get("a")
+    cache.put("c", Agent())
+
+    assert flushed == ["b"]
+    assert "a" in cache and "c" in cache and "b" not in cache
+
+
+def test_pinned_agents_are_not_evicted():
+    flushed = []
+    cache = AgentCache(max_agents=1, idle_ttl=None, on_evict=lambda sid, w: flushed.append(sid))
+    cache.put("a", Agent())
+    cache.pin("a")
+    cache.put("b", Agent())
+    assert flushed == [] and len(cache) == 2
+
+    cache.unpin("a")
+    cache.put("c", Agent())
+    assert flushed == ["a", "b"]
+
+
+def test_evicted_agents_are_flushed_without_the_cache_lock():
+    lookups = []
+
+    def on_evict(session_id, wrapper):
+        # Another thread can use the cache while the evicted agent is being saved
+        t = threading.Thread(target=lambda: lookups.append(cache.get("b")))
+        t.start()
+        t.join(timeout=2)
+        assert not t.is_alive()
+
+    cache = AgentCache(max_agents=1, idle_ttl=None, on_evict=on_evict)
+    cache.put("a", Agent())
+    cache.put("b", Agent())
+    assert len(lookups) == 1 and lookups[0] is not None
+
+
+def test_lookup_waits_for_the_flush_of_its_session():
+    saving = threading.Event()
+    release = threading.Event()
+    saved = []
+
+    def on_evict(session_id, wrapper):
+        saving.set()
+        release.wait(2)
+        saved.append(session_id)
+
+    cache = AgentCache(max_agents=1, idle_ttl=None, on_evict=on_evict)
+    cache.put("a", Agent())
+    evicting = threading.Thread(target=cache.put, args=("b", Agent()))
+    evicting.start()
+    assert saving.wait(2)
+
+    result = []
+    lookup = threading.Thread(target=lambda: result.append((cache.get("a"), list(saved))))
+    lookup.start()
+    time.sleep(0.05)
+    assert lookup.is_alive()  # waiting for "a" to be saved
+
+    release.set()
+    lookup.join(2)
+    evicting.join(2)
+    assert result == [(None, ["a"])]
+
+
+def test_pop_waits_for_the_flush_of_its_session():
+    saving = threading.Event()
+    release = threading.Event()
+    events = []
+
+    def on_evict(session_id, wrapper):
+        saving.set()
+        release.wait(2)
+        events.append(f"saved {session_id}")
+
+    cache = AgentCache(max_agents=1, idle_ttl=None, on_evict=on_evict)
+    cache.put("a", Agent())
+    evicting = threading.Thread(target=cache.put, args=("b", Agent()))
+    evicting.start()
+    assert saving.wait(2)
+
+    def delete_session():
+        # What the server does: drop the live agent, then delete the stored session
+        events.append(("popped", cache.pop("a")))
+        events.append("deleted a")
+
+    deleting = threading.Thread(target=delete_session)
+    deleting.start()
+    time.sleep(0.05)
+    assert deleting.is_alive()  # waiting for the save of "a" to finish
+
+    release.set()
+    deleting.join(2)
+    evicting.join(2)
+    assert events == ["saved a", ("popped", None), "deleted a"]
+
+
+def test_refreshed_agent_is_not_evicted_by_its_own_growth():
+    flushed = []
+    cache = AgentCache(max_agents=10, idle_ttl=None, memory_budget=25,
+                       on_evict=lambda sid, w: flushed.append(sid), size_fn=lambda w: w.size)
+    a = Agent(10)
+    cache.put("a", a)
+    cache.put("b", Agent(10))
+
+    a.size = 20  # the run of "a" just finished and grew its state
+    cache.refresh("a")
+
+    assert flushed == ["b"]
+    assert "a" in cache
+
+
+def test_memory_estimate_includes_step_contents(wrapper):
+    text = "x" * 200_000
+    step = ActionStep(step_number=1, timing=Timing(start_time=0.0, end_time=1.0),
+                      model_output=text, observations=text[:100_000] + "y")
+    wrapper.agent.memory.steps.append(step)
+
+    assert wrapper.estimate_memory() >= 300_000
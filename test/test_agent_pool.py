@@ -0,0 +1,74 @@
+from smolagents import CodeAgent, tool
+from smolagents.memory import TaskStep
+
+from smolagentsUI.agent_pool import AgentPool, clone_agent
+
+from conftest import StaticModel
+
+
+@tool
+def lookup(key: str) -> str:
+    """
+    Returns the value stored under a key.
+
+    Args:
+        key: Name of the value.
+    """
+    return key.upper()
+
+
+def make_prototype():
+    prototype = CodeAgent(tools=[lookup], model=StaticModel())
+    # As at the start of a run: the executor gets the tools as static tools
+    prototype.python_executor.send_tools({**prototype.tools, **prototype.managed_agents})
+    prototype.python_executor.state["prototype_variable"] = 1
+    return prototype
+
+
+def assert_independent_clone(prototype, clone):
+    # Shared: the model and the tools
+    assert clone is not prototype
+    assert clone.model is prototype.model
+    assert clone.tools["lookup"] is prototype.tools["lookup"]
+    assert clone.python_executor.static_tools["lookup"] is prototype.python_executor.static_tools["lookup"]
+
+    # Per session: memory and executor state
+    assert clone.memory is not prototype.memory
+    assert clone.memory.steps is not prototype.memory.steps
+    assert clone.memory.system_prompt is prototype.memory.system_prompt
+    assert clone.python_executor is not prototype.python_executor
+    assert "prototype_variable" not in clone.python_executor.state
+
+    clone.memory.steps.append(TaskStep(task="only in the clone"))
+    clone.python_executor.state["x"] = 42
+    assert prototype.memory.steps == []
+    assert "x" not in prototype.python_executor.state
+
+
+def test_clone_shares_model_and_tools_but_not_state():
+    prototype = make_prototype()
+    first, second = clone_agent(prototype), clone_agent(prototype)
+    assert_independent_clone(prototype, first)
+    assert_independent_clone(prototype, second)
+    assert first.python_executor.state is not second.python_executor.state
+
+
+def test_pool_hands_out_independent_clones():
+    prototype = make_prototype()
+    pool = AgentPool(prototype, size=0)
+    first, second = pool.acquire(), pool.acquire()
+    assert pool.stats()["misses"] == 2
+    assert_independent_clone(prototype, first)
+    assert_independent_clone(prototype, second)
+    assert first.memory is not second.memory
+    pool.shutdown()
+
+
+def test_prefilled_clones_are_hits():
+    prototype = make_prototype()
+    pool = AgentPool(prototype, size=2)
+    pool._ready.extend(clone_agent(prototype) for _ in range(2))
+    agent = pool.acquire()
+    assert pool.stats() == {"size": 2, "ready": 1, "hits": 1, "misses": 0}
+    assert_independent_clone(prototype, agent)
+    pool.shutdown()
@@ -0,0 +1,142 @@
+import pytest
+
+from smolagentsUI import server
+from smolagentsUI.artifact_store import (MemoryArtifactStore, artifact_hash, artifact_url, find_artifact_refs,
+                                         store_artifact)
+from smolagentsUI.conversation_manager import ConversationManager
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"pixels" * 100
+
+
+@pytest.fixture
+def client(served):
+    app, socketio = served
+    return app.test_client()
+
+
+def test_artifact_is_served_with_an_etag(client):
+    url = store_artifact(PNG, "image/png")
+    content_hash = url.rsplit("/", 1)[1]
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.data == PNG
+    assert response.mimetype == "image/png"
+    assert response.headers["ETag"] == f'"{content_hash}"'
+    assert "immutable" in response.headers["Cache-Control"]
+
+    revalidated = client.get(url, headers={"If-None-Match": f'"{content_hash}"'})
+    assert revalidated.status_code == 304
+    assert revalidated.data == b""
+    assert revalidated.headers["ETag"] == f'"{content_hash}"'
+
+    # Another ETag gets the data
+    assert client.get(url, headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_unknown_and_malformed_hashes_are_not_found(client):
+    assert client.get("/artifacts/" + artifact_hash(b"never stored")).status_code == 404
+    assert client.get("/artifacts/not-a-hash").status_code == 404
+
+
+def test_same_bytes_are_stored_once(tmp_path):
+    manager = ConversationManager(str(tmp_path / "chat.db"))
+    assert manager.put_artifact(PNG, "image/png") == manager.put_artifact(PNG, "image/png")
+    assert manager.get_artifact(artifact_hash(PNG)) == ("image/png", PNG)
+    assert manager.get_artifact(artifact_hash(b"other")) is None
+    manager.close()
+
+    store = MemoryArtifactStore()
+    assert store.put_artifact(PNG, "image/png") == artifact_hash(PNG)
+    assert store.get_artifact(artifact_hash(PNG)) == ("image/png", PNG)
+
+
+def test_find_artifact_refs():
+    first, second = artifact_hash(b"1"), artifact_hash(b"2")
+    text = f'{{"observations_images": ["/artifacts/{first}", "/artifacts/{second}", "/artifacts/{first}"]}}'
+    assert find_artifact_refs(text) == {first, second}
+    assert find_artifact_refs("no images") == set()
+
+
+def test_memory_store_keeps_artifacts_referenced_by_a_session():
+    store = MemoryArtifactStore(max_items=2)
+    kept = store.put_artifact(b"kept", "image/png")
+    store.add_refs("s1", [kept])
+    early = artifact_hash(b"referenced first")
+    store.add_refs("s2", [early])
+    for i in range(5):
+        store.put_artifact(b"other %d" % i, "image/png")
+    store.put_artifact(b"referenced first", "image/png")
+    for i in range(5, 10):
+        store.put_artifact(b"other %d" % i, "image/png")
+
+    assert store.get_artifact(kept) == ("image/png", b"kept")
+    assert store.get_artifact(early) is not None
+    assert store.get_artifact(artifact_hash(b"other 0")) is None
+    assert store.get_artifact(artifact_hash(b"other 9")) is not None
+
+    # Released, it is only kept while among the most recent unreferenced ones
+    store.release_session("s1")
+    assert store.get_artifact(kept) is not None
+    store.put_artifact(b"other 10", "image/png")
+    store.put_artifact(b"other 11", "image/png")
+    assert store.get_artifact(kept) is None
+    assert store.get_artifact(early) is not None
+
+
+def test_in_memory_session_keeps_the_images_of_its_steps():
+    manager = ConversationManager()
+    manager._memory_artifacts.max_items = 2
+    url = artifact_url(manager.put_artifact(PNG, "image/png"))
+    session_id = manager.save_session(None, [{"task": "plot", "task_images": [url]}])
+    for i in range(5):
+        manager.put_artifact(b"later %d" % i, "image/png")
+    assert manager.get_artifact(artifact_hash(PNG)) == ("image/png", PNG)
+
+    manager.delete_session(session_id)
+    manager.put_artifact(b"later 5", "image/png")
+    manager.put_artifact(b"later 6", "image/png")
+    assert manager.get_artifact(artifact_hash(PNG)) is None
+
+
+def test_startup_purges_only_unreferenced_artifacts(tmp_path):
+    path = str(tmp_path / "chat.db")
+    manager = ConversationManager(path)
+    in_step = manager.put_artifact(b"step image", "image/png")
+    inspected = manager.put_artifact(b"inspected image", "image/png")
+    inspected_early = manager.put_artifact(b"inspected before the first save", "image/png")
+    orphan = manager.put_artifact(b"never saved", "image/png")
+
+    saved = manager.save_session(None, [{"task": "plot", "task_images": [artifact_url(in_step)]}])
+    manager.add_session_artifacts(saved, [inspected])
+    manager.add_session_artifacts("new-session", [inspected_early])
+    manager.save_session("new-session", [{"task": "inspect"}])
+    manager.close()
+
+    manager = ConversationManager(path)
+    assert manager.get_artifact(in_step) is not None
+    assert manager.get_artifact(inspected) is not None
+    assert manager.get_artifact(inspected_early) is not None
+    assert manager.get_artifact(orphan) is None
+
+    manager.delete_session(saved)
+    assert manager.get_artifact(in_step) is None and manager.get_artifact(inspected) is None
+    manager.close()
+
+
+def test_inspected_image_survives_a_restart(served, tmp_path):
+    Image = pytest.importorskip("PIL.Image")
+    app, socketio = served
+    session_id = server.conversation_manager.save_session(None, [{"task": "draw"}], task_preview="draw")
+    wrapper = server.get_agent_wrapper(session_id)
+    wrapper.agent.python_executor.state["picture"] = Image.new("RGB", (4, 4), "red")
+
+    client = socketio.test_client(app)
+    client.emit("inspect_variable", {"session_id": session_id, "name": "picture"})
+    details = [event for event in client.get_received() if event["name"] == "variable_details"][0]["args"][0]
+    assert details["type"] == "image"
+    (content_hash,) = find_artifact_refs(details["content"])
+
+    manager = ConversationManager(str(tmp_path / "chat.db"))
+    assert manager.get_artifact(content_hash)[0] == "image/png"
+    manager.close()
@@ -0,0 +1,142 @@
+import multiprocessing
+import os
+import threading
+import time
+from multiprocessing.connection import Client
+
+import pytest
+
+from smolagentsUI import cluster, server
+from smolagentsUI.broker import BrokerClient, LocalBroker, new_authkey
+from smolagentsUI.cluster import WorkerCluster
+
+
+@pytest.fixture
+def broker():
+    broker = LocalBroker(new_authkey()).start()
+    yield broker
+    broker.close()
+
+
+class Recorder:
+    """ Session handlers of one worker: records (event, data, sid) and signals each call. """
+    def __init__(self, events):
+        self.calls = []
+        self.called = threading.Event()
+        self.handlers = {event: self.handler(event) for event in events}
+
+    def handler(self, event):
+        def handle(data, sid):
+            self.calls.append((event, data, sid))
+            self.called.set()
+        return handle
+
+
+def workers(broker, n, events=("start_run", "stop_run", "load_session")):
+    """ n WorkerClusters sharing the broker, listening. Returns [(cluster, recorder)]. """
+    result = []
+    for worker_id in range(n):
+        recorder = Recorder(events)
+        worker = WorkerCluster(worker_id, n, broker.url, broker.authkey, recorder.handlers, max_threads=2)
+        worker.start()
+        result.append((worker, recorder))
+    wait_subscribed(broker, n)
+    return result
+
+
+def wait_subscribed(broker, n, timeout=5):
+    deadline = time.monotonic() + timeout
+    while True:
+        with broker._lock:
+            if sum(len(s) for s in broker._subscribers.values()) >= n:
+                return
+        assert time.monotonic() < deadline, "subscribers did not connect"
+        time.sleep(0.01)
+
+
+def session_owned_by(worker, owner):
+    return next(f"session-{i}" for i in range(1000) if worker.owner_of(f"session-{i}") == owner)
+
+
+def test_client_without_the_authkey_is_rejected(broker):
+    with pytest.raises(multiprocessing.AuthenticationError):
+        BrokerClient(broker.url, b"not the key").publish("channel", "message")
+    with pytest.raises(multiprocessing.AuthenticationError):
+        Client((broker.host, broker.port), authkey=b"not the key")
+    with pytest.raises(ValueError):
+        BrokerClient(broker.url, b"")
+
+    # The broker keeps serving clients that hold the key
+    messages = BrokerClient(broker.url, broker.authkey).subscribe("channel")
+    received = []
+    reader = threading.Thread(target=lambda: received.append(next(messages)), daemon=True)
+    reader.start()
+    wait_subscribed(broker, 1)
+    BrokerClient(broker.url, broker.authkey).publish("channel", "hello")
+    reader.join(5)
+    assert received == ["hello"]
+
+
+def test_session_event_runs_on_the_owning_worker(broker):
+    (first, first_calls), (second, second_calls) = workers(broker, 2)
+    session_id = session_owned_by(first, 1)
+    assert not first.owns(session_id) and second.owns(session_id)
+    assert second.owner_of(session_id) == 1
+
+    # Worker 0 received the client's event for a session of worker 1
+    first.forward(session_id, "load_session", {"id": session_id}, "client-sid")
+
+    assert second_calls.called.wait(5)
+    assert second_calls.calls == [("load_session", {"id": session_id}, "client-sid")]
+    assert first_calls.calls == []
+    assert first.stats()["forwarded"] == 1 and second.stats()["received"] == 1
+
+
+def test_stop_run_reaches_the_worker_running_the_session(broker):
+    cluster_workers = workers(broker, 3)
+    (entry, entry_calls) = cluster_workers[0]
+    owner_id = 2
+    owner, owner_calls = cluster_workers[owner_id]
+    session_id = session_owned_by(entry, owner_id)
+
+    entry.forward(session_id, "start_run", {"session_id": session_id, "message": "hi"}, "sid-a")
+    assert owner_calls.called.wait(5)
+    owner_calls.called.clear()
+    # The stop may come from a client connected to any other worker
+    entry.forward(session_id, "stop_run", {"session_id": session_id}, "sid-b")
+    assert owner_calls.called.wait(5)
+
+    assert [(event, sid) for event, _, sid in owner_calls.calls] == [("start_run", "sid-a"), ("stop_run", "sid-b")]
+    assert entry_calls.calls == [] and cluster_workers[1][1].calls == []
+
+
+def test_forked_worker_closes_the_inherited_listener(broker, monkeypatch):
+    # serve() is replaced in the child: it reports whether the broker's socket can still accept there
+    def fake_serve(agent, **kwargs):
+        timeout = threading.Timer(5, os._exit, args=(2,))  # accept() blocks if the listener is open
+        timeout.daemon = True
+        timeout.start()
+        try:
+            broker.listener.accept()
+        except OSError:
+            raise SystemExit(0)
+        raise SystemExit(1)
+    monkeypatch.setattr(server, "serve", fake_serve)
+
+    context = multiprocessing.get_context("fork")
+    child = context.Process(target=cluster._run_worker,
+                            args=(None, 0, 2, 0, broker, broker.url, broker.authkey, {}))
+    child.start()
+    child.join(10)
+    assert child.exitcode == 0
+
+    # The launcher still accepts connections
+    BrokerClient(broker.url, broker.authkey).publish("channel", "still open")
+
+
+@pytest.mark.parametrize("host", ["0.0.0.0", "::", "192.0.2.1"])
+def test_broker_only_listens_on_loopback(host):
+    with pytest.raises(ValueError, match="loopback"):
+        LocalBroker(new_authkey(), host=host)
+    broker = LocalBroker(new_authkey(), host="localhost")
+    broker.close()
@@ -0,0 +1,37 @@
+import threading
+
+import pytest
+
+from smolagentsUI.compression import available_codecs, decode_text, encode_text, get_codec
+
+
+@pytest.mark.parametrize("name", available_codecs())
+def test_text_round_trip(name):
+    codec = get_codec(name)
+    text = '{"model_output": "' + "abc " * 500 + '"}'
+    payload, codec_name = encode_text(text, codec)
+    assert decode_text(payload, codec_name) == text
+    # Small payloads stay readable text
+    assert encode_text("short", codec) == ("short", None)
+
+
+def test_zstd_codec_is_shared_safely_between_threads():
+    pytest.importorskip("zstandard")
+    codec = get_codec("zstd")
+    errors = []
+
+    def work(n):
+        try:
+            for i in range(200):
+                text = f"thread {n} row {i} " * 100
+                payload, codec_name = encode_text(text, codec)
+                assert decode_text(payload, codec_name) == text
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=work, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
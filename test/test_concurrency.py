@@ -0,0 +1,106 @@
+import threading
+import time
+
+import pytest
+
+from smolagentsUI.concurrency import ThreadingBackend, make_backend
+
+
+class RecordingSocketIO:
+    def __init__(self):
+        self.emitted = []
+
+    def emit(self, event, data, to=None):
+        self.emitted.append((event, data, to, threading.get_ident()))
+
+
+def on_own_hub(test):
+    """ Runs test(gevent) on a new OS thread, which gets its own gevent hub, and destroys the hub afterwards. """
+    gevent = pytest.importorskip("gevent")
+    errors = []
+
+    def main():
+        try:
+            test(gevent)
+        except BaseException as e:
+            errors.append(e)
+        finally:
+            gevent.get_hub().destroy(destroy_loop=True)
+
+    thread = threading.Thread(target=main)
+    thread.start()
+    thread.join(30)
+    assert not thread.is_alive()
+    if errors:
+        raise errors[0]
+
+
+def wait_for(gevent, condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        gevent.sleep(0.01)
+
+
+def test_emits_from_os_threads_are_delivered_in_order_on_the_loop():
+    def test(gevent):
+        socketio = RecordingSocketIO()
+        backend = make_backend("gevent", socketio, threadpool_size=4)
+        loop_thread = threading.get_ident()
+
+        def produce(worker):
+            for i in range(200):
+                backend.emit("stream_delta", {"worker": worker, "i": i}, to=f"sid-{worker}")
+
+        producers = [threading.Thread(target=produce, args=(worker,)) for worker in range(4)]
+        for producer in producers:
+            producer.start()
+        wait_for(gevent, lambda: len(socketio.emitted) == 800)
+        for producer in producers:
+            producer.join()
+
+        # Sent by the pump greenlet, on the loop's thread, in each producer's order
+        assert {thread for *_, thread in socketio.emitted} == {loop_thread}
+        for worker in range(4):
+            sent = [(data["i"], to) for event, data, to, _ in socketio.emitted if data["worker"] == worker]
+            assert sent == [(i, f"sid-{worker}") for i in range(200)]
+        assert backend.stats()["emitted_from_threads"] == 800
+        assert backend.stats()["queued_emits"] == 0
+
+    on_own_hub(test)
+
+
+def test_emits_on_the_loop_are_sent_directly():
+    def test(gevent):
+        socketio = RecordingSocketIO()
+        backend = make_backend("gevent", socketio)
+        backend.emit("run_complete", {"session_id": "s"}, to="sid")
+        assert socketio.emitted == [("run_complete", {"session_id": "s"}, "sid", threading.get_ident())]
+        assert backend.stats()["emitted_from_threads"] == 0
+
+    on_own_hub(test)
+
+
+def test_run_blocking_uses_the_threadpool_and_propagates_errors():
+    def test(gevent):
+        backend = make_backend("gevent", RecordingSocketIO())
+        assert backend.run_blocking(threading.get_ident) != threading.get_ident()
+
+        def fail():
+            raise ValueError("boom")
+        with pytest.raises(ValueError, match="boom"):
+            backend.run_blocking(fail)
+
+    on_own_hub(test)
+
+
+def test_threading_backend_and_unknown_mode():
+    socketio = RecordingSocketIO()
+    backend = make_backend("threading", socketio)
+    assert isinstance(backend, ThreadingBackend)
+    assert backend.run_blocking(lambda x: x + 1, 1) == 2
+    backend.emit("event", {}, to="sid")
+    assert socketio.emitted[0][:3] == ("event", {}, "sid")
+
+    with pytest.raises(ValueError):
+        make_backend("asyncio", socketio)
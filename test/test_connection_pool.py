@@ -0,0 +1,69 @@
+import threading
+
+import pytest
+
+from smolagentsUI.conversation_manager import ConversationManager
+
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = ConversationManager(str(tmp_path / "chat.db"), pool_size=3)
+    yield manager
+    manager.close()
+
+
+def test_handler_threads_share_a_bounded_pool(manager):
+    manager.save_session("s", [{"task": "hello"}], "hello")
+
+    def request():
+        manager.get_profiles("s")
+        manager.search_sessions("hello")
+
+    for _ in range(10):
+        threads = [threading.Thread(target=request) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    assert manager._open_connections <= 3
+    assert manager._idle.qsize() == manager._open_connections
+
+
+def test_connections_are_reused_across_threads(manager):
+    seen = []
+
+    def request():
+        with manager._connection() as conn:
+            seen.append(conn)
+
+    for _ in range(5):
+        t = threading.Thread(target=request)
+        t.start()
+        t.join()
+
+    assert len({id(conn) for conn in seen}) == 1
+
+
+def test_nested_use_reuses_the_checked_out_connection(manager):
+    with manager._connection() as outer:
+        with manager._connection() as inner:
+            assert inner is outer
+    assert manager._open_connections == 1
+
+
+def test_waits_for_a_free_connection(tmp_path):
+    manager = ConversationManager(str(tmp_path / "chat.db"), pool_size=1)
+    got = threading.Event()
+
+    def request():
+        with manager._connection():
+            got.set()
+
+    with manager._connection():
+        t = threading.Thread(target=request)
+        t.start()
+        assert not got.wait(0.1)
+    assert got.wait(2)
+    t.join()
+    manager.close()
@@ -0,0 +1,80 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from smolagentsUI.dataframe_view import MAX_WINDOW_COLS, MAX_WINDOW_ROWS, DataFrameWindowCache
+
+
+@pytest.fixture
+def df():
+    return pd.DataFrame({
+        "city": ["Paris", "Lyon", "Nice", "Lille", "Nantes"],
+        "population": [2100000, 520000, 340000, 230000, 320000],
+        "region": ["IDF", "ARA", "PACA", "HDF", "PDL"],
+    }, index=[10, 11, 12, 13, 14])
+
+
+def test_natural_window(df):
+    cache = DataFrameWindowCache()
+    page = cache.get_window("df", 1, df, row_start=1, row_count=2, col_start=0, col_count=2)
+    assert page["columns"] == ["city", "population"]
+    assert page["index"] == ["11", "12"]
+    assert page["rows"] == [["Lyon", "520000"], ["Nice", "340000"]]
+    assert (page["total_rows"], page["total_rows_unfiltered"], page["total_cols"]) == (5, 5, 3)
+
+
+def test_sorted_view(df):
+    cache = DataFrameWindowCache()
+    page = cache.get_window("df", 1, df, sort_by=1, ascending=True)
+    assert [row[0] for row in page["rows"]] == ["Lille", "Nantes", "Nice", "Lyon", "Paris"]
+    assert page["index"] == ["13", "14", "12", "11", "10"]
+
+    page = cache.get_window("df", 1, df, row_start=0, row_count=2, sort_by=1, ascending=False)
+    assert [row[0] for row in page["rows"]] == ["Paris", "Lyon"]
+
+
+def test_filtered_and_sorted_view(df):
+    cache = DataFrameWindowCache()
+    page = cache.get_window("df", 1, df, sort_by=0, filter={"column": 1, "op": "<", "value": "400000"})
+    assert [row[0] for row in page["rows"]] == ["Lille", "Nantes", "Nice"]
+    assert (page["total_rows"], page["total_rows_unfiltered"]) == (3, 5)
+
+    # No column: any column matches, case-insensitively
+    page = cache.get_window("df", 1, df, filter={"column": None, "op": "contains", "value": "pa"})
+    assert [row[0] for row in page["rows"]] == ["Paris", "Nice"]
+
+    with pytest.raises(ValueError):
+        cache.get_window("df", 1, df, filter={"column": 0, "op": "like", "value": "x"})
+
+
+def test_windows_are_cached_per_version(df):
+    cache = DataFrameWindowCache()
+    first = cache.get_window("df", 1, df, sort_by=1)
+    assert cache.get_window("df", 1, df, sort_by=1) is first
+    assert cache.stats()["hits"] == 1
+
+    # A new version drops the views and pages of the old one
+    changed = df.assign(population=-df["population"])
+    page = cache.get_window("df", 2, changed, sort_by=1)
+    assert page is not first
+    assert [row[0] for row in page["rows"]] == ["Paris", "Lyon", "Nice", "Nantes", "Lille"]
+    assert page["version"] != first["version"]
+    assert cache.stats()["views"] == 1
+    assert all(key[1] == 2 for key in cache._views)
+
+    cache.invalidate("df")
+    assert cache.stats()["views"] == cache.stats()["pages"] == 0
+
+
+def test_window_is_clamped():
+    big = pd.DataFrame({f"c{i}": range(MAX_WINDOW_ROWS + 100) for i in range(MAX_WINDOW_COLS + 10)})
+    cache = DataFrameWindowCache()
+
+    page = cache.get_window("big", 1, big, row_count=10_000, col_count=10_000)
+    assert len(page["rows"]) == MAX_WINDOW_ROWS
+    assert len(page["columns"]) == MAX_WINDOW_COLS
+    assert all(len(row) == MAX_WINDOW_COLS for row in page["rows"])
+
+    page = cache.get_window("big", 1, big, row_start=10_000, row_count=0, col_start=10_000, col_count=-5)
+    assert page["row_start"] == len(big) - 1 and len(page["rows"]) == 1
+    assert page["col_start"] == big.shape[1] - 1 and page["columns"] == [f"c{MAX_WINDOW_COLS + 9}"]
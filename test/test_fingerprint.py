@@ -0,0 +1,88 @@
+import pytest
+
+from smolagentsUI import agent_wrapper, conversation_manager
+from smolagentsUI.conversation_manager import ConversationManager
+from smolagentsUI.utils import fingerprint_value
+
+
+@pytest.fixture
+def hash_calls(monkeypatch):
+    calls = []
+
+    def counting(value):
+        calls.append(value)
+        return fingerprint_value(value)
+
+    monkeypatch.setattr(agent_wrapper, "fingerprint_value", counting)
+    return calls
+
+
+def test_state_is_hashed_once_until_code_runs(wrapper, hash_calls):
+    state = wrapper.agent.python_executor.state
+    blob = state["blob"] = b"x" * 1000
+    wrapper.get_active_variables()
+    first = wrapper.get_state_fingerprints()
+
+    wrapper.get_variable_delta()
+    assert wrapper.get_state_fingerprints() == first
+    assert sum(v is blob for v in hash_calls) == 1
+
+    # A new state version (code ran) hashes again
+    wrapper._state_version += 1
+    wrapper.get_state_fingerprints()
+    assert sum(v is blob for v in hash_calls) == 2
+
+
+def test_reassigned_and_deleted_variables(wrapper, hash_calls):
+    state = wrapper.agent.python_executor.state
+    state["text"] = "a"
+    before = wrapper.get_state_fingerprints()["text"]
+
+    state["text"] = "b"
+    assert wrapper.get_state_fingerprints()["text"] != before
+
+    del state["text"]
+    assert "text" not in wrapper.get_state_fingerprints()
+    assert "text" not in wrapper._fingerprints
+
+
+def test_restoring_state_invalidates_fingerprints(wrapper, hash_calls):
+    blob = wrapper.agent.python_executor.state["blob"] = b"x" * 1000
+    wrapper.get_state_fingerprints()
+    wrapper.set_executor_state({"blob": blob})
+    wrapper.get_state_fingerprints()
+    assert sum(v is blob for v in hash_calls) == 2
+
+
+def test_save_uses_precomputed_fingerprints(tmp_path, monkeypatch):
+    manager = ConversationManager(storage_path=str(tmp_path / "chat.db"))
+    state = {"text": "hello"}
+    precomputed = {"text": fingerprint_value("hello")}
+    monkeypatch.setattr(conversation_manager, "fingerprint_value",
+                        lambda value: pytest.fail("state was hashed again"))
+
+    session_id = manager.save_session(None, [], python_state=state, python_fingerprints=precomputed)
+    manager.release_session(session_id)
+
+    assert manager.get_session(session_id)["python_state"] == state
+    manager.close()
+
+
+def test_pandas_metadata_is_part_of_the_fingerprint():
+    pd = pytest.importorskip("pandas")
+    df = pd.DataFrame({"a": [1, 2], "b": ["x", "y"]})
+
+    named_index = df.copy()
+    named_index.index.name = "id"
+    named_columns = df.copy()
+    named_columns.columns.name = "field"
+    with_attrs = df.copy()
+    with_attrs.attrs["source"] = "survey"
+    categorical = df.astype({"b": pd.CategoricalDtype(["x", "y", "z"])})
+    fewer_categories = df.astype({"b": "category"})
+
+    fingerprints = [fingerprint_value(v) for v in
+                    (df, named_index, named_columns, with_attrs, categorical, fewer_categories)]
+    assert None not in fingerprints
+    assert len(set(fingerprints)) == len(fingerprints)
+    assert fingerprint_value(df.copy()) == fingerprint_value(df)
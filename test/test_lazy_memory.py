@@ -0,0 +1,41 @@
+from smolagentsUI.lazy_memory import LazyList
+
+
+def make(n=5):
+    built = []
+
+    def factory(data):
+        built.append(data)
+        return {"built": data}
+    return LazyList(range(n), factory), built
+
+
+def test_items_are_built_on_first_access_only():
+    items, built = make()
+    assert len(items) == 5 and built == []
+
+    assert items[1] == {"built": 1}
+    assert items[-1] == {"built": 4}
+    assert items[1] is items[1]
+    assert built == [1, 4]
+    assert items.built_count() == 2
+
+
+def test_peek_and_pending_data_do_not_build():
+    items, built = make()
+    assert items.peek(2) == 2
+    assert items.pending_data(2) == 2
+    items[2]
+    assert items.pending_data(2) is None
+    assert items.peek(2) == {"built": 2}
+    assert built == [2]
+
+
+def test_behaves_like_a_list():
+    items, built = make(3)
+    items.append("plain")
+    assert items[1:3] == [{"built": 1}, {"built": 2}]
+    assert list(reversed(items))[0] == "plain"
+    assert items == [{"built": 0}, {"built": 1}, {"built": 2}, "plain"]
+    assert items.copy() == list(items)
+    assert sorted(built) == [0, 1, 2]
@@ -0,0 +1,71 @@
+import pytest
+
+from smolagentsUI.metrics import MetricsRegistry
+
+
+def test_counter_text_with_escaped_labels():
+    registry = MetricsRegistry()
+    emits = registry.counter("app_emits_total", "Events emitted.", labels=("event",))
+    emits.inc("run_complete")
+    emits.inc("run_complete", amount=2)
+    emits.inc('say "hi"\\now\nthen')
+
+    assert registry.render() == (
+        "# HELP app_emits_total Events emitted.\n"
+        "# TYPE app_emits_total counter\n"
+        'app_emits_total{event="run_complete"} 3\n'
+        'app_emits_total{event="say \\"hi\\"\\\\now\\nthen"} 1\n'
+    )
+
+
+def test_histogram_text_has_cumulative_buckets_and_inf():
+    registry = MetricsRegistry()
+    latency = registry.histogram("app_db_seconds", "DB latency.", labels=("operation",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(value, "save")
+
+    assert registry.render() == (
+        "# HELP app_db_seconds DB latency.\n"
+        "# TYPE app_db_seconds histogram\n"
+        'app_db_seconds_bucket{operation="save",le="0.1"} 2\n'
+        'app_db_seconds_bucket{operation="save",le="1"} 3\n'
+        'app_db_seconds_bucket{operation="save",le="+Inf"} 4\n'
+        'app_db_seconds_sum{operation="save"} 3.65\n'
+        'app_db_seconds_count{operation="save"} 4\n'
+    )
+
+
+def test_unlabelled_metrics_and_gauges_in_registration_order():
+    registry = MetricsRegistry()
+    runs = registry.counter("app_runs_total", "Runs.")
+    registry.gauge("app_queued", "Queued runs.", lambda: 2)
+    registry.gauge("app_broken", "Not running.", lambda: 1 / 0)
+    runs.inc(amount=1.5)
+
+    assert registry.render() == (
+        "# HELP app_runs_total Runs.\n"
+        "# TYPE app_runs_total counter\n"
+        "app_runs_total 1.5\n"
+        "# HELP app_queued Queued runs.\n"
+        "# TYPE app_queued gauge\n"
+        "app_queued 2\n"
+    )
+
+
+def test_disabled_metrics_record_nothing():
+    registry = MetricsRegistry()
+    runs = registry.counter("app_runs_total", "Runs.")
+    latency = registry.histogram("app_seconds", "Latency.")
+    registry.set_enabled(False)
+    runs.inc()
+    with latency.time():
+        pass
+    assert registry.render() == (
+        "# HELP app_runs_total Runs.\n"
+        "# TYPE app_runs_total counter\n"
+        "# HELP app_seconds Latency.\n"
+        "# TYPE app_seconds histogram\n"
+    )
+
+    with pytest.raises(ValueError):
+        registry.counter("app_runs_total", "Again.")
@@ -0,0 +1,131 @@
+import json
+import sqlite3
+
+import pytest
+
+from smolagentsUI.conversation_manager import SCHEMA_VERSION, ConversationManager
+from smolagentsUI.migrate import migrate
+
+# Schema of databases written before message deduplication and compression (user_version 0)
+LEGACY_SCHEMA = """
+CREATE TABLE sessions (session_id TEXT PRIMARY KEY, preview TEXT, timestamp TEXT,
+                       last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+CREATE TABLE steps (id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL,
+                    step_index INTEGER NOT NULL, step_data TEXT NOT NULL);
+CREATE TABLE python_state (session_id TEXT PRIMARY KEY, state_data BLOB,
+                           last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+"""
+
+SYSTEM = {"role": "system", "content": [{"type": "text", "text": "You are a helpful agent. " * 40}]}
+STEPS = [
+    {"task": "Summarize the report"},
+    {"step_number": 1, "model_output": "Reading the report. " * 30, "observations": "",
+     "model_input_messages": [SYSTEM, {"role": "user", "content": [{"type": "text", "text": "Summarize"}]}]},
+    {"step_number": 2, "model_output": "Done.", "observations": "",
+     "model_input_messages": [SYSTEM]},
+]
+
+
+def legacy_db(path):
+    conn = sqlite3.connect(path)
+    conn.executescript(LEGACY_SCHEMA)
+    conn.execute("INSERT INTO sessions (session_id, preview, timestamp) VALUES ('s1', 'Report', '2025-12-01 10:00:00')")
+    conn.executemany("INSERT INTO steps (session_id, step_index, step_data) VALUES ('s1', ?, ?)",
+                     [(i, json.dumps(step)) for i, step in enumerate(STEPS)])
+    conn.commit()
+    conn.close()
+
+
+def test_legacy_database_is_upgraded_and_compressed(tmp_path):
+    path = str(tmp_path / "legacy.db")
+    legacy_db(path)
+
+    manager = ConversationManager(path, codec="zlib")
+    assert manager.migration_stats["from_version"] == 0
+    assert manager.migration_stats["steps_rewritten"] == 2
+    assert manager.get_session("s1")["steps"] == STEPS
+    manager.close()
+
+    conn = sqlite3.connect(path)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+    codecs = [row[0] for row in conn.execute("SELECT codec FROM steps ORDER BY step_index")]
+    # The task step is too small to compress; rewritten steps use the configured codec
+    assert codecs == [None, "zlib", None]
+    # The system prompt shared by both steps is stored once
+    assert conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0] == 2
+    conn.close()
+
+
+def test_migrate_is_idempotent_and_compresses_old_rows(tmp_path):
+    path = str(tmp_path / "legacy.db")
+    legacy_db(path)
+    migrate(path, codec="none")
+
+    stats = migrate(path, compress=True, codec="zlib", vacuum=True)
+    assert stats["from_version"] == SCHEMA_VERSION
+    assert stats["steps_rewritten"] == 0
+    assert stats["rows_compressed"]["steps"] > 0
+
+    manager = ConversationManager(path)
+    assert manager.get_session("s1")["steps"] == STEPS
+    manager.close()
+
+
+def step_indexes(conn):
+    return {row[1]: row[2] for row in conn.execute("PRAGMA index_list(steps)")}  # name -> unique
+
+
+def test_duplicate_steps_are_removed_before_the_unique_index(tmp_path):
+    path = str(tmp_path / "legacy.db")
+    legacy_db(path)
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE INDEX idx_steps_session_id ON steps(session_id)")
+    # A step saved twice: the later row wins
+    newer = {**STEPS[2], "model_output": "Done, saved again."}
+    conn.execute("INSERT INTO steps (session_id, step_index, step_data) VALUES ('s1', 2, ?)", (json.dumps(newer),))
+    conn.commit()
+    conn.close()
+
+    manager = ConversationManager(path)
+    assert manager.migration_stats["duplicate_steps_removed"] == 1
+    assert manager.get_session("s1")["steps"] == STEPS[:2] + [newer]
+    manager.close()
+
+    conn = sqlite3.connect(path)
+    indexes = step_indexes(conn)
+    assert indexes.get("idx_steps_session_step") == 1
+    assert "idx_steps_session_id" not in indexes
+    with pytest.raises(sqlite3.IntegrityError):
+        conn.execute("INSERT INTO steps (session_id, step_index, step_data) VALUES ('s1', 0, '{}')")
+    conn.close()
+
+
+def test_version_2_database_gets_the_unique_index(tmp_path):
+    path = str(tmp_path / "chat.db")
+    manager = ConversationManager(path)
+    session_id = manager.save_session(None, STEPS, task_preview="Report")
+    manager.close()
+
+    # As written by schema version 2
+    conn = sqlite3.connect(path)
+    conn.execute("DROP INDEX idx_steps_session_step")
+    conn.execute("CREATE INDEX idx_steps_session_id ON steps(session_id)")
+    conn.execute("INSERT INTO steps (session_id, step_index, step_data) SELECT session_id, step_index, step_data "
+                 "FROM steps WHERE step_index = 0")
+    conn.execute("PRAGMA user_version = 2")
+    conn.commit()
+    conn.close()
+
+    stats = migrate(path)
+    assert stats["from_version"] == 2 and stats["to_version"] == SCHEMA_VERSION
+    assert stats["duplicate_steps_removed"] == 1
+
+    conn = sqlite3.connect(path)
+    assert step_indexes(conn) == {"idx_steps_session_step": 1}
+    assert conn.execute("SELECT COUNT(*) FROM steps").fetchone()[0] == len(STEPS)
+    conn.close()
+
+    manager = ConversationManager(path)
+    assert manager.migration_stats["duplicate_steps_removed"] == 0
+    assert manager.get_session(session_id)["steps"] == STEPS
+    manager.close()
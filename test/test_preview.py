@@ -0,0 +1,40 @@
+from collections import UserDict, deque
+
+from smolagentsUI.preview import CHAT_LIMITS, VIEWER_LIMITS, preview_text
+from smolagentsUI.utils import display_value, get_display_field, make_display_step, serialize_step
+
+
+class Opaque:
+    """ An object without __dict__ and a long str(). """
+    __slots__ = ("size",)
+
+    def __init__(self, size):
+        self.size = size
+
+    def __str__(self):
+        return "x" * self.size
+
+
+def test_unhandled_objects_are_stored_in_full():
+    value = Opaque(CHAT_LIMITS.max_chars * 2)
+    assert serialize_step({"action_output": value})["action_output"] == str(value)
+
+
+def test_display_payloads_are_bounded():
+    full = "x" * (CHAT_LIMITS.max_chars * 2)
+    step = {"step_number": 1, "action_output": [full, "/artifacts/abc"]}
+
+    shown = get_display_field(step, "action_output")
+    assert len(shown[0]) == CHAT_LIMITS.max_chars + len("...")
+    assert shown[1] == "/artifacts/abc"
+    assert make_display_step(step, 0)["action_output"]["_deferred"] == "action_output"
+    assert display_value({"a": 1, "b": None}) == {"a": 1, "b": None}
+
+
+def test_large_containers_are_previewed_from_a_slice():
+    assert preview_text(deque(range(10 ** 6))) == "deque([0, 1, 2, 3, 4, 5, 6, 7, 8, 9, ...])"
+    assert preview_text(UserDict({i: i for i in range(1000)})).startswith("UserDict({0: 0, 1: 1,")
+    assert preview_text(range(10 ** 9)) == "range(0, 1000000000)"
+
+    text = preview_text(b"x" * 10 ** 6, VIEWER_LIMITS)
+    assert text.startswith("b'xxx") and len(text) <= VIEWER_LIMITS.max_chars + len("...")
@@ -0,0 +1,49 @@
+import marshal
+import threading
+import tracemalloc
+
+from smolagentsUI import profiling
+from smolagentsUI.profiling import RunProfiler
+
+
+def work():
+    return sorted(str(i) for i in range(20000))
+
+
+def test_one_capture_at_a_time():
+    first, second = RunProfiler(memory=False), RunProfiler(memory=False)
+    assert first.start()
+    try:
+        assert not second.start()
+        # Also from another thread
+        results = []
+        thread = threading.Thread(target=lambda: results.append(RunProfiler(memory=False).start()))
+        thread.start()
+        thread.join()
+        assert results == [False]
+        work()
+    finally:
+        summary = first.stop()
+
+    assert not profiling._capture_lock.locked()
+    assert summary["duration_s"] > 0
+    assert any("sorted" in hotspot["function"] for hotspot in summary["hotspots"])
+    assert isinstance(marshal.loads(first.dump()), dict)
+
+    # The lock was released: the next run can be profiled
+    assert second.start()
+    second.stop()
+    assert not profiling._capture_lock.locked()
+
+
+def test_memory_tracing_is_stopped_and_lock_released():
+    profiler = RunProfiler(top_n=5)
+    assert profiler.start()
+    assert tracemalloc.is_tracing()
+    work()
+    summary = profiler.stop()
+
+    assert not tracemalloc.is_tracing()
+    assert not profiling._capture_lock.locked()
+    assert summary["memory"]["peak_kib"] > 0
+    assert len(summary["memory"]["top"]) <= 5
@@ -0,0 +1,103 @@
+import threading
+
+import pytest
+
+from smolagentsUI.scheduler import QueueFullError, RunScheduler
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = RunScheduler(max_workers=1, max_queued=1)
+    yield scheduler
+    scheduler.shutdown()
+
+
+def blocker():
+    """ A run that holds its worker until released. Returns (fn, started, release). """
+    started, release = threading.Event(), threading.Event()
+
+    def fn():
+        started.set()
+        release.wait(5)
+    return fn, started, release
+
+
+def test_runs_of_a_session_execute_in_order_one_at_a_time():
+    scheduler = RunScheduler(max_workers=4, max_queued=8)
+    order, active = [], []
+    done = threading.Event()
+
+    def run(i):
+        def fn():
+            active.append(i)
+            assert len(active) == 1
+            order.append(i)
+            active.remove(i)
+            if i == 4:
+                done.set()
+        return fn
+
+    for i in range(5):
+        scheduler.submit("s", run(i))
+    assert done.wait(5)
+    scheduler.shutdown()
+    assert order == [0, 1, 2, 3, 4]
+
+
+def test_waiting_runs_get_positions_and_the_queue_is_bounded(scheduler):
+    fn, started, release = blocker()
+    first = scheduler.submit("a", fn)
+    assert first.position == 0
+    assert started.wait(5)
+
+    positions = []
+    queued = scheduler.submit("b", lambda: None, on_queued=lambda job, position: positions.append(position))
+    assert queued.position == 1 and positions == [1]
+    assert scheduler.stats()["queued"] == 1
+
+    with pytest.raises(QueueFullError):
+        scheduler.submit("c", lambda: None)
+
+    release.set()
+
+
+def test_cancel_drops_waiting_runs(scheduler):
+    fn, started, release = blocker()
+    scheduler.submit("a", fn)
+    assert started.wait(5)
+
+    cancelled = []
+    scheduler.submit("b", lambda: pytest.fail("cancelled run was executed"), on_cancel=cancelled.append)
+    assert scheduler.cancel("b") == 1
+    assert len(cancelled) == 1 and not scheduler.is_busy("b")
+
+    release.set()
+
+
+def test_a_failing_run_does_not_block_its_session():
+    scheduler = RunScheduler(max_workers=1, max_queued=4)
+    done = threading.Event()
+
+    def fail():
+        raise RuntimeError("boom")
+
+    scheduler.submit("s", fail)
+    scheduler.submit("s", done.set)
+    assert done.wait(5)
+    scheduler.shutdown()
+
+
+def test_without_a_queue_only_runs_that_can_start_are_accepted():
+    scheduler = RunScheduler(max_workers=2, max_queued=0)
+    fn, started, release = blocker()
+    scheduler.submit("a", fn)
+    assert started.wait(5)
+
+    with pytest.raises(QueueFullError, match="still running"):
+        scheduler.submit("a", lambda: None)
+    done = threading.Event()
+    scheduler.submit("b", done.set)
+    assert done.wait(5)
+
+    release.set()
+    scheduler.shutdown()
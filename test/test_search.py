@@ -0,0 +1,64 @@
+import pytest
+
+from smolagentsUI.conversation_manager import ConversationManager
+
+STEPS = [
+    {"task": "Plot the monthly revenue per region"},
+    {"step_number": 1, "model_output": "Loading the sales data", "code_action": "df = load_sales()",
+     "observations": "12 regions"},
+]
+
+
+@pytest.fixture(params=["database", "memory"])
+def manager(request, tmp_path):
+    manager = ConversationManager(str(tmp_path / "chat.db") if request.param == "database" else None)
+    if request.param == "database" and not manager.search_enabled:
+        pytest.skip("SQLite without FTS5")
+    yield manager
+    manager.close()
+
+
+def hits(page):
+    return [(r["session_id"], r["step_index"]) for r in page["results"]]
+
+
+def test_matches_steps_and_titles_with_prefix_on_the_last_word(manager):
+    sid = manager.save_session(None, STEPS, task_preview="Sales chat")
+    manager.save_session(None, [{"task": "Write a poem"}], task_preview="Poetry")
+
+    assert hits(manager.search_sessions("revenue")) == [(sid, 0)]
+    assert set(hits(manager.search_sessions("sal"))) == {(sid, None), (sid, 1)}
+    assert hits(manager.search_sessions("monthly region")) == [(sid, 0)]
+    assert hits(manager.search_sessions("monthly poem")) == []
+
+    result = manager.search_sessions("revenue")["results"][0]
+    assert "<mark>revenue</mark>" in result["snippet"].lower()
+    assert result["preview"] == "Sales chat"
+
+
+def test_paging(manager):
+    for i in range(5):
+        manager.save_session(None, [{"task": f"forecast number {i}"}], task_preview=f"Chat {i}")
+
+    first = manager.search_sessions("forecast", limit=3)
+    second = manager.search_sessions("forecast", limit=3, offset=3)
+    assert first["has_more"] and not second["has_more"]
+    assert len(first["results"]) == 3 and len(second["results"]) == 2
+    assert not set(hits(first)) & set(hits(second))
+
+
+def test_index_follows_rename_and_delete(manager):
+    sid = manager.save_session(None, STEPS, task_preview="Sales chat")
+
+    manager.rename_session(sid, "Quarterly numbers")
+    assert hits(manager.search_sessions("quarterly")) == [(sid, None)]
+    assert (sid, None) not in hits(manager.search_sessions("chat"))
+
+    manager.delete_session(sid)
+    assert manager.search_sessions("revenue")["results"] == []
+
+
+def test_empty_and_punctuation_only_queries(manager):
+    manager.save_session(None, STEPS, task_preview="Sales chat")
+    assert manager.search_sessions("")["results"] == []
+    assert manager.search_sessions('"*()')["results"] == []
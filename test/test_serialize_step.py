@@ -0,0 +1,74 @@
+import json
+
+from smolagentsUI import utils
+from smolagentsUI.utils import JSON_SNIFF_MAX_CHARS, serialize_step
+
+
+class Node:
+    def __init__(self, name):
+        self.name = name
+        self.children = []
+
+
+def test_self_referencing_dict_and_list():
+    data = {"name": "root"}
+    data["self"] = data
+    assert serialize_step(data) == {"name": "root", "self": "[Circular reference: dict]"}
+
+    items = [1, 2]
+    items.append(items)
+    assert serialize_step(items) == [1, 2, "[Circular reference: list]"]
+
+
+def test_indirect_cycle_through_objects():
+    parent = Node("parent")
+    child = Node("child")
+    parent.children.append(child)
+    child.children.append(parent)
+
+    assert serialize_step(parent) == {
+        "_type": "Node",
+        "name": "parent",
+        "children": [{"_type": "Node", "name": "child", "children": ["[Circular reference: Node]"]}],
+    }
+    json.dumps(serialize_step(parent))
+
+
+def test_shared_values_are_not_cycles():
+    shared = [1, 2]
+    assert serialize_step({"a": shared, "b": [shared, shared]}) == {"a": [1, 2], "b": [[1, 2], [1, 2]]}
+
+
+def test_deep_cycle_does_not_recurse_forever():
+    head = current = {"depth": 0}
+    for depth in range(1, 200):
+        current["next"] = current = {"depth": depth}
+    current["next"] = head
+
+    result = serialize_step(head)
+    for _ in range(199):
+        result = result["next"]
+    assert result == {"depth": 199, "next": "[Circular reference: dict]"}
+
+
+def json_list_of_length(length):
+    text = json.dumps(["x" * (length - 4)])
+    assert len(text) == length
+    return text
+
+
+def test_json_strings_are_parsed_up_to_the_sniff_limit():
+    assert serialize_step('{"a": [1, 2]}') == {"a": [1, 2]}
+    assert serialize_step("[not json]") == "[not json]"
+
+    at_limit = json_list_of_length(JSON_SNIFF_MAX_CHARS)
+    assert serialize_step(at_limit) == json.loads(at_limit)
+
+    over_limit = json_list_of_length(JSON_SNIFF_MAX_CHARS + 1)
+    assert serialize_step(over_limit) == over_limit
+
+
+def test_sniff_limit_is_read_at_call_time(monkeypatch):
+    monkeypatch.setattr(utils, "JSON_SNIFF_MAX_CHARS", 8)
+    assert serialize_step('{"a": 1}') == {"a": 1}
+    assert serialize_step('{"ab": 1}') == '{"ab": 1}'
@@ -0,0 +1,72 @@
+from smolagentsUI.conversation_manager import ConversationManager
+from smolagentsUI.session_registry import SessionRegistry
+
+
+def ids(registry):
+    return [session["id"] for session in registry]
+
+
+def session(session_id):
+    return {"id": session_id, "preview": session_id}
+
+
+def test_recency_order():
+    registry = SessionRegistry()
+    for session_id in ("a", "b", "c"):
+        registry.append(session(session_id))
+    assert ids(registry) == ["a", "b", "c"]
+
+    registry.push_front(session("d"))
+    assert ids(registry) == ["d", "a", "b", "c"]
+
+    assert registry.move_to_front("c")
+    assert ids(registry) == ["c", "d", "a", "b"]
+    assert not registry.move_to_front("missing")
+    assert ids(registry) == ["c", "d", "a", "b"]
+
+
+def test_push_front_replaces_an_existing_session():
+    registry = SessionRegistry()
+    registry.append(session("a"))
+    registry.append(session("b"))
+
+    updated = {"id": "b", "preview": "renamed"}
+    registry.push_front(updated)
+    assert ids(registry) == ["b", "a"]
+    assert registry.get("b") is updated
+    assert len(registry) == 2
+
+
+def test_remove():
+    registry = SessionRegistry()
+    for session_id in ("a", "b", "c"):
+        registry.append(session(session_id))
+
+    removed = registry.remove("b")
+    assert removed == session("b")
+    assert "b" not in registry and registry.get("b") is None
+    assert ids(registry) == ["a", "c"]
+    assert registry.remove("b") is None
+
+    registry.clear()
+    assert len(registry) == 0 and ids(registry) == []
+
+
+def test_manager_lists_sessions_by_recency():
+    manager = ConversationManager(None)
+    first = manager.save_session(None, [{"task": "first"}], task_preview="first")
+    second = manager.save_session(None, [{"task": "second"}], task_preview="second")
+    third = manager.save_session(None, [{"task": "third"}], task_preview="third")
+
+    def summary_ids():
+        return [s["id"] for s in manager.get_session_summaries()]
+
+    assert summary_ids() == [third, second, first]
+
+    manager.save_session(first, [{"task": "first"}, {"task": "again"}], task_preview="first")
+    assert summary_ids() == [first, third, second]
+
+    manager.delete_session(third)
+    assert summary_ids() == [first, second]
+    assert manager.get_session(third) is None
+    manager.close()
@@ -0,0 +1,158 @@
+import pytest
+from smolagents.memory import ActionStep, TaskStep
+from smolagents.monitoring import Timing
+
+from smolagentsUI import agent_wrapper
+from smolagentsUI.agent_wrapper import AgentWrapper
+from smolagentsUI.conversation_manager import ConversationManager
+from smolagentsUI.utils import serialize_step
+
+
+def action_step(number, text):
+    return ActionStep(step_number=number, timing=Timing(start_time=float(number), end_time=number + 0.5),
+                      model_output=text, observations=f"observed {text}")
+
+
+def fill(wrapper, turns):
+    steps = wrapper.agent.memory.steps
+    for turn in range(turns):
+        steps.append(TaskStep(task=f"task {turn}"))
+        steps.append(action_step(1, f"output {turn}.1"))
+        steps.append(action_step(2, f"output {turn}.2"))
+
+
+def save(manager, wrapper, session_id=None):
+    """ What server.save_agent_session does: only the changed steps are written. """
+    steps_data, changed = wrapper.get_steps_changes()
+    session_id = manager.save_session(session_id, steps_data, changed_steps=changed)
+    wrapper.mark_steps_persisted(steps_data)
+    return session_id
+
+
+def stored_steps(path, session_id):
+    manager = ConversationManager(path)
+    steps = manager.get_session(session_id)["steps"]
+    manager.close()
+    return steps
+
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = ConversationManager(str(tmp_path / "chat.db"))
+    yield manager
+    manager.close()
+
+
+@pytest.fixture
+def packed(manager, monkeypatch):
+    """ The step dicts written to the steps table, in order. """
+    written = []
+    pack = manager._pack_messages
+
+    def spy(conn, session_id, step):
+        written.append(step)
+        return pack(conn, session_id, step)
+    monkeypatch.setattr(manager, "_pack_messages", spy)
+    return written
+
+
+@pytest.fixture
+def counted(monkeypatch):
+    """ Steps passed to serialize_step by the wrapper. """
+    calls = []
+
+    def counting(step):
+        calls.append(step)
+        return serialize_step(step)
+    monkeypatch.setattr(agent_wrapper, "serialize_step", counting)
+    return calls
+
+
+def test_only_new_and_modified_steps_are_reported(wrapper, counted):
+    fill(wrapper, turns=1)
+    steps_data, changed = wrapper.get_steps_changes()
+    assert changed == [0, 1, 2]
+    wrapper.mark_steps_persisted(steps_data)
+
+    # Nothing changed: nothing is serialized again, the same dicts are returned
+    counted.clear()
+    again, changed = wrapper.get_steps_changes()
+    assert changed == [] and counted == []
+    assert all(a is b for a, b in zip(again, steps_data))
+
+    # A field assigned, or a nested object changed in place
+    memory = wrapper.agent.memory.steps
+    memory[1].observations = "edited"
+    memory[2].timing.end_time = 99.0
+    memory.append(TaskStep(task="next"))
+    steps_data, changed = wrapper.get_steps_changes()
+    assert changed == [1, 2, 3]
+    assert counted == [memory[1], memory[2], memory[3]]
+    assert steps_data[1]["observations"] == "edited"
+    assert steps_data[2]["timing"]["end_time"] == 99.0
+
+
+def test_step_edited_after_a_save_is_written_again(manager, wrapper, packed):
+    fill(wrapper, turns=2)
+    session_id = save(manager, wrapper)
+    assert len(packed) == 6
+
+    packed.clear()
+    wrapper.agent.memory.steps[4].observations = "edited after the save"
+    save(manager, wrapper, session_id)
+
+    assert [step["observations"] for step in packed] == ["edited after the save"]
+    steps = stored_steps(manager.storage_path, session_id)
+    assert len(steps) == 6
+    assert steps[4]["observations"] == "edited after the save"
+
+
+def test_unchanged_steps_are_not_rewritten(manager, wrapper, packed):
+    fill(wrapper, turns=2)
+    session_id = save(manager, wrapper)
+
+    packed.clear()
+    save(manager, wrapper, session_id)
+    assert packed == []
+
+    wrapper.agent.memory.steps.append(action_step(3, "output 1.3"))
+    save(manager, wrapper, session_id)
+    assert [step["model_output"] for step in packed] == ["output 1.3"]
+    assert len(stored_steps(manager.storage_path, session_id)) == 7
+
+
+def test_removed_steps_are_deleted(manager, wrapper):
+    fill(wrapper, turns=2)
+    session_id = save(manager, wrapper)
+
+    del wrapper.agent.memory.steps[3:]
+    save(manager, wrapper, session_id)
+    assert [step.get("task") for step in stored_steps(manager.storage_path, session_id)] == ["task 0", None, None]
+
+
+def test_resumed_session_saves_like_a_full_rewrite(manager, agent, packed):
+    first = AgentWrapper(agent)
+    fill(first, turns=2)
+    session_id = save(manager, first)
+    loaded = manager.get_session(session_id)["steps"]
+
+    # Resume: only the steps touched after load_memory are written
+    resumed = AgentWrapper(agent)
+    resumed.load_memory(loaded)
+    memory = resumed.agent.memory.steps
+    memory[2].observations = "edited after resume"
+    memory.append(TaskStep(task="task 2"))
+    memory.append(action_step(1, "output 2.1"))
+    packed.clear()
+    save(manager, resumed, session_id)
+    assert [step.get("observations", step.get("task")) for step in packed] == [
+        "edited after resume", "task 2", "observed output 2.1"]
+
+    # The same memory written in full, to a new session
+    full_id = manager.save_session(None, resumed.get_steps_data(), changed_steps=list(range(len(memory))))
+
+    stored = stored_steps(manager.storage_path, session_id)
+    assert stored == stored_steps(manager.storage_path, full_id)
+    assert len(stored) == 8
+    assert stored[:2] == loaded[:2] and stored[3:6] == loaded[3:6]
+    assert stored[2]["observations"] == "edited after resume"
@@ -0,0 +1,64 @@
+import pytest
+
+from smolagentsUI.conversation_manager import ConversationManager
+
+
+def make_steps(turns, actions_per_turn):
+    steps = []
+    for turn in range(turns):
+        steps.append({"task": f"task {turn}"})
+        for number in range(1, actions_per_turn + 1):
+            steps.append({
+                "step_number": number,
+                "model_output": f"output {turn}.{number}",
+                "observations": "",
+                "model_input_messages": [{"role": "user", "content": [{"type": "text", "text": f"t{turn}"}]}],
+            })
+    return steps
+
+
+@pytest.fixture
+def stored(tmp_path):
+    manager = ConversationManager(storage_path=str(tmp_path / "chat.db"))
+    steps = make_steps(turns=3, actions_per_turn=4)  # 15 steps, tasks at 0, 5 and 10
+    session_id = manager.save_session(None, steps, task_preview="paging")
+    manager.release_session(session_id)
+    yield manager, session_id, steps
+    manager.close()
+
+
+def without_messages(steps):
+    return [{k: v for k, v in step.items() if k != "model_input_messages"} for step in steps]
+
+
+@pytest.mark.parametrize("before, limit, expected_start", [
+    (None, 3, 10),   # latest turn
+    (None, 7, 5),    # extended back to the task at 5
+    (10, 2, 5),
+    (5, 20, 0),
+    (3, 1, 0),
+])
+def test_page_matches_the_loaded_session(stored, before, limit, expected_start):
+    manager, session_id, steps = stored
+    page = manager.get_steps_page(session_id, before=before, limit=limit)
+    end = len(steps) if before is None else before
+
+    assert page["start_index"] == expected_start
+    assert page["total_steps"] == len(steps)
+    assert page["steps"] == without_messages(steps[expected_start:end])
+    assert page["preview"] == "paging"
+    # The session itself was not loaded
+    assert manager.sessions_cache.get(session_id)["steps"] is None
+
+    manager.get_session(session_id)
+    loaded = manager.get_steps_page(session_id, before=before, limit=limit)
+    assert loaded["start_index"] == expected_start
+    assert without_messages(loaded["steps"]) == page["steps"]
+
+
+def test_single_step(stored):
+    manager, session_id, steps = stored
+    assert manager.get_step(session_id, 7) == without_messages(steps)[7]
+    assert manager.get_step(session_id, len(steps)) is None
+    assert manager.get_step("missing", 0) is None
+    assert manager.sessions_cache.get(session_id)["steps"] is None
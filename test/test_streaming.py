@@ -0,0 +1,71 @@
+import threading
+import time
+
+from smolagentsUI.streaming import StreamCoalescer, StreamMetrics
+
+
+class Recorder:
+    def __init__(self):
+        self.events = []
+        self.times = []
+        self.sent = threading.Event()
+
+    def __call__(self, event):
+        self.events.append(event)
+        self.times.append(time.monotonic())
+        self.sent.set()
+
+
+def delta(content):
+    return {"type": "stream_delta", "content": content, "session_id": "s"}
+
+
+def test_deltas_within_the_window_are_merged():
+    sent = Recorder()
+    coalescer = StreamCoalescer(sent, window_ms=1000, max_bytes=0)
+    for part in ["a", "b", "c"]:
+        coalescer.push(delta(part))
+    coalescer.push({"type": "action_step", "session_id": "s"})
+
+    assert [e["type"] for e in sent.events] == ["stream_delta", "stream_delta", "action_step"]
+    assert [e.get("content") for e in sent.events[:2]] == ["a", "bc"]
+
+
+def test_buffer_is_flushed_at_max_bytes():
+    sent = Recorder()
+    coalescer = StreamCoalescer(sent, window_ms=10000, max_bytes=4)
+    coalescer.push(delta("x"))  # first delta goes out at once
+    for part in ["ab", "cd", "e"]:
+        coalescer.push(delta(part))
+
+    assert [e["content"] for e in sent.events] == ["x", "abcd"]
+    coalescer.close()
+    assert sent.events[-1]["content"] == "e"
+
+
+def test_single_buffered_delta_is_sent_within_the_window():
+    sent = Recorder()
+    coalescer = StreamCoalescer(sent, window_ms=50, max_bytes=0)
+    coalescer.push(delta("first"))
+    sent.sent.clear()
+
+    pushed = time.monotonic()
+    coalescer.push(delta("second"))  # buffered; the model then pauses
+    assert sent.sent.wait(1.0)
+
+    assert sent.events[-1]["content"] == "second"
+    assert sent.times[-1] - pushed < 0.05 + 0.03
+    coalescer.close()
+
+
+def test_no_deadline_flush_after_close():
+    sent = Recorder()
+    metrics = StreamMetrics()
+    coalescer = StreamCoalescer(sent, window_ms=30, max_bytes=0, metrics=metrics)
+    coalescer.push(delta("a"))
+    coalescer.push(delta("b"))
+    coalescer.close()
+    time.sleep(0.06)
+
+    assert [e["content"] for e in sent.events] == ["a", "b"]
+    assert metrics.snapshot()["frames_in"] == 2
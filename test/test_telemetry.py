@@ -0,0 +1,96 @@
+import time
+
+import pytest
+
+from smolagentsUI.conversation_manager import ConversationManager
+from smolagentsUI.telemetry import parse_time, step_telemetry_rows
+
+START = time.mktime(time.strptime("2025-12-01 10:00", "%Y-%m-%d %H:%M"))
+
+
+def action(number, start, duration, tokens=(100, 20), error=None):
+    return {"step_number": number, "model_output": "", "observations": "", "error": error,
+            "timing": {"start_time": start, "end_time": start + duration},
+            "token_usage": {"input_tokens": tokens[0], "output_tokens": tokens[1]}}
+
+
+def run(start, durations, error_at=None):
+    steps = [{"task": "task"}]
+    for i, duration in enumerate(durations):
+        steps.append(action(i + 1, start + i * 10, duration, error="boom" if i == error_at else None))
+        if i == 0:
+            steps.append({"plan": "1. do it", "timing": {"start_time": start + 1, "end_time": start + 2}})
+    return steps
+
+
+@pytest.fixture(params=["database", "memory"])
+def manager(request, tmp_path):
+    manager = ConversationManager(str(tmp_path / "chat.db") if request.param == "database" else None)
+    first = run(START, [2.0, 4.0], error_at=1)
+    a = manager.save_session(None, first, task_preview="A", model_id="model-a")
+    # A second run in the same session, the next day
+    manager.save_session(a, first + run(START + 86400, [1.0]), task_preview="A",
+                         changed_steps=list(range(len(first), len(first) + 3)), model_id="model-a")
+    manager.save_session(None, run(START, [12.0]), task_preview="B", model_id="model-b")
+    yield manager, a
+    manager.close()
+
+
+def test_rows_of_action_and_planning_steps():
+    steps = run(START, [2.0, 4.0], error_at=1)
+    rows = step_telemetry_rows("s", steps, range(len(steps)), "m")
+    assert [(r[1], r[2], r[3]) for r in rows] == [(1, 0, "action"), (2, 0, "planning"), (3, 0, "action")]
+    assert rows[0][6:] == (2.0, 100, 20, 0, "m")
+    assert rows[2][9] == 1
+
+
+def test_rollup_by_session_and_model(manager):
+    manager, a = manager
+    by_session = {r["key"]: r for r in manager.telemetry_rollup("session")["rows"]}
+    assert by_session[a]["runs"] == 2
+    assert by_session[a]["steps"] == 5
+    assert by_session[a]["errors"] == 1
+    assert by_session[a]["duration_s"] == pytest.approx(2 + 4 + 1 + 1 + 1)
+    assert by_session[a]["preview"] == "A"
+
+    by_model = manager.telemetry_rollup("model")["rows"]
+    assert [r["key"] for r in by_model] == ["model-b", "model-a"]  # largest total step time first
+    assert by_model[1]["input_tokens"] == 300
+
+
+def test_rollup_by_day_with_filters(manager):
+    manager, a = manager
+    days = manager.telemetry_rollup("day")["rows"]
+    assert [r["key"] for r in days] == ["2025-12-02", "2025-12-01"]
+
+    rows = manager.telemetry_rollup("day", since="2025-12-02", session_id=a)["rows"]
+    assert [(r["key"], r["steps"]) for r in rows] == [("2025-12-02", 2)]
+    assert manager.telemetry_rollup("day", model_id="missing")["rows"] == []
+
+
+def test_slowest_steps(manager):
+    manager, _ = manager
+    rows = manager.telemetry_rollup("step", limit=2)["rows"]
+    assert [r["duration_s"] for r in rows] == [12.0, 4.0]
+
+
+def test_invalid_requests(manager):
+    manager, _ = manager
+    with pytest.raises(ValueError):
+        manager.telemetry_rollup("year")
+    with pytest.raises(ValueError):
+        parse_time("yesterday")
+
+
+def test_socket_request_without_a_payload(served):
+    app, socketio = served
+    client = socketio.test_client(app)
+    client.emit("get_telemetry")
+    client.emit("get_telemetry", {"group_by": "model", "request_id": 7})
+    client.emit("get_telemetry", {"group_by": "weekday"})
+
+    received = client.get_received()
+    assert [event["name"] for event in received] == ["telemetry", "telemetry", "error"]
+    assert received[0]["args"][0]["group_by"] == "day"
+    assert received[1]["args"][0]["request_id"] == 7
+    client.disconnect()
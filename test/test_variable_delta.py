@@ -0,0 +1,63 @@
+def test_unchanged_variables_are_not_reported(wrapper):
+    state = wrapper.agent.python_executor.state
+    state.update({"n": 1, "text": "hello", "values": list(range(20))})
+    assert [v["name"] for v in wrapper.get_active_variables()] == ["n", "text", "values"]
+
+    assert wrapper.get_variable_delta() == {"added": [], "changed": [], "removed": []}
+
+
+def test_added_reassigned_and_removed_variables(wrapper):
+    state = wrapper.agent.python_executor.state
+    state.update({"a": 1, "b": "x"})
+    wrapper.get_active_variables()
+
+    state["a"] = 2
+    state["c"] = [1]
+    del state["b"]
+    delta = wrapper.get_variable_delta()
+
+    assert [v["name"] for v in delta["added"]] == ["c"]
+    assert [v["name"] for v in delta["changed"]] == ["a"]
+    assert delta["removed"] == ["b"]
+
+
+def test_in_place_change_in_the_middle_of_a_list(wrapper):
+    state = wrapper.agent.python_executor.state
+    state["lst"] = list(range(20))
+    wrapper.get_active_variables()
+
+    state["lst"][5] = 999
+    delta = wrapper.get_variable_delta()
+
+    assert [v["name"] for v in delta["changed"]] == ["lst"]
+    assert "999" in delta["changed"][0]["preview"]
+
+
+def test_in_place_change_of_a_nested_value(wrapper):
+    state = wrapper.agent.python_executor.state
+    state["d"] = {"a": [1, 2], "b": 3}
+    wrapper.get_active_variables()
+
+    state["d"]["a"].append(3)
+    delta = wrapper.get_variable_delta()
+
+    assert [v["name"] for v in delta["changed"]] == ["d"]
+    assert "[1, 2, 3]" in delta["changed"][0]["preview"]
+
+
+def test_in_place_change_of_an_object_attribute(wrapper):
+    class Box:
+        def __init__(self):
+            self.items = [1]
+
+        def __repr__(self):
+            return f"Box({self.items})"
+
+    state = wrapper.agent.python_executor.state
+    state["box"] = Box()
+    wrapper.get_active_variables()
+
+    state["box"].items.append(2)
+    delta = wrapper.get_variable_delta()
+
+    assert [v["name"] for v in delta["changed"]] == ["box"]